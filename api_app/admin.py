@@ -0,0 +1,12 @@
+# api_app/admin.py
+
+from django.contrib import admin
+from .models import IdempotentBatch
+
+
+@admin.register(IdempotentBatch)
+class IdempotentBatchAdmin(admin.ModelAdmin):
+    list_display = ('key', 'user', 'line_count', 'status_code', 'created_at')
+    list_select_related = ('user',)
+    search_fields = ('key',)
+    readonly_fields = ('key', 'request_hash', 'user', 'line_count', 'status_code', 'response', 'created_at')
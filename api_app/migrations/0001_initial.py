@@ -0,0 +1,34 @@
+# Generated by Django 5.0.6 on 2026-10-18 10:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotentBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100, unique=True, verbose_name='Clave de Idempotencia')),
+                ('request_hash', models.CharField(max_length=64, verbose_name='Huella del Contenido')),
+                ('line_count', models.PositiveIntegerField(default=0, verbose_name='Líneas')),
+                ('status_code', models.PositiveSmallIntegerField(default=200, verbose_name='Código HTTP')),
+                ('response', models.JSONField(default=dict, verbose_name='Respuesta')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Lote Idempotente',
+                'verbose_name_plural': 'Lotes Idempotentes',
+            },
+        ),
+    ]
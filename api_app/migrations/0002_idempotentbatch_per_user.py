@@ -0,0 +1,24 @@
+# Generated by Django 5.0.6 on 2026-10-19 01:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_app', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='idempotentbatch',
+            name='key',
+            field=models.CharField(max_length=100, verbose_name='Clave de Idempotencia'),
+        ),
+        migrations.AddConstraint(
+            model_name='idempotentbatch',
+            constraint=models.UniqueConstraint(fields=('user', 'key'), name='idempotentbatch_user_key_uniq'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# api_app/models.py
+
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+from django.conf import settings
+
+
+class IdempotentBatch(models.Model):
+    """
+    Resultado almacenado de un lote de movimientos enviado por un escáner.
+    Si el cliente reintenta con la misma clave se responde desde aquí,
+    sin volver a tocar el stock. Las claves son por usuario: dos escáneres
+    con la misma clave no se pisan ni ven la respuesta del otro.
+    """
+    key = models.CharField(max_length=100, verbose_name=_("Clave de Idempotencia"))
+    request_hash = models.CharField(max_length=64, verbose_name=_("Huella del Contenido"))
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, verbose_name=_("Usuario"))
+    line_count = models.PositiveIntegerField(default=0, verbose_name=_("Líneas"))
+    status_code = models.PositiveSmallIntegerField(default=200, verbose_name=_("Código HTTP"))
+    response = models.JSONField(default=dict, verbose_name=_("Respuesta"))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Fecha de Creación"))
+
+    class Meta:
+        verbose_name = _("Lote Idempotente")
+        verbose_name_plural = _("Lotes Idempotentes")
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='idempotentbatch_user_key_uniq'),
+        ]
+
+    def __str__(self):
+        return f"Lote {self.key} ({self.line_count} líneas)"
@@ -0,0 +1,21 @@
+# api_app/pagination.py
+
+from rest_framework.pagination import CursorPagination
+
+
+class StableCursorPagination(CursorPagination):
+    """
+    Paginación por cursor: coste constante por página (WHERE pk < cursor)
+    en lugar de OFFSET creciente. Cada vista puede declarar su propio
+    `cursor_ordering`; por defecto se ordena por '-pk' (único e inmutable).
+    """
+    ordering = '-pk'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, 'cursor_ordering', self.ordering)
+        if isinstance(ordering, str):
+            return (ordering,)
+        return tuple(ordering)
@@ -0,0 +1,143 @@
+# api_app/serializers.py
+
+from rest_framework import serializers
+
+from billing_app.models import Invoice, InvoiceItem
+from delivery_app.models import DeliveryNote, DeliveryNoteItem
+from inventory_app.models import Product, ProductVariation, Dispatch, StockArrival
+from purchasing_app.models import PurchaseOrder, PurchaseOrderItem
+
+
+def requested_fields(request):
+    """Campos pedidos en ?fields=a,b,c (None si no se filtra)"""
+    if request is None:
+        return None
+    raw = request.query_params.get('fields')
+    if not raw:
+        return None
+    return {f.strip() for f in raw.split(',') if f.strip()}
+
+
+class SparseFieldsMixin:
+    """
+    Sparse fieldsets: ?fields=id,sku,name recorta la representación.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        wanted = requested_fields(self.context.get('request'))
+        if wanted:
+            for name in set(self.fields) - wanted:
+                self.fields.pop(name)
+
+
+# ==========================================
+# 1. INVENTARIO
+# ==========================================
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    category_name = serializers.CharField(source='category.name', default=None, read_only=True)
+    total_stock = serializers.IntegerField(source='total_qty', read_only=True)
+
+    class Meta:
+        model = Product
+        fields = (
+            'id', 'sku', 'name', 'barcode', 'category', 'category_name',
+            'unit_of_measure', 'cost_price', 'sale_price', 'min_stock_level',
+            'tracking_type', 'costing_method', 'is_critical', 'daily_usage_rate', 'is_active',
+            'total_stock', 'created_at', 'updated_at',
+        )
+
+
+class ProductVariationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    product_sku = serializers.CharField(source='product.sku', read_only=True)
+    product_name = serializers.CharField(source='product.name', read_only=True)
+
+    class Meta:
+        model = ProductVariation
+        fields = ('id', 'product', 'product_sku', 'product_name', 'size', 'color', 'sku_variant', 'stock')
+
+
+class StockLevelSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    total_stock = serializers.IntegerField(source='total_qty', read_only=True)
+    stock_status = serializers.CharField(read_only=True)
+
+    class Meta:
+        model = Product
+        fields = ('id', 'sku', 'name', 'is_critical', 'min_stock_level', 'total_stock', 'stock_status', 'updated_at')
+
+
+class DispatchSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    sku_variant = serializers.CharField(source='variation.sku_variant', read_only=True)
+    product = serializers.IntegerField(source='variation.product_id', read_only=True)
+    product_name = serializers.CharField(source='variation.product.name', read_only=True)
+    username = serializers.CharField(source='user.username', default=None, read_only=True)
+
+    class Meta:
+        model = Dispatch
+        fields = ('id', 'variation', 'sku_variant', 'product', 'product_name', 'quantity',
+                  'destination', 'dispatched_at', 'user', 'username')
+
+
+class StockArrivalSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    sku_variant = serializers.CharField(source='variation.sku_variant', read_only=True)
+    product = serializers.IntegerField(source='variation.product_id', read_only=True)
+    product_name = serializers.CharField(source='variation.product.name', read_only=True)
+    username = serializers.CharField(source='user.username', default=None, read_only=True)
+
+    class Meta:
+        model = StockArrival
+        fields = ('id', 'variation', 'sku_variant', 'product', 'product_name', 'quantity',
+                  'unit_cost', 'supplier', 'arrival_date', 'user', 'username')
+
+
+# ==========================================
+# 2. DOCUMENTOS (FACTURAS, COMPRAS, ENTREGAS)
+# ==========================================
+class InvoiceItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = InvoiceItem
+        fields = ('id', 'product', 'product_name', 'sku', 'quantity', 'unit_price', 'line_total')
+
+
+class InvoiceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    client_name = serializers.CharField(source='client.full_name', default=None, read_only=True)
+    items = InvoiceItemSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Invoice
+        fields = ('id', 'invoice_number', 'client', 'client_name', 'invoice_date', 'due_date',
+                  'subtotal', 'tax_amount', 'discount_amount', 'total_amount', 'status',
+                  'payment_method', 'created_at', 'updated_at', 'items')
+
+
+class PurchaseOrderItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PurchaseOrderItem
+        fields = ('id', 'product', 'quantity', 'cost_price')
+
+
+class PurchaseOrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    supplier_name = serializers.CharField(source='supplier.name', read_only=True)
+    items = PurchaseOrderItemSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = PurchaseOrder
+        fields = ('id', 'po_number', 'supplier', 'supplier_name', 'order_date',
+                  'expected_delivery_date', 'status', 'created_at', 'updated_at', 'items')
+
+
+class DeliveryNoteItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DeliveryNoteItem
+        fields = ('id', 'product', 'product_name', 'sku', 'quantity')
+
+
+class DeliveryNoteSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    client_name = serializers.CharField(source='client.full_name', read_only=True)
+    items = DeliveryNoteItemSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = DeliveryNote
+        fields = ('id', 'delivery_note_number', 'client', 'client_name', 'invoice',
+                  'delivery_date', 'delivery_address', 'status', 'received_by',
+                  'created_at', 'updated_at', 'items')
@@ -0,0 +1,270 @@
+# api_app/tests.py
+
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from inventory_app import changes
+from inventory_app.models import CatalogChange, CountLine, CountSession, Product, ProductVariation
+from inventory_app.tests import TEST_CACHES, QueryBudgetTestCase
+from jobs_app.models import Job
+
+from .urls import router, urlpatterns
+
+# Presupuesto de un listado o detalle paginado (sesión, usuario, ETag, página, prefetch)
+API_READ_BUDGET = 5
+
+
+class APIQueryBudgetTests(QueryBudgetTestCase):
+
+    @classmethod
+    def load_dataset(cls, prefix, rows):
+        super().load_dataset(prefix, rows)
+        # El feed de sincronización necesita filas en la bitácora de cambios
+        changes.record(changes.Entity.PRODUCT, Product.objects.filter(sku__startswith=prefix).values_list('pk', flat=True))
+        changes.record(
+            changes.Entity.VARIATION,
+            ProductVariation.objects.filter(product__sku__startswith=prefix).values_list('pk', flat=True),
+        )
+
+    def detail_case(self, viewset, basename):
+        resolved = {}
+
+        def request(client):
+            # El pk se resuelve en la pasada de calentamiento (fuera de la medición): el set
+            # chico no trae despachos hasta que corre el caso del lote de movimientos
+            if 'pk' not in resolved:
+                resolved['pk'] = viewset().get_queryset().order_by('pk').values_list('pk', flat=True).first()
+            self.assertIsNotNone(resolved['pk'], f"{basename}: sin filas")
+            return self.get_case(reverse(f'{basename}-detail', args=[resolved['pk']]))(client)
+        return request
+
+    def movement_batch_case(self):
+        variations = list(ProductVariation.objects.filter(stock__gte=10).order_by('pk')[:3])
+        url = reverse('api-movement-batch')
+
+        def movement_batch(client):
+            # Clave nueva en cada llamada: un reintento no contabiliza y mediría otra ruta
+            data = {
+                'idempotency_key': uuid.uuid4().hex,
+                'destination': 'Planta',
+                'lines': [{'type': 'dispatch', 'sku': v.sku_variant, 'qty': 1} for v in variations],
+            }
+            return self.post_case(url, data, status=200, content_type='application/json')(client)
+        return movement_batch
+
+    def count_cases(self):
+        session = CountSession.objects.create(name='Conteo QB líneas', created_by=self.superuser)
+        variations = list(ProductVariation.objects.order_by('pk')[:3])
+        lines = {
+            'mode': 'set',
+            'lines': [{'sku': v.sku_variant, 'qty': 5} for v in variations],
+        }
+        CountLine.objects.bulk_create(CountLine(session=session, variation=v, counted_qty=5) for v in variations)
+
+        # Aprobar cierra la sesión: una por llamada (calentamiento y medición, set chico y crecido),
+        # cada una con un sobrante y un faltante sobre variaciones que no toca el lote de movimientos
+        pending = []
+        stocked = list(ProductVariation.objects.filter(stock__gte=10).order_by('-pk')[:8])
+        for over, short in zip(stocked[::2], stocked[1::2]):
+            pending.append(CountSession.objects.create(name='Conteo QB aprobación', created_by=self.superuser))
+            CountLine.objects.bulk_create([
+                CountLine(session=pending[-1], variation=over, counted_qty=over.stock + 5),
+                CountLine(session=pending[-1], variation=short, counted_qty=short.stock - 5),
+            ])
+
+        def approve(client):
+            self.assertTrue(pending, "Sin sesiones de conteo pendientes")
+            url = reverse('api-count-approve', args=[pending.pop().pk])
+            return self.post_case(url, {}, status=200, content_type='application/json')(client)
+
+        return {
+            'api-count-lines': (9, self.post_case(
+                reverse('api-count-lines', args=[session.pk]), lines, status=200, content_type='application/json')),
+            'api-count-reconcile': (9, self.post_case(
+                reverse('api-count-reconcile', args=[session.pk]), {}, status=200, content_type='application/json')),
+            # Bloqueos y diferencias + post_movements con capas de costo (ver api-movement-batch)
+            'api-count-approve': (24, approve),
+        }
+
+    def api_cases(self):
+        cases = {'api-root': (3, self.get_case(reverse('api-root')))}
+        # post_movements con capas de costo y bitácora de cambios (ver create_dispatch:post)
+        cases['api-movement-batch'] = (20, self.movement_batch_case())
+        for _, viewset, basename in router.registry:
+            cases[f'{basename}-list'] = (API_READ_BUDGET, self.get_case(reverse(f'{basename}-list')))
+            cases[f'{basename}-detail'] = (API_READ_BUDGET, self.detail_case(viewset, basename))
+
+        # Filas pendientes de posición (índice parcial) y la última posición
+        cases['api-sync'] = (4, self.get_case(reverse('api-sync')))
+        cases['api-sync:cursor'] = (6, self.get_case(reverse('api-sync') + '?cursor=0'))
+
+        cases['api-count-sessions'] = (4, self.post_case(
+            reverse('api-count-sessions'), {'name': 'Conteo QB'}, status=201, content_type='application/json'))
+        cases.update(self.count_cases())
+        ids = ','.join(str(pk) for pk in ProductVariation.objects.order_by('pk').values_list('pk', flat=True)[:3])
+        cases['api-jobs'] = (4, self.post_case(
+            reverse('api-jobs'), {'task': 'inventory.refresh_stock_rollups'}, status=202, content_type='application/json'))
+        job = Job.objects.create(task='inventory.refresh_stock_rollups')
+        cases['api-job-status'] = (3, self.get_case(reverse('api-job-status', args=[job.pk])))
+        cases['api-availability'] = (3, self.get_case(f"{reverse('api-availability')}?variations={ids}&skus=QB-NOPE"))
+        moments = ['2024-06-01T00:00:00', '2025-06-30T12:00:00-04:00']
+        price_items = [{'product': pk, 'at': at} for pk in Product.objects.order_by('pk').values_list('pk', flat=True)[:5]
+                       for at in moments]
+        cases['api-prices-at'] = (3, self.post_case(
+            reverse('api-prices-at'), {'items': price_items}, status=200, content_type='application/json'))
+
+        return cases
+
+    def test_api_endpoints(self):
+        cases = self.api_cases()
+        expected = [p.name for p in urlpatterns if getattr(p, 'name', None)] + [
+            f'{basename}-{kind}' for _, _, basename in router.registry for kind in ('list', 'detail')
+        ] + ['api-root']
+        self.assert_covers(expected, {name.split(':')[0] for name in cases})
+        self.assert_query_budgets(cases, 'QBL')
+
+    def test_admin_changelists(self):
+        self.assert_query_budgets(self.admin_changelist_cases('api_app'), 'QBL')
+
+
+# ==========================================
+# LOTES IDEMPOTENTES
+# ==========================================
+@override_settings(CACHES=TEST_CACHES)
+class MovementBatchIdempotencyTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.scanner, cls.other = User.objects.create_user('scan-1'), User.objects.create_user('scan-2')
+        product = Product.objects.create(sku='IDM-1', name='Guante', sale_price=5)
+        cls.variation = ProductVariation.objects.create(product=product, size='M', color='Gris',
+                                                        sku_variant='IDM-1-M', stock=20)
+
+    def post_batch(self, user, key, qty=2):
+        self.client.force_login(user)
+        data = {'idempotency_key': key, 'destination': 'Planta',
+                'lines': [{'type': 'dispatch', 'sku': self.variation.sku_variant, 'qty': qty}]}
+        return self.client.post(reverse('api-movement-batch'), data, content_type='application/json')
+
+    def stock(self):
+        self.variation.refresh_from_db(fields=['stock'])
+        return self.variation.stock
+
+    def test_retry_replays_stored_response(self):
+        first = self.post_batch(self.scanner, 'lote-1')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json()['accepted'], 1)
+        self.assertEqual(self.stock(), 18)
+
+        retry = self.post_batch(self.scanner, 'lote-1')
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.headers.get('Idempotent-Replayed'), 'true')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(self.stock(), 18)
+
+    def test_same_key_with_other_content_is_rejected(self):
+        self.post_batch(self.scanner, 'lote-1')
+        conflict = self.post_batch(self.scanner, 'lote-1', qty=3)
+        self.assertEqual(conflict.status_code, 409)
+        self.assertEqual(self.stock(), 18)
+
+    def test_keys_are_scoped_per_user(self):
+        self.post_batch(self.scanner, 'lote-1')
+        # Otro escáner con la misma clave: lote propio, sin ver la respuesta ajena
+        other = self.post_batch(self.other, 'lote-1', qty=3)
+        self.assertEqual(other.status_code, 200)
+        self.assertNotIn('Idempotent-Replayed', other.headers)
+        self.assertEqual(self.stock(), 15)
+
+    def test_fractional_quantities_are_rejected(self):
+        for n, qty in enumerate([2.7, '1.5', 'NaN', 'Infinity', True, 0]):
+            response = self.post_batch(self.scanner, f'lote-q{n}', qty=qty)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual((response.json()['accepted'], response.json()['results'][0]['status']), (0, 'error'))
+        # 3.0 (Excel, JavaScript) es entero
+        self.assertEqual(self.post_batch(self.scanner, 'lote-q9', qty=3.0).json()['accepted'], 1)
+        self.assertEqual(self.stock(), 17)
+
+    def test_malformed_body_is_a_bad_request(self):
+        self.client.force_login(self.scanner)
+        url = reverse('api-movement-batch')
+        line = {'type': 'dispatch', 'sku': self.variation.sku_variant, 'qty': 1}
+        for body in ([line], {'idempotency_key': 123, 'lines': [line]}, {'idempotency_key': ['a'], 'lines': [line]}):
+            self.assertEqual(self.client.post(url, body, content_type='application/json').status_code, 400)
+        self.assertEqual(self.stock(), 20)
+
+
+# ==========================================
+# TRABAJOS EN SEGUNDO PLANO
+# ==========================================
+@override_settings(CACHES=TEST_CACHES)
+class JobStatusTests(TestCase):
+
+    def test_only_staff_or_owner_reads_a_job(self):
+        User = get_user_model()
+        staff, owner, scanner = (User.objects.create_user('jefe', is_staff=True), User.objects.create_user('dueño'),
+                                 User.objects.create_user('scan-1'))
+        job = Job.objects.create(task='inventory.refresh_stock_rollups', created_by=owner, error="detalle interno")
+        url = reverse('api-job-status', args=[job.pk])
+        for user, expected in ((staff, 200), (owner, 200), (scanner, 404)):
+            self.client.force_login(user)
+            self.assertEqual(self.client.get(url).status_code, expected)
+
+        self.client.force_login(scanner)
+        response = self.client.post(reverse('api-jobs'), {'task': 'inventory.refresh_stock_rollups'},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+# ==========================================
+@override_settings(CACHES=TEST_CACHES)
+class SyncFeedTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('tablet')
+        cls.products = Product.objects.bulk_create([
+            Product(sku=f'SY-{n}', name=f'Material {n}', sale_price=n) for n in range(1, 5)
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def feed(self, cursor=None, limit=1000):
+        query = {} if cursor is None else {'cursor': cursor, 'limit': limit}
+        response = self.client.get(reverse('api-sync'), query)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def change(self, product, pk=None):
+        CatalogChange.objects.create(id=pk, entity=changes.Entity.PRODUCT, object_id=product.pk)
+
+    def test_late_commit_with_lower_id_is_not_skipped(self):
+        cursor = self.feed()['cursor']
+        self.change(self.products[0], pk=1000)
+        page = self.feed(cursor)
+        self.assertEqual([p['id'] for p in page['products']], [self.products[0].pk])
+
+        # Transacción larga: tomó un id menor y confirma después de que el cliente avanzó
+        self.change(self.products[1], pk=500)
+        late = self.feed(page['cursor'])
+        self.assertEqual([p['id'] for p in late['products']], [self.products[1].pk])
+        self.assertGreater(late['cursor'], page['cursor'])
+
+        idle = self.feed(late['cursor'])
+        self.assertEqual((idle['cursor'], idle['products'], idle['has_more']), (late['cursor'], [], False))
+
+    def test_pages_cover_every_change_once(self):
+        cursor = self.feed()['cursor']
+        changes.record(changes.Entity.PRODUCT, [p.pk for p in self.products])
+        seen = []
+        while True:
+            page = self.feed(cursor, limit=3)
+            seen += [p['id'] for p in page['products']]
+            cursor = page['cursor']
+            if not page['has_more']:
+                break
+        self.assertEqual(seen, [p.pk for p in self.products])
+        self.assertEqual(self.feed()['cursor'], cursor)
@@ -0,0 +1,32 @@
+# api_app/urls.py
+
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+
+from . import views
+
+router = DefaultRouter()
+# Inventario
+router.register('productos', views.ProductViewSet, basename='api-products')
+router.register('variaciones', views.ProductVariationViewSet, basename='api-variations')
+router.register('stock', views.StockLevelViewSet, basename='api-stock')
+router.register('despachos', views.DispatchViewSet, basename='api-dispatches')
+router.register('ingresos', views.StockArrivalViewSet, basename='api-arrivals')
+# Documentos
+router.register('facturas', views.InvoiceViewSet, basename='api-invoices')
+router.register('ordenes-compra', views.PurchaseOrderViewSet, basename='api-purchase-orders')
+router.register('notas-entrega', views.DeliveryNoteViewSet, basename='api-delivery-notes')
+
+urlpatterns = [
+    path('movimientos/lote/', views.MovementBatchView.as_view(), name='api-movement-batch'),
+    path('sync/', views.SyncFeedView.as_view(), name='api-sync'),
+    path('conteos/', views.CountSessionView.as_view(), name='api-count-sessions'),
+    path('conteos/<int:pk>/lineas/', views.CountLinesView.as_view(), name='api-count-lines'),
+    path('conteos/<int:pk>/conciliar/', views.CountReconcileView.as_view(), name='api-count-reconcile'),
+    path('conteos/<int:pk>/aprobar/', views.CountApproveView.as_view(), name='api-count-approve'),
+    path('disponibilidad/', views.AvailabilityView.as_view(), name='api-availability'),
+    path('precios/vigentes/', views.PriceAtView.as_view(), name='api-prices-at'),
+    path('trabajos/', views.JobEnqueueView.as_view(), name='api-jobs'),
+    path('trabajos/<int:pk>/', views.JobStatusView.as_view(), name='api-job-status'),
+    path('', include(router.urls)),
+]
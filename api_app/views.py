@@ -0,0 +1,543 @@
+# api_app/views.py
+
+import hashlib
+import json
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q, prefetch_related_objects
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import status, viewsets
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from billing_app.models import Invoice
+from core.db_router import use_replica
+from delivery_app.models import DeliveryNote
+from inventory_app import changes, counting, pricing
+from inventory_app.models import CountSession, Product, ProductVariation, Dispatch, StockArrival, Warehouse
+from inventory_app.services import post_movements
+from jobs_app import queue as jobs
+from jobs_app.models import Job
+from purchasing_app.models import PurchaseOrder
+
+from . import serializers
+from .models import IdempotentBatch
+
+
+def _resolve(obj, path):
+    """Lee 'a.b.c' sobre el objeto (None si algún eslabón falta)"""
+    for attr in path.split('.'):
+        if obj is None:
+            return None
+        obj = getattr(obj, attr)
+    return obj
+
+
+def _if_none_match(request):
+    header = request.headers.get('If-None-Match', '')
+    return {tag.strip() for tag in header.split(',') if tag.strip()}
+
+
+class ConditionalGetMixin:
+    """
+    ETag / If-None-Match para listados y detalles de sólo lectura.
+
+    El ETag se calcula con los valores baratos de `etag_fields` de los objetos
+    ya cargados en la página (pk, updated_at, stock...) más la URL completa
+    (cursor, ?fields=). Si coincide devolvemos 304 sin serializar y sin
+    ejecutar los prefetch de líneas de documento (`prefetch_lookups`), que
+    sólo se cargan cuando realmente hay que responder con cuerpo.
+    """
+    etag_fields = ('pk',)
+    prefetch_lookups = ()
+
+    def compute_etag(self, objects):
+        digest = hashlib.sha1(self.request.get_full_path().encode())
+        for obj in objects:
+            digest.update(repr(tuple(_resolve(obj, f) for f in self.etag_fields)).encode())
+        return f'"{digest.hexdigest()}"'
+
+    def _not_modified(self, etag):
+        tags = _if_none_match(self.request)
+        return etag in tags or '*' in tags
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        objects = page if page is not None else list(queryset)
+
+        etag = self.compute_etag(objects)
+        if self._not_modified(etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        if self.prefetch_lookups:
+            prefetch_related_objects(objects, *self.prefetch_lookups)
+        serializer = self.get_serializer(objects, many=True)
+        if page is not None:
+            response = self.get_paginated_response(serializer.data)
+        else:
+            response = Response(serializer.data)
+        response['ETag'] = etag
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+
+        etag = self.compute_etag([instance])
+        if self._not_modified(etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        if self.prefetch_lookups:
+            prefetch_related_objects([instance], *self.prefetch_lookups)
+        response = Response(self.get_serializer(instance).data)
+        response['ETag'] = etag
+        return response
+
+
+class ReadOnlyAPIViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+
+    def list(self, request, *args, **kwargs):
+        # Los listados (paginados, con ETag) leen de la réplica; el detalle y
+        # el feed de sincronización siguen en el primario
+        with use_replica():
+            return super().list(request, *args, **kwargs)
+
+
+# ==========================================
+# 1. INVENTARIO
+# ==========================================
+class ProductViewSet(ReadOnlyAPIViewSet):
+    serializer_class = serializers.ProductSerializer
+    etag_fields = ('pk', 'updated_at', 'total_qty', 'category.name')
+
+    def get_queryset(self):
+        return Product.objects.select_related('category').with_stock()
+
+
+class ProductVariationViewSet(ReadOnlyAPIViewSet):
+    serializer_class = serializers.ProductVariationSerializer
+    etag_fields = ('pk', 'stock', 'size', 'color', 'sku_variant', 'product.updated_at')
+
+    def get_queryset(self):
+        return ProductVariation.objects.select_related('product')
+
+
+class StockLevelViewSet(ReadOnlyAPIViewSet):
+    """Stock total y semáforo por producto, calculados en una sola consulta"""
+    serializer_class = serializers.StockLevelSerializer
+    etag_fields = ('pk', 'total_qty', 'min_stock_level', 'updated_at')
+
+    def get_queryset(self):
+        return Product.objects.filter(is_active=True).with_stock_status()
+
+
+class DispatchViewSet(ReadOnlyAPIViewSet):
+    serializer_class = serializers.DispatchSerializer
+    etag_fields = ('pk', 'variation.product.updated_at')
+
+    def get_queryset(self):
+        return Dispatch.objects.select_related('variation__product', 'user')
+
+
+class StockArrivalViewSet(ReadOnlyAPIViewSet):
+    serializer_class = serializers.StockArrivalSerializer
+    etag_fields = ('pk', 'variation.product.updated_at')
+
+    def get_queryset(self):
+        return StockArrival.objects.select_related('variation__product', 'user')
+
+
+# ==========================================
+# 2. DOCUMENTOS
+# ==========================================
+class InvoiceViewSet(ReadOnlyAPIViewSet):
+    serializer_class = serializers.InvoiceSerializer
+    etag_fields = ('pk', 'updated_at', 'client.full_name')
+    prefetch_lookups = ('items',)
+
+    def get_queryset(self):
+        return Invoice.objects.select_related('client')
+
+
+class PurchaseOrderViewSet(ReadOnlyAPIViewSet):
+    serializer_class = serializers.PurchaseOrderSerializer
+    etag_fields = ('pk', 'updated_at', 'supplier.name')
+    prefetch_lookups = ('items',)
+
+    def get_queryset(self):
+        return PurchaseOrder.objects.select_related('supplier')
+
+
+class DeliveryNoteViewSet(ReadOnlyAPIViewSet):
+    serializer_class = serializers.DeliveryNoteSerializer
+    etag_fields = ('pk', 'updated_at', 'client.full_name')
+    prefetch_lookups = ('items',)
+
+    def get_queryset(self):
+        return DeliveryNote.objects.select_related('client')
+
+
+# ==========================================
+# 3. ESCRITURA POR LOTES (ESCÁNERES)
+# ==========================================
+class MovementBatchView(APIView):
+    """
+    POST de cientos de líneas de despacho/reposición en una sola transacción.
+
+    Cuerpo:
+        {"idempotency_key": "...", "destination": "...", "supplier": "...",
+         "lines": [{"type": "dispatch", "sku": "JN-30-AZU", "qty": 2}, ...]}
+
+    La clave también puede enviarse en la cabecera Idempotency-Key. Un reintento
+    del mismo usuario con la misma clave devuelve la respuesta almacenada
+    (cabecera Idempotent-Replayed: true) sin volver a contabilizar nada; con
+    otro contenido, 409. Las claves de otros usuarios no interfieren.
+    """
+
+    def post(self, request):
+        data = request.data
+        if not isinstance(data, dict):
+            return Response({'error': "El cuerpo debe ser un objeto JSON."}, status=status.HTTP_400_BAD_REQUEST)
+        key = request.headers.get('Idempotency-Key') or data.get('idempotency_key') or ''
+        # Una clave numérica u objeto no es una clave: 400, no un 500 al hacer strip()
+        key = key.strip() if isinstance(key, str) else ''
+        lines = data.get('lines')
+
+        if not key or len(key) > 100:
+            return Response({'error': "Falta 'idempotency_key' (máx. 100 caracteres)."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(lines, list) or not lines:
+            return Response({'error': "'lines' debe ser una lista no vacía."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        max_lines = getattr(settings, 'SCANNER_BATCH_MAX_LINES', 1000)
+        if len(lines) > max_lines:
+            return Response({'error': f"Máximo {max_lines} líneas por lote."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not all(isinstance(line, dict) for line in lines):
+            return Response({'error': "Cada línea debe ser un objeto."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        request_hash = hashlib.sha256(
+            json.dumps(data, sort_keys=True, default=str).encode()
+        ).hexdigest()
+
+        with transaction.atomic():
+            try:
+                # El índice único (usuario, clave) serializa reintentos concurrentes
+                with transaction.atomic():
+                    batch = IdempotentBatch.objects.create(
+                        key=key, request_hash=request_hash, user=request.user, line_count=len(lines),
+                    )
+            except IntegrityError:
+                batch = None
+
+            if batch is not None:
+                results = post_movements(
+                    lines,
+                    user=request.user,
+                    destination=data.get('destination') or '',
+                    supplier=data.get('supplier') or 'General',
+                )
+                accepted = sum(1 for r in results if r['status'] == 'ok')
+                batch.response = {
+                    'idempotency_key': key,
+                    'accepted': accepted,
+                    'rejected': len(results) - accepted,
+                    'results': results,
+                }
+                batch.save(update_fields=['response'])
+                return Response(batch.response, status=batch.status_code)
+
+        stored = IdempotentBatch.objects.get(user=request.user, key=key)
+        if stored.request_hash != request_hash:
+            return Response({'error': "La clave de idempotencia ya se usó con otro contenido."},
+                            status=status.HTTP_409_CONFLICT)
+        return Response(stored.response, status=stored.status_code, headers={'Idempotent-Replayed': 'true'})
+
+
+# ==========================================
+# 4. SINCRONIZACIÓN DELTA (TABLETAS OFFLINE)
+# ==========================================
+class SyncFeedView(APIView):
+    """
+    Cambios de catálogo y stock desde un cursor.
+
+    GET /api/sync/             -> {"cursor": N} (punto de partida tras la carga inicial)
+    GET /api/sync/?cursor=N    -> productos y variaciones cambiados, stock nuevo
+                                  y bajas (tombstones) con id > N.
+    El cliente repite con el "cursor" devuelto mientras "has_more" sea true.
+    """
+
+    def get(self, request):
+        if 'cursor' not in request.query_params:
+            return Response({'cursor': changes.latest_cursor()})
+
+        try:
+            cursor = max(int(request.query_params['cursor']), 0)
+            limit = min(int(request.query_params.get('limit', 1000)), 5000)
+        except ValueError:
+            return Response({'error': "'cursor' y 'limit' deben ser enteros."}, status=status.HTTP_400_BAD_REQUEST)
+
+        rows, has_more = changes.changes_since(cursor, max(limit, 1))
+        if not rows:
+            return Response({'cursor': cursor, 'has_more': has_more, 'products': [], 'variations': [],
+                             'stock': [], 'deleted': {'products': [], 'variations': []}})
+
+        # Colapsamos: por objeto sólo importa la última operación. Las variaciones
+        # completas ya traen su stock, así que no se repiten en "stock".
+        latest = {}
+        for row in rows:
+            latest[(row['entity'], row['object_id'])] = row['operation']
+
+        def ids(entity, operation):
+            return [pk for (e, pk), op in latest.items() if e == entity and op == operation]
+
+        deleted_variations = set(ids(changes.Entity.VARIATION, changes.Operation.DELETE))
+        product_ids = ids(changes.Entity.PRODUCT, changes.Operation.UPSERT)
+        variation_ids = ids(changes.Entity.VARIATION, changes.Operation.UPSERT)
+        stock_ids = [pk for pk in ids(changes.Entity.STOCK, changes.Operation.UPSERT)
+                     if pk not in deleted_variations and pk not in variation_ids]
+
+        products = Product.objects.filter(pk__in=product_ids).select_related('category').with_stock() if product_ids else []
+        variations = ProductVariation.objects.filter(pk__in=variation_ids).select_related('product') if variation_ids else []
+        stock = list(ProductVariation.objects.filter(pk__in=stock_ids).values('id', 'stock')) if stock_ids else []
+
+        return Response({
+            'cursor': rows[-1]['position'],
+            'has_more': has_more,
+            'products': serializers.ProductSerializer(products, many=True).data,
+            'variations': serializers.ProductVariationSerializer(variations, many=True).data,
+            'stock': stock,
+            'deleted': {
+                'products': ids(changes.Entity.PRODUCT, changes.Operation.DELETE),
+                'variations': sorted(deleted_variations),
+            },
+        })
+
+
+# ==========================================
+# 5. CONTEOS FÍSICOS
+# ==========================================
+def _count_session(pk):
+    return CountSession.objects.filter(pk=pk).first()
+
+
+def _not_found():
+    return Response({'error': "Conteo no encontrado."}, status=status.HTTP_404_NOT_FOUND)
+
+
+class CountSessionView(APIView):
+    """POST {"name": "...", "warehouse": id opcional} -> abre una sesión de conteo."""
+
+    def post(self, request):
+        name = (request.data.get('name') or '').strip()
+        if not name:
+            return Response({'error': "Falta 'name'."}, status=status.HTTP_400_BAD_REQUEST)
+        warehouse = request.data.get('warehouse')
+        if warehouse not in (None, ''):
+            warehouse = Warehouse.objects.filter(pk=warehouse).first() if str(warehouse).isdigit() else None
+            if warehouse is None:
+                return Response({'error': "Almacén no encontrado."}, status=status.HTTP_400_BAD_REQUEST)
+        session = CountSession.objects.create(name=name[:150], warehouse=warehouse or None, created_by=request.user)
+        return Response({'id': session.pk, 'name': session.name, 'status': session.status},
+                        status=status.HTTP_201_CREATED)
+
+
+class CountLinesView(APIView):
+    """
+    Carga de líneas contadas en una sesión abierta.
+
+    JSON:      {"mode": "add" | "set", "lines": [{"sku": "JN-30-AZU", "qty": 12}, ...]}
+    Multipart: file=<XLSX con columnas SKU y Cantidad>, mode opcional.
+
+    En modo "add" (por defecto) las cantidades se suman a lo ya contado, así
+    varios escáneres pueden cargar zonas distintas; "set" reemplaza la cifra.
+    """
+
+    def post(self, request, pk):
+        session = _count_session(pk)
+        if session is None:
+            return _not_found()
+        mode = request.data.get('mode') or counting.ADD
+        try:
+            if 'file' in request.FILES:
+                lines = counting.parse_xlsx(request.FILES['file'])
+            else:
+                lines = request.data.get('lines')
+                if not isinstance(lines, list) or not all(isinstance(line, dict) for line in lines):
+                    return Response({'error': "'lines' debe ser una lista de objetos (o envíe 'file' con un XLSX)."},
+                                    status=status.HTTP_400_BAD_REQUEST)
+            if not lines:
+                return Response({'error': "No hay líneas para cargar."}, status=status.HTTP_400_BAD_REQUEST)
+            max_lines = getattr(settings, 'COUNT_UPLOAD_MAX_LINES', 100000)
+            if len(lines) > max_lines:
+                return Response({'error': f"Máximo {max_lines} líneas por carga."}, status=status.HTTP_400_BAD_REQUEST)
+            result = counting.add_lines(session, lines, mode)
+        except counting.CountError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result)
+
+
+def _variance_rows(session):
+    return [
+        {'variation': line.variation_id, 'sku': line.variation.sku_variant, 'product': line.variation.product.name,
+         'counted': line.counted_qty, 'system': line.system_stock, 'variance': line.variance}
+        for line in counting.largest_variances(session)
+    ]
+
+
+class CountReconcileView(APIView):
+    """POST -> calcula las diferencias contra el stock actual; devuelve totales y las mayores diferencias."""
+
+    def post(self, request, pk):
+        session = _count_session(pk)
+        if session is None:
+            return _not_found()
+        try:
+            totals = counting.reconcile(session)
+        except counting.CountError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'id': session.pk, 'summary': totals, 'largest_variances': _variance_rows(session)})
+
+
+class CountApproveView(APIView):
+    """POST -> contabiliza los ajustes (requiere el permiso "Puede aprobar conteos físicos")."""
+
+    def post(self, request, pk):
+        if not request.user.has_perm('inventory_app.approve_countsession'):
+            return Response({'error': "No tiene permiso para aprobar conteos."}, status=status.HTTP_403_FORBIDDEN)
+        session = _count_session(pk)
+        if session is None:
+            return _not_found()
+        try:
+            session = counting.approve(session, request.user)
+        except counting.CountError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'id': session.pk, 'status': session.status, 'adjusted_lines': session.adjusted_lines,
+            'units_added': session.units_added, 'units_removed': session.units_removed,
+        })
+
+
+# ==========================================
+# 6. DISPONIBLE PARA PROMETER
+# ==========================================
+class AvailabilityView(APIView):
+    """
+    GET /api/disponibilidad/?variations=1,2,3   (o ?skus=JN-30-AZU,JN-32-AZU)
+    -> [{"id", "sku", "stock", "reserved", "available"}] en una sola consulta.
+    "available" descuenta las reservas vigentes de facturas y notas de entrega abiertas.
+    """
+    MAX_ITEMS = 500
+
+    def get(self, request):
+        ids = [v for v in request.query_params.get('variations', '').split(',') if v.strip()]
+        skus = [v.strip() for v in request.query_params.get('skus', '').split(',') if v.strip()]
+        if not ids and not skus:
+            return Response({'error': "Indique 'variations' (ids) o 'skus' separados por coma."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) + len(skus) > self.MAX_ITEMS:
+            return Response({'error': f"Máximo {self.MAX_ITEMS} variaciones por consulta."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            ids = [int(v) for v in ids]
+        except ValueError:
+            return Response({'error': "'variations' debe ser una lista de enteros."}, status=status.HTTP_400_BAD_REQUEST)
+
+        rows = (ProductVariation.objects.filter(Q(pk__in=ids) | Q(sku_variant__in=skus)).order_by('pk')
+                .with_available().values('pk', 'sku_variant', 'stock', 'reserved', 'available'))
+        return Response([
+            {'id': row['pk'], 'sku': row['sku_variant'], 'stock': row['stock'],
+             'reserved': row['reserved'], 'available': row['available']}
+            for row in rows
+        ])
+
+
+# ==========================================
+# 7. TRABAJOS EN SEGUNDO PLANO
+# ==========================================
+def _job_payload(job):
+    return {
+        'id': job.pk, 'task': job.task, 'status': job.status, 'attempts': job.attempts,
+        'progress': {'done': job.progress_done, 'total': job.progress_total, 'percent': job.percent,
+                     'message': job.progress_message},
+        'result': job.result, 'error': job.error.strip().splitlines()[-1] if job.error else None,
+        'created_at': job.created_at, 'started_at': job.started_at, 'finished_at': job.finished_at,
+    }
+
+
+class JobEnqueueView(APIView):
+    """
+    POST {"task": "inventory.rebuild_cost_layers", "args": {...}, "priority": 0}
+    -> 202 con el trabajo; el avance se consulta en api/trabajos/<id>/. Sólo personal (is_staff).
+    """
+
+    def post(self, request):
+        if not request.user.is_staff:
+            return Response({'error': "Sólo el personal puede encolar trabajos."}, status=status.HTTP_403_FORBIDDEN)
+        args = request.data.get('args') or {}
+        if not isinstance(args, dict):
+            return Response({'error': "'args' debe ser un objeto."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            priority = int(request.data.get('priority') or 0)
+            job = jobs.enqueue(request.data.get('task') or '', args, priority, user=request.user)
+        except (TypeError, ValueError):
+            return Response({'error': "'priority' debe ser entero."}, status=status.HTTP_400_BAD_REQUEST)
+        except jobs.JobError as e:
+            return Response({'error': str(e), 'tasks': sorted(jobs.TASKS)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(_job_payload(job), status=status.HTTP_202_ACCEPTED)
+
+
+class JobStatusView(APIView):
+    """
+    GET -> estado y avance de un trabajo (para barras de progreso que consultan
+    cada pocos segundos). El personal ve todos; los demás, sólo los que encolaron
+    (el resultado y el error pueden traer datos de otros módulos).
+    """
+
+    def get(self, request, pk):
+        jobs = Job.objects.all() if request.user.is_staff else Job.objects.filter(created_by=request.user)
+        # Ajeno o inexistente: el mismo 404, sin revelar qué ids existen
+        job = jobs.filter(pk=pk).first()
+        if job is None:
+            return Response({'error': "Trabajo no encontrado."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(_job_payload(job))
+
+
+# ==========================================
+# 8. PRECIOS A UNA FECHA
+# ==========================================
+class PriceAtView(APIView):
+    """
+    POST {"items": [{"product": 12, "at": "2025-03-01T10:30:00-04:00"}, ...]}
+    -> [{"product", "at", "price"}] en el mismo orden: precio de referencia
+    vigente en cada fecha según el historial de precios (null si el producto
+    no existe). Se resuelven en una consulta por lote (pricing.prices_at).
+    """
+    MAX_ITEMS = 20000
+
+    def post(self, request):
+        items = request.data.get('items')
+        if not isinstance(items, list) or not items:
+            return Response({'error': "Indique 'items': [{\"product\": id, \"at\": fecha ISO}, ...]."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > self.MAX_ITEMS:
+            return Response({'error': f"Máximo {self.MAX_ITEMS} pares por consulta."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        pairs = []
+        for n, item in enumerate(items):
+            try:
+                at = parse_datetime(str(item['at']))
+                product = int(item['product'])
+            except (KeyError, TypeError, ValueError):
+                at = None
+            if at is None:
+                return Response({'error': f"Par {n}: 'product' entero y 'at' fecha-hora ISO."},
+                                status=status.HTTP_400_BAD_REQUEST)
+            pairs.append((product, at if timezone.is_aware(at) else timezone.make_aware(at)))
+        prices = pricing.prices_at(pairs)
+        # Como los serializadores: decimales en texto, sin pérdida
+        return Response([{'product': product, 'at': at, 'price': None if price is None else f'{price:.4f}'}
+                         for (product, at), price in zip(pairs, prices)])
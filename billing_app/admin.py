@@ -1,9 +1,11 @@
 # billing_app/admin.py
 
-from django.contrib import admin
+from django.contrib import admin, messages
 from .models import Client, Invoice, InvoiceItem
 from decimal import Decimal
 
+from inventory_app import reservations
+
 
 @admin.register(Client)
 class ClientAdmin(admin.ModelAdmin):
@@ -21,6 +23,7 @@ class InvoiceItemInline(admin.TabularInline):
     extra = 1  # Campos vacíos para añadir ítems por defecto.
     # Hacemos campos de solo lectura que se calculan solos
     readonly_fields = ('line_total', 'product_name', 'sku')
+    raw_id_fields = ('variation',)
 
 
 @admin.register(Invoice)
@@ -29,6 +32,8 @@ class InvoiceAdmin(admin.ModelAdmin):
                     'invoice_date', 'total_amount', 'status')
     list_filter = ('status', 'invoice_date')
     search_fields = ('invoice_number', 'client__full_name')
+    # 'client' admite nulos: el select_related automático del admin no lo sigue
+    list_select_related = ('client',)
     # Hacemos los campos de totales de solo lectura en el formulario del admin
     readonly_fields = ('subtotal', 'tax_amount', 'total_amount',
                        'created_at', 'updated_at', 'created_by')
@@ -71,3 +76,13 @@ class InvoiceAdmin(admin.ModelAdmin):
 
         # Guardamos la factura de nuevo para persistir estos cambios
         invoice.save()
+
+        # Sincronizadas aquí (no al confirmar, como en las señales) para avisar lo que no alcanzó
+        shortages = reservations.sync_document(invoice)
+        if shortages:
+            self.message_user(
+                request,
+                f"Sin stock disponible para reservar {sum(shortages.values())} unidad(es) "
+                f"en {len(shortages)} variación(es).",
+                messages.WARNING,
+            )
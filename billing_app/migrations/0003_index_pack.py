@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-19 00:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+from core.migration_operations import AddIndexConcurrentlyIfSupported
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY (PostgreSQL) no puede ir dentro de una transacción
+    atomic = False
+
+    dependencies = [
+        ('billing_app', '0002_alter_invoiceitem_line_total'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyIfSupported(
+            model_name='invoice',
+            index=models.Index(fields=['status', '-invoice_date'], name='invoice_status_date_idx'),
+        ),
+    ]
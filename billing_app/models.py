@@ -103,6 +103,10 @@ class Invoice(models.Model):
     class Meta:
         verbose_name = _("Factura")
         verbose_name_plural = _("Facturas")
+        indexes = [
+            # Filtro por estado ordenado por fecha (admin, API, reservas)
+            models.Index(fields=['status', '-invoice_date'], name='invoice_status_date_idx'),
+        ]
 
     def __str__(self):
         return f"Factura #{self.invoice_number} - {self.client.full_name}"
@@ -119,6 +123,11 @@ class InvoiceItem(models.Model):
     product_name = models.CharField(
         max_length=255, verbose_name=_("Nombre del Producto en la Venta"))
     sku = models.CharField(max_length=50, verbose_name=_("SKU en la Venta"))
+    # Variación que se reserva mientras el documento está abierto (si el
+    # producto tiene una sola variación puede quedar vacía)
+    variation = models.ForeignKey(
+        'inventory_app.ProductVariation', on_delete=models.SET_NULL, null=True, blank=True,
+        verbose_name=_("Variación"))
     quantity = models.DecimalField(
         max_digits=10, decimal_places=2, verbose_name=_("Cantidad"))
     unit_price = models.DecimalField(
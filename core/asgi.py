@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_asgi_application()
+
+# Precarga la tabla de escaneo en memoria de este worker
+from inventory_app.scan import warm_on_startup  # noqa: E402
+
+warm_on_startup()
@@ -0,0 +1,124 @@
+# core/db_router.py
+
+"""
+Lecturas pesadas (reportes, Dashboard, listados de la API) contra la
+réplica de lectura: el alias 'replica' de DATABASES (DB_REPLICA_*).
+
+  - ReplicaRouter: dentro de use_replica() las lecturas van a la réplica;
+    fuera de él, y toda escritura, al primario. Sin alias 'replica'
+    configurado todo queda en el primario.
+  - use_replica(): context manager y también decorador de vistas (se
+    recrea en cada llamada: seguro con hilos y peticiones concurrentes).
+  - ReplicaStickinessMiddleware: tras un POST (o cualquier método que
+    escribe) el navegador queda pegado al primario REPLICA_STICKY_SECONDS
+    (cookie), así ve sus propias escrituras aunque la réplica vaya atrasada.
+    Los clientes sin cookies (escáneres con Basic auth) no quedan pegados.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA = 'replica'
+STICKY_COOKIE = 'sig_primary_until'
+SAFE_METHODS = {'GET', 'HEAD', 'OPTIONS', 'TRACE'}
+
+_reading = ContextVar('db_router_reading', default=False)
+_pinned = ContextVar('db_router_pinned', default=False)
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+@contextmanager
+def use_replica():
+    """Las lecturas del bloque (o de la vista decorada) van a la réplica"""
+    token = _reading.set(True)
+    try:
+        yield
+    finally:
+        _reading.reset(token)
+
+
+@contextmanager
+def use_primary():
+    """Dentro de use_replica(): lecturas que deben ver lo último confirmado"""
+    token = _reading.set(False)
+    try:
+        yield
+    finally:
+        _reading.reset(token)
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if not _reading.get() or _pinned.get() or not replica_configured():
+            return DEFAULT_DB_ALIAS
+        # Dentro de una transacción del primario se lee lo que ella ya escribió
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        # Explícito: un objeto leído de la réplica se guarda igual en el primario
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplica y primario tienen los mismos datos
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # La réplica replica el esquema del primario; nunca se migra directo
+        return db != REPLICA
+
+
+class ReplicaStickinessMiddleware:
+    """Fija el primario durante una petición que escribe y durante REPLICA_STICKY_SECONDS después"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replica_configured():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sticky_seconds = getattr(settings, 'REPLICA_STICKY_SECONDS', 5)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _pinned(self, request):
+        if request.method not in SAFE_METHODS:
+            return True
+        try:
+            return float(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def _stick(self, request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(STICKY_COOKIE, f'{time.time() + self.sticky_seconds:.3f}',
+                                max_age=self.sticky_seconds, httponly=True, samesite='Lax')
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _pinned.set(self._pinned(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _pinned.reset(token)
+        return self._stick(request, response)
+
+    async def __acall__(self, request):
+        token = _pinned.set(self._pinned(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _pinned.reset(token)
+        return self._stick(request, response)
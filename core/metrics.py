@@ -0,0 +1,250 @@
+# core/metrics.py
+
+"""
+Registro de métricas en proceso, expuesto en /metrics con formato de texto
+de Prometheus (sin dependencias).
+
+Escritura sin contención: cada hilo acumula en su propio fragmento (dicts
+que sólo él modifica) y la lectura suma los fragmentos. El único lock se
+toma al crear el fragmento de un hilo nuevo.
+
+Varios workers (gunicorn): con METRICS_MULTIPROC_DIR cada proceso vuelca su
+instantánea a <dir>/<pid>.json como máximo cada METRICS_FLUSH_SECONDS y el
+worker que atiende /metrics suma los archivos de todos. Los archivos de
+workers ya terminados se conservan para que los contadores no retrocedan;
+el directorio debe vaciarse al (re)iniciar el servicio. Sin él cada scrape
+vería los contadores de un solo worker: check_multiprocess() lo impide al arrancar.
+"""
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+COUNTER = 'counter'
+HISTOGRAM = 'histogram'
+GAUGE = 'gauge'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+DB_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+# nombre -> (tipo, ayuda, buckets)
+METRICS = {
+    'sig_http_requests_total': (COUNTER, "Peticiones HTTP atendidas por vista, método y clase de estado.", None),
+    'sig_http_request_duration_seconds': (HISTOGRAM, "Latencia de las peticiones HTTP por vista.", LATENCY_BUCKETS),
+    'sig_db_query_duration_seconds': (HISTOGRAM, "Tiempo total de BD por petición, por vista.", DB_BUCKETS),
+    'sig_db_queries_total': (COUNTER, "Consultas SQL ejecutadas por vista.", None),
+    'sig_catalog_cache_lookups_total': (COUNTER, "Búsquedas en la caché del catálogo por resultado.", None),
+    'sig_stock_movements_total': (COUNTER, "Movimientos de stock confirmados por tipo.", None),
+    'sig_stock_movement_units_total': (COUNTER, "Unidades movidas por tipo de movimiento.", None),
+}
+
+
+def _key(labels):
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._shards = []
+        self._local = threading.local()
+        self._collectors = []
+        self._gauges = []
+        self._last_flush = 0.0
+        self._flush_lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = ({}, {})  # (contadores, histogramas)
+            self._local.shard = shard
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def inc(self, name, labels=None, amount=1):
+        counters = self._shard()[0]
+        key = (name, _key(labels))
+        counters[key] = counters.get(key, 0) + amount
+
+    def observe(self, name, value, labels=None):
+        histograms = self._shard()[1]
+        key = (name, _key(labels))
+        buckets = METRICS[name][2]
+        data = histograms.get(key)
+        if data is None:
+            # Un contador por bucket (no acumulado) + desborde (+Inf) + suma + total
+            data = histograms[key] = [0] * (len(buckets) + 3)
+        data[bisect.bisect_left(buckets, value)] += 1
+        data[-2] += value
+        data[-1] += 1
+
+    def register_collector(self, collector):
+        """collector() -> [(nombre, labels, valor)]: contadores que otro módulo ya lleva"""
+        self._collectors.append(collector)
+
+    def register_gauges(self, provider):
+        """provider(snapshot) -> [(nombre, ayuda, [(labels, valor)])], evaluado en cada scrape"""
+        self._gauges.append(provider)
+
+    def gauges(self, snapshot):
+        samples = []
+        for provider in self._gauges:
+            samples.extend(provider(snapshot))
+        return samples
+
+    def snapshot(self):
+        """{'counters': [[nombre, labels, valor]], 'histograms': [[nombre, labels, datos]]} de este proceso"""
+        counters = {}
+        histograms = {}
+        with self._lock:
+            shards = list(self._shards)
+        for shard_counters, shard_histograms in shards:
+            # list(dict.items()) se copia sin soltar el GIL: seguro frente al hilo dueño
+            for key, value in list(shard_counters.items()):
+                counters[key] = counters.get(key, 0) + value
+            for key, data in list(shard_histograms.items()):
+                data = list(data)
+                merged = histograms.get(key)
+                histograms[key] = data if merged is None else [a + b for a, b in zip(merged, data)]
+        for collector in self._collectors:
+            for name, labels, value in collector():
+                key = (name, _key(labels))
+                counters[key] = counters.get(key, 0) + value
+        return {
+            'counters': [[name, dict(labels), value] for (name, labels), value in counters.items()],
+            'histograms': [[name, dict(labels), data] for (name, labels), data in histograms.items()],
+        }
+
+    # --- Multi-proceso ---
+
+    def maybe_flush(self):
+        """Llamado al final de cada petición: vuelca a disco como máximo cada METRICS_FLUSH_SECONDS"""
+        directory = getattr(settings, 'METRICS_MULTIPROC_DIR', None)
+        if not directory:
+            return
+        now = time.monotonic()
+        if now - self._last_flush < getattr(settings, 'METRICS_FLUSH_SECONDS', 5):
+            return
+        self._last_flush = now
+        self.flush(directory)
+
+    def flush(self, directory):
+        path = os.path.join(directory, f'{os.getpid()}.json')
+        tmp = f'{path}.tmp'
+        # Dos hilos del mismo proceso compartirían el archivo temporal
+        with self._flush_lock:
+            with open(tmp, 'w') as fh:
+                json.dump(self.snapshot(), fh)
+            os.replace(tmp, path)
+
+    def collect(self):
+        """Instantánea de todos los procesos (o sólo de éste si no hay directorio)"""
+        directory = getattr(settings, 'METRICS_MULTIPROC_DIR', None)
+        if not directory:
+            return self.snapshot()
+        self._last_flush = time.monotonic()
+        self.flush(directory)
+        merged = {'counters': [], 'histograms': []}
+        for path in glob.glob(os.path.join(directory, '*.json')):
+            try:
+                with open(path) as fh:
+                    data = json.load(fh)
+            except (OSError, ValueError):
+                # Archivo de un worker a medio escribir o ya borrado
+                continue
+            merged['counters'].extend(data.get('counters', []))
+            merged['histograms'].extend(data.get('histograms', []))
+        return merged
+
+
+registry = Registry()
+
+
+def check_multiprocess():
+    """Llamado al cargar la app: con varios workers las métricas necesitan METRICS_MULTIPROC_DIR"""
+    workers = getattr(settings, 'WEB_CONCURRENCY', 1)
+    if (workers > 1 and getattr(settings, 'METRICS_ENABLED', True)
+            and not getattr(settings, 'METRICS_MULTIPROC_DIR', '')):
+        raise ImproperlyConfigured(
+            f"WEB_CONCURRENCY={workers} sin METRICS_MULTIPROC_DIR: cada scrape de /metrics "
+            "devolvería los contadores de un solo worker. Defina el directorio compartido "
+            "o METRICS_ENABLED=False."
+        )
+
+
+def inc(name, labels=None, amount=1):
+    registry.inc(name, labels, amount)
+
+
+def observe(name, value, labels=None):
+    registry.observe(name, value, labels)
+
+
+# ==========================================
+# FORMATO DE TEXTO DE PROMETHEUS
+# ==========================================
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, extra=None):
+    items = sorted(labels.items()) + (extra or [])
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in items) + '}'
+
+
+def _number(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def render(snapshot, gauges=()):
+    """
+    snapshot: salida de Registry.collect(). gauges: [(nombre, ayuda, [(labels, valor)])]
+    calculados al momento del scrape. Suma las series repetidas (varios procesos).
+    """
+    counters = {}
+    for name, labels, value in snapshot['counters']:
+        key = (name, _key(labels))
+        counters[key] = counters.get(key, 0) + value
+    histograms = {}
+    for name, labels, data in snapshot['histograms']:
+        key = (name, _key(labels))
+        merged = histograms.get(key)
+        histograms[key] = list(data) if merged is None else [a + b for a, b in zip(merged, data)]
+
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == COUNTER:
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_labels(dict(labels))} {_number(value)}')
+        else:
+            for (metric, labels), data in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                labels = dict(labels)
+                cumulative = 0
+                for bound, count in zip(buckets, data):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_labels(labels, [("le", _number(float(bound)))])} {cumulative}')
+                lines.append(f'{name}_bucket{_labels(labels, [("le", "+Inf")])} {data[-1]}')
+                lines.append(f'{name}_sum{_labels(labels)} {_number(data[-2])}')
+                lines.append(f'{name}_count{_labels(labels)} {data[-1]}')
+
+    for name, help_text, samples in gauges:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {GAUGE}')
+        for labels, value in samples:
+            lines.append(f'{name}{_labels(labels)} {_number(value)}')
+    return '\n'.join(lines) + '\n'
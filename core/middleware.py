@@ -0,0 +1,190 @@
+# core/middleware.py
+
+import json
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import metrics, profiling
+
+logger = logging.getLogger(__name__)
+
+HTTP_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+
+class MetricsMiddleware:
+    """
+    Latencia, conteo y tiempo de BD por vista para /metrics (METRICS_ENABLED).
+    Va primero en MIDDLEWARE para medir la petición completa. El tiempo de BD
+    sale de un RequestProfile sin captura de SQL: sumar, no guardar.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        profiling.install()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        profile = profiling.RequestProfile(capture_sql=False)
+        token = profiling.current_profile.set(profile)
+        try:
+            response = self.get_response(request)
+        finally:
+            profiling.current_profile.reset(token)
+        self._record(request, response, start, profile)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        profile = profiling.RequestProfile(capture_sql=False)
+        token = profiling.current_profile.set(profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            profiling.current_profile.reset(token)
+        self._record(request, response, start, profile)
+        return response
+
+    @staticmethod
+    def _record(request, response, start, profile):
+        match = request.resolver_match
+        # Nombre de la ruta, nunca la URL: cardinalidad acotada
+        view = match.view_name if match else 'unmatched'
+        metrics.observe('sig_http_request_duration_seconds', time.perf_counter() - start, {'view': view})
+        method = request.method if request.method in HTTP_METHODS else 'OTHER'
+        metrics.inc('sig_http_requests_total', {
+            'view': view, 'method': method, 'status': f'{response.status_code // 100}xx',
+        })
+        if profile.query_count:
+            metrics.inc('sig_db_queries_total', {'view': view}, profile.query_count)
+        metrics.observe('sig_db_query_duration_seconds', profile.db_seconds, {'view': view})
+        metrics.registry.maybe_flush()
+
+
+class QueryProfilingMiddleware:
+    """
+    Perfilado opt-in (PROFILING_ENABLED) de una muestra de peticiones.
+
+    Toda petición se cronometra (dos lecturas de reloj). Una fracción
+    PROFILING_SAMPLE_RATE, más las de staff con la cabecera "X-Profile: 1",
+    registra además cada consulta y el render de plantillas y produce:
+      - cabecera Server-Timing (sólo para staff): db, tpl y app
+      - una línea JSON en el log con conteo, tiempos y consultas duplicadas
+    Las peticiones más lentas que PROFILING_SLOW_MS se registran como WARNING;
+    si estaban perfiladas incluyen las PROFILING_TOP_QUERIES consultas más lentas.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.01)
+        self.slow_ms = getattr(settings, 'PROFILING_SLOW_MS', 1000)
+        self.top_queries = getattr(settings, 'PROFILING_TOP_QUERIES', 5)
+        profiling.install()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        forced = self._wants_profile(request) and self._is_staff(request.user)
+        start, profile, token = self._start(forced)
+        try:
+            response = self.get_response(request)
+        finally:
+            if token is not None:
+                profiling.current_profile.reset(token)
+        staff = profile is not None and self._is_staff(request.user)
+        self._finish(request, response, start, profile, staff)
+        return response
+
+    async def __acall__(self, request):
+        # request.user no puede resolverse desde el bucle de eventos: auser()
+        forced = self._wants_profile(request) and self._is_staff(await request.auser())
+        start, profile, token = self._start(forced)
+        try:
+            response = await self.get_response(request)
+        finally:
+            if token is not None:
+                profiling.current_profile.reset(token)
+        staff = profile is not None and self._is_staff(await request.auser())
+        self._finish(request, response, start, profile, staff)
+        return response
+
+    @staticmethod
+    def _wants_profile(request):
+        return request.headers.get('X-Profile') == '1' and hasattr(request, 'user')
+
+    @staticmethod
+    def _is_staff(user):
+        return bool(user.is_authenticated and user.is_staff)
+
+    def _start(self, forced):
+        if forced or random.random() < self.sample_rate:
+            profile = profiling.current_profile.get()
+            if profile is not None:
+                # MetricsMiddleware ya cuenta esta petición: sólo pasamos a guardar el SQL
+                profile.capture_sql = True
+                return time.perf_counter(), profile, None
+            profile = profiling.RequestProfile()
+            return time.perf_counter(), profile, profiling.current_profile.set(profile)
+        return time.perf_counter(), None, None
+
+    def _finish(self, request, response, start, profile, staff):
+        total_ms = (time.perf_counter() - start) * 1000
+        slow = total_ms >= self.slow_ms
+        if profile is None and not slow:
+            return
+
+        match = request.resolver_match
+        line = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'total_ms': round(total_ms, 1),
+            'sampled': profile is not None,
+        }
+        if profile is not None:
+            db_ms = profile.db_seconds * 1000
+            template_ms = profile.template_seconds * 1000
+            duplicates = profile.duplicates()
+            line.update({
+                'queries': profile.query_count,
+                'db_ms': round(db_ms, 1),
+                'template_ms': round(template_ms, 1),
+                # Ejecuciones de más de una misma huella: el síntoma de un N+1
+                'duplicated_queries': sum(count - 1 for _, count, _ in duplicates),
+                'duplicates': [
+                    {'count': count, 'ms': round(seconds * 1000, 1), 'sql': fp[:300]}
+                    for fp, count, seconds in duplicates[:self.top_queries]
+                ],
+            })
+            if slow:
+                line['top_sql'] = [
+                    {'ms': round(seconds * 1000, 1), 'sql': sql[:1000]}
+                    for sql, seconds in profile.top_queries(self.top_queries)
+                ]
+            if staff:
+                # El tiempo de plantillas incluye las consultas perezosas que dispara
+                response['Server-Timing'] = (
+                    f'db;dur={db_ms:.1f};desc="{profile.query_count} queries", '
+                    f'tpl;dur={template_ms:.1f}, app;dur={total_ms:.1f}'
+                )
+
+        logger.log(logging.WARNING if slow else logging.INFO, json.dumps(line))
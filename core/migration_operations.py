@@ -0,0 +1,57 @@
+# core/migration_operations.py
+
+"""
+Operaciones de migración propias.
+
+AddIndexConcurrentlyIfSupported: AddIndex que en PostgreSQL construye el
+índice con CREATE INDEX CONCURRENTLY (sin bloquear escrituras sobre tablas
+grandes como los movimientos). En otros motores se comporta como AddIndex.
+
+CONCURRENTLY no puede correr dentro de una transacción: la migración que la
+use debe declarar `atomic = False`. Si la construcción falla a medias,
+PostgreSQL deja un índice INVALID que hay que borrar (DROP INDEX) antes de
+reintentar la migración.
+
+Las tablas particionadas (movimientos, ver inventory_app.partitioning) no
+admiten CONCURRENTLY: sobre ellas el índice se crea de forma normal.
+"""
+from django.db import NotSupportedError
+from django.db.migrations.operations import AddIndex
+
+
+class AddIndexConcurrentlyIfSupported(AddIndex):
+
+    def _concurrently(self, schema_editor, model):
+        if schema_editor.connection.vendor != 'postgresql':
+            return False
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [model._meta.db_table])
+            row = cursor.fetchone()
+        if row is not None and row[0] == 'p':
+            return False
+        if schema_editor.connection.in_atomic_block:
+            raise NotSupportedError(
+                f"{self.__class__.__name__} requiere una migración no atómica (atomic = False)."
+            )
+        return True
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        if self._concurrently(schema_editor, model):
+            schema_editor.add_index(model, self.index, concurrently=True)
+        else:
+            schema_editor.add_index(model, self.index)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        if self._concurrently(schema_editor, model):
+            schema_editor.remove_index(model, self.index, concurrently=True)
+        else:
+            schema_editor.remove_index(model, self.index)
+
+    def describe(self):
+        return f"{super().describe()} (CONCURRENTLY si el motor lo soporta)"
@@ -0,0 +1,136 @@
+# core/profiling.py
+
+"""
+Perfilado por petición: consultas SQL y tiempo de plantillas.
+
+El perfil activo vive en una ContextVar. Así funciona igual bajo WSGI (un
+hilo por petición) y bajo ASGI, donde las vistas sync corren en el hilo de
+sync_to_async y heredan el contexto de la petición.
+
+  - record_query: execute_wrapper instalado de forma permanente en cada
+    conexión (señal connection_created). Sin perfil activo sólo hace una
+    lectura de la ContextVar.
+  - ProfilingTemplates: backend DjangoTemplates que cronometra el render de
+    la plantilla principal (los {% include %} quedan dentro de ese tiempo).
+
+QueryProfilingMiddleware (core/middleware.py) decide qué peticiones se
+perfilan y publica los resultados; MetricsMiddleware usa el mismo perfil
+(sin guardar SQL) para el tiempo de BD de /metrics.
+"""
+import re
+import time
+from contextvars import ContextVar
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates
+
+current_profile = ContextVar('sig_request_profile', default=None)
+
+# Normalización de SQL para agrupar "la misma consulta con otros valores"
+_IN_LIST = re.compile(r'\bIN \((?:\s*%s\s*,?)+\)', re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_SPACES = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """SQL sin valores: 'WHERE id = 5' e 'WHERE id = 7' dan la misma huella"""
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+class RequestProfile:
+    """
+    Conteo y tiempo de consultas de una petición. Con capture_sql=False (las
+    métricas de /metrics) sólo acumula; el perfilado muestreado guarda además
+    cada sentencia para las huellas duplicadas y el top de lentas.
+    """
+    __slots__ = ('capture_sql', 'queries', 'query_count', 'db_seconds', 'template_seconds')
+
+    def __init__(self, capture_sql=True):
+        self.capture_sql = capture_sql
+        # (sql, segundos); los parámetros no se guardan (datos de clientes)
+        self.queries = []
+        self.query_count = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+
+    def add_query(self, sql, seconds):
+        self.query_count += 1
+        self.db_seconds += seconds
+        if self.capture_sql:
+            self.queries.append((sql, seconds))
+
+    def top_queries(self, limit):
+        return sorted(self.queries, key=lambda q: q[1], reverse=True)[:limit]
+
+    def duplicates(self):
+        """[(huella, veces, segundos)] de las consultas repetidas, más repetidas primero"""
+        groups = {}
+        for sql, seconds in self.queries:
+            entry = groups.setdefault(fingerprint(sql), [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+        repeated = [(fp, count, seconds) for fp, (count, seconds) in groups.items() if count > 1]
+        return sorted(repeated, key=lambda d: (d[1], d[2]), reverse=True)
+
+
+# ==========================================
+# 1. CONSULTAS (execute_wrapper)
+# ==========================================
+def record_query(execute, sql, params, many, context):
+    profile = current_profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.add_query(sql, time.perf_counter() - start)
+
+
+def _attach(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def install():
+    """Engancha record_query en las conexiones actuales y en las que se abran después"""
+    connection_created.connect(_attach, dispatch_uid='sig_profiling_attach')
+    for conn in connections.all(initialized_only=True):
+        _attach(conn)
+
+
+# ==========================================
+# 2. PLANTILLAS
+# ==========================================
+class ProfilingTemplates(DjangoTemplates):
+    """DjangoTemplates con cronómetro en el render de la plantilla principal"""
+
+    def from_string(self, template_code):
+        return ProfiledTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return ProfiledTemplate(super().get_template(template_name))
+
+
+class ProfiledTemplate:
+    def __init__(self, template):
+        self._template = template
+
+    def __getattr__(self, name):
+        # origin, template, backend... los usan el test client y la barra de depuración
+        return getattr(self._template, name)
+
+    def render(self, context=None, request=None):
+        profile = current_profile.get()
+        if profile is None:
+            return self._template.render(context, request)
+        start = time.perf_counter()
+        try:
+            return self._template.render(context, request)
+        finally:
+            profile.template_seconds += time.perf_counter() - start
@@ -16,6 +16,8 @@ ALLOWED_HOSTS = ['3.16.157.108', 'localhost', '127.0.0.1']
 
 # Application definition
 INSTALLED_APPS = [
+    # Debe ir primero: hace que 'runserver' sirva por ASGI (Dashboard en vivo)
+    'daphne',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -23,19 +25,28 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.humanize',
+    'rest_framework',
     # Nuestras Apps
     'inventory_app',
     'billing_app',
     'delivery_app',
     'purchasing_app',
+    'api_app',
+    'jobs_app',
 ]
 
 MIDDLEWARE = [
+    # Primero: la latencia de /metrics cubre la petición completa
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Lecturas propias tras escribir: fija el primario (inactivo sin réplica)
+    'core.db_router.ReplicaStickinessMiddleware',
+    # Perfilado SQL/plantillas por muestreo (inactivo salvo PROFILING_ENABLED)
+    'core.middleware.QueryProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -44,7 +55,8 @@ ROOT_URLCONF = 'core.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates con cronómetro para el perfilado (sin costo si está apagado)
+        'BACKEND': 'core.profiling.ProfilingTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -59,6 +71,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'core.wsgi.application'
+ASGI_APPLICATION = 'core.asgi.application'
 
 # Database
 DATABASES = {
@@ -72,6 +85,24 @@ DATABASES = {
     }
 }
 
+# Réplica de lectura (opcional): reportes, Dashboard y listados de la API
+# leen de ella (core/db_router.py). Sin DB_REPLICA_HOST / DB_REPLICA_NAME
+# todo va al primario. En las pruebas espeja al primario.
+if os.getenv('DB_REPLICA_HOST') or os.getenv('DB_REPLICA_NAME'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'ENGINE': os.getenv('DB_REPLICA_ENGINE', DATABASES['default']['ENGINE']),
+        'NAME': os.getenv('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        'USER': os.getenv('DB_REPLICA_USER', DATABASES['default']['USER']),
+        'PASSWORD': os.getenv('DB_REPLICA_PASS', DATABASES['default']['PASSWORD']),
+        'HOST': os.getenv('DB_REPLICA_HOST', DATABASES['default']['HOST']),
+        'PORT': os.getenv('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+# Segundos que un navegador lee del primario después de escribir
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 5))
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -104,6 +135,151 @@ STATICFILES_DIRS = [
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# API REST (sólo lectura para BI y clientes móviles)
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+    ],
+    'DEFAULT_PERMISSION_CLASSES': [
+        'rest_framework.permissions.IsAuthenticated',
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'api_app.pagination.StableCursorPagination',
+    'PAGE_SIZE': 100,
+}
+# Tope de líneas por lote de los escáneres (api/movimientos/lote/)
+SCANNER_BATCH_MAX_LINES = int(os.getenv('SCANNER_BATCH_MAX_LINES', 1000))
+# Tope de líneas por carga de un conteo físico (api/conteos/<id>/lineas/, JSON o XLSX)
+COUNT_UPLOAD_MAX_LINES = int(os.getenv('COUNT_UPLOAD_MAX_LINES', 100000))
+# Patrón del SKU de las variaciones generadas en el alta ({sku}, {size}, {color}, {n})
+VARIANT_SKU_PATTERN = os.getenv('VARIANT_SKU_PATTERN', '{sku}-{size}-{color}')
+
+# CACHÉ
+# El catálogo usa su propio alias. Ahí viven también los contadores de versión
+# (catálogo, tabla de escaneo, fragmentos, ETag de la API): deben ser los mismos
+# para todos los workers. Sólo el LRU local (nivel 1) es por proceso.
+#   'filebased' (por defecto): workers del mismo host, sin servicios externos.
+#   'redis': varios hosts (CATALOG_CACHE_LOCATION=redis://...; requiere el paquete redis).
+#   'locmem': un solo proceso (runserver, tests); con WEB_CONCURRENCY > 1 el arranque falla.
+CATALOG_CACHE_BACKEND = os.getenv('CATALOG_CACHE_BACKEND', 'filebased')
+CATALOG_CACHE_TIMEOUT = int(os.getenv('CATALOG_CACHE_TIMEOUT', 3600))
+# Tope del LRU local (nivel 1, por proceso)
+CATALOG_CACHE_LOCAL_MAX_ENTRIES = int(os.getenv('CATALOG_CACHE_LOCAL_MAX_ENTRIES', 1000))
+# Workers del servidor (gunicorn lee la misma variable)
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', 1))
+
+CACHE_BACKENDS = {
+    'filebased': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+}
+
+
+def _shared_cache(name, location_env, max_entries):
+    """Alias del catálogo / fragmentos según CATALOG_CACHE_BACKEND"""
+    config = {'BACKEND': CACHE_BACKENDS[CATALOG_CACHE_BACKEND], 'KEY_PREFIX': name}
+    if CATALOG_CACHE_BACKEND == 'redis':
+        config['LOCATION'] = os.getenv('CATALOG_CACHE_LOCATION', 'redis://127.0.0.1:6379/1')
+        return config
+    config['LOCATION'] = (
+        os.getenv(location_env, os.path.join(BASE_DIR, '.cache', name))
+        if CATALOG_CACHE_BACKEND == 'filebased'
+        else f'sig-{name}'
+    )
+    # Tope de entradas de filebased / locmem (Redis usa su propia política de memoria)
+    config['OPTIONS'] = {'MAX_ENTRIES': max_entries, 'CULL_FREQUENCY': 4}
+    return config
+
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sig-default',
+    },
+    'catalog': {
+        **_shared_cache('catalog', 'CATALOG_CACHE_LOCATION', int(os.getenv('CATALOG_CACHE_MAX_ENTRIES', 5000))),
+        'TIMEOUT': CATALOG_CACHE_TIMEOUT,
+    },
+    # Fragmentos {% cache %} de las tablas: la clave lleva las versiones del
+    # catálogo ({% fragment_version %}), nunca se invalidan a mano. Las
+    # entradas de versiones viejas caducan solas (o las descarta MAX_ENTRIES)
+    'template_fragments': _shared_cache(
+        'fragments', 'FRAGMENT_CACHE_LOCATION', int(os.getenv('FRAGMENT_CACHE_MAX_ENTRIES', 2000)),
+    ),
+}
+
+# TABLA DE ESCANEO (inventory_app/scan.py)
+SCAN_TABLE_WARM_ON_STARTUP = os.getenv('SCAN_TABLE_WARM_ON_STARTUP', 'True').lower() in ['true', '1', 't']
+SCAN_TABLE_RECHECK_SECONDS = float(os.getenv('SCAN_TABLE_RECHECK_SECONDS', 2))
+# Vida máxima de la tabla: se recalienta aunque no haya llegado ningún aviso (0 = sin límite)
+SCAN_TABLE_TTL_SECONDS = float(os.getenv('SCAN_TABLE_TTL_SECONDS', 300))
+
+# PARTICIONES MENSUALES DE MOVIMIENTOS (inventory_app/partitioning.py, sólo PostgreSQL)
+# manage_movement_partitions crea los meses futuros y archiva los anteriores a la retención
+MOVEMENT_PARTITIONS_AHEAD = int(os.getenv('MOVEMENT_PARTITIONS_AHEAD', 3))
+MOVEMENT_RETAIN_MONTHS = int(os.getenv('MOVEMENT_RETAIN_MONTHS', 24))
+MOVEMENT_ARCHIVE_DIR = os.getenv('MOVEMENT_ARCHIVE_DIR', os.path.join(BASE_DIR, 'archive', 'movements'))
+
+# VALORIZACIÓN DIARIA (inventory_app/valuation.py, comando snapshot_valuation cada noche)
+# Días de tendencia del Dashboard y mínimo de días del gráfico de los reportes
+VALUATION_TREND_DAYS = int(os.getenv('VALUATION_TREND_DAYS', 90))
+VALUATION_TREND_MIN_DAYS = int(os.getenv('VALUATION_TREND_MIN_DAYS', 30))
+
+# RESERVAS DE STOCK (inventory_app/reservations.py, comando sweep_reservations cada hora)
+# Horas que un documento abierto aparta stock desde su último guardado
+RESERVATION_HOLD_HOURS = int(os.getenv('RESERVATION_HOLD_HOURS', 72))
+
+# COLA DE TRABAJOS (jobs_app, worker: manage.py run_jobs)
+# Reintentos con espera exponencial desde JOBS_RETRY_BASE_SECONDS; un trabajo
+# sin latido en JOBS_STALE_SECONDS se da por abandonado (worker caído)
+JOBS_CONCURRENCY = int(os.getenv('JOBS_CONCURRENCY', 4))
+JOBS_POLL_SECONDS = float(os.getenv('JOBS_POLL_SECONDS', 2))
+JOBS_MAX_ATTEMPTS = int(os.getenv('JOBS_MAX_ATTEMPTS', 3))
+JOBS_RETRY_BASE_SECONDS = int(os.getenv('JOBS_RETRY_BASE_SECONDS', 30))
+JOBS_STALE_SECONDS = int(os.getenv('JOBS_STALE_SECONDS', 300))
+JOBS_PROGRESS_SECONDS = float(os.getenv('JOBS_PROGRESS_SECONDS', 1))
+
+# DASHBOARD EN VIVO (inventory_app/live.py, requiere servir por ASGI)
+# 'inprocess' para un solo proceso; 'postgres' (LISTEN/NOTIFY) con varios workers
+LIVE_UPDATES_ENABLED = os.getenv('LIVE_UPDATES_ENABLED', 'True').lower() in ['true', '1', 't']
+LIVE_BROADCASTER = os.getenv('LIVE_BROADCASTER', 'inprocess')
+LIVE_PING_SECONDS = int(os.getenv('LIVE_PING_SECONDS', 15))
+# Espera tras un movimiento antes de recalcular los totales del inventario (una vez por ráfaga)
+LIVE_KPI_DEBOUNCE_SECONDS = float(os.getenv('LIVE_KPI_DEBOUNCE_SECONDS', 2))
+
+# PERFILADO POR PETICIÓN (core/middleware.py)
+# Apagado por defecto. Con una tasa baja (1%) puede quedar activo en producción.
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False').lower() in ['true', '1', 't']
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', 0.01))
+PROFILING_SLOW_MS = float(os.getenv('PROFILING_SLOW_MS', 1000))
+PROFILING_TOP_QUERIES = int(os.getenv('PROFILING_TOP_QUERIES', 5))
+
+# MÉTRICAS PROMETHEUS (/metrics, core/metrics.py)
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() in ['true', '1', 't']
+# Con varios workers de gunicorn: directorio compartido, vaciado en cada arranque del servicio.
+# Obligatorio con WEB_CONCURRENCY > 1 (el arranque falla sin él).
+METRICS_MULTIPROC_DIR = os.getenv('METRICS_MULTIPROC_DIR', '')
+METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', 5))
+# /metrics exige "Authorization: Bearer <token>" (el scraper) o una sesión de staff.
+# METRICS_PUBLIC=True lo abre sin autenticación (sólo detrás de una red privada).
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+METRICS_PUBLIC = os.getenv('METRICS_PUBLIC', 'False').lower() in ['true', '1', 't']
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'plain': {'format': '%(asctime)s %(levelname)s %(name)s %(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'plain'},
+    },
+    'loggers': {
+        # Una línea JSON por petición perfilada o lenta
+        'core.middleware': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'inventory_dashboard'
 LOGOUT_REDIRECT_URL = 'login'
\ No newline at end of file
@@ -18,9 +18,14 @@ from django.contrib import admin
 from django.urls import path, include
 from django.contrib.auth import views as auth_views
 
+from . import views
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('inventory_app.urls')),
+    path('api/', include('api_app.urls')),
     path('login/', auth_views.LoginView.as_view(template_name='registration/login.html'), name='login'),
     path('logout/', auth_views.LogoutView.as_view(), name='logout'),
+    # Prometheus (formato de texto)
+    path('metrics', views.metrics_view, name='metrics'),
 ]
@@ -0,0 +1,30 @@
+# core/views.py
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+
+from . import metrics
+
+
+def _authorized(request):
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return True
+    return request.user.is_authenticated and request.user.is_staff
+
+
+@require_GET
+def metrics_view(request):
+    """
+    Métricas en formato de texto de Prometheus. Se exige
+    "Authorization: Bearer <METRICS_TOKEN>" (sin sesión ni CSRF) o una sesión
+    de staff, salvo que METRICS_PUBLIC lo abra explícitamente.
+    """
+    if not getattr(settings, 'METRICS_PUBLIC', False) and not _authorized(request):
+        return HttpResponse(status=401, headers={'WWW-Authenticate': 'Bearer'})
+
+    snapshot = metrics.registry.collect()
+    body = metrics.render(snapshot, metrics.registry.gauges(snapshot))
+    return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,8 +1,10 @@
 # delivery_app/admin.py
 
-from django.contrib import admin
+from django.contrib import admin, messages
 from .models import DeliveryNote, DeliveryNoteItem
 
+from inventory_app import reservations
+
 # Register your models here.
 
 
@@ -13,6 +15,7 @@ class DeliveryNoteItemInline(admin.TabularInline):
     """
     model = DeliveryNoteItem
     extra = 1
+    raw_id_fields = ('variation',)
 
 
 @admin.register(DeliveryNote)
@@ -22,3 +25,15 @@ class DeliveryNoteAdmin(admin.ModelAdmin):
     list_filter = ('status', 'delivery_date')
     search_fields = ('delivery_note_number', 'client__full_name')
     inlines = [DeliveryNoteItemInline]
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Sincronizadas aquí (no al confirmar, como en las señales) para avisar lo que no alcanzó
+        shortages = reservations.sync_document(form.instance)
+        if shortages:
+            self.message_user(
+                request,
+                f"Sin stock disponible para reservar {sum(shortages.values())} unidad(es) "
+                f"en {len(shortages)} variación(es).",
+                messages.WARNING,
+            )
@@ -0,0 +1,24 @@
+# Generated by Django 5.0.6 on 2026-10-19 00:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+from core.migration_operations import AddIndexConcurrentlyIfSupported
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY (PostgreSQL) no puede ir dentro de una transacción
+    atomic = False
+
+    dependencies = [
+        ('billing_app', '0003_index_pack'),
+        ('delivery_app', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyIfSupported(
+            model_name='deliverynote',
+            index=models.Index(fields=['status', 'delivery_date'], name='deliverynote_status_date_idx'),
+        ),
+    ]
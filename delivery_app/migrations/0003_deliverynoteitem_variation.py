@@ -0,0 +1,20 @@
+# Generated by Django 5.0.6 on 2026-10-19 00:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delivery_app', '0002_index_pack'),
+        ('inventory_app', '0014_count_sessions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deliverynoteitem',
+            name='variation',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='inventory_app.productvariation', verbose_name='Variación'),
+        ),
+    ]
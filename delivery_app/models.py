@@ -71,6 +71,9 @@ class DeliveryNote(models.Model):
     class Meta:
         verbose_name = _("Nota de Entrega")
         verbose_name_plural = _("Notas de Entrega")
+        indexes = [
+            models.Index(fields=['status', 'delivery_date'], name='deliverynote_status_date_idx'),
+        ]
 
     def __str__(self):
         return f"Nota de Entrega #{self.delivery_note_number} para {self.client.full_name}"
@@ -87,6 +90,11 @@ class DeliveryNoteItem(models.Model):
     product_name = models.CharField(
         max_length=255, verbose_name=_("Nombre del Producto"))
     sku = models.CharField(max_length=50, verbose_name=_("SKU"))
+    # Variación que se reserva mientras el documento está abierto (si el
+    # producto tiene una sola variación puede quedar vacía)
+    variation = models.ForeignKey(
+        'inventory_app.ProductVariation', on_delete=models.SET_NULL, null=True, blank=True,
+        verbose_name=_("Variación"))
 
     quantity = models.DecimalField(
         max_digits=10, decimal_places=2, verbose_name=_("Cantidad a Despachar"))
@@ -1,8 +1,13 @@
 # inventory_app/admin.py
 
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.utils.html import format_html
-from .models import Warehouse, Product, ProductLot, SerialNumber, Category, ProductVariation, Dispatch, StockArrival
+from . import counting
+from .models import (
+    Warehouse, Product, ProductLot, SerialNumber, Category, ProductVariation, Dispatch, StockArrival,
+    MovementArchive, ArchivedMovementTotal, ValuationSnapshot, CostLayer, CountSession, CountLine,
+    StockReservation, PriceHistory,
+)
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -19,13 +24,23 @@ class ProductVariationAdmin(admin.ModelAdmin):
     list_display = ('product', 'size', 'color', 'sku_variant', 'stock')
     list_filter = ('size', 'color', 'product__category')
     search_fields = ('sku_variant', 'product__name')
+    list_select_related = ('product',)
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ('name', 'sku', 'category', 'sale_price', 'cost_price', 'total_stock', 'is_active')
-    list_filter = ('tracking_type', 'is_active', 'category')
+    list_filter = ('tracking_type', 'costing_method', 'is_active', 'category')
     search_fields = ('name', 'sku', 'barcode')
     readonly_fields = ('total_stock',) # El stock total se calcula solo
+    list_select_related = ('category',)
+
+    def get_queryset(self, request):
+        # total_stock lee la anotación: sin un SUM por fila del listado
+        return super().get_queryset(request).with_stock()
+
+    def save_model(self, request, obj, form, change):
+        # Un cambio de precio desde el admin queda en el historial con su autor
+        obj.save(changed_by=request.user, price_rule="Edición en el admin" if change else "")
 
 @admin.register(StockArrival)
 class StockArrivalAdmin(admin.ModelAdmin):
@@ -33,6 +48,11 @@ class StockArrivalAdmin(admin.ModelAdmin):
     list_filter = ('arrival_date', 'variation__product__category')
     search_fields = ('variation__product__name', 'supplier')
     date_hierarchy = 'arrival_date'
+    list_select_related = ('variation__product', 'user')
+
+    def get_queryset(self, request):
+        # cost_difference lee la anotación: sin una consulta por fila del listado
+        return super().get_queryset(request).with_previous_cost()
 
     def color_difference(self, obj):
         """Muestra la diferencia de costo con colores: Verde (bajó/igual), Rojo (subió)"""
@@ -59,17 +79,147 @@ class StockArrivalAdmin(admin.ModelAdmin):
 
 @admin.register(Dispatch)
 class DispatchAdmin(admin.ModelAdmin):
-    list_display = ('dispatched_at', 'variation', 'quantity', 'destination', 'user')
+    list_display = ('dispatched_at', 'variation', 'quantity', 'destination', 'user', 'total_value')
     list_filter = ('dispatched_at', 'variation__product__category')
     search_fields = ('variation__product__name', 'destination')
+    list_select_related = ('variation__product', 'user')
+
+    def get_queryset(self, request):
+        # total_value lee la anotación: el precio vigente sale en la misma consulta
+        return super().get_queryset(request).with_unit_price()
+
+    def total_value(self, obj):
+        return obj.total_value
+    total_value.short_description = "Valor"
 
 @admin.register(ProductLot)
 class ProductLotAdmin(admin.ModelAdmin):
     list_display = ('product', 'lot_number', 'quantity', 'expiration_date', 'warehouse')
     search_fields = ('product__name', 'lot_number')
+    list_select_related = ('product', 'warehouse')
 
 @admin.register(SerialNumber)
 class SerialNumberAdmin(admin.ModelAdmin):
     list_display = ('product', 'serial_number', 'status', 'warehouse')
     list_filter = ('status',)
-    search_fields = ('product__name', 'serial_number')
\ No newline at end of file
+    search_fields = ('product__name', 'serial_number')
+    list_select_related = ('product', 'warehouse')
+
+class ArchivedMovementTotalInline(admin.TabularInline):
+    model = ArchivedMovementTotal
+    fields = ('variation', 'movement_count', 'quantity', 'total_cost')
+    readonly_fields = fields
+    raw_id_fields = ('variation',)
+    extra = 0
+    can_delete = False
+
+@admin.register(MovementArchive)
+class MovementArchiveAdmin(admin.ModelAdmin):
+    """Sólo lectura: los meses se archivan con manage_movement_partitions"""
+    list_display = ('period', 'kind', 'rows', 'quantity', 'file', 'archived_at')
+    list_filter = ('kind',)
+    readonly_fields = ('kind', 'period', 'file', 'sha256', 'rows', 'quantity', 'archived_at')
+    inlines = [ArchivedMovementTotalInline]
+
+    def has_add_permission(self, request):
+        return False
+
+@admin.register(ValuationSnapshot)
+class ValuationSnapshotAdmin(admin.ModelAdmin):
+    """Sólo lectura: las fotos diarias las escribe snapshot_valuation"""
+    list_display = ('date', 'scope', 'name', 'units', 'cost_value', 'sale_value')
+    list_filter = ('scope',)
+    search_fields = ('name',)
+    date_hierarchy = 'date'
+    readonly_fields = ('date', 'scope', 'category', 'warehouse', 'name', 'units', 'cost_value', 'sale_value', 'created_at')
+
+    def has_add_permission(self, request):
+        return False
+
+@admin.register(CostLayer)
+class CostLayerAdmin(admin.ModelAdmin):
+    """Sólo lectura: las capas las mantienen los movimientos (costing.py) y rebuild_cost_layers"""
+    list_display = ('variation', 'received_at', 'quantity', 'remaining', 'unit_cost', 'arrival_id')
+    list_filter = ('variation__product__costing_method',)
+    search_fields = ('variation__sku_variant', 'variation__product__name')
+    date_hierarchy = 'received_at'
+    list_select_related = ('variation__product',)
+    readonly_fields = ('variation', 'arrival', 'received_at', 'quantity', 'remaining', 'unit_cost')
+
+    def has_add_permission(self, request):
+        return False
+
+@admin.register(CountSession)
+class CountSessionAdmin(admin.ModelAdmin):
+    """Las líneas se cargan por api/conteos/; aquí se concilia, aprueba o anula"""
+    list_display = ('name', 'warehouse', 'status', 'created_by', 'created_at', 'reconciled_at',
+                    'adjusted_lines', 'units_added', 'units_removed')
+    list_filter = ('status', 'warehouse')
+    search_fields = ('name',)
+    list_select_related = ('warehouse', 'created_by')
+    readonly_fields = ('status', 'created_by', 'created_at', 'reconciled_at', 'approved_by', 'approved_at',
+                       'adjusted_lines', 'units_added', 'units_removed')
+    actions = ['reconcile_sessions', 'approve_sessions', 'cancel_sessions']
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            obj.created_by = request.user
+        super().save_model(request, obj, form, change)
+
+    def has_approve_permission(self, request):
+        return request.user.has_perm('inventory_app.approve_countsession')
+
+    def _run(self, request, queryset, operation, done):
+        for session in queryset:
+            try:
+                operation(session)
+            except counting.CountError as e:
+                self.message_user(request, f"{session.name}: {e}", messages.ERROR)
+            else:
+                self.message_user(request, f"{session.name}: {done}", messages.SUCCESS)
+
+    @admin.action(description="Conciliar contra el stock actual")
+    def reconcile_sessions(self, request, queryset):
+        self._run(request, queryset, counting.reconcile, "diferencias calculadas.")
+
+    @admin.action(description="Aprobar y contabilizar ajustes", permissions=['approve'])
+    def approve_sessions(self, request, queryset):
+        self._run(request, queryset, lambda session: counting.approve(session, request.user), "ajustes contabilizados.")
+
+    @admin.action(description="Anular conteo")
+    def cancel_sessions(self, request, queryset):
+        self._run(request, queryset, counting.cancel, "anulado.")
+
+@admin.register(CountLine)
+class CountLineAdmin(admin.ModelAdmin):
+    list_display = ('session', 'variation', 'counted_qty', 'system_stock', 'variance', 'updated_at')
+    list_filter = ('session__status',)
+    search_fields = ('variation__sku_variant', 'variation__product__name', 'session__name')
+    list_select_related = ('session', 'variation__product')
+    raw_id_fields = ('session', 'variation')
+    readonly_fields = ('system_stock', 'variance')
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    """Sólo lectura: las reservas siguen el estado de facturas y notas de entrega"""
+    list_display = ('variation', 'quantity', 'invoice', 'delivery_note', 'expires_at', 'created_at')
+    search_fields = ('variation__sku_variant', 'invoice__invoice_number', 'delivery_note__delivery_note_number')
+    date_hierarchy = 'expires_at'
+    list_select_related = ('variation__product', 'invoice__client', 'delivery_note__client')
+    readonly_fields = ('variation', 'invoice', 'delivery_note', 'quantity', 'expires_at', 'created_at')
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(PriceHistory)
+class PriceHistoryAdmin(admin.ModelAdmin):
+    """Sólo lectura: lo escriben el reprecio masivo y el ajuste de precio del producto"""
+    list_display = ('product', 'old_price', 'new_price', 'rule', 'effective_from', 'changed_by')
+    search_fields = ('product__sku', 'product__name')
+    date_hierarchy = 'effective_from'
+    list_select_related = ('product', 'changed_by')
+    readonly_fields = ('product', 'old_price', 'new_price', 'effective_from', 'rule', 'changed_by')
+
+    def has_add_permission(self, request):
+        return False
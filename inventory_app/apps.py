@@ -4,3 +4,16 @@ from django.apps import AppConfig
 class InventoryAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inventory_app'
+
+    def ready(self):
+        # Contadores de versión compartidos entre workers (falla al arrancar si no)
+        from . import cache
+        cache.check_shared_versions()
+        # Con varios workers /metrics debe sumar los de todos (falla al arrancar si no)
+        from core import metrics as core_metrics
+        core_metrics.check_multiprocess()
+        # Conecta los receptores de señales (invalidación de caché)
+        from . import signals  # noqa: F401
+        # Contadores y gauges de inventario para /metrics
+        from . import metrics
+        metrics.register()
@@ -0,0 +1,352 @@
+# inventory_app/cache.py
+
+"""
+Caché del Catálogo (Categorías, Productos y Variaciones).
+
+Dos niveles:
+  1. Un LRU local acotado (por proceso) que evita deserializar en cada lectura.
+  2. El framework de caché de Django (alias 'catalog'): filebased (por
+     defecto, sin servicios externos), Redis o, en un solo proceso, locmem.
+
+Los contadores de versión viven en el nivel 2 y los comparten todos los
+workers (también los de la tabla de escaneo y los ETag de la API): con
+varios workers un alias locmem daría a cada uno contadores propios y uno no
+vería las invalidaciones de otro. check_shared_versions() lo impide al arrancar.
+
+Las claves de datos llevan incrustados contadores de versión
+(global, por categoría y por producto). Invalidar es incrementar un contador:
+las entradas viejas quedan inalcanzables y el LRU/culling las desaloja solo.
+
+Las variantes `a*` (aget_or_load, aget_search_results...) son para las
+vistas async: usan la API async de la caché y un cargador corrutina.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+
+from .models import Category, Product, ProductVariation
+
+CACHE_ALIAS = 'catalog'
+KEY_PREFIX = 'catalog'
+
+# Ámbitos de versión
+SCOPE_CATALOG = 'all'         # Invalidación total (importaciones masivas)
+SCOPE_CATEGORY = 'category'   # Lista de categorías
+SCOPE_PRODUCT = 'product'     # Un producto y sus variaciones
+SCOPE_SEARCH = 'search'       # Resultados del buscador AJAX
+# Contadores gruesos para los fragmentos de plantilla ({% cache %} de tablas)
+SCOPE_STOCK = 'stock'         # Cualquier movimiento de existencias
+SCOPE_PRODUCTS = 'products'   # Cualquier alta/edición de producto, variación o categoría
+
+_MISSING = object()
+
+
+# ==========================================
+# 1. LRU LOCAL (NIVEL 1)
+# ==========================================
+class LocalLRU:
+    """Diccionario ordenado con tope de entradas y desalojo LRU."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=_MISSING):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            return self._data[key]
+
+    def set(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class CacheStats:
+    """Contadores de aciertos/fallos para ajustar tamaños y TTL."""
+
+    FIELDS = ('local_hits', 'shared_hits', 'misses', 'invalidations')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def incr(self, field, amount=1):
+        with self._lock:
+            self._counts[field] += amount
+
+    def reset(self):
+        with self._lock:
+            self._counts = dict.fromkeys(self.FIELDS, 0)
+
+    def snapshot(self):
+        with self._lock:
+            data = dict(self._counts)
+        hits = data['local_hits'] + data['shared_hits']
+        lookups = hits + data['misses']
+        data['hits'] = hits
+        data['hit_ratio'] = round(hits / lookups, 4) if lookups else 0.0
+        data['local_entries'] = len(_local)
+        return data
+
+
+_local = LocalLRU(getattr(settings, 'CATALOG_CACHE_LOCAL_MAX_ENTRIES', 1000))
+_stats = CacheStats()
+
+
+def _cache():
+    try:
+        return caches[CACHE_ALIAS]
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+def shared():
+    """La caché compartida por todos los workers (la de los contadores de versión)"""
+    return _cache()
+
+
+def check_shared_versions():
+    """Llamado al cargar la app: con varios workers la caché del catálogo no puede ser por proceso"""
+    workers = getattr(settings, 'WEB_CONCURRENCY', 1)
+    if workers > 1 and isinstance(_cache(), LocMemCache):
+        raise ImproperlyConfigured(
+            f"La caché del catálogo es locmem (por proceso) y WEB_CONCURRENCY={workers}: "
+            "los workers no verían las invalidaciones de los demás. "
+            "Use CATALOG_CACHE_BACKEND=filebased o redis."
+        )
+
+
+# ==========================================
+# 2. CONTADORES DE VERSIÓN
+# ==========================================
+def _version_key(scope, pk=None):
+    return f"{KEY_PREFIX}:v:{scope}" if pk is None else f"{KEY_PREFIX}:v:{scope}:{pk}"
+
+
+def _initial_version():
+    # Si un contador es desalojado, al recrearlo no debe coincidir con una
+    # versión anterior cuyos datos aún sigan en caché: usamos el reloj.
+    return int(time.time() * 1000)
+
+
+def get_versions(*scopes):
+    """
+    Lee varios contadores en una sola operación de caché.
+    `scopes` son tuplas (scope, pk); devuelve una tupla de enteros.
+    """
+    cache = _cache()
+    keys = [_version_key(scope, pk) for scope, pk in scopes]
+    found = cache.get_many(keys)
+    versions = []
+    for key in keys:
+        value = found.get(key)
+        if value is None:
+            value = _initial_version()
+            if not cache.add(key, value, timeout=None):
+                value = cache.get(key, value)
+        versions.append(value)
+    return tuple(versions)
+
+
+async def aget_versions(*scopes):
+    """Versión async de get_versions (mismas claves y misma semántica)"""
+    cache = _cache()
+    keys = [_version_key(scope, pk) for scope, pk in scopes]
+    found = await cache.aget_many(keys)
+    versions = []
+    for key in keys:
+        value = found.get(key)
+        if value is None:
+            value = _initial_version()
+            if not await cache.aadd(key, value, timeout=None):
+                value = await cache.aget(key, value)
+        versions.append(value)
+    return tuple(versions)
+
+
+def get_version(scope, pk=None):
+    return get_versions((scope, pk))[0]
+
+
+def bump(scope, pk=None):
+    """Invalida un ámbito incrementando su contador. Devuelve la nueva versión."""
+    cache = _cache()
+    key = _version_key(scope, pk)
+    try:
+        version = cache.incr(key)
+    except ValueError:
+        version = _initial_version()
+        cache.set(key, version, timeout=None)
+    _stats.incr('invalidations')
+    return version
+
+
+def _bump_fragments(stock_only):
+    bump(SCOPE_STOCK)
+    if not stock_only:
+        # Un guardado completo puede cambiar cualquier campo, stock incluido
+        bump(SCOPE_PRODUCTS)
+
+
+def invalidate_product(pk, stock_only=False):
+    bump(SCOPE_PRODUCT, pk)
+    bump(SCOPE_SEARCH)
+    _bump_fragments(stock_only)
+
+
+def invalidate_products(pks, stock_only=False):
+    """Para rutas masivas (bulk_create / update) que no disparan señales."""
+    for pk in set(pks):
+        bump(SCOPE_PRODUCT, pk)
+    bump(SCOPE_SEARCH)
+    _bump_fragments(stock_only)
+
+
+def invalidate_categories():
+    bump(SCOPE_CATEGORY)
+    # Los listados muestran el nombre de la categoría
+    bump(SCOPE_PRODUCTS)
+
+
+def invalidate_catalog():
+    bump(SCOPE_CATALOG)
+
+
+def fragment_version(*scopes, product=None):
+    """
+    Versión compuesta para claves de {% cache %}: una sola lectura de caché.
+    Incluye siempre el contador global (importaciones masivas).
+    """
+    pairs = [(SCOPE_CATALOG, None)] + [(scope, None) for scope in scopes]
+    if product is not None:
+        pairs.append((SCOPE_PRODUCT, product))
+    return '.'.join(str(v) for v in get_versions(*pairs))
+
+
+# ==========================================
+# 3. LECTURA CON CARGA PEREZOSA
+# ==========================================
+def get_or_load(name, scopes, loader, timeout=None):
+    """
+    Devuelve el valor cacheado `name` bajo las versiones de `scopes`,
+    ejecutando `loader()` sólo en caso de fallo en ambos niveles.
+    """
+    versions = get_versions((SCOPE_CATALOG, None), *scopes)
+    key = f"{KEY_PREFIX}:d:{name}:" + '.'.join(str(v) for v in versions)
+
+    value = _local.get(key)
+    if value is not _MISSING:
+        _stats.incr('local_hits')
+        return value
+
+    cache = _cache()
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        _stats.incr('shared_hits')
+        _local.set(key, value)
+        return value
+
+    _stats.incr('misses')
+    value = loader()
+    cache.set(key, value, timeout=timeout or getattr(settings, 'CATALOG_CACHE_TIMEOUT', 3600))
+    _local.set(key, value)
+    return value
+
+
+async def aget_or_load(name, scopes, aloader, timeout=None):
+    """Como get_or_load, con `aloader` corrutina y llamadas async a la caché"""
+    versions = await aget_versions((SCOPE_CATALOG, None), *scopes)
+    key = f"{KEY_PREFIX}:d:{name}:" + '.'.join(str(v) for v in versions)
+
+    # El LRU local es memoria del proceso: no hay nada que esperar
+    value = _local.get(key)
+    if value is not _MISSING:
+        _stats.incr('local_hits')
+        return value
+
+    cache = _cache()
+    value = await cache.aget(key, _MISSING)
+    if value is not _MISSING:
+        _stats.incr('shared_hits')
+        _local.set(key, value)
+        return value
+
+    _stats.incr('misses')
+    value = await aloader()
+    await cache.aset(key, value, timeout=timeout or getattr(settings, 'CATALOG_CACHE_TIMEOUT', 3600))
+    _local.set(key, value)
+    return value
+
+
+def get_categories():
+    return get_or_load(
+        'categories', [(SCOPE_CATEGORY, None)],
+        lambda: list(Category.objects.all()),
+    )
+
+
+def get_product(pk):
+    """Producto con su categoría y stock total precalculado (o None)."""
+    def load():
+        return (
+            Product.objects.select_related('category')
+            .with_stock()
+            .filter(pk=pk)
+            .first()
+        )
+
+    return get_or_load(
+        f'product:{pk}', [(SCOPE_PRODUCT, pk), (SCOPE_CATEGORY, None)], load,
+    )
+
+
+def get_product_variations(pk):
+    return get_or_load(
+        f'variations:{pk}', [(SCOPE_PRODUCT, pk)],
+        lambda: list(ProductVariation.objects.filter(product_id=pk).order_by('pk')),
+    )
+
+
+def get_search_results(query, loader):
+    digest = hashlib.md5(query.lower().encode()).hexdigest()
+    return get_or_load(f'search:{digest}', [(SCOPE_SEARCH, None)], loader)
+
+
+async def aget_search_results(query, aloader):
+    digest = hashlib.md5(query.lower().encode()).hexdigest()
+    return await aget_or_load(f'search:{digest}', [(SCOPE_SEARCH, None)], aloader)
+
+
+def stats():
+    return _stats.snapshot()
+
+
+def reset_stats():
+    _stats.reset()
+
+
+def clear_local():
+    _local.clear()
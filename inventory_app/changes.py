@@ -0,0 +1,82 @@
+# inventory_app/changes.py
+
+"""
+Registro de cambios para la sincronización delta (api/sync/).
+
+record() inserta las filas en la misma transacción del cambio: se confirman
+(o se revierten) con él. Su id sale de la secuencia al insertar, no al
+confirmar, así que una transacción larga puede confirmar un id menor después
+de que un cliente ya leyó ids mayores. Por eso el cursor del feed no es el id
+sino `position`, que sequence() asigna a las filas ya confirmadas, de a una
+pasada serializada por vez: lo que confirma más tarde recibe posiciones
+mayores y ningún cliente se lo salta.
+"""
+from django.db import connection, transaction
+from django.db.models import Exists, F, Max, Min, OuterRef
+
+from .models import CatalogChange
+
+Entity = CatalogChange.Entity
+Operation = CatalogChange.Operation
+
+# Clave del advisory lock del secuenciador (PostgreSQL; en SQLite las escrituras ya son de a una)
+SEQUENCE_LOCK = 0x53494743
+
+
+def record(entity, object_ids, operation=Operation.UPSERT):
+    """Una fila por objeto cambiado, dentro de la transacción en curso"""
+    object_ids = list(dict.fromkeys(object_ids))
+    if not object_ids:
+        return
+    CatalogChange.objects.bulk_create([
+        CatalogChange(entity=entity, object_id=pk, operation=operation) for pk in object_ids
+    ])
+
+
+def sequence():
+    """
+    Da posición, en orden de id, a las filas confirmadas que aún no la tienen.
+    Devuelve cuántas ordenó. Sin filas pendientes: una consulta al índice parcial.
+    """
+    pending = CatalogChange.objects.filter(position__isnull=True)
+    if pending.aggregate(low=Min('id'))['low'] is None:
+        return 0
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_xact_lock(%s)', [SEQUENCE_LOCK])
+        bounds = pending.aggregate(low=Min('id'), high=Max('id'))
+        if bounds['low'] is None:
+            return 0
+        top = CatalogChange.objects.aggregate(top=Max('position'))['top'] or 0
+        # Sólo el rango leído: una fila de id menor que confirme entretanto va en la próxima pasada
+        return pending.filter(id__range=(bounds['low'], bounds['high'])).update(
+            position=F('id') + (top + 1 - bounds['low']))
+
+
+def latest_cursor():
+    sequence()
+    return CatalogChange.objects.aggregate(top=Max('position'))['top'] or 0
+
+
+def changes_since(cursor, limit):
+    """Filas con position > cursor, en orden. Devuelve (filas, has_more)."""
+    sequence()
+    rows = list(
+        CatalogChange.objects.filter(position__gt=cursor)
+        .order_by('position')
+        .values('position', 'entity', 'object_id', 'operation')[:limit + 1]
+    )
+    return rows[:limit], len(rows) > limit
+
+
+def compact(older_than):
+    """
+    Borra entradas anteriores a `older_than` que ya fueron reemplazadas por una
+    más nueva del mismo objeto. Las bajas (tombstones) vigentes se conservan.
+    """
+    newer = CatalogChange.objects.filter(
+        entity=OuterRef('entity'), object_id=OuterRef('object_id'), pk__gt=OuterRef('pk'),
+    )
+    deleted, _ = CatalogChange.objects.filter(created_at__lt=older_than).filter(Exists(newer)).delete()
+    return deleted
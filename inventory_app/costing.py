@@ -0,0 +1,277 @@
+# inventory_app/costing.py
+
+"""
+Capas de costo (CostLayer) por variación: valorización PEPS o promedio
+ponderado móvil según Product.costing_method.
+
+  - receive(): cada ingreso abre una capa (PEPS) o repondera la capa
+    abierta de la variación (promedio).
+  - consume(): cada despacho toma unidades de las capas abiertas más
+    antiguas y deja el costo de lo despachado en CostConsumption.
+  - average_costs(): costo promedio de lo que queda en capas, que se
+    guarda en Product.cost_price.
+
+Es incremental: un lote de movimientos sólo lee (con bloqueo) las capas
+abiertas de sus variaciones. rebuild() las reconstruye desde el historial.
+"""
+import heapq
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Sum, Value, When
+from django.utils import timezone
+
+from . import cache as catalog_cache
+from . import changes
+from . import scan
+from .models import CostConsumption, CostLayer, Dispatch, Product, ProductVariation, StockArrival
+
+COST_PLACES = Decimal('0.0001')
+# Productos por UPDATE ... CASE de store_costs
+STORE_CHUNK = 500
+
+
+# ==========================================
+# 1. OPERACIONES SOBRE UNA VARIACIÓN
+# ==========================================
+def _receive(layers, variation_id, method, quantity, unit_cost, received_at, arrival_id=None):
+    """
+    Suma un ingreso a `layers` (capas abiertas de la variación en orden PEPS;
+    se modifica). Devuelve (capa nueva o None, capas existentes modificadas).
+    """
+    if method == Product.CostingMethod.FIFO or not layers:
+        layer = CostLayer(
+            variation_id=variation_id, arrival_id=arrival_id, received_at=received_at,
+            quantity=quantity, remaining=quantity, unit_cost=unit_cost,
+        )
+        layers.append(layer)
+        return layer, []
+
+    # Promedio: una sola capa abierta. Las que queden de cuando el producto
+    # era PEPS se funden en ella.
+    units = sum(layer.remaining for layer in layers) + quantity
+    value = sum(layer.remaining * layer.unit_cost for layer in layers) + quantity * unit_cost
+    changed = list(layers)
+    average = layers[0]
+    for layer in layers[1:]:
+        layer.remaining = 0
+    average.quantity += quantity
+    average.remaining = units
+    average.unit_cost = (value / units).quantize(COST_PLACES)
+    del layers[1:]
+    return None, changed
+
+
+def _consume(layers, dispatch_id, quantity, fallback_cost):
+    """
+    Toma `quantity` unidades de las capas más antiguas de `layers` (se
+    modifica). Lo que no cubran las capas se valora a `fallback_cost`.
+    Devuelve (consumos, capas modificadas).
+    """
+    consumptions = []
+    changed = []
+    while quantity and layers:
+        layer = layers[0]
+        taken = min(quantity, layer.remaining)
+        consumptions.append(CostConsumption(dispatch_id=dispatch_id, layer=layer, quantity=taken, unit_cost=layer.unit_cost))
+        layer.remaining -= taken
+        quantity -= taken
+        changed.append(layer)
+        if not layer.remaining:
+            layers.pop(0)
+    if quantity:
+        consumptions.append(CostConsumption(dispatch_id=dispatch_id, quantity=quantity, unit_cost=fallback_cost))
+    return consumptions, changed
+
+
+def _open_layers(variation_ids):
+    """{variation_id: [capas abiertas en orden PEPS]} en una consulta, con bloqueo"""
+    layers = {}
+    for layer in (CostLayer.objects.select_for_update()
+                  .filter(variation_id__in=variation_ids, remaining__gt=0)
+                  .order_by('variation_id', 'received_at', 'pk')):
+        layers.setdefault(layer.variation_id, []).append(layer)
+    return layers
+
+
+def _save(new_layers, changed):
+    if new_layers:
+        CostLayer.objects.bulk_create(new_layers)
+    # Las capas creadas en este mismo lote ya se guardaron con su estado final
+    created = {id(layer) for layer in new_layers}
+    existing = {layer.pk: layer for layer in changed if id(layer) not in created}
+    if existing:
+        CostLayer.objects.bulk_update(existing.values(), ['quantity', 'remaining', 'unit_cost'])
+
+
+# ==========================================
+# 2. MOVIMIENTOS RECIÉN GUARDADOS
+# ==========================================
+def receive(arrivals):
+    """Capas de una lista de StockArrival ya guardados (con variation.product cargado)"""
+    if not arrivals:
+        return
+    averaged = {a.variation_id for a in arrivals if a.variation.product.costing_method == Product.CostingMethod.AVG}
+    layers = _open_layers(averaged) if averaged else {}
+    new_layers, changed = [], []
+    for arrival in arrivals:
+        layer, modified = _receive(
+            layers.setdefault(arrival.variation_id, []), arrival.variation_id,
+            arrival.variation.product.costing_method, arrival.quantity,
+            Decimal(str(arrival.unit_cost)), arrival.arrival_date, arrival.pk,
+        )
+        if layer is not None:
+            new_layers.append(layer)
+        changed.extend(modified)
+    _save(new_layers, changed)
+
+
+def consume(dispatches):
+    """Consumos de una lista de Dispatch ya guardados (con variation.product cargado)"""
+    if not dispatches:
+        return
+    layers = _open_layers({d.variation_id for d in dispatches})
+    consumptions, changed = [], []
+    for dispatch in dispatches:
+        taken, modified = _consume(
+            layers.setdefault(dispatch.variation_id, []), dispatch.pk, dispatch.quantity,
+            dispatch.variation.product.cost_price,
+        )
+        consumptions.extend(taken)
+        changed.extend(modified)
+    _save([], changed)
+    CostConsumption.objects.bulk_create(consumptions)
+
+
+def average_costs(product_ids):
+    """{product_id: costo promedio de sus capas abiertas}; sin capas abiertas no hay entrada"""
+    money = DecimalField(max_digits=18, decimal_places=4)
+    rows = (CostLayer.objects.filter(variation__product_id__in=product_ids, remaining__gt=0)
+            .order_by().values('variation__product_id')
+            .annotate(units=Sum('remaining'), value=Sum(F('remaining') * F('unit_cost'), output_field=money)))
+    return {row['variation__product_id']: (Decimal(str(row['value'])) / row['units']).quantize(COST_PLACES) for row in rows}
+
+
+def store_costs(costs):
+    """
+    Guarda {product_id: costo} con un UPDATE ... CASE por cada STORE_CHUNK
+    productos. Como no pasa por save(), invalida aquí la caché, la tabla de
+    escaneo y la sincronización delta.
+    """
+    now = timezone.now()
+    pks = sorted(costs)
+    for start in range(0, len(pks), STORE_CHUNK):
+        chunk = pks[start:start + STORE_CHUNK]
+        Product.objects.filter(pk__in=chunk).update(
+            cost_price=Case(*[When(pk=pk, then=Value(costs[pk])) for pk in chunk], default=F('cost_price')),
+            updated_at=now,
+        )
+    product_ids = list(costs)
+    transaction.on_commit(lambda: catalog_cache.invalidate_products(product_ids))
+    transaction.on_commit(lambda: scan.invalidate_products(product_ids))
+    changes.record(changes.Entity.PRODUCT, sorted(product_ids))
+
+
+def sync_cost_price(product):
+    """Guarda en `product` el costo promedio de sus capas si cambió (dispara las señales del catálogo)"""
+    cost = average_costs([product.pk]).get(product.pk)
+    if cost is not None and cost != product.cost_price:
+        product.cost_price = cost
+        product.save(update_fields=['cost_price', 'updated_at'])
+
+
+# ==========================================
+# 3. RECONSTRUCCIÓN DESDE EL HISTORIAL
+# ==========================================
+def _history(variation_ids, chunk_size):
+    """Ingresos y despachos de las variaciones en orden cronológico (ingresos primero a igual hora)"""
+    arrivals = (StockArrival.objects.filter(variation_id__in=variation_ids).order_by('arrival_date', 'pk')
+                .values_list('arrival_date', 'pk', 'variation_id', 'quantity', 'unit_cost').iterator(chunk_size))
+    dispatches = (Dispatch.objects.filter(variation_id__in=variation_ids).order_by('dispatched_at', 'pk')
+                  .values_list('dispatched_at', 'pk', 'variation_id', 'quantity').iterator(chunk_size))
+    return heapq.merge(
+        ((at, 0, pk, variation_id, quantity, cost) for at, pk, variation_id, quantity, cost in arrivals),
+        ((at, 1, pk, variation_id, quantity, None) for at, pk, variation_id, quantity in dispatches),
+    )
+
+
+def _net_movements(variation_ids):
+    net = {}
+    for model in (StockArrival, Dispatch):
+        sign = 1 if model is StockArrival else -1
+        for variation_id, quantity in (model.objects.filter(variation_id__in=variation_ids).order_by()
+                                       .values('variation_id').annotate(total=Sum('quantity'))
+                                       .values_list('variation_id', 'total')):
+            net[variation_id] = net.get(variation_id, 0) + sign * quantity
+    return net
+
+
+def _rebuild_batch(variation_ids, chunk_size):
+    stats = {'layers': 0, 'consumptions': 0, 'opening': 0, 'repriced': 0}
+    variations = {
+        v.pk: v for v in ProductVariation.objects.select_for_update(of=('self',)).select_related('product')
+        .filter(pk__in=variation_ids)
+    }
+    CostConsumption.objects.filter(dispatch__variation_id__in=variation_ids).delete()
+    CostLayer.objects.filter(variation_id__in=variation_ids).delete()
+
+    # Stock que el historial no explica (carga inicial, ajustes): capa de apertura al costo vigente
+    net = _net_movements(variation_ids)
+    layers = {pk: [] for pk in variations}
+    new_layers = []
+    for pk, variation in variations.items():
+        opening = variation.stock - net.get(pk, 0)
+        if opening > 0:
+            layer, _ = _receive(layers[pk], pk, variation.product.costing_method, opening,
+                                variation.product.cost_price, variation.product.created_at)
+            new_layers.append(layer)
+            stats['opening'] += 1
+
+    consumptions = []
+    for at, kind, movement_id, variation_id, quantity, cost in _history(variation_ids, chunk_size):
+        product = variations[variation_id].product
+        if kind == 0:
+            layer, _ = _receive(layers[variation_id], variation_id, product.costing_method, quantity, cost, at, movement_id)
+            if layer is not None:
+                new_layers.append(layer)
+        else:
+            taken, _ = _consume(layers[variation_id], movement_id, quantity, product.cost_price)
+            consumptions.extend(taken)
+
+    # Todo es nuevo: las capas se insertan con su estado final y luego los consumos que las referencian
+    CostLayer.objects.bulk_create(new_layers, batch_size=chunk_size)
+    CostConsumption.objects.bulk_create(consumptions, batch_size=chunk_size)
+    stats['layers'] = len(new_layers)
+    stats['consumptions'] = len(consumptions)
+
+    products = {v.product_id: v.product.cost_price for v in variations.values()}
+    costs = {pk: cost for pk, cost in average_costs(list(products)).items() if cost != products[pk]}
+    if costs:
+        store_costs(costs)
+    stats['repriced'] = len(costs)
+    return stats
+
+
+def rebuild(batch_size=200, chunk_size=2000, progress=None, variations=None):
+    """
+    Reconstruye capas y consumos de `variations` (queryset; todas por
+    defecto), `batch_size` variaciones por transacción; los movimientos se
+    leen en streaming. `progress(procesadas, estadísticas)` se llama tras cada lote.
+    """
+    totals = {'variations': 0, 'layers': 0, 'consumptions': 0, 'opening': 0, 'repriced': 0}
+    variations = ProductVariation.objects.all() if variations is None else variations
+    ids = variations.order_by('pk').values_list('pk', flat=True)
+    last = 0
+    while True:
+        batch = list(ids.filter(pk__gt=last)[:batch_size])
+        if not batch:
+            break
+        with transaction.atomic():
+            stats = _rebuild_batch(batch, chunk_size)
+        last = batch[-1]
+        totals['variations'] += len(batch)
+        for key, value in stats.items():
+            totals[key] += value
+        if progress is not None:
+            progress(totals['variations'], totals)
+    return totals
@@ -0,0 +1,300 @@
+# inventory_app/counting.py
+
+"""
+Conteos físicos / cíclicos (CountSession, CountLine).
+
+  1. add_lines(): líneas de un lote de escáner o de un XLSX (parse_xlsx).
+     Se agrupan por variación en memoria y se guardan con un upsert masivo;
+     en modo 'add' se suman a lo ya contado (varios contadores, varias zonas).
+  2. reconcile(): stock del sistema y diferencia de todas las líneas con un
+     único UPDATE ... SET = (subconsulta).
+  3. approve(): en una transacción bloquea las variaciones contadas,
+     recalcula las diferencias y contabiliza los ajustes con post_movements
+     (sobrantes como ingresos, faltantes como despachos; el stock se ajusta
+     con un UPDATE por cada services.UPDATE_CHUNK variaciones).
+"""
+import zipfile
+from decimal import Decimal, InvalidOperation
+from itertools import chain
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, IntegerField, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Abs
+from django.utils import timezone
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+
+from . import scan
+from .models import CountLine, CountSession, ProductVariation
+from .services import ARRIVAL, DISPATCH, MovementError, post_movements
+
+ADD = 'add'
+SET = 'set'
+MODES = (ADD, SET)
+
+SKU_HEADERS = {'sku', 'sku variante', 'sku_variant', 'codigo', 'código', 'code', 'barcode'}
+QTY_HEADERS = {'cantidad', 'qty', 'conteo', 'contado', 'quantity'}
+
+# Errores por línea que se devuelven (el resto sólo se cuenta)
+MAX_REPORTED_ERRORS = 100
+# Filas por INSERT del upsert de líneas y valores por IN (...) al resolver códigos
+WRITE_BATCH_SIZE = 2000
+LOOKUP_CHUNK = 2000
+
+
+class CountError(Exception):
+    """Operación rechazada sobre un conteo (estado de la sesión, archivo inválido...)"""
+
+
+def _require_open(session):
+    if session.status != CountSession.Status.OPEN:
+        raise CountError(f"El conteo está {session.get_status_display().lower()}: no admite cambios.")
+
+
+# ==========================================
+# 1. CARGA DE LÍNEAS
+# ==========================================
+def parse_xlsx(fileobj):
+    """
+    Líneas {'row', 'sku', 'qty'} de la primera hoja. Si la primera fila trae
+    encabezados (SKU / Cantidad) se usan esas columnas; si no, A = SKU y B = cantidad.
+    """
+    try:
+        workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    except (InvalidFileException, zipfile.BadZipFile, KeyError, OSError):
+        raise CountError("El archivo no es un XLSX válido.")
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        first = next(rows, None)
+        if first is None:
+            return []
+        header = [str(cell).strip().lower() if cell is not None else '' for cell in first]
+        sku_col, qty_col, number = 0, 1, 1
+        if any(h in SKU_HEADERS for h in header):
+            sku_col = next(i for i, h in enumerate(header) if h in SKU_HEADERS)
+            qty_col = next((i for i, h in enumerate(header) if h in QTY_HEADERS), None)
+            if qty_col is None:
+                raise CountError("El XLSX tiene columna de SKU pero no de cantidad.")
+            number = 2
+        else:
+            rows = chain([first], rows)
+
+        lines = []
+        for number, row in enumerate(rows, start=number):
+            sku = row[sku_col] if len(row) > sku_col else None
+            qty = row[qty_col] if len(row) > qty_col else None
+            if sku in (None, '') and qty in (None, ''):
+                continue  # Filas vacías al final de la hoja
+            if isinstance(sku, float) and sku.is_integer():
+                sku = int(sku)  # Códigos numéricos que Excel guardó como número
+            lines.append({'row': number, 'sku': '' if sku is None else str(sku), 'qty': qty})
+        return lines
+    finally:
+        workbook.close()
+
+
+def _quantity(value):
+    # Excel entrega números como float (12.0)
+    try:
+        quantity = Decimal(str(value).strip())
+    except InvalidOperation:
+        return None
+    if quantity != quantity.to_integral_value() or quantity < 0:
+        return None
+    return int(quantity)
+
+
+def _resolve_code(code):
+    """variation_id para el SKU / código de barras de un producto de una sola variación (tabla de escaneo)"""
+    entry = scan.lookup(code)
+    if entry is None:
+        return None, "Código no encontrado."
+    if entry['match'] == 'variation':
+        return entry['id'], None
+    if len(entry['variations']) == 1:
+        return entry['variations'][0]['id'], None
+    return None, "El producto tiene varias variaciones: escanee el SKU de la variante."
+
+
+def _variation_ids(codes):
+    """
+    {código: variation_id} de los SKU de variante, por lotes de LOOKUP_CHUNK.
+    Incluye productos inactivos: su stock también se cuenta (la tabla de escaneo no los tiene).
+    """
+    found = {}
+    codes = list(codes)
+    for start in range(0, len(codes), LOOKUP_CHUNK):
+        chunk = codes[start:start + LOOKUP_CHUNK]
+        found.update(ProductVariation.objects.filter(sku_variant__in=chunk).values_list('sku_variant', 'pk'))
+    return found
+
+
+def add_lines(session, lines, mode=ADD):
+    """
+    Guarda líneas {'sku' | 'variation', 'qty'[, 'row']} en la sesión. Las
+    repetidas se suman. mode='add' suma a lo ya contado; 'set' lo reemplaza.
+    Devuelve {'accepted', 'rejected', 'variations', 'errors'}.
+    """
+    if mode not in MODES:
+        raise CountError(f"Modo inválido (use {' o '.join(MODES)}).")
+    _require_open(session)
+
+    errors = []
+    rejected = 0
+
+    def reject(ref, error):
+        nonlocal rejected
+        rejected += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({'line': ref, 'error': error})
+
+    by_id = []
+    by_code = []
+    for index, line in enumerate(lines):
+        ref = line.get('row', index)
+        quantity = _quantity(line.get('qty'))
+        if quantity is None:
+            reject(ref, "Cantidad inválida.")
+        elif line.get('variation') not in (None, ''):
+            try:
+                by_id.append((ref, int(line['variation']), quantity))
+            except (TypeError, ValueError):
+                reject(ref, "Variación inválida.")
+        else:
+            by_code.append((ref, scan.normalize(str(line.get('sku') or line.get('code') or '')), quantity))
+
+    # Ids y SKU de variante se validan con una consulta por lote; el resto
+    # (SKU o código de barras de producto) pasa por la tabla de escaneo
+    known = set()
+    if by_id:
+        ids = list({pk for _, pk, _ in by_id})
+        for start in range(0, len(ids), LOOKUP_CHUNK):
+            known.update(ProductVariation.objects.filter(pk__in=ids[start:start + LOOKUP_CHUNK])
+                         .values_list('pk', flat=True))
+    skus = _variation_ids({code for _, code, _ in by_code if code}) if by_code else {}
+
+    totals = {}
+    for ref, variation_id, quantity in by_id:
+        if variation_id in known:
+            totals[variation_id] = totals.get(variation_id, 0) + quantity
+        else:
+            reject(ref, "Variación no encontrada.")
+    for ref, code, quantity in by_code:
+        variation_id, error = (skus[code], None) if code in skus else _resolve_code(code)
+        if error is None:
+            totals[variation_id] = totals.get(variation_id, 0) + quantity
+        else:
+            reject(ref, error)
+
+    with transaction.atomic():
+        # Serializa las cargas concurrentes de la misma sesión (la suma lee y escribe)
+        session = CountSession.objects.select_for_update().get(pk=session.pk)
+        _require_open(session)
+        if mode == ADD and totals:
+            for variation_id, counted in session.lines.values_list('variation_id', 'counted_qty'):
+                if variation_id in totals:
+                    totals[variation_id] += counted
+        CountLine.objects.bulk_create(
+            [CountLine(session=session, variation_id=pk, counted_qty=qty) for pk, qty in totals.items()],
+            # La diferencia vuelve a None: la línea cambió y hay que conciliar de nuevo
+            update_conflicts=True, unique_fields=['session', 'variation'],
+            update_fields=['counted_qty', 'system_stock', 'variance', 'updated_at'],
+            batch_size=WRITE_BATCH_SIZE,
+        )
+
+    return {
+        'accepted': len(lines) - rejected,
+        'rejected': rejected,
+        'variations': len(totals),
+        'errors': errors,
+    }
+
+
+# ==========================================
+# 2. DIFERENCIAS
+# ==========================================
+def _update_variances(session):
+    stock = Subquery(ProductVariation.objects.filter(pk=OuterRef('variation_id')).values('stock')[:1])
+    return CountLine.objects.filter(session=session).update(
+        system_stock=stock,
+        variance=ExpressionWrapper(F('counted_qty') - stock, output_field=IntegerField()),
+    )
+
+
+def reconcile(session):
+    """Stock del sistema y diferencia de cada línea en un solo UPDATE; devuelve summary()"""
+    _require_open(session)
+    with transaction.atomic():
+        _update_variances(session)
+        session.reconciled_at = timezone.now()
+        session.save(update_fields=['reconciled_at'])
+    return summary(session)
+
+
+def summary(session):
+    """Totales de la sesión (una consulta agregada)"""
+    money = DecimalField(max_digits=18, decimal_places=4)
+    totals = session.lines.aggregate(
+        lines=Count('pk'),
+        counted_units=Sum('counted_qty'),
+        with_variance=Count('pk', filter=Q(variance__isnull=False) & ~Q(variance=0)),
+        units_over=Sum('variance', filter=Q(variance__gt=0)),
+        units_short=Sum('variance', filter=Q(variance__lt=0)),
+        cost_impact=Sum(F('variance') * F('variation__product__cost_price'), output_field=money),
+    )
+    return {key: value or 0 for key, value in totals.items()}
+
+
+def largest_variances(session, limit=50):
+    """Líneas con mayor diferencia absoluta (revisión antes de aprobar)"""
+    return (session.lines.filter(variance__isnull=False).exclude(variance=0)
+            .select_related('variation__product').order_by(Abs('variance').desc(), 'pk')[:limit])
+
+
+# ==========================================
+# 3. APROBACIÓN
+# ==========================================
+def approve(session, user):
+    """
+    Contabiliza los ajustes en una sola transacción: o entran todos o ninguno.
+    Las diferencias se recalculan con las variaciones bloqueadas, de modo que
+    un movimiento concurrente no deja el ajuste desfasado.
+    """
+    label = f"Ajuste por conteo #{session.pk}"
+    with transaction.atomic():
+        session = CountSession.objects.select_for_update().get(pk=session.pk)
+        _require_open(session)
+        list(ProductVariation.objects.select_for_update().filter(count_lines__session=session)
+             .order_by('pk').values_list('pk', flat=True))
+        _update_variances(session)
+
+        adjustments = list(session.lines.filter(variance__isnull=False).exclude(variance=0)
+                           .values_list('variation_id', 'variance'))
+        if adjustments:
+            try:
+                post_movements(
+                    [{'type': ARRIVAL if variance > 0 else DISPATCH, 'variation': pk, 'qty': abs(variance)}
+                     for pk, variance in adjustments],
+                    user=user, destination=label, supplier=label, partial=False,
+                )
+            except MovementError as e:
+                failed = next(r for r in e.results if r['status'] == 'error')
+                raise CountError(f"Línea {failed['line']}: {failed['error']}")
+
+        now = timezone.now()
+        session.status = CountSession.Status.APPROVED
+        session.reconciled_at = now
+        session.approved_by = user
+        session.approved_at = now
+        session.adjusted_lines = len(adjustments)
+        session.units_added = sum(v for _, v in adjustments if v > 0)
+        session.units_removed = -sum(v for _, v in adjustments if v < 0)
+        session.save()
+    return session
+
+
+def cancel(session):
+    _require_open(session)
+    session.status = CountSession.Status.CANCELLED
+    session.save(update_fields=['status'])
+    return session
@@ -0,0 +1,343 @@
+# inventory_app/live.py
+
+"""
+Difusión de eventos en vivo para el Dashboard (Server-Sent Events).
+
+Un único productor (los movimientos de stock, al confirmarse la transacción)
+publica eventos; cada navegador conectado tiene una cola asyncio en el
+proceso ASGI que lo atiende. Cien dashboards abiertos cuestan cien colas en
+memoria y cero consultas de sondeo.
+
+Dos difusores, elegidos con LIVE_BROADCASTER:
+  - 'inprocess' (por defecto): publicar y escuchar en el mismo proceso.
+  - 'postgres': publica con pg_notify y un hilo por proceso hace LISTEN y
+    reparte localmente. Necesario con varios workers ASGI. Los procesos con
+    navegadores conectados lo anuncian en la caché compartida (PRESENCE_KEY):
+    sin nadie escuchando, los movimientos no publican nada.
+
+La transacción que escribe sólo arma eventos con lo que ya tiene en memoria
+(más una consulta acotada por los insumos críticos afectados). Los totales del
+inventario se recalculan después del commit, en un hilo y a lo sumo uno cada
+LIVE_KPI_DEBOUNCE_SECONDS por proceso ('kpi_totals').
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from . import cache as catalog_cache
+from .models import Product, ProductVariation
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'sig_live'
+# Tope de eventos por navegador: un cliente lento pierde eventos, no frena al resto
+QUEUE_SIZE = 256
+# Máximo de líneas de movimiento detalladas por evento (lotes grandes se resumen)
+MAX_MOVEMENT_LINES = 20
+# Máximo de insumos críticos por evento (los de mayor variación)
+MAX_CRITICAL_PRODUCTS = 40
+# Largo máximo de los textos de una línea de movimiento
+TEXT_LENGTH = 40
+# pg_notify rechaza payloads de 8000 bytes o más
+NOTIFY_MAX_BYTES = 7900
+# Anuncio de "hay navegadores conectados" en la caché compartida
+PRESENCE_KEY = 'live:subscribers'
+PRESENCE_SECONDS = 90
+
+
+class InProcessBroadcaster:
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def publish(self, event):
+        """Seguro desde cualquier hilo (vistas WSGI, sync_to_async, workers)"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, event)
+            except RuntimeError:
+                # Bucle cerrado: el suscriptor se desconectó
+                self._discard((loop, queue))
+
+    def _discard(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def subscribe(self):
+        """`async with broadcaster.subscribe() as queue:` (se da de baja al salir)"""
+        return _Subscription(self)
+
+    def _add(self, subscriber):
+        with self._lock:
+            self._subscribers.add(subscriber)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def has_subscribers(self):
+        return bool(self._subscribers)
+
+
+class PostgresBroadcaster(InProcessBroadcaster):
+    """LISTEN/NOTIFY: un hilo oyente por proceso reparte a las colas locales"""
+
+    def __init__(self):
+        super().__init__()
+        self._listener = None
+        self._announced_at = 0
+
+    def publish(self, event):
+        payload = json.dumps(event, default=str)
+        if len(payload.encode()) > NOTIFY_MAX_BYTES:
+            # Nunca se pierde en silencio: el navegador recarga la foto completa
+            logger.warning("Evento en vivo '%s' de %s bytes: se envía 'resync'", event['type'], len(payload))
+            payload = json.dumps({'type': 'resync', 'data': {}})
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [CHANNEL, payload])
+
+    def has_subscribers(self):
+        # Los navegadores pueden estar en cualquier proceso ASGI
+        return bool(self._subscribers) or bool(catalog_cache.shared().get(PRESENCE_KEY))
+
+    def _announce(self):
+        if self._subscribers and time.monotonic() - self._announced_at > PRESENCE_SECONDS / 3:
+            catalog_cache.shared().set(PRESENCE_KEY, True, PRESENCE_SECONDS)
+            self._announced_at = time.monotonic()
+
+    def _add(self, subscriber):
+        self._ensure_listener()
+        super()._add(subscriber)
+        self._announce()
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name='sig-live-listener', daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        while True:
+            try:
+                self._listen_once()
+            except Exception:
+                logger.exception("Se perdió la conexión LISTEN; reintentando en 5 s")
+                time.sleep(5)
+
+    def _listen_once(self):
+        # Conexión dedicada, fuera del manejo de conexiones de Django
+        wrapper = connections['default']
+        conn = wrapper.get_new_connection(wrapper.get_connection_params())
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANNEL}")
+            logger.info("Escuchando el canal %s", CHANNEL)
+            while True:
+                self._announce()
+                if select.select([conn], [], [], 30) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    try:
+                        InProcessBroadcaster.publish(self, json.loads(notify.payload))
+                    except ValueError:
+                        logger.warning("Evento en vivo inválido: %r", notify.payload)
+        finally:
+            conn.close()
+
+
+class _Subscription:
+    """
+    Context manager de clase (no generador): se cierra bien aunque el flujo
+    SSE termine por cancelación o por finalización del generador que lo usa.
+    """
+
+    def __init__(self, broadcaster):
+        self.broadcaster = broadcaster
+        self.subscriber = None
+
+    async def __aenter__(self):
+        self.subscriber = (asyncio.get_running_loop(), asyncio.Queue(maxsize=QUEUE_SIZE))
+        self.broadcaster._add(self.subscriber)
+        return self.subscriber[1]
+
+    async def __aexit__(self, *exc_info):
+        self.broadcaster._discard(self.subscriber)
+        return False
+
+
+def _offer(queue, event):
+    try:
+        queue.put_nowait(event)
+    except asyncio.QueueFull:
+        pass
+
+
+def _build_broadcaster():
+    if getattr(settings, 'LIVE_BROADCASTER', 'inprocess') == 'postgres':
+        return PostgresBroadcaster()
+    return InProcessBroadcaster()
+
+
+broadcaster = _build_broadcaster()
+
+
+def emit(event_type, data):
+    """Publica al confirmar la transacción actual (nunca eventos revertidos)"""
+    event = {'type': event_type, 'data': data}
+    transaction.on_commit(lambda: _safe_publish(event))
+
+
+def _safe_publish(event):
+    try:
+        broadcaster.publish(event)
+    except Exception:
+        # El dashboard en vivo nunca debe romper un despacho
+        logger.exception("No se pudo publicar el evento en vivo")
+
+
+def _short(text):
+    return text if len(text) <= TEXT_LENGTH else text[:TEXT_LENGTH - 1] + '…'
+
+
+def format_sse(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+
+
+# ==========================================
+# PRODUCTOR: MOVIMIENTOS DE STOCK
+# ==========================================
+def publish_movements(dispatches=(), arrivals=(), stock_deltas=None):
+    """
+    Emite, para un conjunto de movimientos recién contabilizados (dentro de
+    la transacción que los creó; se publican al confirmar):
+      - 'movements': líneas nuevas para las tablas de últimos ingresos/despachos
+      - 'kpi': variación de costo / valor de venta del inventario (los totales
+        llegan después en 'kpi_totals', ver totals)
+      - 'critical': stock y semáforo de los insumos críticos afectados
+    `stock_deltas` es {variation_id: delta}. Sin navegadores conectados no
+    hace nada; con ellos, a lo sumo una consulta por lote.
+    """
+    if not getattr(settings, 'LIVE_UPDATES_ENABLED', True) or not broadcaster.has_subscribers():
+        return
+
+    cost_delta = Decimal('0')
+    sales_delta = Decimal('0')
+    lines = []
+    for kind, movements, sign in (('dispatch', dispatches, -1), ('arrival', arrivals, 1)):
+        for m in movements:
+            product = m.variation.product
+            cost_delta += sign * m.quantity * product.cost_price
+            sales_delta += sign * m.quantity * product.sale_price
+            if len(lines) < MAX_MOVEMENT_LINES:
+                lines.append({
+                    'kind': kind,
+                    'id': m.pk,
+                    'product': _short(product.name),
+                    'sku': _short(m.variation.sku_variant),
+                    'quantity': m.quantity,
+                    'place': _short(m.destination if kind == 'dispatch' else (m.supplier or '')),
+                    'user': _short(m.user.username) if m.user_id else '',
+                    'at': timezone.localtime(m.dispatched_at if kind == 'dispatch' else m.arrival_date).strftime('%d/%m %H:%M'),
+                })
+
+    total = len(dispatches) + len(arrivals)
+    if not total:
+        return
+    emit('movements', {'lines': lines, 'total': total})
+    emit('kpi', {
+        'delta': {'total_cost': cost_delta, 'total_sales': sales_delta, 'projected_profit': sales_delta - cost_delta},
+    })
+    # Una reposición con costo nuevo revaloriza todo el stock del producto: el
+    # cliente corrige la deriva de los deltas con los totales recalculados
+    transaction.on_commit(totals.request)
+
+    if stock_deltas:
+        _emit_critical_changes(stock_deltas)
+
+
+def _emit_critical_changes(stock_deltas):
+    product_delta = {}
+    for v in ProductVariation.objects.filter(pk__in=stock_deltas, product__is_critical=True).values('pk', 'product_id'):
+        product_delta[v['product_id']] = product_delta.get(v['product_id'], 0) + stock_deltas[v['pk']]
+    if not product_delta:
+        return
+
+    # Un conteo grande puede tocar cientos: van los de mayor variación
+    shown = sorted(product_delta, key=lambda pk: -abs(product_delta[pk]))[:MAX_CRITICAL_PRODUCTS]
+    changes = []
+    for p in (Product.objects.filter(pk__in=shown).with_stock()
+              .values('pk', 'min_stock_level', 'daily_usage_rate', 'total_qty')):
+        new_total = p['total_qty']
+        old_status = Product.status_for(new_total - product_delta[p['pk']], p['min_stock_level'])
+        new_status = Product.status_for(new_total, p['min_stock_level'])
+        rate = p['daily_usage_rate']
+        changes.append({
+            'product_id': p['pk'],
+            'stock': new_total,
+            'status': new_status,
+            'status_changed': old_status != new_status,
+            'days_remaining': 0 if new_total <= 0 else (999 if rate <= 0 else round(new_total / float(rate), 1)),
+        })
+    emit('critical', {'products': changes, 'total': len(product_delta)})
+
+
+# ==========================================
+# TOTALES DEL INVENTARIO (FUERA DE LA TRANSACCIÓN)
+# ==========================================
+def publish_totals():
+    """Valorización completa del inventario -> 'kpi_totals' (una consulta)"""
+    values = ProductVariation.objects.valuation()
+    total_cost = values['total_cost']
+    total_sales = values['total_sales']
+    _safe_publish({'type': 'kpi_totals', 'data': {
+        'total_cost': total_cost,
+        'total_sales': total_sales,
+        'projected_profit': total_sales - total_cost,
+    }})
+
+
+class TotalsProducer:
+    """
+    Recalcula los totales tras una ráfaga de movimientos: el primer aviso
+    programa un cálculo a LIVE_KPI_DEBOUNCE_SECONDS en un hilo propio y los
+    avisos siguientes hasta que corra se suman a él. Ninguna petición espera.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def request(self):
+        with self._lock:
+            if self._timer is not None:
+                return
+            self._timer = threading.Timer(getattr(settings, 'LIVE_KPI_DEBOUNCE_SECONDS', 2), self._run)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _run(self):
+        # Antes de calcular: un movimiento confirmado durante el cálculo programa otro
+        with self._lock:
+            self._timer = None
+        try:
+            publish_totals()
+        except Exception:
+            logger.exception("No se pudieron recalcular los totales en vivo")
+        finally:
+            connection.close()
+
+
+totals = TotalsProducer()
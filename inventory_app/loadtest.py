@@ -0,0 +1,210 @@
+# inventory_app/loadtest.py
+
+"""
+Utilidades para pruebas de carga (comandos bench_async y loadtest).
+
+  - Recorder: latencias por endpoint y resumen con p50/p95/p99.
+  - http_request: cliente HTTP/1.1 mínimo sobre asyncio (sin dependencias),
+    capaz de mantener cientos de conexiones concurrentes en un solo hilo;
+    http_request_sync es su equivalente para pools de hilos.
+  - auth_headers: cookies de sesión y CSRF de un usuario, creadas
+    directamente en el SessionStore (sin pasar por el login).
+"""
+import asyncio
+import http.client
+import math
+import socket
+import subprocess
+import sys
+import threading
+import time
+from importlib import import_module
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.utils.crypto import get_random_string
+
+
+# ==========================================
+# 1. MÉTRICAS
+# ==========================================
+def percentile(sorted_values, pct):
+    """Percentil por rango más cercano sobre una lista ya ordenada"""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+
+class Recorder:
+    """Acumula (endpoint, segundos, código HTTP). Seguro entre hilos."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencies = {}
+        self._errors = {}
+        self._statuses = {}
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def add(self, endpoint, seconds, status, ok=None):
+        """`ok` permite marcar como error respuestas 2xx (p. ej. un formulario rechazado)"""
+        if ok is None:
+            ok = bool(status) and status < 500
+        with self._lock:
+            self._latencies.setdefault(endpoint, []).append(seconds)
+            codes = self._statuses.setdefault(endpoint, {})
+            codes[status] = codes.get(status, 0) + 1
+            if not ok:
+                self._errors[endpoint] = self._errors.get(endpoint, 0) + 1
+
+    def stop(self):
+        self.finished = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    def summary(self):
+        elapsed = self.elapsed
+        endpoints = {}
+        all_latencies = []
+        with self._lock:
+            items = {name: sorted(values) for name, values in self._latencies.items()}
+            statuses = {name: dict(codes) for name, codes in self._statuses.items()}
+            errors = dict(self._errors)
+        for name, values in sorted(items.items()):
+            all_latencies.extend(values)
+            endpoints[name] = self._stats(values, elapsed)
+            endpoints[name]['errors'] = errors.get(name, 0)
+            endpoints[name]['status_codes'] = {str(code): n for code, n in sorted(statuses[name].items())}
+        all_latencies.sort()
+        total = self._stats(all_latencies, elapsed)
+        total['errors'] = sum(errors.values())
+        return {'elapsed_s': round(elapsed, 3), 'total': total, 'endpoints': endpoints}
+
+    @staticmethod
+    def _stats(values, elapsed):
+        ms = 1000
+        return {
+            'requests': len(values),
+            'throughput_rps': round(len(values) / elapsed, 1) if elapsed else 0.0,
+            'mean_ms': round(sum(values) / len(values) * ms, 2) if values else 0.0,
+            'p50_ms': round(percentile(values, 50) * ms, 2),
+            'p95_ms': round(percentile(values, 95) * ms, 2),
+            'p99_ms': round(percentile(values, 99) * ms, 2),
+            'max_ms': round(values[-1] * ms, 2) if values else 0.0,
+        }
+
+
+# ==========================================
+# 2. CLIENTE HTTP ASYNC MÍNIMO
+# ==========================================
+async def http_request(base_url, method, path, headers=None, body=b'', timeout=30):
+    """
+    Una petición por conexión (Connection: close). Devuelve (status, cuerpo).
+    Errores de red o timeout se devuelven como status 0.
+    """
+    url = urlsplit(base_url)
+    host, port = url.hostname, url.port or 80
+    lines = [f"{method} {path} HTTP/1.1", f"Host: {url.netloc}", "Connection: close",
+             f"Content-Length: {len(body)}"]
+    lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    payload = ("\r\n".join(lines) + "\r\n\r\n").encode('latin-1') + body
+
+    async def exchange():
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            writer.write(payload)
+            await writer.drain()
+            raw = await reader.read()
+        finally:
+            writer.close()
+        head, _, content = raw.partition(b"\r\n\r\n")
+        status = int(head.split(b" ", 2)[1]) if head else 0
+        return status, content
+
+    try:
+        return await asyncio.wait_for(exchange(), timeout)
+    except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+        return 0, b''
+
+
+def http_request_sync(base_url, method, path, headers=None, body=b'', timeout=30):
+    """Equivalente bloqueante de http_request, para pools de hilos"""
+    url = urlsplit(base_url)
+    conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=timeout)
+    try:
+        conn.request(method, path, body=body or None, headers=headers or {})
+        response = conn.getresponse()
+        return response.status, response.read()
+    except (OSError, http.client.HTTPException):
+        return 0, b''
+    finally:
+        conn.close()
+
+
+async def run_pool(concurrency, jobs, worker):
+    """
+    Lanza `concurrency` clientes que consumen `jobs` (iterable) hasta
+    agotarlo; cada cliente llama `await worker(job)` en bucle cerrado.
+    """
+    iterator = iter(jobs)
+
+    async def client():
+        for job in iterator:
+            await worker(job)
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+
+
+# ==========================================
+# 3. AUTENTICACIÓN Y HOST
+# ==========================================
+def auth_headers(user):
+    """Cabeceras Cookie + X-CSRFToken de una sesión nueva del usuario"""
+    store = import_module(settings.SESSION_ENGINE).SessionStore()
+    store[SESSION_KEY] = str(user.pk)
+    store[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+    store[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    store.create()
+
+    csrf = get_random_string(32)
+    return {
+        'Cookie': f"{settings.SESSION_COOKIE_NAME}={store.session_key}; {settings.CSRF_COOKIE_NAME}={csrf}",
+        'X-CSRFToken': csrf,
+    }
+
+
+def client_host():
+    """
+    Host permitido para el Client de Django fuera de las pruebas (sin
+    setup_test_environment, 'testserver' no está en ALLOWED_HOSTS).
+    """
+    for host in ('localhost', '127.0.0.1'):
+        if host in settings.ALLOWED_HOSTS:
+            return host
+    return next((h for h in settings.ALLOWED_HOSTS if h and '*' not in h), 'localhost')
+
+
+# ==========================================
+# 4. SERVIDOR ASGI LOCAL
+# ==========================================
+def start_asgi_server(port, timeout=20):
+    """Levanta daphne con core.asgi en 127.0.0.1:port y espera a que acepte conexiones"""
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'daphne', '-b', '127.0.0.1', '-p', str(port), 'core.asgi:application'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"daphne terminó al arrancar (código {process.returncode}).")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"daphne no respondió en el puerto {port} tras {timeout} s.")
@@ -0,0 +1,115 @@
+# inventory_app/management/commands/bench_async.py
+
+import asyncio
+import json
+import random
+import time
+from urllib.parse import urlencode
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from inventory_app import loadtest
+from inventory_app.models import Product, ProductVariation
+
+# (escenario, vista sync, vista async)
+PAIRS = (
+    ('search', 'product_search_ajax', 'product_search_ajax_async'),
+    ('scan', 'scan_lookup', 'scan_lookup_async'),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara las vistas AJAX sync y async (búsqueda y escaneo) bajo N clientes "
+        "concurrentes contra un servidor ASGI en vivo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help="Servidor ya levantado (core.asgi).")
+        parser.add_argument('--serve', action='store_true', help="Levanta daphne con core.asgi en --port y lo detiene al final.")
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--concurrency', type=int, default=200, help="Clientes concurrentes.")
+        parser.add_argument('--requests', type=int, default=2000, help="Peticiones por escenario y variante.")
+        parser.add_argument('--stock', action='store_true', help="Escaneos con ?stock=1 (una consulta por escaneo).")
+        parser.add_argument('--user', default=None, help="Usuario para las peticiones (por defecto el primer superusuario).")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--json', action='store_true', help="Imprime el resultado completo en JSON.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        codes = list(ProductVariation.objects.values_list('sku_variant', flat=True)[:500])
+        names = list(Product.objects.values_list('name', flat=True)[:500])
+        if not codes or not names:
+            raise CommandError("No hay productos en la base de datos. Cargue datos primero.")
+        # Fragmentos de nombre de 3 a 6 letras: muchas búsquedas distintas, como en los formularios
+        terms = sorted({n[i:i + rng.randint(3, 6)] for n in names for i in range(0, max(len(n) - 3, 1), 3)})
+
+        User = get_user_model()
+        user = (User.objects.filter(username=options['user']).first() if options['user']
+                else User.objects.filter(is_superuser=True).first())
+        if user is None:
+            raise CommandError("No se encontró un usuario para autenticar las peticiones.")
+        headers = loadtest.auth_headers(user)
+
+        n = options['requests']
+        paths = {}
+        for scenario, sync_name, async_name in PAIRS:
+            if scenario == 'search':
+                sample = ['?' + urlencode({'q': rng.choice(terms).strip()}) for _ in range(n)]
+                for name in (sync_name, async_name):
+                    paths[name] = [reverse(name) + q for q in sample]
+            else:
+                sample = [rng.choice(codes) for _ in range(n)]
+                suffix = '?stock=1' if options['stock'] else ''
+                for name in (sync_name, async_name):
+                    paths[name] = [reverse(name, args=[c]) + suffix for c in sample]
+
+        server = None
+        base_url = options['url']
+        if options['serve']:
+            base_url = f"http://127.0.0.1:{options['port']}"
+            try:
+                server = loadtest.start_asgi_server(options['port'])
+            except RuntimeError as exc:
+                raise CommandError(str(exc))
+
+        try:
+            results = {}
+            for scenario, sync_name, async_name in PAIRS:
+                for variant, name in (('sync', sync_name), ('async', async_name)):
+                    # Una ronda corta de calentamiento (tabla de escaneo, caché, conexiones)
+                    asyncio.run(self._run(base_url, headers, paths[name][:50], min(options['concurrency'], 10)))
+                    recorder = asyncio.run(self._run(base_url, headers, paths[name], options['concurrency']))
+                    results[f"{scenario}:{variant}"] = recorder.summary()['total']
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+        if options['json']:
+            self.stdout.write(json.dumps({
+                'concurrency': options['concurrency'], 'requests': n, 'url': base_url, 'results': results,
+            }, indent=2))
+            return
+
+        self.stdout.write(f"{options['concurrency']} clientes concurrentes, {n} peticiones por variante ({base_url})")
+        self.stdout.write(f"{'escenario':<14}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errores':>9}")
+        for key, r in results.items():
+            self.stdout.write(
+                f"{key:<14}{r['throughput_rps']:>10,.0f}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}"
+                f"{r['p99_ms']:>10.1f}{r['errors']:>9}"
+            )
+
+    async def _run(self, base_url, headers, paths, concurrency):
+        recorder = loadtest.Recorder()
+
+        async def worker(path):
+            start = time.perf_counter()
+            status, _ = await loadtest.http_request(base_url, 'GET', path, headers=headers)
+            recorder.add('request', time.perf_counter() - start, status)
+
+        await loadtest.run_pool(concurrency, paths, worker)
+        recorder.stop()
+        return recorder
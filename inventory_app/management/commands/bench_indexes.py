@@ -0,0 +1,180 @@
+# inventory_app/management/commands/bench_indexes.py
+
+import json
+import statistics
+import time
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from billing_app.models import Invoice
+from delivery_app.models import DeliveryNote
+from inventory_app.models import Dispatch, Product, ProductVariation, StockArrival
+from purchasing_app.models import PurchaseOrder
+
+# Índices de las migraciones *_index_pack: (modelo, nombre)
+INDEX_PACK = (
+    ('inventory_app.Product', 'product_critical_idx'),
+    ('inventory_app.Product', 'product_updated_idx'),
+    ('inventory_app.Dispatch', 'dispatch_date_idx'),
+    ('inventory_app.Dispatch', 'dispatch_variation_date_idx'),
+    ('inventory_app.StockArrival', 'arrival_date_idx'),
+    ('inventory_app.StockArrival', 'arrival_variation_date_idx'),
+    ('billing_app.Invoice', 'invoice_status_date_idx'),
+    ('purchasing_app.PurchaseOrder', 'po_status_date_idx'),
+    ('purchasing_app.PurchaseOrder', 'po_open_expected_idx'),
+    ('delivery_app.DeliveryNote', 'deliverynote_status_date_idx'),
+)
+
+
+def _queries(sample):
+    """(nombre, índice esperado, queryset): las consultas reales de vistas, admin y API"""
+    recent = ('variation__product', 'user')
+    return [
+        ('dashboard_recent_dispatches', 'dispatch_date_idx',
+         Dispatch.objects.select_related(*recent).order_by('-dispatched_at')[:5]),
+        ('dashboard_recent_arrivals', 'arrival_date_idx',
+         StockArrival.objects.select_related(*recent).order_by('-arrival_date')[:5]),
+        ('report_dispatches_7d', 'dispatch_date_idx',
+         Dispatch.objects.filter(dispatched_at__range=[sample['end'] - timedelta(days=7), sample['end']])
+         .select_related(*recent).order_by('-dispatched_at')),
+        ('dashboard_critical', 'product_critical_idx',
+         Product.objects.filter(is_active=True, is_critical=True).by_stock_priority()),
+        ('catalog_last_change', 'product_updated_idx', Product.objects.last_change()),
+        ('product_last_change', 'dispatch_variation_date_idx', Product.objects.last_change(sample['product'])),
+        ('arrival_previous_cost', 'arrival_variation_date_idx',
+         StockArrival.objects.filter(variation_id=sample['variation']).with_previous_cost().order_by('-arrival_date')[:50]),
+        ('invoices_issued', 'invoice_status_date_idx',
+         Invoice.objects.filter(status=Invoice.InvoiceStatus.ISSUED).order_by('-invoice_date')[:50]),
+        ('purchase_orders_by_status', 'po_status_date_idx',
+         PurchaseOrder.objects.filter(status=PurchaseOrder.POStatus.FULLY_RECEIVED).order_by('-order_date')[:50]),
+        ('purchase_orders_open', 'po_open_expected_idx',
+         PurchaseOrder.objects.filter(status__in=[PurchaseOrder.POStatus.SENT, PurchaseOrder.POStatus.PARTIALLY_RECEIVED])
+         .order_by('expected_delivery_date')[:50]),
+        ('delivery_notes_pending', 'deliverynote_status_date_idx',
+         DeliveryNote.objects.filter(status=DeliveryNote.DeliveryStatus.PENDING).order_by('delivery_date')[:50]),
+    ]
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN (ANALYZE en PostgreSQL) y tiempos de las consultas cubiertas por el paquete de "
+        "índices. Con --compare mide además sin esos índices (DROP INDEX dentro de una transacción "
+        "que se revierte: bloquea las tablas mientras dura, usar sobre una copia sembrada con "
+        "generate_synthetic_data, nunca en producción)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--compare', action='store_true', help="Mide antes (sin el paquete) y después.")
+        parser.add_argument('--repeat', type=int, default=20, help="Ejecuciones por consulta (se reporta la mediana).")
+        parser.add_argument('--only', default=None, help="Consultas a medir, separadas por coma.")
+        parser.add_argument('--plans', action='store_true', help="Imprime los planes completos.")
+        parser.add_argument('--json', action='store_true', help="Imprime el resultado completo en JSON.")
+
+    def handle(self, *args, **options):
+        variation = (ProductVariation.objects.filter(arrivals__isnull=False, dispatches__isnull=False)
+                     .order_by('pk').values('pk', 'product_id').first())
+        end = Dispatch.objects.order_by('-dispatched_at').values_list('dispatched_at', flat=True).first()
+        if variation is None or end is None:
+            raise CommandError("No hay movimientos en la base de datos. Cargue datos con generate_synthetic_data.")
+        sample = {'variation': variation['pk'], 'product': variation['product_id'], 'end': end}
+
+        queries = _queries(sample)
+        if options['only']:
+            wanted = set(options['only'].split(','))
+            unknown = wanted - {name for name, _, _ in queries}
+            if unknown:
+                raise CommandError(f"Consultas desconocidas: {', '.join(sorted(unknown))}")
+            queries = [q for q in queries if q[0] in wanted]
+
+        missing = self._missing_indexes()
+        if missing:
+            raise CommandError(f"Faltan índices del paquete (¿migraciones pendientes?): {', '.join(missing)}")
+
+        if connection.vendor == 'postgresql':
+            # Estadísticas frescas tras sembrar: si no, el planificador ignora los índices
+            with connection.cursor() as cursor:
+                for model in {apps.get_model(label) for label, _ in INDEX_PACK}:
+                    cursor.execute(f'ANALYZE {connection.ops.quote_name(model._meta.db_table)}')
+
+        results = {'vendor': connection.vendor, 'after': self._run(queries, options['repeat'])}
+        if options['compare']:
+            results['before'] = self._run_without_pack(queries, options['repeat'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2, default=str))
+            return
+        self._report(results, options['plans'])
+
+    # --- Medición ---
+
+    def _missing_indexes(self):
+        missing = []
+        constraints = {}
+        with connection.cursor() as cursor:
+            for label, name in INDEX_PACK:
+                table = apps.get_model(label)._meta.db_table
+                if table not in constraints:
+                    constraints[table] = connection.introspection.get_constraints(cursor, table)
+                if name not in constraints[table]:
+                    missing.append(f'{label}.{name}')
+        return missing
+
+    def _run(self, queries, repeat):
+        explain_options = {'analyze': True, 'buffers': True} if connection.vendor == 'postgresql' else {}
+        rows = []
+        for name, index, queryset in queries:
+            plan = queryset.explain(**explain_options)
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - start) * 1000)
+            rows.append({
+                'query': name,
+                'index': index,
+                'uses_index': index in plan,
+                'median_ms': round(statistics.median(timings), 3),
+                'plan': plan,
+            })
+        return rows
+
+    def _run_without_pack(self, queries, repeat):
+        rows = None
+        try:
+            # DROP INDEX es transaccional en PostgreSQL y SQLite: al revertir vuelven los índices
+            with transaction.atomic(), connection.cursor() as cursor:
+                for _, name in INDEX_PACK:
+                    cursor.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
+                rows = self._run(queries, repeat)
+                raise _Rollback
+        except _Rollback:
+            pass
+        return rows
+
+    # --- Reporte ---
+
+    def _report(self, results, plans):
+        before = {r['query']: r for r in results.get('before') or []}
+        self.stdout.write(f"Motor: {results['vendor']}")
+        header = f"{'Consulta':<30} {'Índice esperado':<30} {'Usa':<4} {'Después ms':>11}"
+        if before:
+            header += f" {'Antes ms':>11} {'Mejora':>8}"
+        self.stdout.write(header)
+        for row in results['after']:
+            line = (f"{row['query']:<30} {row['index']:<30} {'sí' if row['uses_index'] else 'NO':<4} "
+                    f"{row['median_ms']:>11.3f}")
+            if row['query'] in before:
+                old = before[row['query']]['median_ms']
+                line += f" {old:>11.3f} {old / row['median_ms'] if row['median_ms'] else 0:>7.1f}x"
+            self.stdout.write(line)
+            if plans:
+                if row['query'] in before:
+                    self.stdout.write(f"  -- Antes:\n{before[row['query']]['plan']}")
+                self.stdout.write(f"  -- Después:\n{row['plan']}\n")
@@ -0,0 +1,73 @@
+# inventory_app/management/commands/bench_scan.py
+
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, RequestFactory
+from django.urls import reverse
+
+from inventory_app import loadtest, scan
+from inventory_app.models import Product, ProductVariation
+from inventory_app.views import scan_lookup
+
+
+class Command(BaseCommand):
+    help = "Mide el throughput (req/s por worker) del endpoint de escaneo exacto."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5000, help="Escaneos por escenario.")
+        parser.add_argument('--codes', type=int, default=500, help="Códigos distintos a muestrear.")
+        parser.add_argument('--user', default=None, help="Usuario para las peticiones (por defecto el primer superusuario).")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        codes = list(ProductVariation.objects.values_list('sku_variant', flat=True)[:options['codes']])
+        codes += list(Product.objects.exclude(barcode=None).values_list('barcode', flat=True)[:options['codes'] // 4])
+        if not codes:
+            raise CommandError("No hay variaciones en la base de datos. Cargue datos primero.")
+
+        User = get_user_model()
+        user = (User.objects.filter(username=options['user']).first() if options['user']
+                else User.objects.filter(is_superuser=True).first())
+        if user is None:
+            raise CommandError("No se encontró un usuario para autenticar las peticiones.")
+
+        n = options['requests']
+        sample = [rng.choice(codes) for _ in range(n)]
+
+        start = time.perf_counter()
+        count = scan.table.warm()
+        warm_ms = (time.perf_counter() - start) * 1000
+        self.stdout.write(f"Tabla precargada: {count} códigos en {warm_ms:.1f} ms")
+
+        # 1. Búsqueda directa en la tabla (sin HTTP)
+        self._report("Tabla en memoria", n, lambda: [scan.lookup(c) for c in sample])
+
+        # 2. Vista sin middleware (RequestFactory)
+        factory = RequestFactory()
+
+        def call_view():
+            for c in sample:
+                request = factory.get(f'/scan/{c}/')
+                request.user = user
+                scan_lookup(request, c)
+        self._report("Vista (sin middleware)", n, call_view)
+
+        # 3. Pila completa de Django (sesión + autenticación + middleware)
+        client = Client(HTTP_HOST=loadtest.client_host())
+        client.force_login(user)
+        urls = [reverse('scan_lookup', args=[c]) for c in sample]
+        self._report("Pila completa (Client)", n, lambda: [client.get(u) for u in urls])
+
+        self.stdout.write(f"Estadísticas de la tabla: {scan.table.stats}")
+
+    def _report(self, label, n, fn):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"{label:<26} {n / elapsed:>12,.0f} req/s   {elapsed / n * 1e6:>9.1f} µs/req"
+        )
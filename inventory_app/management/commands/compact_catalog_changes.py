@@ -0,0 +1,21 @@
+# inventory_app/management/commands/compact_catalog_changes.py
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from inventory_app import changes
+
+
+class Command(BaseCommand):
+    help = "Elimina entradas reemplazadas de la bitácora de sincronización (conserva la última por objeto)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-days', type=int, default=30,
+                            help="No tocar entradas más recientes que estos días.")
+
+    def handle(self, *args, **options):
+        older_than = timezone.now() - timedelta(days=options['keep_days'])
+        deleted = changes.compact(older_than)
+        self.stdout.write(self.style.SUCCESS(f"Entradas compactadas: {deleted}"))
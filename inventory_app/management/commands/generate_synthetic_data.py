@@ -0,0 +1,562 @@
+# inventory_app/management/commands/generate_synthetic_data.py
+
+import contextlib
+import csv
+import io
+import random
+import time
+import zlib
+from datetime import date, datetime, time as dt_time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from billing_app.models import Client, Invoice, InvoiceItem
+from delivery_app.models import DeliveryNote, DeliveryNoteItem
+from inventory_app import cache as catalog_cache
+from inventory_app import costing
+from inventory_app import scan
+from inventory_app.models import (
+    Category, Warehouse, Product, ProductVariation, ProductLot, SerialNumber, Dispatch, StockArrival,
+)
+from purchasing_app.models import Supplier, PurchaseOrder, PurchaseOrderItem
+
+# ==========================================
+# VOCABULARIO
+# ==========================================
+FAMILIES = [
+    # (familia, artículos, medidas, variantes, unidad)
+    ('Reactivos', ['Cianuro de Sodio', 'Cal Viva', 'Carbón Activado', 'Soda Cáustica', 'Floculante',
+                   'Ácido Clorhídrico', 'Peróxido de Hidrógeno', 'Bórax'],
+     ['25 Kg', '50 Kg', '1 Ton', '200 L'], ['Industrial', 'Grado Técnico', 'Alta Pureza'], 'kg'),
+    ('Molienda', ['Bola de Molienda', 'Liner de Molino', 'Barra de Molienda', 'Placa de Desgaste'],
+     ['2"', '3"', '4"', '5"'], ['Acero Forjado', 'Acero Fundido', 'Alto Cromo'], 'unidad'),
+    ('Seguridad', ['Casco', 'Botas de Seguridad', 'Guantes', 'Lentes', 'Respirador', 'Arnés', 'Chaleco Reflectivo'],
+     ['S', 'M', 'L', 'XL'], ['Amarillo', 'Blanco', 'Naranja', 'Negro'], 'unidad'),
+    ('Repuestos', ['Rodamiento', 'Correa', 'Válvula', 'Filtro', 'Manguera', 'Sello Mecánico', 'Bomba'],
+     ['10mm', '25mm', '50mm', '100mm'], ['Estándar', 'Reforzado', 'Alta Presión'], 'unidad'),
+    ('Perforación', ['Broca', 'Barreno', 'Martillo de Fondo', 'Acople'],
+     ['38mm', '45mm', '64mm', '89mm'], ['Botones', 'Cruz', 'Retráctil'], 'unidad'),
+    ('Combustibles', ['Gasoil', 'Aceite Hidráulico', 'Grasa', 'Aceite de Motor'],
+     ['20 L', '208 L', '1000 L'], ['Mineral', 'Sintético'], 'litro'),
+]
+QUALIFIERS = ['', 'Premium', 'Económico', 'Importado', 'Nacional', 'Serie A', 'Serie B', 'Modelo 2']
+DESTINATIONS = ['Planta de Beneficio', 'Mina Norte', 'Mina Sur', 'Laboratorio', 'Taller Mecánico',
+                'Almacén Central', 'Campamento', 'Voladura']
+FIRST_NAMES = ['José', 'María', 'Luis', 'Carmen', 'Carlos', 'Ana', 'Jorge', 'Rosa', 'Pedro', 'Luisa']
+LAST_NAMES = ['González', 'Rodríguez', 'Pérez', 'Hernández', 'García', 'Martínez', 'López', 'Díaz']
+COMPANY_WORDS = ['Minera', 'Suministros', 'Inversiones', 'Servicios', 'Comercial', 'Industrias', 'Transporte']
+PLACES = ['Guayana', 'Bolívar', 'El Callao', 'Tumeremo', 'Upata', 'Orinoco', 'Caroní', 'Andes']
+
+TAX_RATE = Decimal('0.16')
+UTC = dt_timezone.utc
+
+
+def _chunks(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _ean13(number12):
+    digits = f"{number12:012d}"
+    total = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(digits))
+    return digits + str((10 - total % 10) % 10)
+
+
+@contextlib.contextmanager
+def _historical_timestamps(*fields):
+    """
+    Desactiva auto_now_add/auto_now para poder insertar fechas históricas con
+    bulk_create (si no, pre_save las pisaría con la hora actual).
+    """
+    saved = [(f, f.auto_now, f.auto_now_add) for f in fields]
+    for f in fields:
+        f.auto_now = f.auto_now_add = False
+    try:
+        yield
+    finally:
+        for f, auto_now, auto_now_add in saved:
+            f.auto_now, f.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera datos sintéticos deterministas (misma semilla y --end-date => mismos datos): "
+        "catálogo, almacenes, lotes, series, clientes, documentos y años de historial de "
+        "despachos/ingresos. Inserta con bulk_create por bloques o, en PostgreSQL, con COPY."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--prefix', default='SYN', help="Prefijo de SKUs y números de documento (debe ser nuevo).")
+        parser.add_argument('--categories', type=int, default=12)
+        parser.add_argument('--products', type=int, default=5000)
+        parser.add_argument('--variations', type=int, default=4, help="Variaciones promedio por producto.")
+        parser.add_argument('--warehouses', type=int, default=5)
+        parser.add_argument('--users', type=int, default=10, help="Operadores sintéticos para firmar movimientos.")
+        parser.add_argument('--clients', type=int, default=1000)
+        parser.add_argument('--suppliers', type=int, default=100)
+        parser.add_argument('--invoices', type=int, default=10000)
+        parser.add_argument('--purchase-orders', type=int, default=3000)
+        parser.add_argument('--delivery-notes', type=int, default=5000)
+        parser.add_argument('--movements', type=int, default=200000, help="Despachos + ingresos en total.")
+        parser.add_argument('--years', type=float, default=3, help="Años de historial hacia atrás.")
+        parser.add_argument('--end-date', default=None, help="Fin del historial AAAA-MM-DD (por defecto hoy).")
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Filas por bulk_create.")
+        parser.add_argument('--copy', dest='use_copy', action='store_true', default=None,
+                            help="Forzar COPY para movimientos (sólo PostgreSQL; por defecto si la BD es PostgreSQL).")
+        parser.add_argument('--no-copy', dest='use_copy', action='store_false', help="Usar siempre bulk_create.")
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.rng = random.Random(options['seed'])
+        self.prefix = options['prefix'].strip().upper()
+        self.chunk = max(options['chunk_size'], 100)
+        if not self.prefix or len(self.prefix) > 10:
+            raise CommandError("--prefix debe tener entre 1 y 10 caracteres.")
+        if Product.objects.filter(sku__startswith=f"{self.prefix}-").exists():
+            raise CommandError(f"Ya existen productos con el prefijo '{self.prefix}'. Use otro --prefix.")
+
+        try:
+            end = date.fromisoformat(options['end_date']) if options['end_date'] else date.today()
+        except ValueError:
+            raise CommandError("--end-date debe tener el formato AAAA-MM-DD.")
+        self.end = datetime.combine(end, dt_time(23, 59, 59), tzinfo=UTC)
+        self.start = self.end - timedelta(days=options['years'] * 365)
+
+        use_copy = options['use_copy']
+        if use_copy is None:
+            use_copy = connection.vendor == 'postgresql'
+        elif use_copy and connection.vendor != 'postgresql':
+            raise CommandError("COPY sólo está disponible en PostgreSQL.")
+
+        started = time.perf_counter()
+        self._step("Usuarios", self._create_users)
+        self._step("Categorías", self._create_categories)
+        self._step("Almacenes", self._create_warehouses)
+        self._step("Productos", self._create_products)
+        self._step("Variaciones", self._create_variations)
+        self._step("Lotes y series", self._create_lots_and_serials)
+        self._step("Clientes y proveedores", self._create_parties)
+        self._step("Facturas", self._create_invoices)
+        self._step("Órdenes de compra", self._create_purchase_orders)
+        self._step("Notas de entrega", self._create_delivery_notes)
+        self._step("Movimientos" + (" (COPY)" if use_copy else ""),
+                   self._copy_movements if use_copy else self._bulk_movements)
+        self._step("Stock (neto de movimientos)", self._update_stock)
+        self._step("Capas de costo", self._rebuild_cost_layers)
+
+        # bulk_create no dispara señales: invalidamos cachés a mano
+        catalog_cache.invalidate_catalog()
+        scan.invalidate_products([])
+        self.stdout.write(self.style.SUCCESS(f"Listo en {time.perf_counter() - started:.1f} s."))
+
+    def _step(self, label, fn):
+        start = time.perf_counter()
+        rows = fn()
+        elapsed = time.perf_counter() - start
+        rate = f" ({rows / elapsed:,.0f} filas/s)" if rows and elapsed else ""
+        self.stdout.write(f"{label:<32} {rows or 0:>12,} filas  {elapsed:>8.1f} s{rate}")
+
+    def _bulk(self, model, objects):
+        total = 0
+        for batch in _chunks(objects, self.chunk):
+            model.objects.bulk_create(batch, batch_size=self.chunk)
+            total += len(batch)
+        return total
+
+    def _random_datetime(self):
+        span = (self.end - self.start).total_seconds()
+        return self.start + timedelta(seconds=self.rng.random() * span)
+
+    # ==========================================
+    # 1. CATÁLOGO
+    # ==========================================
+    def _create_users(self):
+        User = get_user_model()
+        password = make_password(None)
+        users = [User(username=f"{self.prefix.lower()}_op{n:03d}", password=password)
+                 for n in range(1, self.options['users'] + 1)]
+        User.objects.bulk_create(users, ignore_conflicts=True)
+        self.user_ids = list(User.objects.filter(username__startswith=f"{self.prefix.lower()}_op")
+                             .order_by('pk').values_list('pk', flat=True)) or [None]
+        return len(users)
+
+    def _create_categories(self):
+        categories = []
+        for n in range(self.options['categories']):
+            family = FAMILIES[n % len(FAMILIES)]
+            categories.append(Category(
+                name=f"{family[0]} {self.prefix}-{n + 1:03d}",
+                description=f"Familia sintética de {family[0].lower()}",
+            ))
+        Category.objects.bulk_create(categories)
+        self.categories = [
+            (c.pk, FAMILIES[n % len(FAMILIES)]) for n, c in enumerate(
+                Category.objects.filter(name__in=[c.name for c in categories]).order_by('pk')
+            )
+        ]
+        return len(categories)
+
+    def _create_warehouses(self):
+        warehouses = [Warehouse(name=f"Almacén {PLACES[n % len(PLACES)]} {self.prefix}-{n + 1:02d}",
+                                address=f"Sector {PLACES[n % len(PLACES)]}")
+                      for n in range(self.options['warehouses'])]
+        Warehouse.objects.bulk_create(warehouses)
+        self.warehouse_ids = list(Warehouse.objects.filter(name__in=[w.name for w in warehouses])
+                                  .order_by('pk').values_list('pk', flat=True))
+        return len(warehouses)
+
+    def _create_products(self):
+        rng = self.rng
+        # EAN-13 de uso interno (prefijo 2), con un tramo por --prefix
+        barcode_base = 200_000_000_000 + (zlib.crc32(self.prefix.encode()) % 1000) * 100_000_000
+        created_at = Product._meta.get_field('created_at')
+
+        def products():
+            for n in range(self.options['products']):
+                category_id, family = rng.choice(self.categories)
+                _, articles, _, _, unit = family
+                cost = Decimal(str(round(rng.lognormvariate(3, 1.1), 2))) + Decimal('0.50')
+                critical = rng.random() < 0.05
+                tracking = rng.choices(list(Product.TrackingType), weights=[80, 15, 5])[0]
+                yield Product(
+                    sku=f"{self.prefix}-{n + 1:07d}",
+                    name=f"{rng.choice(articles)} {rng.choice(QUALIFIERS)}".strip() + f" #{n + 1}",
+                    barcode=_ean13(barcode_base + n) if rng.random() < 0.7 else None,
+                    category_id=category_id,
+                    unit_of_measure=unit,
+                    cost_price=cost,
+                    sale_price=(cost * Decimal(str(round(rng.uniform(1.3, 2.5), 2)))).quantize(Decimal('0.01')),
+                    min_stock_level=rng.choice([5, 10, 20, 50, 100]),
+                    tracking_type=tracking,
+                    is_critical=critical,
+                    daily_usage_rate=Decimal(str(round(rng.uniform(1, 30), 2))) if critical else 0,
+                    is_active=rng.random() < 0.97,
+                    created_at=self._random_datetime(),
+                )
+
+        with _historical_timestamps(created_at):
+            total = self._bulk(Product, products())
+        rows = (Product.objects.filter(sku__startswith=f"{self.prefix}-").order_by('pk')
+                .values_list('pk', 'category_id', 'cost_price', 'sale_price', 'tracking_type', 'name', 'sku'))
+        family_by_category = dict(self.categories)
+        # (pk, familia, costo, precio, seguimiento, nombre, sku), en orden de creación
+        self.products = [(pk, family_by_category[cat], cost, sale, tracking, name, sku)
+                         for pk, cat, cost, sale, tracking, name, sku in rows]
+        return total
+
+    def _create_variations(self):
+        rng = self.rng
+        mean = max(self.options['variations'], 1)
+
+        def variations():
+            for index, (pk, family, *_rest) in enumerate(self.products):
+                _, _, sizes, kinds, _ = family
+                combos = [(s, k) for s in sizes for k in kinds]
+                count = min(max(1, round(rng.gauss(mean, mean / 3))), len(combos))
+                for j, (size, kind) in enumerate(rng.sample(combos, count)):
+                    yield ProductVariation(product_id=pk, size=size, color=kind,
+                                           sku_variant=f"{self.prefix}-{index + 1:07d}-{j + 1:02d}", stock=0)
+
+        total = self._bulk(ProductVariation, variations())
+        cost_by_product = {p[0]: p[2] for p in self.products}
+        # (pk, costo del producto) en orden de pk: índice estable para el historial
+        self.variations = [
+            (pk, cost_by_product[product_id]) for pk, product_id in
+            ProductVariation.objects.filter(sku_variant__startswith=f"{self.prefix}-")
+            .order_by('pk').values_list('pk', 'product_id')
+        ]
+        return total
+
+    def _create_lots_and_serials(self):
+        rng = self.rng
+        if not self.warehouse_ids:
+            return 0
+
+        def lots():
+            for pk, *_rest, tracking, _name, sku in self.products:
+                if tracking != Product.TrackingType.LOT:
+                    continue
+                for n in range(rng.randint(1, 4)):
+                    yield ProductLot(
+                        product_id=pk,
+                        warehouse_id=rng.choice(self.warehouse_ids),
+                        lot_number=f"L{n + 1:03d}-{sku}",
+                        expiration_date=(self.end + timedelta(days=rng.randint(-60, 720))).date(),
+                        quantity=rng.randint(0, 500),
+                    )
+
+        def serials():
+            for pk, *_rest, tracking, _name, sku in self.products:
+                if tracking != Product.TrackingType.SERIAL:
+                    continue
+                for n in range(rng.randint(1, 6)):
+                    yield SerialNumber(
+                        product_id=pk,
+                        warehouse_id=rng.choice(self.warehouse_ids),
+                        serial_number=f"SN-{sku}-{n + 1:03d}",
+                        status=rng.choices(['IN_STOCK', 'ASSIGNED', 'IN_REPAIR'], weights=[80, 15, 5])[0],
+                    )
+
+        return self._bulk(ProductLot, lots()) + self._bulk(SerialNumber, serials())
+
+    # ==========================================
+    # 2. TERCEROS Y DOCUMENTOS
+    # ==========================================
+    def _create_parties(self):
+        rng = self.rng
+
+        def clients():
+            for n in range(self.options['clients']):
+                juridical = rng.random() < 0.4
+                name = (f"{rng.choice(COMPANY_WORDS)} {rng.choice(PLACES)} C.A." if juridical
+                        else f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}")
+                yield Client(
+                    client_type=Client.ClientType.JURIDICAL if juridical else Client.ClientType.NATURAL,
+                    full_name=f"{name} ({self.prefix}-{n + 1})",
+                    identification_number=f"{'J' if juridical else 'V'}-{self.prefix}-{n + 1:08d}",
+                    address=f"Calle {rng.randint(1, 99)}, {rng.choice(PLACES)}",
+                    phone=f"0414-{rng.randint(1000000, 9999999)}",
+                )
+
+        def suppliers():
+            for n in range(self.options['suppliers']):
+                yield Supplier(
+                    name=f"{rng.choice(COMPANY_WORDS)} {rng.choice(PLACES)} {self.prefix}-{n + 1:04d}",
+                    contact_person=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                    phone=f"0286-{rng.randint(1000000, 9999999)}",
+                )
+
+        total = self._bulk(Client, clients()) + self._bulk(Supplier, suppliers())
+        self.clients = list(Client.objects.filter(identification_number__contains=f"-{self.prefix}-")
+                            .order_by('pk').values_list('pk', 'address'))
+        self.suppliers = list(Supplier.objects.filter(name__contains=f" {self.prefix}-")
+                              .order_by('pk').values_list('pk', 'name'))
+        return total
+
+    def _document_lines(self, low=1, high=5):
+        return [self.rng.choice(self.products) for _ in range(self.rng.randint(low, high))]
+
+    def _create_invoices(self):
+        rng = self.rng
+        if not self.clients or not self.products:
+            return 0
+        stamps = (Invoice._meta.get_field('created_at'), Invoice._meta.get_field('updated_at'))
+        total = 0
+        self.invoices = []
+        with _historical_timestamps(*stamps):
+            for batch in _chunks(range(self.options['invoices']), self.chunk // 4 or 1):
+                invoices, lines = [], []
+                for n in batch:
+                    when = self._random_datetime()
+                    items = []
+                    for pk, _family, _cost, sale, _t, name, sku in self._document_lines():
+                        qty = Decimal(rng.randint(1, 20))
+                        items.append(InvoiceItem(product_id=pk, product_name=name, sku=sku,
+                                                 quantity=qty, unit_price=sale, line_total=qty * sale))
+                    subtotal = sum(i.line_total for i in items)
+                    tax = (subtotal * TAX_RATE).quantize(Decimal('0.0001'))
+                    invoices.append(Invoice(
+                        invoice_number=f"{self.prefix}-F{n + 1:08d}",
+                        client_id=rng.choice(self.clients)[0],
+                        invoice_date=when.date(),
+                        due_date=when.date() + timedelta(days=30),
+                        subtotal=subtotal, tax_amount=tax, total_amount=subtotal + tax,
+                        status=rng.choices(list(Invoice.InvoiceStatus), weights=[5, 25, 65, 5])[0],
+                        payment_method=rng.choice(['Transferencia', 'Efectivo', 'Punto de Venta', None]),
+                        created_by_id=rng.choice(self.user_ids),
+                        created_at=when, updated_at=when,
+                    ))
+                    lines.append(items)
+                Invoice.objects.bulk_create(invoices)
+                for invoice, items in zip(invoices, lines):
+                    for item in items:
+                        item.invoice_id = invoice.pk
+                    self.invoices.append((invoice.pk, invoice.client_id, invoice.invoice_date))
+                InvoiceItem.objects.bulk_create([i for items in lines for i in items], batch_size=self.chunk)
+                total += len(invoices) + sum(len(items) for items in lines)
+        return total
+
+    def _create_purchase_orders(self):
+        rng = self.rng
+        if not self.suppliers or not self.products:
+            return 0
+        stamps = (PurchaseOrder._meta.get_field('created_at'), PurchaseOrder._meta.get_field('updated_at'))
+        total = 0
+        with _historical_timestamps(*stamps):
+            for batch in _chunks(range(self.options['purchase_orders']), self.chunk // 4 or 1):
+                orders, lines = [], []
+                for n in batch:
+                    when = self._random_datetime()
+                    orders.append(PurchaseOrder(
+                        po_number=f"{self.prefix}-OC{n + 1:08d}",
+                        supplier_id=rng.choice(self.suppliers)[0],
+                        order_date=when.date(),
+                        expected_delivery_date=when.date() + timedelta(days=rng.randint(7, 45)),
+                        status=rng.choices(list(PurchaseOrder.POStatus), weights=[5, 15, 10, 65, 5])[0],
+                        created_by_id=rng.choice(self.user_ids),
+                        created_at=when, updated_at=when,
+                    ))
+                    lines.append([
+                        PurchaseOrderItem(product_id=pk, quantity=Decimal(rng.randint(10, 500)),
+                                          cost_price=(cost * Decimal(str(round(rng.uniform(0.9, 1.1), 2)))))
+                        for pk, _family, cost, *_rest in self._document_lines(1, 8)
+                    ])
+                PurchaseOrder.objects.bulk_create(orders)
+                for order, items in zip(orders, lines):
+                    for item in items:
+                        item.purchase_order_id = order.pk
+                PurchaseOrderItem.objects.bulk_create([i for items in lines for i in items], batch_size=self.chunk)
+                total += len(orders) + sum(len(items) for items in lines)
+        return total
+
+    def _create_delivery_notes(self):
+        rng = self.rng
+        if not self.clients or not self.products:
+            return 0
+        addresses = dict(self.clients)
+        stamps = (DeliveryNote._meta.get_field('created_at'), DeliveryNote._meta.get_field('updated_at'))
+        total = 0
+        with _historical_timestamps(*stamps):
+            for batch in _chunks(range(self.options['delivery_notes']), self.chunk // 4 or 1):
+                notes, lines = [], []
+                for n in batch:
+                    # La mitad de las notas nace de una factura (mismo cliente, fecha posterior)
+                    if self.invoices and rng.random() < 0.5:
+                        invoice_id, client_id, invoice_date = rng.choice(self.invoices)
+                        when = datetime.combine(invoice_date + timedelta(days=rng.randint(0, 5)), dt_time(12), tzinfo=UTC)
+                    else:
+                        invoice_id, client_id = None, rng.choice(self.clients)[0]
+                        when = self._random_datetime()
+                    notes.append(DeliveryNote(
+                        delivery_note_number=f"{self.prefix}-NE{n + 1:08d}",
+                        client_id=client_id, invoice_id=invoice_id,
+                        delivery_date=when.date(),
+                        delivery_address=addresses.get(client_id) or 'Retiro en almacén',
+                        status=rng.choices(list(DeliveryNote.DeliveryStatus), weights=[5, 5, 10, 75, 5])[0],
+                        created_by_id=rng.choice(self.user_ids),
+                        created_at=when, updated_at=when,
+                    ))
+                    lines.append([
+                        DeliveryNoteItem(product_id=pk, product_name=name, sku=sku, quantity=Decimal(rng.randint(1, 20)))
+                        for pk, _family, _cost, _sale, _t, name, sku in self._document_lines()
+                    ])
+                DeliveryNote.objects.bulk_create(notes)
+                for note, items in zip(notes, lines):
+                    for item in items:
+                        item.delivery_note_id = note.pk
+                DeliveryNoteItem.objects.bulk_create([i for items in lines for i in items], batch_size=self.chunk)
+                total += len(notes) + sum(len(items) for items in lines)
+        return total
+
+    # ==========================================
+    # 3. HISTORIAL DE MOVIMIENTOS
+    # ==========================================
+    def _movements(self):
+        """
+        Genera (tipo, variación, cantidad, costo, lugar, usuario, fecha) en orden
+        cronológico, llevando el stock de cada variación en memoria: nunca se
+        despacha más de lo disponible. Pocos artículos concentran la rotación.
+        """
+        rng = self.rng
+        n = self.options['movements']
+        if not n or not self.variations:
+            return
+        stock = [0] * len(self.variations)
+        span = (self.end - self.start).total_seconds()
+        step = span / n
+        supplier_names = [name for _, name in self.suppliers] or ['General']
+        count = len(self.variations)
+        for i in range(n):
+            index = int(count * rng.random() ** 2)
+            pk, cost = self.variations[index]
+            when = self.start + timedelta(seconds=(i + rng.random()) * step)
+            user_id = rng.choice(self.user_ids)
+            qty = rng.randint(1, 10)
+            if stock[index] >= qty and rng.random() < 0.65:
+                stock[index] -= qty
+                yield 'D', pk, qty, None, rng.choice(DESTINATIONS), user_id, when
+            else:
+                qty = rng.randint(5, 60)
+                stock[index] += qty
+                unit_cost = (cost * Decimal(str(round(rng.uniform(0.9, 1.1), 3)))).quantize(Decimal('0.0001'))
+                yield 'A', pk, qty, unit_cost, rng.choice(supplier_names), user_id, when
+
+    def _bulk_movements(self):
+        dispatched_at = Dispatch._meta.get_field('dispatched_at')
+        arrival_date = StockArrival._meta.get_field('arrival_date')
+        total = 0
+        with _historical_timestamps(dispatched_at, arrival_date):
+            for batch in _chunks(self._movements(), self.chunk):
+                dispatches, arrivals = [], []
+                for kind, pk, qty, cost, place, user_id, when in batch:
+                    if kind == 'D':
+                        dispatches.append(Dispatch(variation_id=pk, quantity=qty, destination=place,
+                                                   user_id=user_id, dispatched_at=when))
+                    else:
+                        arrivals.append(StockArrival(variation_id=pk, quantity=qty, unit_cost=cost, supplier=place,
+                                                     user_id=user_id, arrival_date=when))
+                Dispatch.objects.bulk_create(dispatches)
+                StockArrival.objects.bulk_create(arrivals)
+                total += len(batch)
+        return total
+
+    def _copy_movements(self):
+        """COPY ... FROM STDIN en CSV: un viaje por bloque grande, sin ORM por fila"""
+        def columns(model, names):
+            return ', '.join(connection.ops.quote_name(model._meta.get_field(n).column) for n in names)
+
+        dispatch_sql = (f"COPY {connection.ops.quote_name(Dispatch._meta.db_table)} "
+                        f"({columns(Dispatch, ['variation', 'quantity', 'destination', 'user', 'dispatched_at'])}) "
+                        "FROM STDIN WITH (FORMAT csv)")
+        arrival_sql = (f"COPY {connection.ops.quote_name(StockArrival._meta.db_table)} "
+                       f"({columns(StockArrival, ['variation', 'quantity', 'unit_cost', 'supplier', 'user', 'arrival_date'])}) "
+                       "FROM STDIN WITH (FORMAT csv)")
+
+        total = 0
+        with connection.cursor() as cursor:
+            for batch in _chunks(self._movements(), self.chunk * 20):
+                dispatches, arrivals = io.StringIO(), io.StringIO()
+                d_writer, a_writer = csv.writer(dispatches), csv.writer(arrivals)
+                for kind, pk, qty, cost, place, user_id, when in batch:
+                    stamp = when.isoformat()
+                    user = '' if user_id is None else user_id
+                    if kind == 'D':
+                        d_writer.writerow((pk, qty, place, user, stamp))
+                    else:
+                        a_writer.writerow((pk, qty, cost, place, user, stamp))
+                for sql, buffer in ((dispatch_sql, dispatches), (arrival_sql, arrivals)):
+                    buffer.seek(0)
+                    cursor.copy_expert(sql, buffer)
+                total += len(batch)
+        return total
+
+    def _update_stock(self):
+        """Stock de cada variación = ingresos - despachos, en un solo UPDATE"""
+        def net(model):
+            return Coalesce(Subquery(
+                model.objects.filter(variation=OuterRef('pk')).order_by()
+                .values('variation').annotate(total=Sum('quantity')).values('total'),
+                output_field=IntegerField(),
+            ), Value(0))
+
+        return ProductVariation.objects.filter(sku_variant__startswith=f"{self.prefix}-").update(
+            stock=net(StockArrival) - net(Dispatch)
+        )
+
+    def _rebuild_cost_layers(self):
+        """Capas PEPS / promedio desde los movimientos recién cargados (bulk_create no pasa por save())"""
+        variations = ProductVariation.objects.filter(sku_variant__startswith=f"{self.prefix}-")
+        return costing.rebuild(chunk_size=self.chunk, variations=variations)['layers']
@@ -0,0 +1,325 @@
+# inventory_app/management/commands/loadtest.py
+
+import asyncio
+import json
+import random
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.urls import reverse
+from django.utils import timezone
+
+from inventory_app import loadtest
+from inventory_app.models import Product, ProductVariation
+
+# Mezclas de tráfico: {escenario: peso}
+MIXES = {
+    # Día normal: mucha consulta, algo de movimiento
+    'default': {'dashboard': 10, 'list': 20, 'detail': 15, 'search': 25, 'scan': 15, 'reports': 3,
+                'dispatch': 8, 'arrival': 4},
+    # Temporada alta: formularios de salida y escáneres a pleno
+    'peak': {'dashboard': 5, 'list': 10, 'detail': 5, 'search': 30, 'scan': 25, 'reports': 1,
+             'dispatch': 18, 'arrival': 6},
+    # Sólo lectura (seguro contra una BD con datos reales)
+    'read': {'dashboard': 15, 'list': 25, 'detail': 20, 'search': 25, 'scan': 15, 'reports': 5},
+    # Clientes de la API / BI
+    'api': {'api_products': 30, 'api_stock': 40, 'api_sync': 30},
+}
+WRITE_SCENARIOS = {'dispatch', 'arrival'}
+
+DESTINATIONS = ['Planta de Beneficio', 'Mina Norte', 'Laboratorio', 'Taller Mecánico', 'Almacén Central']
+SUPPLIERS = ['General', 'Proveedor Andino', 'Química del Sur', 'Suministros Orinoco']
+
+
+def _parse_weights(text):
+    weights = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        try:
+            weights[name.strip()] = float(weight)
+        except ValueError:
+            raise CommandError(f"Peso inválido: '{part}' (use escenario=peso).")
+    return weights
+
+
+class JobSource:
+    """
+    Secuencia reproducible de peticiones (misma semilla => mismas peticiones).
+    Con `total` se detiene tras N peticiones; con `deadline`, al vencer el plazo.
+    Compartida entre hilos o corrutinas.
+    """
+
+    def __init__(self, builder, names, weights, seed, total=None, deadline=None):
+        self.builder = builder
+        self.names = names
+        self.weights = weights
+        self.rng = random.Random(seed)
+        self.total = total
+        self.deadline = deadline
+        self.issued = 0
+        self._lock = threading.Lock()
+
+    def next(self):
+        with self._lock:
+            if self.total is not None and self.issued >= self.total:
+                return None
+            if self.deadline is not None and time.monotonic() >= self.deadline:
+                return None
+            self.issued += 1
+            name = self.rng.choices(self.names, self.weights)[0]
+            return self.builder(name, self.rng)
+
+    def __iter__(self):
+        while (job := self.next()) is not None:
+            yield job
+
+
+class Command(BaseCommand):
+    help = (
+        "Generador de carga reproducible: reproduce una mezcla de flujos (dashboard, listados, "
+        "búsquedas, escaneos, despachos, ingresos) contra el Client de Django o un servidor en "
+        "vivo y reporta throughput y p50/p95/p99 por endpoint en JSON. Las mezclas con "
+        "despachos e ingresos ESCRIBEN en la base de datos configurada."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mix', default='default', choices=sorted(MIXES), help="Mezcla de tráfico predefinida.")
+        parser.add_argument('--weights', default=None,
+                            help="Pesos propios, p. ej. 'search=50,scan=30,dispatch=20' (reemplaza --mix).")
+        parser.add_argument('--target', default='client', choices=['client', 'live'],
+                            help="'client': Client de Django en proceso; 'live': servidor HTTP en --url.")
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument('--serve', action='store_true', help="Con --target live: levanta daphne (core.asgi) en --port.")
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--pool', default='thread', choices=['thread', 'asyncio'])
+        parser.add_argument('--concurrency', type=int, default=10)
+        parser.add_argument('--requests', type=int, default=1000, help="Total de peticiones (ignorado con --duration).")
+        parser.add_argument('--duration', type=float, default=None, help="Segundos de carga en lugar de un total fijo.")
+        parser.add_argument('--warmup', type=int, default=20, help="Peticiones de calentamiento (no se miden).")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--user', default=None, help="Usuario para las peticiones (por defecto el primer superusuario).")
+        parser.add_argument('--output', default=None, help="Además de imprimirlo, guarda el JSON en este archivo.")
+
+    def handle(self, *args, **options):
+        weights = _parse_weights(options['weights']) if options['weights'] else MIXES[options['mix']]
+        self.data = self._load_data()
+        unknown = set(weights) - set(self._builders())
+        if unknown:
+            raise CommandError(f"Escenarios desconocidos: {', '.join(sorted(unknown))}. "
+                               f"Disponibles: {', '.join(sorted(self._builders()))}.")
+        if set(weights) & WRITE_SCENARIOS and not self.data['variations']:
+            raise CommandError("No hay variaciones para despachar/ingresar. Cargue datos primero.")
+        names = [n for n in weights if weights[n] > 0]
+
+        User = get_user_model()
+        self.user = (User.objects.filter(username=options['user']).first() if options['user']
+                     else User.objects.filter(is_superuser=True).first())
+        if self.user is None:
+            raise CommandError("No se encontró un usuario para autenticar las peticiones.")
+
+        server = None
+        self.base_url = options['url']
+        if options['target'] == 'live':
+            self.headers = loadtest.auth_headers(self.user)
+            if options['serve']:
+                self.base_url = f"http://127.0.0.1:{options['port']}"
+                try:
+                    server = loadtest.start_asgi_server(options['port'])
+                except RuntimeError as exc:
+                    raise CommandError(str(exc))
+
+        try:
+            if options['warmup']:
+                warm = JobSource(self._build, names, [weights[n] for n in names], options['seed'] + 1,
+                                 total=options['warmup'])
+                self._execute(warm, options, loadtest.Recorder())
+
+            deadline = time.monotonic() + options['duration'] if options['duration'] else None
+            source = JobSource(self._build, names, [weights[n] for n in names], options['seed'],
+                               total=None if deadline else options['requests'], deadline=deadline)
+            recorder = loadtest.Recorder()
+            self._execute(source, options, recorder)
+            recorder.stop()
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+        report = {
+            'meta': {
+                'commit': self._git_commit(),
+                'timestamp': timezone.now().isoformat(),
+                'mix': None if options['weights'] else options['mix'],
+                'weights': {n: weights[n] for n in names},
+                'target': options['target'],
+                'url': self.base_url if options['target'] == 'live' else None,
+                'pool': options['pool'],
+                'concurrency': options['concurrency'],
+                'seed': options['seed'],
+                'database': connection.vendor,
+                'debug': settings.DEBUG,
+            },
+            **recorder.summary(),
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fh:
+                fh.write(output + '\n')
+        self.stdout.write(output)
+
+    # ==========================================
+    # DATOS Y ESCENARIOS
+    # ==========================================
+    def _load_data(self):
+        products = list(Product.objects.filter(is_active=True).values_list('pk', 'name', 'sku')[:1000])
+        variations = list(ProductVariation.objects.filter(product__is_active=True)
+                          .values_list('pk', 'sku_variant', 'product__cost_price')[:2000])
+        terms = sorted({word[:5] for _, name, _ in products for word in name.split() if len(word) >= 3})
+        terms += [sku[:4] for _, _, sku in products[:100]]
+        return {'products': products, 'variations': variations, 'terms': terms or ['a']}
+
+    def _builders(self):
+        return {
+            'dashboard': self._get_dashboard,
+            'list': self._get_list,
+            'detail': self._get_detail,
+            'search': self._get_search,
+            'scan': self._get_scan,
+            'reports': self._get_reports,
+            'dispatch': self._post_dispatch,
+            'arrival': self._post_arrival,
+            'api_products': self._get_api_products,
+            'api_stock': self._get_api_stock,
+            'api_sync': self._get_api_sync,
+        }
+
+    def _build(self, name, rng):
+        """Devuelve (endpoint, método, ruta, datos de formulario)"""
+        return self._builders()[name](rng)
+
+    def _get_dashboard(self, rng):
+        return 'dashboard', 'GET', reverse('inventory_dashboard'), None
+
+    def _get_list(self, rng):
+        params = {'o': rng.choice(['name', '-name', 'stock', '-stock', 'price'])}
+        if rng.random() < 0.5:
+            params['q'] = rng.choice(self.data['terms'])
+        return 'list', 'GET', f"{reverse('inventory_list')}?{urlencode(params)}", None
+
+    def _get_detail(self, rng):
+        pk = rng.choice(self.data['products'])[0] if self.data['products'] else 0
+        return 'detail', 'GET', reverse('product_detail', args=[pk]), None
+
+    def _get_search(self, rng):
+        return 'search', 'GET', f"{reverse('product_search_ajax')}?{urlencode({'q': rng.choice(self.data['terms'])})}", None
+
+    def _get_scan(self, rng):
+        code = rng.choice(self.data['variations'])[1] if self.data['variations'] else 'NO-EXISTE'
+        return 'scan', 'GET', reverse('scan_lookup', args=[code]), None
+
+    def _get_reports(self, rng):
+        params = {'interval': rng.choice(['daily', 'weekly', 'monthly']), 'type': rng.choice(['dispatches', 'arrivals'])}
+        return 'reports', 'GET', f"{reverse('inventory_reports')}?{urlencode(params)}", None
+
+    def _pick_lines(self, rng):
+        return rng.sample(self.data['variations'], min(rng.randint(1, 5), len(self.data['variations'])))
+
+    def _post_dispatch(self, rng):
+        items = [{'id': pk, 'qty': 1} for pk, _, _ in self._pick_lines(rng)]
+        data = {'items_data': json.dumps(items), 'destination': rng.choice(DESTINATIONS)}
+        return 'dispatch', 'POST', reverse('create_dispatch'), data
+
+    def _post_arrival(self, rng):
+        # Reponemos algo más de lo que despacha una línea típica para no agotar stock
+        items = [{'id': pk, 'qty': rng.randint(1, 4), 'cost': str(cost)} for pk, _, cost in self._pick_lines(rng)]
+        data = {'items_data': json.dumps(items), 'supplier': rng.choice(SUPPLIERS)}
+        return 'arrival', 'POST', reverse('create_stock_arrival'), data
+
+    def _get_api_products(self, rng):
+        return 'api_products', 'GET', reverse('api-products-list'), None
+
+    def _get_api_stock(self, rng):
+        return 'api_stock', 'GET', f"{reverse('api-stock-list')}?fields=id,sku,total_stock,stock_status", None
+
+    def _get_api_sync(self, rng):
+        return 'api_sync', 'GET', f"{reverse('api-sync')}?cursor=0&limit=500", None
+
+    # ==========================================
+    # EJECUCIÓN
+    # ==========================================
+    def _execute(self, source, options, recorder):
+        concurrency = max(options['concurrency'], 1)
+        if options['pool'] == 'asyncio':
+            asyncio.run(self._run_async(source, concurrency, recorder, options['target']))
+        else:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                futures = [pool.submit(self._run_thread, source, recorder, options['target'])
+                           for _ in range(concurrency)]
+                for future in futures:
+                    future.result()
+
+    def _run_thread(self, source, recorder, target):
+        if target == 'client':
+            client = Client(raise_request_exception=False, HTTP_HOST=loadtest.client_host())
+            client.force_login(self.user)
+        try:
+            for endpoint, method, path, data in source:
+                start = time.perf_counter()
+                if target == 'client':
+                    response = client.post(path, data) if method == 'POST' else client.get(path)
+                    status = response.status_code
+                else:
+                    headers, body = self._live_request(data)
+                    status, _ = loadtest.http_request_sync(self.base_url, method, path, headers=headers, body=body)
+                recorder.add(endpoint, time.perf_counter() - start, status, self._ok(method, status))
+        finally:
+            # Cada hilo abre su propia conexión a la BD
+            connection.close()
+
+    async def _run_async(self, source, concurrency, recorder, target):
+        if target == 'client':
+            client = AsyncClient(raise_request_exception=False, HTTP_HOST=loadtest.client_host())
+            await sync_to_async(client.force_login)(self.user)
+
+        async def worker(job):
+            endpoint, method, path, data = job
+            start = time.perf_counter()
+            if target == 'client':
+                response = await (client.post(path, data) if method == 'POST' else client.get(path))
+                status = response.status_code
+            else:
+                headers, body = self._live_request(data)
+                status, _ = await loadtest.http_request(self.base_url, method, path, headers=headers, body=body)
+            recorder.add(endpoint, time.perf_counter() - start, status, self._ok(method, status))
+
+        await loadtest.run_pool(concurrency, source, worker)
+
+    @staticmethod
+    def _ok(method, status):
+        # Los formularios redirigen al contabilizar; un 200 es el formulario con error
+        if method == 'POST':
+            return status in (301, 302, 303)
+        return bool(status) and status < 500
+
+    def _live_request(self, data):
+        if data is None:
+            return self.headers, b''
+        headers = dict(self.headers, **{'Content-Type': 'application/x-www-form-urlencoded'})
+        return headers, urlencode(data).encode()
+
+    @staticmethod
+    def _git_commit():
+        try:
+            return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                  cwd=settings.BASE_DIR, timeout=5).stdout.strip() or None
+        except (OSError, subprocess.SubprocessError):
+            return None
@@ -0,0 +1,39 @@
+# inventory_app/management/commands/manage_movement_partitions.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory_app import partitioning
+
+
+class Command(BaseCommand):
+    help = (
+        "Mantenimiento de las particiones mensuales de despachos e ingresos (PostgreSQL): crea los "
+        "meses futuros y archiva a CSV comprimido los meses cerrados más viejos que la retención."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=None,
+                            help="Meses futuros a preparar (por defecto MOVEMENT_PARTITIONS_AHEAD).")
+        parser.add_argument('--retain-months', type=int, default=None,
+                            help="Meses en línea antes de archivar (por defecto MOVEMENT_RETAIN_MONTHS).")
+        parser.add_argument('--archive-dir', default=None, help="Destino de los CSV (por defecto MOVEMENT_ARCHIVE_DIR).")
+        parser.add_argument('--dry-run', action='store_true', help="Sólo lista las acciones.")
+
+    def handle(self, *args, **options):
+        if options['retain_months'] is not None and options['retain_months'] < 1:
+            raise CommandError("--retain-months debe ser al menos 1 (el mes en curso nunca se archiva).")
+        try:
+            actions = partitioning.maintain(
+                months_ahead=options['months_ahead'],
+                retain_months=options['retain_months'],
+                directory=options['archive_dir'],
+                dry_run=options['dry_run'],
+            )
+        except RuntimeError as exc:
+            raise CommandError(str(exc))
+
+        labels = {'create': "Partición creada", 'archive': "Mes archivado"}
+        prefix = "[simulación] " if options['dry_run'] else ""
+        for action, table, month in actions:
+            self.stdout.write(f"{prefix}{labels[action]}: {partitioning.partition_name(table, month)}")
+        self.stdout.write(self.style.SUCCESS(f"{prefix}Acciones: {len(actions)}"))
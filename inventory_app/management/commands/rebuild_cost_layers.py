@@ -0,0 +1,32 @@
+# inventory_app/management/commands/rebuild_cost_layers.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory_app.costing import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye las capas de costo (PEPS / promedio) y los consumos desde el historial de "
+        "ingresos y despachos, por lotes de variaciones. Correr tras migrar y tras cambiar el "
+        "método de costeo de productos con historial."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help="Variaciones por transacción.")
+        parser.add_argument('--chunk-size', type=int, default=2000, help="Movimientos leídos por viaje a la BD.")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['chunk_size'] < 1:
+            raise CommandError("--batch-size y --chunk-size deben ser positivos.")
+
+        def progress(done, totals):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"{done} variaciones, {totals['layers']} capas, {totals['consumptions']} consumos")
+
+        totals = rebuild(options['batch_size'], options['chunk_size'], progress)
+        self.stdout.write(self.style.SUCCESS(
+            f"Capas reconstruidas: {totals['variations']} variaciones, {totals['layers']} capas "
+            f"({totals['opening']} de apertura), {totals['consumptions']} consumos, "
+            f"{totals['repriced']} productos con nuevo costo promedio."
+        ))
@@ -0,0 +1,21 @@
+# inventory_app/management/commands/recompute_usage_rates.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory_app.usage import recompute_usage_rates
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula la tasa de consumo diario de los productos activos desde los despachos de los "
+        "últimos días (también corre como trabajo programado, ver jobs_app)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90, help="Días de despachos a promediar.")
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError("--days debe ser positivo.")
+        changed = recompute_usage_rates(options['days'])
+        self.stdout.write(self.style.SUCCESS(f"Tasas de consumo actualizadas: {changed} productos."))
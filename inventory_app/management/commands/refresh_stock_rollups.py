@@ -0,0 +1,16 @@
+# inventory_app/management/commands/refresh_stock_rollups.py
+
+from django.core.management.base import BaseCommand
+
+from inventory_app.metrics import refresh_stock_rollups
+
+
+class Command(BaseCommand):
+    help = "Recalcula los resúmenes de semáforo de stock que expone /metrics (programar cada minuto)."
+
+    def handle(self, *args, **options):
+        rows = refresh_stock_rollups()
+        for row in rows:
+            if row.product_count:
+                self.stdout.write(f"{row.status:<14}{'crítico' if row.is_critical else '':<9}{row.product_count:>8} productos{row.units:>12} u.")
+        self.stdout.write(self.style.SUCCESS("Resúmenes de stock actualizados."))
@@ -0,0 +1,30 @@
+# inventory_app/management/commands/snapshot_valuation.py
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory_app.valuation import take_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Guarda la valorización del inventario del día por categoría y por almacén "
+        "(programar cada noche). Repetirla el mismo día reemplaza la foto."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', default=None,
+                            help="Fecha de la foto (AAAA-MM-DD, por defecto hoy). Siempre valoriza el stock actual.")
+
+    def handle(self, *args, **options):
+        day = None
+        if options['date']:
+            try:
+                day = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError("--date debe tener el formato AAAA-MM-DD.")
+        rows = take_snapshot(day)
+        for row in rows:
+            self.stdout.write(f"{row.get_scope_display():<10}{row.name:<30}{row.units:>14,.2f} u.{row.cost_value:>18,.2f}")
+        self.stdout.write(self.style.SUCCESS(f"Valorización guardada: {len(rows)} filas."))
@@ -0,0 +1,21 @@
+# inventory_app/management/commands/sweep_reservations.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory_app.reservations import sweep_expired
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra en bloque las reservas de stock vencidas (programar cada hora). Las vencidas ya no "
+        "descuentan del disponible; el barrido sólo mantiene chica la tabla."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help="Reservas borradas por transacción.")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size debe ser positivo.")
+        deleted = sweep_expired(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Reservas vencidas borradas: {deleted}"))
@@ -0,0 +1,107 @@
+# inventory_app/metrics.py
+
+"""
+Métricas de inventario para /metrics (core/metrics.py).
+
+  - Contadores de movimientos confirmados (despachos / ingresos y unidades).
+  - Aciertos de la caché del catálogo (contadores propios de cache.py).
+  - Gauges de semáforo leídos de StockRollup, que recalcula el comando
+    refresh_stock_rollups: un scrape nunca recorre el catálogo.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from core import metrics
+
+from . import cache as catalog_cache
+from .models import Product, StockRollup
+
+
+# ==========================================
+# 1. MOVIMIENTOS
+# ==========================================
+def count_movements(dispatches=(), arrivals=()):
+    """Suma a los contadores al confirmar la transacción (nunca movimientos revertidos)"""
+    counts = [
+        ('dispatch', len(dispatches), sum(m.quantity for m in dispatches)),
+        ('arrival', len(arrivals), sum(m.quantity for m in arrivals)),
+    ]
+
+    def record():
+        for kind, count, units in counts:
+            if count:
+                metrics.inc('sig_stock_movements_total', {'type': kind}, count)
+                metrics.inc('sig_stock_movement_units_total', {'type': kind}, units)
+    transaction.on_commit(record)
+
+
+# ==========================================
+# 2. CACHÉ DEL CATÁLOGO
+# ==========================================
+def catalog_cache_counters():
+    stats = catalog_cache.stats()
+    return [
+        ('sig_catalog_cache_lookups_total', {'result': 'local_hit'}, stats['local_hits']),
+        ('sig_catalog_cache_lookups_total', {'result': 'shared_hit'}, stats['shared_hits']),
+        ('sig_catalog_cache_lookups_total', {'result': 'miss'}, stats['misses']),
+    ]
+
+
+# ==========================================
+# 3. SEMÁFORO DE STOCK (RESÚMENES)
+# ==========================================
+def refresh_stock_rollups():
+    """Recalcula StockRollup con una consulta agrupada; devuelve las filas escritas"""
+    now = timezone.now()
+    rows = {
+        (status, critical): StockRollup(status=status, is_critical=critical, refreshed_at=now)
+        for status in Product.STOCK_STATUSES for critical in (False, True)
+    }
+    for r in Product.objects.filter(is_active=True).stock_status_summary():
+        row = rows[(r['stock_state'], r['is_critical'])]
+        row.product_count = r['product_count']
+        row.units = r['units'] or 0
+
+    # Todas las combinaciones, también en cero: un gauge que desaparece no es un cero
+    with transaction.atomic():
+        StockRollup.objects.all().delete()
+        StockRollup.objects.bulk_create(rows.values())
+    return list(rows.values())
+
+
+def stock_gauges(snapshot):
+    gauges = []
+    rollups = list(StockRollup.objects.all())
+    if rollups:
+        gauges.append((
+            'sig_products', "Productos activos por semáforo de stock y marca de insumo crítico.",
+            [({'status': r.status, 'critical': str(r.is_critical).lower()}, r.product_count) for r in rollups],
+        ))
+        gauges.append((
+            'sig_stock_units', "Unidades en stock por semáforo y marca de insumo crítico.",
+            [({'status': r.status, 'critical': str(r.is_critical).lower()}, r.units) for r in rollups],
+        ))
+        refreshed_at = max(r.refreshed_at for r in rollups)
+        gauges.append((
+            'sig_stock_rollup_age_seconds', "Antigüedad de los resúmenes de stock (refresh_stock_rollups).",
+            [({}, round((timezone.now() - refreshed_at).total_seconds(), 1))],
+        ))
+
+    # Proporción acumulada de aciertos, sumando todos los procesos
+    lookups = {}
+    for name, labels, value in snapshot['counters']:
+        if name == 'sig_catalog_cache_lookups_total':
+            lookups[labels['result']] = lookups.get(labels['result'], 0) + value
+    total = sum(lookups.values())
+    if total:
+        hits = lookups.get('local_hit', 0) + lookups.get('shared_hit', 0)
+        gauges.append((
+            'sig_catalog_cache_hit_ratio', "Aciertos / búsquedas de la caché del catálogo desde el arranque.",
+            [({}, round(hits / total, 4))],
+        ))
+    return gauges
+
+
+def register():
+    metrics.registry.register_collector(catalog_cache_counters)
+    metrics.registry.register_gauges(stock_gauges)
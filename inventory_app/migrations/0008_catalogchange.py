@@ -0,0 +1,28 @@
+# Generated by Django 5.0.6 on 2026-10-18 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0007_alter_product_options_alter_productlot_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogChange',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False, verbose_name='Secuencia')),
+                ('entity', models.CharField(choices=[('product', 'Producto'), ('variation', 'Variación'), ('stock', 'Stock de Variación')], max_length=10, verbose_name='Entidad')),
+                ('object_id', models.BigIntegerField(verbose_name='ID del Objeto')),
+                ('operation', models.CharField(choices=[('U', 'Alta / Modificación'), ('D', 'Baja')], default='U', max_length=1, verbose_name='Operación')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha')),
+            ],
+            options={
+                'verbose_name': 'Cambio de Catálogo',
+                'verbose_name_plural': 'Cambios de Catálogo',
+                'indexes': [models.Index(fields=['entity', 'object_id', 'id'], name='catalogchange_obj_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.6 on 2026-10-19 00:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0008_catalogchange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(max_length=20, verbose_name='Semáforo')),
+                ('is_critical', models.BooleanField(default=False, verbose_name='Insumo Crítico')),
+                ('product_count', models.PositiveIntegerField(default=0, verbose_name='Productos')),
+                ('units', models.BigIntegerField(default=0, verbose_name='Unidades en Stock')),
+                ('refreshed_at', models.DateTimeField(verbose_name='Calculado el')),
+            ],
+            options={
+                'verbose_name': 'Resumen de Stock',
+                'verbose_name_plural': 'Resúmenes de Stock',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='stockrollup',
+            constraint=models.UniqueConstraint(fields=('status', 'is_critical'), name='stockrollup_status_critical_uniq'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.0.6 on 2026-10-19 00:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+from core.migration_operations import AddIndexConcurrentlyIfSupported
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY (PostgreSQL) no puede ir dentro de una transacción
+    atomic = False
+
+    dependencies = [
+        ('inventory_app', '0009_stockrollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyIfSupported(
+            model_name='dispatch',
+            index=models.Index(fields=['-dispatched_at'], name='dispatch_date_idx'),
+        ),
+        AddIndexConcurrentlyIfSupported(
+            model_name='dispatch',
+            index=models.Index(fields=['variation', 'dispatched_at'], name='dispatch_variation_date_idx'),
+        ),
+        AddIndexConcurrentlyIfSupported(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_active', True), ('is_critical', True)), fields=['name'], name='product_critical_idx'),
+        ),
+        AddIndexConcurrentlyIfSupported(
+            model_name='product',
+            index=models.Index(fields=['-updated_at'], name='product_updated_idx'),
+        ),
+        AddIndexConcurrentlyIfSupported(
+            model_name='stockarrival',
+            index=models.Index(fields=['-arrival_date'], name='arrival_date_idx'),
+        ),
+        AddIndexConcurrentlyIfSupported(
+            model_name='stockarrival',
+            index=models.Index(fields=['variation', 'arrival_date', 'id'], name='arrival_variation_date_idx'),
+        ),
+    ]
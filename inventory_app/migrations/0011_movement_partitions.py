@@ -0,0 +1,60 @@
+# Generated by Django 5.0.6 on 2026-10-19 00:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from inventory_app.partitioning import partition_movement_tables, unpartition_movement_tables
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0010_index_pack'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovementArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('dispatch', 'Despachos'), ('arrival', 'Ingresos')], max_length=10, verbose_name='Tipo de Movimiento')),
+                ('period', models.DateField(help_text='Primer día del mes archivado.', verbose_name='Mes')),
+                ('file', models.CharField(max_length=500, verbose_name='Archivo CSV')),
+                ('sha256', models.CharField(max_length=64, verbose_name='Suma SHA-256')),
+                ('rows', models.PositiveIntegerField(default=0, verbose_name='Movimientos')),
+                ('quantity', models.BigIntegerField(default=0, verbose_name='Unidades')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='Archivado el')),
+            ],
+            options={
+                'verbose_name': 'Mes Archivado',
+                'verbose_name_plural': 'Meses Archivados',
+                'ordering': ['-period', 'kind'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedMovementTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('movement_count', models.PositiveIntegerField(default=0, verbose_name='Movimientos')),
+                ('quantity', models.BigIntegerField(default=0, verbose_name='Unidades')),
+                ('total_cost', models.DecimalField(decimal_places=4, default=0, max_digits=18, verbose_name='Costo Total (Ingresos)')),
+                ('variation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_totals', to='inventory_app.productvariation')),
+            ],
+            options={
+                'verbose_name': 'Total Archivado',
+                'verbose_name_plural': 'Totales Archivados',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='movementarchive',
+            constraint=models.UniqueConstraint(fields=('kind', 'period'), name='movementarchive_kind_period_uniq'),
+        ),
+        migrations.AddField(
+            model_name='archivedmovementtotal',
+            name='archive',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='totals', to='inventory_app.movementarchive'),
+        ),
+        # PostgreSQL: reconstruye despachos e ingresos como tablas particionadas por mes
+        # (copia todas las filas; en tablas grandes correr en una ventana de mantenimiento)
+        migrations.RunPython(partition_movement_tables, unpartition_movement_tables),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.0.6 on 2026-10-19 00:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0011_movement_partitions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ValuationSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Fecha')),
+                ('scope', models.CharField(choices=[('category', 'Categoría'), ('warehouse', 'Almacén')], max_length=10, verbose_name='Agrupación')),
+                ('name', models.CharField(max_length=100, verbose_name='Nombre')),
+                ('units', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Unidades')),
+                ('cost_value', models.DecimalField(decimal_places=2, default=0, max_digits=18, verbose_name='Valor al Costo')),
+                ('sale_value', models.DecimalField(decimal_places=2, default=0, max_digits=18, verbose_name='Valor de Venta')),
+                ('created_at', models.DateTimeField(verbose_name='Calculado el')),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='inventory_app.category', verbose_name='Categoría')),
+                ('warehouse', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='inventory_app.warehouse', verbose_name='Almacén')),
+            ],
+            options={
+                'verbose_name': 'Valorización Diaria',
+                'verbose_name_plural': 'Valorizaciones Diarias',
+                'ordering': ['-date', 'scope', 'name'],
+                'indexes': [models.Index(fields=['scope', 'date'], name='valuation_scope_date_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='valuationsnapshot',
+            constraint=models.UniqueConstraint(condition=models.Q(('scope', 'category')), fields=('date', 'category'), name='valuation_date_category_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='valuationsnapshot',
+            constraint=models.UniqueConstraint(condition=models.Q(('scope', 'warehouse')), fields=('date', 'warehouse'), name='valuation_date_warehouse_uniq'),
+        ),
+    ]
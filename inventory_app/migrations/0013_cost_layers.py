@@ -0,0 +1,53 @@
+# Generated by Django 5.0.6 on 2026-10-19 00:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0012_valuation_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='costing_method',
+            field=models.CharField(choices=[('FIFO', 'PEPS (Primero en Entrar, Primero en Salir)'), ('AVG', 'Promedio Ponderado Móvil')], default='FIFO', max_length=4, verbose_name='Método de Costeo'),
+        ),
+        migrations.CreateModel(
+            name='CostLayer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('received_at', models.DateTimeField(verbose_name='Recibido el')),
+                ('quantity', models.PositiveIntegerField(verbose_name='Cantidad Recibida')),
+                ('remaining', models.PositiveIntegerField(verbose_name='Cantidad Restante')),
+                ('unit_cost', models.DecimalField(decimal_places=4, max_digits=18, verbose_name='Costo Unitario')),
+                ('arrival', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='cost_layers', to='inventory_app.stockarrival', verbose_name='Ingreso')),
+                ('variation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cost_layers', to='inventory_app.productvariation')),
+            ],
+            options={
+                'verbose_name': 'Capa de Costo',
+                'verbose_name_plural': 'Capas de Costo',
+            },
+        ),
+        migrations.CreateModel(
+            name='CostConsumption',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(verbose_name='Cantidad')),
+                ('unit_cost', models.DecimalField(decimal_places=4, max_digits=18, verbose_name='Costo Unitario')),
+                ('dispatch', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='cost_consumptions', to='inventory_app.dispatch', verbose_name='Despacho')),
+                ('layer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='consumptions', to='inventory_app.costlayer', verbose_name='Capa')),
+            ],
+            options={
+                'verbose_name': 'Consumo de Capa',
+                'verbose_name_plural': 'Consumos de Capas',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='costlayer',
+            index=models.Index(condition=models.Q(('remaining__gt', 0)), fields=['variation', 'received_at', 'id'], name='costlayer_open_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.0.6 on 2026-10-19 00:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0013_cost_layers'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CountSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=150, verbose_name='Descripción')),
+                ('status', models.CharField(choices=[('OPEN', 'Abierto'), ('APPROVED', 'Aprobado'), ('CANCELLED', 'Anulado')], default='OPEN', max_length=10, verbose_name='Estado')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Creado el')),
+                ('reconciled_at', models.DateTimeField(blank=True, null=True, verbose_name='Conciliado el')),
+                ('approved_at', models.DateTimeField(blank=True, null=True, verbose_name='Aprobado el')),
+                ('adjusted_lines', models.PositiveIntegerField(default=0, verbose_name='Líneas Ajustadas')),
+                ('units_added', models.PositiveIntegerField(default=0, verbose_name='Unidades Sumadas')),
+                ('units_removed', models.PositiveIntegerField(default=0, verbose_name='Unidades Descontadas')),
+                ('approved_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Aprobado por')),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Creado por')),
+                ('warehouse', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='inventory_app.warehouse', verbose_name='Almacén')),
+            ],
+            options={
+                'verbose_name': 'Conteo Físico',
+                'verbose_name_plural': 'Conteos Físicos',
+                'ordering': ['-created_at'],
+                'permissions': [('approve_countsession', 'Puede aprobar conteos físicos')],
+            },
+        ),
+        migrations.CreateModel(
+            name='CountLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('counted_qty', models.PositiveIntegerField(default=0, verbose_name='Cantidad Contada')),
+                ('system_stock', models.IntegerField(blank=True, null=True, verbose_name='Stock del Sistema')),
+                ('variance', models.IntegerField(blank=True, null=True, verbose_name='Diferencia')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('variation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='count_lines', to='inventory_app.productvariation')),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='inventory_app.countsession')),
+            ],
+            options={
+                'verbose_name': 'Línea de Conteo',
+                'verbose_name_plural': 'Líneas de Conteo',
+                'indexes': [models.Index(fields=['session', 'variance'], name='countline_session_variance_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='countline',
+            constraint=models.UniqueConstraint(fields=('session', 'variation'), name='countline_session_variation_uniq'),
+        ),
+    ]
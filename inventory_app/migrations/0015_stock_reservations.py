@@ -0,0 +1,37 @@
+# Generated by Django 5.0.6 on 2026-10-19 00:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing_app', '0004_invoiceitem_variation'),
+        ('delivery_app', '0003_deliverynoteitem_variation'),
+        ('inventory_app', '0014_count_sessions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(verbose_name='Cantidad Reservada')),
+                ('expires_at', models.DateTimeField(verbose_name='Vence el')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('delivery_note', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='delivery_app.deliverynote', verbose_name='Nota de Entrega')),
+                ('invoice', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='billing_app.invoice', verbose_name='Factura')),
+                ('variation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='inventory_app.productvariation', verbose_name='Variación')),
+            ],
+            options={
+                'verbose_name': 'Reserva de Stock',
+                'verbose_name_plural': 'Reservas de Stock',
+                'indexes': [models.Index(fields=['variation', 'expires_at'], name='reservation_variation_exp_idx'), models.Index(fields=['expires_at'], name='reservation_expires_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='stockreservation',
+            constraint=models.CheckConstraint(check=models.Q(models.Q(('delivery_note__isnull', True), ('invoice__isnull', False)), models.Q(('delivery_note__isnull', False), ('invoice__isnull', True)), _connector='OR'), name='reservation_one_document'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.6 on 2026-10-19 01:02
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0015_stock_reservations'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('old_price', models.DecimalField(decimal_places=4, max_digits=18, verbose_name='Precio Anterior')),
+                ('new_price', models.DecimalField(decimal_places=4, max_digits=18, verbose_name='Precio Nuevo')),
+                ('effective_from', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Vigente desde')),
+                ('rule', models.CharField(blank=True, max_length=100, verbose_name='Regla Aplicada')),
+                ('changed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Modificado por')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_history', to='inventory_app.product', verbose_name='Producto')),
+            ],
+            options={
+                'verbose_name': 'Cambio de Precio',
+                'verbose_name_plural': 'Historial de Precios',
+                'ordering': ['-effective_from'],
+            },
+        ),
+    ]
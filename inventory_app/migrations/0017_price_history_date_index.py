@@ -0,0 +1,19 @@
+# Generated by Django 5.0.6 on 2026-10-19 01:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0016_price_history'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pricehistory',
+            index=models.Index(fields=['product', 'effective_from'], name='pricehistory_product_date_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-19 01:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0017_price_history_date_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='archivedmovementtotal',
+            name='total_cost',
+            field=models.DecimalField(decimal_places=4, default=0, help_text='Ingresos: costo recibido. Despachos: costo consumido de las capas.', max_digits=18, verbose_name='Costo Total'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.6 on 2026-10-19 01:27
+
+from django.db import migrations, models
+
+
+def keep_cursors(apps, schema_editor):
+    # Las filas existentes conservan su id como posición: los cursores ya entregados siguen valiendo
+    CatalogChange = apps.get_model('inventory_app', 'CatalogChange')
+    CatalogChange.objects.update(position=models.F('id'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory_app', '0018_archived_total_cost_label'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='catalogchange',
+            name='position',
+            field=models.BigIntegerField(blank=True, null=True, unique=True, verbose_name='Posición en el Feed'),
+        ),
+        migrations.RunPython(keep_cursors, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='catalogchange',
+            index=models.Index(condition=models.Q(('position__isnull', True)), fields=['id'], name='catalogchange_pending_idx'),
+        ),
+    ]
@@ -1,9 +1,13 @@
-from django.db import models
-from django.db.models import Sum
+from django.db import models, transaction
+from django.db.models import Sum, Count, Max, Case, When, Value, F, OuterRef, Subquery, Q, DecimalField
+from django.db.models.functions import Coalesce, Greatest
 from django.contrib.auth.models import User
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from decimal import Decimal
 
+from .partitioning import month_start
+
 # ==========================================
 # 1. CATEGORÍAS
 # ==========================================
@@ -38,12 +42,80 @@ class Warehouse(models.Model):
 # ==========================================
 # 3. PRODUCTO MAESTRO (LOGÍSTICA AVANZADA)
 # ==========================================
+def _stock_state(field):
+    """Semáforo en SQL sobre la anotación `field` (mismo criterio que Product.status_for)"""
+    return Case(
+        When(**{f'{field}__lte': 0}, then=Value('OUT_OF_STOCK')),
+        When(**{f'{field}__lte': F('min_stock_level')}, then=Value('CRITICAL')),
+        When(**{f'{field}__lte': F('min_stock_level') * Decimal('1.2')}, then=Value('LOW')),
+        default=Value('OK'),
+        output_field=models.CharField(),
+    )
+
+
+class ProductQuerySet(models.QuerySet):
+    def with_stock(self):
+        """Anota 'total_qty' (suma de variaciones) en la misma consulta"""
+        return self.annotate(total_qty=Coalesce(Sum('variations__stock'), 0))
+
+    def with_stock_status(self):
+        """Anota 'total_qty' y el semáforo 'stock_state' calculado en SQL"""
+        return self.with_stock().annotate(stock_state=_stock_state('total_qty'))
+
+    def by_stock_priority(self):
+        """with_stock_status() ordenado de mayor a menor riesgo (OUT_OF_STOCK primero)"""
+        priority = Case(
+            *[When(stock_state=status, then=Value(i)) for i, status in enumerate(Product.STOCK_STATUSES)],
+            default=Value(len(Product.STOCK_STATUSES)),
+        )
+        return self.with_stock_status().order_by(priority, 'name')
+
+    def last_change(self, product_id=None):
+        """
+        Una fila (updated_at, last_dispatch, last_arrival) con el cambio más
+        reciente del catálogo, o de un producto, en una sola consulta.
+        """
+        def latest(model, field):
+            movements = model.objects.order_by()
+            if product_id is None:
+                # Todo el catálogo: recorrido hacia atrás del índice por fecha
+                return Subquery(movements.order_by(f'-{field}').values(field)[:1])
+            # Un producto: MAX sobre sus variaciones (índice variación + fecha)
+            return Subquery(movements.filter(variation__product_id=product_id)
+                            .values('variation__product').annotate(last=Max(field)).values('last'))
+
+        products = self if product_id is None else self.filter(pk=product_id)
+        return (products.order_by('-updated_at')
+                .annotate(last_dispatch=latest(Dispatch, 'dispatched_at'),
+                          last_arrival=latest(StockArrival, 'arrival_date'))
+                .values_list('updated_at', 'last_dispatch', 'last_arrival')[:1])
+
+    def stock_status_summary(self):
+        """
+        Productos y unidades por (semáforo, crítico) en una sola consulta agrupada.
+        El stock por producto va en subconsulta: no se puede agrupar por un agregado.
+        """
+        per_product = (ProductVariation.objects.filter(product=OuterRef('pk'))
+                       .values('product').annotate(total=Sum('stock')).values('total'))
+        return (
+            self.annotate(stock_qty=Coalesce(Subquery(per_product), 0))
+            .annotate(stock_state=_stock_state('stock_qty'))
+            .order_by()
+            .values('stock_state', 'is_critical')
+            .annotate(product_count=Count('pk'), units=Sum('stock_qty'))
+        )
+
+
 class Product(models.Model):
     class TrackingType(models.TextChoices):
         NONE = 'NONE', _('Sin Seguimiento')
         LOT = 'LOT', _('Por Lote')
         SERIAL = 'SERIAL', _('Por Número de Serie')
 
+    class CostingMethod(models.TextChoices):
+        FIFO = 'FIFO', _('PEPS (Primero en Entrar, Primero en Salir)')
+        AVG = 'AVG', _('Promedio Ponderado Móvil')
+
     # Identificación
     sku = models.CharField(max_length=50, unique=True, verbose_name=_("SKU (Código Interno)"))
     name = models.CharField(max_length=255, verbose_name=_("Descripción del Material"))
@@ -53,7 +125,11 @@ class Product(models.Model):
     unit_of_measure = models.CharField(max_length=20, default='unidad', verbose_name=_("Unidad de Medida"))
 
     # Financiero
+    # Costo promedio de las capas abiertas (costing.py): lo recalcula cada movimiento
     cost_price = models.DecimalField(max_digits=18, decimal_places=4, default=0.0, verbose_name=_("Costo Promedio"))
+    costing_method = models.CharField(
+        max_length=4, choices=CostingMethod.choices, default=CostingMethod.FIFO, verbose_name=_("Método de Costeo"),
+    )
     sale_price = models.DecimalField(max_digits=18, decimal_places=4, default=0.0, verbose_name=_("Valor Referencia (Activo)"))
 
     # Control de Stock y Alertas
@@ -75,11 +151,16 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProductQuerySet.as_manager()
+
     # --- PROPIEDADES CALCULADAS ---
 
     @property
     def total_stock(self):
         """Suma el stock físico de todas las variaciones/ubicaciones"""
+        # Si la consulta ya anotó 'total_qty' (listados, caché) evitamos otra consulta
+        if hasattr(self, 'total_qty'):
+            return self.total_qty or 0
         return self.variations.aggregate(total=Sum('stock'))['total'] or 0
 
     @property
@@ -98,9 +179,16 @@ class Product(models.Model):
     @property
     def stock_status(self):
         """Semáforo de estado para el Dashboard"""
-        stock = self.total_stock
-        min_level = self.min_stock_level
-        
+        if hasattr(self, 'stock_state'):
+            return self.stock_state
+        return self.status_for(self.total_stock, self.min_stock_level)
+
+    # Valores del semáforo, de mayor a menor riesgo
+    STOCK_STATUSES = ('OUT_OF_STOCK', 'CRITICAL', 'LOW', 'OK')
+
+    @staticmethod
+    def status_for(stock, min_level):
+        """Semáforo a partir de un stock y un mínimo dados (sin consultas)"""
         # Prioridad 1: Sin Stock
         if stock <= 0:
             return 'OUT_OF_STOCK'
@@ -120,14 +208,83 @@ class Product(models.Model):
         verbose_name = _("Producto")
         verbose_name_plural = _("Productos")
         ordering = ['name']
+        indexes = [
+            # Parcial: el Dashboard sólo lista los críticos activos (una fracción del catálogo)
+            models.Index(fields=['name'], condition=Q(is_active=True, is_critical=True), name='product_critical_idx'),
+            # Último cambio del catálogo (ETag / Last-Modified de los listados)
+            models.Index(fields=['-updated_at'], name='product_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.sku})"
 
+    # --- HISTORIAL DE PRECIOS ---
+    # Todo cambio de sale_price guardado con save() (vistas, admin, API) deja su
+    # PriceHistory; el reprecio masivo (UPDATE en bloque) lo escribe él mismo.
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Precio tal como se leyó: save() lo compara para saber si cambió
+        instance._loaded_sale_price = instance.__dict__.get('sale_price')
+        return instance
+
+    def save(self, *args, changed_by=None, price_rule='', **kwargs):
+        update_fields = kwargs.get('update_fields')
+        tracked = 'sale_price' in self.__dict__ and (update_fields is None or 'sale_price' in update_fields)
+        if not tracked:
+            return super().save(*args, **kwargs)
+
+        creating = self._state.adding
+        previous = getattr(self, '_loaded_sale_price', None)
+        if previous is None and not creating:
+            # Instancia armada a mano (no leída de la BD): el precio anterior se consulta
+            previous = Product.objects.filter(pk=self.pk).values_list('sale_price', flat=True).first()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            new_price = Decimal(str(self.sale_price))
+            if creating or previous is None:
+                PriceHistory.objects.create(product=self, old_price=new_price, new_price=new_price,
+                                            rule=price_rule or "Precio inicial", changed_by=changed_by)
+            elif new_price != previous:
+                PriceHistory.objects.create(product=self, old_price=previous, new_price=new_price,
+                                            rule=price_rule or "Ajuste manual", changed_by=changed_by)
+        self._loaded_sale_price = new_price
+
 
 # ==========================================
 # 4. VARIACIONES (TALLAS / ESPECIFICACIONES)
 # ==========================================
+class ProductVariationQuerySet(models.QuerySet):
+    def with_available(self, at=None):
+        """
+        Anota 'reserved' (reservas vigentes) y 'available' (stock - reservado)
+        con un LEFT JOIN agrupado: sirve para muchas variaciones en una consulta.
+        """
+        at = at or timezone.now()
+        reserved = Coalesce(Sum('reservations__quantity', filter=Q(reservations__expires_at__gt=at)), 0)
+        return self.annotate(reserved=reserved).annotate(available=F('stock') - F('reserved'))
+
+    def valuation(self):
+        """
+        {'total_cost', 'total_sales'} del inventario en una consulta. El costo
+        sale de las capas abiertas (CostLayer); el stock que ninguna capa cubre
+        (cargado antes de las capas o ajustado a mano) se valora al costo promedio.
+        """
+        layers = CostLayer.objects.filter(variation=OuterRef('pk'), remaining__gt=0).order_by().values('variation')
+        money = DecimalField(max_digits=18, decimal_places=4)
+        layer_value = Subquery(layers.annotate(v=Sum(F('remaining') * F('unit_cost'), output_field=money)).values('v'))
+        layer_units = Subquery(layers.annotate(u=Sum('remaining')).values('u'))
+        totals = self.annotate(
+            layer_value=Coalesce(layer_value, Value(Decimal('0')), output_field=money),
+            uncovered=Greatest(F('stock') - Coalesce(layer_units, 0), 0),
+        ).aggregate(
+            total_cost=Sum(F('layer_value') + F('uncovered') * F('product__cost_price'), output_field=money),
+            total_sales=Sum(F('stock') * F('product__sale_price'), output_field=money),
+        )
+        return {key: value or 0 for key, value in totals.items()}
+
+
 class ProductVariation(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='variations')
     size = models.CharField(max_length=50, verbose_name=_("Medida / Especificación")) # Ej: 10mm, XL, 1 Litro
@@ -135,6 +292,8 @@ class ProductVariation(models.Model):
     sku_variant = models.CharField(max_length=50, unique=True, verbose_name=_("SKU Variante"))
     stock = models.IntegerField(default=0, verbose_name=_("Stock Físico"))
 
+    objects = ProductVariationQuerySet.as_manager()
+
     class Meta:
         verbose_name = _("Variación de Producto")
         verbose_name_plural = _("Variaciones")
@@ -176,6 +335,31 @@ class SerialNumber(models.Model):
 # ==========================================
 # 7. DESPACHOS (SALIDAS OPERATIVAS)
 # ==========================================
+class MovementQuerySet(models.QuerySet):
+    """
+    Común a despachos e ingresos. En PostgreSQL sus tablas están particionadas
+    por mes (partitioning.py): filtrar por fecha limita las particiones leídas.
+    """
+    date_field = None
+
+    def recent(self, limit):
+        """Últimos `limit` movimientos: primero sólo el mes en curso; si no alcanzan, todo el historial"""
+        ordering = f'-{self.date_field}'
+        rows = list(self.filter(**{f'{self.date_field}__gte': month_start()}).order_by(ordering)[:limit])
+        if len(rows) < limit:
+            rows = list(self.order_by(ordering)[:limit])
+        return rows
+
+
+class DispatchQuerySet(MovementQuerySet):
+    date_field = 'dispatched_at'
+
+    def with_unit_price(self):
+        """Anota 'unit_price': precio de referencia vigente al despachar (historial de precios)"""
+        from .pricing import price_at
+        return self.annotate(unit_price=price_at('variation__product', 'dispatched_at'))
+
+
 class Dispatch(models.Model):
     variation = models.ForeignKey(ProductVariation, on_delete=models.CASCADE, related_name='dispatches')
     quantity = models.PositiveIntegerField(verbose_name=_("Cantidad Despachada"))
@@ -183,17 +367,36 @@ class Dispatch(models.Model):
     dispatched_at = models.DateTimeField(auto_now_add=True)
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
 
+    objects = DispatchQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Últimos despachos (Dashboard) y rangos de fecha (reportes)
+            models.Index(fields=['-dispatched_at'], name='dispatch_date_idx'),
+            # Último despacho por variación: se resuelve sólo con el índice
+            models.Index(fields=['variation', 'dispatched_at'], name='dispatch_variation_date_idx'),
+        ]
+
     @property
     def total_value(self):
-        """Valor contable de la salida (basado en precio referencia)"""
-        return self.quantity * self.variation.product.sale_price
+        """Valor contable de la salida al precio de referencia vigente al despachar"""
+        # Sin consulta por fila: la lista debe venir de with_unit_price() (reportes, admin)
+        if not hasattr(self, 'unit_price'):
+            raise ValueError("Dispatch.total_value requiere Dispatch.objects.with_unit_price()")
+        return self.quantity * self.unit_price
 
     def save(self, *args, **kwargs):
         # Descuento automático de stock al guardar
-        if not self.pk: # Solo al crear
+        creating = not self.pk
+        if creating: # Solo al crear
             self.variation.stock -= self.quantity
-            self.variation.save()
+            self.variation.save(update_fields=['stock'])
         super().save(*args, **kwargs)
+        if creating:
+            # Consume las capas de costo (PEPS o promedio) de la variación
+            from .costing import consume, sync_cost_price
+            consume([self])
+            sync_cost_price(self.variation.product)
 
     def __str__(self):
         return f"Salida: {self.quantity} de {self.variation.sku_variant}"
@@ -202,6 +405,20 @@ class Dispatch(models.Model):
 # ==========================================
 # 8. REPOSICIONES (ENTRADAS DE ALMACÉN)
 # ==========================================
+class StockArrivalQuerySet(MovementQuerySet):
+    date_field = 'arrival_date'
+
+    def with_previous_cost(self):
+        """Anota 'previous_cost': costo del ingreso anterior de la misma variación"""
+        previous = StockArrival.objects.filter(
+            variation=OuterRef('variation'),
+        ).filter(
+            Q(arrival_date__lt=OuterRef('arrival_date'))
+            | Q(arrival_date=OuterRef('arrival_date'), pk__lt=OuterRef('pk'))
+        ).order_by('-arrival_date', '-pk').values('unit_cost')[:1]
+        return self.annotate(previous_cost=Subquery(previous))
+
+
 class StockArrival(models.Model):
     variation = models.ForeignKey(ProductVariation, on_delete=models.CASCADE, related_name='arrivals')
     quantity = models.PositiveIntegerField(verbose_name=_("Cantidad Recibida"))
@@ -210,23 +427,399 @@ class StockArrival(models.Model):
     arrival_date = models.DateTimeField(auto_now_add=True)
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
 
+    objects = StockArrivalQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-arrival_date'], name='arrival_date_idx'),
+            # Ingreso anterior de la misma variación (with_previous_cost)
+            models.Index(fields=['variation', 'arrival_date', 'id'], name='arrival_variation_date_idx'),
+        ]
+
     @property
     def total_value(self):
         """Valor total de la entrada (inversión)"""
         return self.quantity * self.unit_cost
 
+    @property
+    def cost_difference(self):
+        """Diferencia de costo contra el ingreso anterior de la variación (0 si es el primero)"""
+        # Si la consulta ya anotó 'previous_cost' (admin) evitamos otra consulta
+        if hasattr(self, 'previous_cost'):
+            previous = self.previous_cost
+        else:
+            previous = StockArrival.objects.filter(pk=self.pk).with_previous_cost().values_list(
+                'previous_cost', flat=True).first()
+        if previous is None:
+            return Decimal('0')
+        return self.unit_cost - previous
+
     def save(self, *args, **kwargs):
         # Aumento automático de stock al guardar
-        if not self.pk: # Solo al crear
+        creating = not self.pk
+        if creating: # Solo al crear
             self.variation.stock += self.quantity
-            self.variation.save()
-            
-            # Actualizar costo promedio del producto maestro (Estrategia Último Precio)
-            product = self.variation.product
-            product.cost_price = self.unit_cost
-            product.save()
-            
+            self.variation.save(update_fields=['stock'])
         super().save(*args, **kwargs)
+        if creating:
+            # Abre (PEPS) o promedia (AVG) una capa de costo y recalcula el costo
+            # promedio del producto maestro a partir de las capas abiertas
+            from .costing import receive, sync_cost_price
+            receive([self])
+            sync_cost_price(self.variation.product)
+
+    def __str__(self):
+        return f"Entrada: {self.quantity} de {self.variation.sku_variant}"
+
+
+# ==========================================
+# 9. BITÁCORA DE CAMBIOS (SINCRONIZACIÓN DELTA)
+# ==========================================
+class CatalogChange(models.Model):
+    """
+    Secuencia monótona de cambios del catálogo y del stock.
+    La fila se escribe en la transacción del cambio; `position` (orden de
+    confirmación) se la asigna después changes.sequence(). Las tabletas piden
+    "cambios desde el cursor N" (WHERE position > N): una búsqueda en su índice.
+    """
+    class Entity(models.TextChoices):
+        PRODUCT = 'product', _('Producto')
+        VARIATION = 'variation', _('Variación')
+        STOCK = 'stock', _('Stock de Variación')
+
+    class Operation(models.TextChoices):
+        UPSERT = 'U', _('Alta / Modificación')
+        DELETE = 'D', _('Baja')
+
+    id = models.BigAutoField(primary_key=True, verbose_name=_("Secuencia"))
+    entity = models.CharField(max_length=10, choices=Entity.choices, verbose_name=_("Entidad"))
+    object_id = models.BigIntegerField(verbose_name=_("ID del Objeto"))
+    operation = models.CharField(max_length=1, choices=Operation.choices, default=Operation.UPSERT, verbose_name=_("Operación"))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Fecha"))
+    # Nula hasta que changes.sequence() ve la fila confirmada
+    position = models.BigIntegerField(null=True, blank=True, unique=True, verbose_name=_("Posición en el Feed"))
+
+    class Meta:
+        verbose_name = _("Cambio de Catálogo")
+        verbose_name_plural = _("Cambios de Catálogo")
+        indexes = [
+            # Compactación: localizar entradas reemplazadas del mismo objeto
+            models.Index(fields=['entity', 'object_id', 'id'], name='catalogchange_obj_idx'),
+            # Filas aún sin posición (parcial: casi siempre vacía)
+            models.Index(fields=['id'], condition=Q(position__isnull=True), name='catalogchange_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.entity}:{self.object_id} ({self.operation})"
+
+
+# ==========================================
+# 10. RESÚMENES DE STOCK (MÉTRICAS)
+# ==========================================
+class StockRollup(models.Model):
+    """
+    Conteo precalculado de productos activos por semáforo, para /metrics.
+    Lo recalcula el comando refresh_stock_rollups; un scrape sólo lee estas filas.
+    """
+    status = models.CharField(max_length=20, verbose_name=_("Semáforo"))
+    is_critical = models.BooleanField(default=False, verbose_name=_("Insumo Crítico"))
+    product_count = models.PositiveIntegerField(default=0, verbose_name=_("Productos"))
+    units = models.BigIntegerField(default=0, verbose_name=_("Unidades en Stock"))
+    refreshed_at = models.DateTimeField(verbose_name=_("Calculado el"))
+
+    class Meta:
+        verbose_name = _("Resumen de Stock")
+        verbose_name_plural = _("Resúmenes de Stock")
+        constraints = [
+            models.UniqueConstraint(fields=['status', 'is_critical'], name='stockrollup_status_critical_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.status}{' (crítico)' if self.is_critical else ''}: {self.product_count}"
+
+
+# ==========================================
+# 11. ARCHIVO DE MOVIMIENTOS (MESES CERRADOS)
+# ==========================================
+class MovementArchive(models.Model):
+    """
+    Partición mensual de movimientos ya archivada (manage_movement_partitions):
+    las filas viven en un CSV comprimido; en línea quedan los totales.
+    """
+    class Kind(models.TextChoices):
+        DISPATCH = 'dispatch', _('Despachos')
+        ARRIVAL = 'arrival', _('Ingresos')
+
+    kind = models.CharField(max_length=10, choices=Kind.choices, verbose_name=_("Tipo de Movimiento"))
+    period = models.DateField(verbose_name=_("Mes"), help_text=_("Primer día del mes archivado."))
+    file = models.CharField(max_length=500, verbose_name=_("Archivo CSV"))
+    sha256 = models.CharField(max_length=64, verbose_name=_("Suma SHA-256"))
+    rows = models.PositiveIntegerField(default=0, verbose_name=_("Movimientos"))
+    quantity = models.BigIntegerField(default=0, verbose_name=_("Unidades"))
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Archivado el"))
+
+    class Meta:
+        verbose_name = _("Mes Archivado")
+        verbose_name_plural = _("Meses Archivados")
+        ordering = ['-period', 'kind']
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'period'], name='movementarchive_kind_period_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.period:%m/%Y} ({self.rows})"
+
+
+class ArchivedMovementTotal(models.Model):
+    """Totales por variación de un mes archivado (lo que los reportes necesitan sin el detalle)"""
+    archive = models.ForeignKey(MovementArchive, on_delete=models.CASCADE, related_name='totals')
+    variation = models.ForeignKey(ProductVariation, on_delete=models.CASCADE, related_name='archived_totals')
+    movement_count = models.PositiveIntegerField(default=0, verbose_name=_("Movimientos"))
+    quantity = models.BigIntegerField(default=0, verbose_name=_("Unidades"))
+    total_cost = models.DecimalField(
+        max_digits=18, decimal_places=4, default=0, verbose_name=_("Costo Total"),
+        help_text=_("Ingresos: costo recibido. Despachos: costo consumido de las capas."),
+    )
+
+    class Meta:
+        verbose_name = _("Total Archivado")
+        verbose_name_plural = _("Totales Archivados")
+
+    def __str__(self):
+        return f"{self.archive}: {self.variation_id} x{self.quantity}"
+
+
+# ==========================================
+# 12. VALORIZACIÓN DIARIA (HISTÓRICO)
+# ==========================================
+class ValuationSnapshot(models.Model):
+    """
+    Valor del inventario al cierre de un día, por categoría (stock de las
+    variaciones) y por almacén (cantidades de los lotes). Lo escribe el
+    comando snapshot_valuation con un INSERT ... SELECT agrupado; las
+    tendencias del Dashboard y los reportes sólo leen estas filas.
+    """
+    class Scope(models.TextChoices):
+        CATEGORY = 'category', _('Categoría')
+        WAREHOUSE = 'warehouse', _('Almacén')
+
+    date = models.DateField(verbose_name=_("Fecha"))
+    scope = models.CharField(max_length=10, choices=Scope.choices, verbose_name=_("Agrupación"))
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, verbose_name=_("Categoría"))
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.SET_NULL, null=True, blank=True, verbose_name=_("Almacén"))
+    # Nombre al momento de la foto: el histórico no cambia si se renombra o borra
+    name = models.CharField(max_length=100, verbose_name=_("Nombre"))
+    units = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name=_("Unidades"))
+    cost_value = models.DecimalField(max_digits=18, decimal_places=2, default=0, verbose_name=_("Valor al Costo"))
+    sale_value = models.DecimalField(max_digits=18, decimal_places=2, default=0, verbose_name=_("Valor de Venta"))
+    created_at = models.DateTimeField(verbose_name=_("Calculado el"))
+
+    class Meta:
+        verbose_name = _("Valorización Diaria")
+        verbose_name_plural = _("Valorizaciones Diarias")
+        ordering = ['-date', 'scope', 'name']
+        indexes = [
+            # Tendencias: un rango de fechas de una agrupación
+            models.Index(fields=['scope', 'date'], name='valuation_scope_date_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'category'], condition=Q(scope='category'), name='valuation_date_category_uniq',
+            ),
+            models.UniqueConstraint(
+                fields=['date', 'warehouse'], condition=Q(scope='warehouse'), name='valuation_date_warehouse_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.date:%d/%m/%Y} {self.name}: {self.cost_value}"
+
+
+# ==========================================
+# 13. CAPAS DE COSTO (PEPS / PROMEDIO)
+# ==========================================
+class CostLayer(models.Model):
+    """
+    Unidades recibidas a un costo que aún no se consumieron. PEPS: una capa
+    por ingreso, los despachos consumen la más antigua. Promedio: una sola
+    capa abierta por variación cuyo costo se repondera con cada ingreso.
+    Las mantiene costing.py; rebuild_cost_layers las reconstruye del historial.
+    """
+    variation = models.ForeignKey(ProductVariation, on_delete=models.CASCADE, related_name='cost_layers')
+    # Sin FK en la BD: los movimientos pueden estar particionados (PK compuesta) o archivados
+    arrival = models.ForeignKey(
+        StockArrival, on_delete=models.SET_NULL, null=True, blank=True, db_constraint=False,
+        related_name='cost_layers', verbose_name=_("Ingreso"),
+    )
+    received_at = models.DateTimeField(verbose_name=_("Recibido el"))
+    quantity = models.PositiveIntegerField(verbose_name=_("Cantidad Recibida"))
+    remaining = models.PositiveIntegerField(verbose_name=_("Cantidad Restante"))
+    unit_cost = models.DecimalField(max_digits=18, decimal_places=4, verbose_name=_("Costo Unitario"))
+
+    class Meta:
+        verbose_name = _("Capa de Costo")
+        verbose_name_plural = _("Capas de Costo")
+        indexes = [
+            # Capas abiertas de una variación en orden PEPS (parcial: las agotadas no se leen)
+            models.Index(
+                fields=['variation', 'received_at', 'id'], condition=Q(remaining__gt=0), name='costlayer_open_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.variation_id}: {self.remaining}/{self.quantity} a {self.unit_cost}"
+
+
+class CostConsumption(models.Model):
+    """Unidades de un despacho tomadas de una capa: el costo de lo despachado"""
+    dispatch = models.ForeignKey(
+        Dispatch, on_delete=models.CASCADE, db_constraint=False, related_name='cost_consumptions',
+        verbose_name=_("Despacho"),
+    )
+    # Nula cuando no había capas que cubrieran el despacho (se valora al costo promedio)
+    layer = models.ForeignKey(
+        CostLayer, on_delete=models.SET_NULL, null=True, blank=True, related_name='consumptions',
+        verbose_name=_("Capa"),
+    )
+    quantity = models.PositiveIntegerField(verbose_name=_("Cantidad"))
+    unit_cost = models.DecimalField(max_digits=18, decimal_places=4, verbose_name=_("Costo Unitario"))
+
+    class Meta:
+        verbose_name = _("Consumo de Capa")
+        verbose_name_plural = _("Consumos de Capas")
+
+    def __str__(self):
+        return f"Despacho {self.dispatch_id}: {self.quantity} a {self.unit_cost}"
+
+
+# ==========================================
+# 14. CONTEOS FÍSICOS (CONCILIACIÓN)
+# ==========================================
+class CountSession(models.Model):
+    """
+    Conteo físico o cíclico. Las líneas llegan por lotes de escáner o XLSX
+    (api/conteos/), la diferencia contra el stock del sistema se calcula con
+    un solo UPDATE y al aprobar los ajustes se contabilizan con post_movements.
+    """
+    class Status(models.TextChoices):
+        OPEN = 'OPEN', _('Abierto')
+        APPROVED = 'APPROVED', _('Aprobado')
+        CANCELLED = 'CANCELLED', _('Anulado')
+
+    name = models.CharField(max_length=150, verbose_name=_("Descripción"))
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.SET_NULL, null=True, blank=True, verbose_name=_("Almacén"))
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.OPEN, verbose_name=_("Estado"))
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='+', verbose_name=_("Creado por"))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Creado el"))
+    reconciled_at = models.DateTimeField(null=True, blank=True, verbose_name=_("Conciliado el"))
+    approved_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name=_("Aprobado por"))
+    approved_at = models.DateTimeField(null=True, blank=True, verbose_name=_("Aprobado el"))
+    adjusted_lines = models.PositiveIntegerField(default=0, verbose_name=_("Líneas Ajustadas"))
+    units_added = models.PositiveIntegerField(default=0, verbose_name=_("Unidades Sumadas"))
+    units_removed = models.PositiveIntegerField(default=0, verbose_name=_("Unidades Descontadas"))
+
+    class Meta:
+        verbose_name = _("Conteo Físico")
+        verbose_name_plural = _("Conteos Físicos")
+        ordering = ['-created_at']
+        permissions = [('approve_countsession', _("Puede aprobar conteos físicos"))]
+
+    def __str__(self):
+        return f"{self.name} ({self.get_status_display()})"
+
+
+class CountLine(models.Model):
+    session = models.ForeignKey(CountSession, on_delete=models.CASCADE, related_name='lines')
+    variation = models.ForeignKey(ProductVariation, on_delete=models.CASCADE, related_name='count_lines')
+    counted_qty = models.PositiveIntegerField(default=0, verbose_name=_("Cantidad Contada"))
+    # Los calcula counting.reconcile() (y de nuevo al aprobar)
+    system_stock = models.IntegerField(null=True, blank=True, verbose_name=_("Stock del Sistema"))
+    variance = models.IntegerField(null=True, blank=True, verbose_name=_("Diferencia"))
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _("Línea de Conteo")
+        verbose_name_plural = _("Líneas de Conteo")
+        constraints = [
+            models.UniqueConstraint(fields=['session', 'variation'], name='countline_session_variation_uniq'),
+        ]
+        indexes = [
+            # Diferencias de una sesión (revisión y aprobación)
+            models.Index(fields=['session', 'variance'], name='countline_session_variance_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.session_id}: {self.variation_id} = {self.counted_qty}"
+
+
+# ==========================================
+# 15. RESERVAS DE STOCK (DISPONIBLE PARA PROMETER)
+# ==========================================
+class StockReservation(models.Model):
+    """
+    Unidades apartadas por un documento abierto (factura en borrador o nota de
+    entrega pendiente). Disponible = stock - reservas vigentes; las vencidas
+    dejan de contar al instante y sweep_reservations las borra en bloque.
+    Las mantiene reservations.py (señales de los documentos).
+    """
+    variation = models.ForeignKey(ProductVariation, on_delete=models.CASCADE, related_name='reservations',
+                                  verbose_name=_("Variación"))
+    invoice = models.ForeignKey('billing_app.Invoice', on_delete=models.CASCADE, null=True, blank=True,
+                                related_name='reservations', verbose_name=_("Factura"))
+    delivery_note = models.ForeignKey('delivery_app.DeliveryNote', on_delete=models.CASCADE, null=True, blank=True,
+                                      related_name='reservations', verbose_name=_("Nota de Entrega"))
+    quantity = models.PositiveIntegerField(verbose_name=_("Cantidad Reservada"))
+    expires_at = models.DateTimeField(verbose_name=_("Vence el"))
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = _("Reserva de Stock")
+        verbose_name_plural = _("Reservas de Stock")
+        constraints = [
+            # Cada reserva pertenece a exactamente un documento
+            models.CheckConstraint(
+                check=Q(invoice__isnull=False, delivery_note__isnull=True)
+                | Q(invoice__isnull=True, delivery_note__isnull=False),
+                name='reservation_one_document',
+            ),
+        ]
+        indexes = [
+            # Suma de reservas vigentes por variación (with_available)
+            models.Index(fields=['variation', 'expires_at'], name='reservation_variation_exp_idx'),
+            # Barrido de vencidas
+            models.Index(fields=['expires_at'], name='reservation_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} de {self.variation_id} hasta {self.expires_at:%Y-%m-%d %H:%M}"
+
+
+# ==========================================
+# 16. HISTORIAL DE PRECIOS
+# ==========================================
+class PriceHistory(models.Model):
+    """
+    Un cambio del precio de referencia (sale_price). Lo escriben el reprecio
+    masivo (pricing.apply, con bulk_create) y el ajuste de un producto; los
+    reportes lo leen para valorizar movimientos pasados al precio de su fecha.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='price_history',
+                                verbose_name=_("Producto"))
+    old_price = models.DecimalField(max_digits=18, decimal_places=4, verbose_name=_("Precio Anterior"))
+    new_price = models.DecimalField(max_digits=18, decimal_places=4, verbose_name=_("Precio Nuevo"))
+    effective_from = models.DateTimeField(default=timezone.now, verbose_name=_("Vigente desde"))
+    rule = models.CharField(max_length=100, blank=True, verbose_name=_("Regla Aplicada"))
+    changed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+',
+                                   verbose_name=_("Modificado por"))
+
+    class Meta:
+        verbose_name = _("Cambio de Precio")
+        verbose_name_plural = _("Historial de Precios")
+        ordering = ['-effective_from']
+        indexes = [
+            # Precio vigente de un producto a una fecha (pricing.price_at / prices_at)
+            models.Index(fields=['product', 'effective_from'], name='pricehistory_product_date_idx'),
+        ]
 
     def __str__(self):
-        return f"Entrada: {self.quantity} de {self.variation.sku_variant}"
\ No newline at end of file
+        return f"{self.product_id}: {self.old_price} -> {self.new_price}"
@@ -0,0 +1,301 @@
+# inventory_app/partitioning.py
+
+"""
+Particionado mensual de los movimientos (PostgreSQL).
+
+inventory_app_dispatch e inventory_app_stockarrival son tablas particionadas
+por rango de fecha (dispatched_at / arrival_date), una partición por mes
+(<tabla>_pAAAA_MM) más una DEFAULT que recibe lo que caiga fuera de rango.
+Una consulta filtrada por fecha (reportes, últimos movimientos del mes) sólo
+lee las particiones de ese rango.
+
+Consecuencias para el resto del código:
+  - La PK física es (id, fecha): PostgreSQL exige la clave de partición en
+    toda restricción única. Django sigue viendo `id` como PK; la unicidad la
+    da la secuencia.
+  - Una FK hacia Dispatch o StockArrival no puede crearse en la BD (no hay
+    índice único sólo sobre id): usar ForeignKey(..., db_constraint=False).
+  - Los índices nuevos sobre estas tablas no admiten CONCURRENTLY (ver
+    core.migration_operations).
+
+maintain() (comando manage_movement_partitions) crea las particiones de los
+próximos meses y archiva las de meses cerrados más viejos que la retención:
+CSV comprimido en disco + MovementArchive / ArchivedMovementTotal en línea,
+y luego DETACH y DROP de la partición. En otros motores todo es un no-op.
+
+Las filas de costeo que apuntan a los movimientos archivados (sin FK en la
+BD) se resuelven en la misma transacción del DROP: los consumos de los
+despachos pasan a los totales (costo consumido) y se borran; las capas de
+los ingresos se conservan (pueden seguir abiertas) y sólo pierden el enlace.
+"""
+import gzip
+import hashlib
+import os
+import re
+from datetime import datetime
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+# (tabla, columna de partición, tipo de MovementArchive)
+MOVEMENT_TABLES = (
+    ('inventory_app_dispatch', 'dispatched_at', 'dispatch'),
+    ('inventory_app_stockarrival', 'arrival_date', 'arrival'),
+)
+
+_PARTITION_NAME = re.compile(r'_p(\d{4})_(\d{2})$')
+
+
+def is_supported(conn=None):
+    return (conn or connection).vendor == 'postgresql'
+
+
+# ==========================================
+# 1. MESES Y NOMBRES
+# ==========================================
+def month_start(value=None):
+    """Primer instante del mes de `value` (ahora por defecto) en la zona del sitio"""
+    local = timezone.localtime(value or timezone.now())
+    return local.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month, count):
+    year, index = divmod(month.year * 12 + month.month - 1 + count, 12)
+    return month.replace(year=year, month=index + 1, day=1)
+
+
+def partition_name(table, month):
+    return f'{table}_p{month:%Y_%m}'
+
+
+def _bounds(month):
+    return f"'{month.isoformat()}'", f"'{add_months(month, 1).isoformat()}'"
+
+
+def _q(name):
+    return connection.ops.quote_name(name)
+
+
+def partitions(cursor, table):
+    """{mes: nombre} de las particiones mensuales adjuntas a `table`"""
+    cursor.execute(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = %s::regclass", [table],
+    )
+    found = {}
+    tz = timezone.get_current_timezone()
+    for (name,) in cursor.fetchall():
+        match = _PARTITION_NAME.search(name)
+        if match:
+            month = timezone.make_aware(datetime(int(match[1]), int(match[2]), 1), tz)
+            found[month] = name
+    return found
+
+
+def is_partitioned(cursor, table):
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [table])
+    row = cursor.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+# ==========================================
+# 2. CONVERSIÓN (MIGRACIONES)
+# ==========================================
+def _rebuild(cursor, table, column=None, months_ahead=3):
+    """
+    Reconstruye `table` particionada por `column` (o sin particionar si es
+    None) copiando las filas. Conserva nombres de PK, índices y FKs para que
+    las migraciones posteriores los encuentren.
+    """
+    cursor.execute(
+        "SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s",
+        [table],
+    )
+    indexes = cursor.fetchall()
+    cursor.execute(
+        "SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype IN ('p', 'u', 'f')", [table],
+    )
+    constraints = cursor.fetchall()
+    if any(kind == 'u' for _, kind, _ in constraints):
+        raise RuntimeError(f"{table}: las restricciones UNIQUE no se migran automáticamente.")
+    pk_name = next(name for name, kind, _ in constraints if kind == 'p')
+    constraint_indexes = {name for name, _, _ in constraints}
+
+    legacy = f'{table}_legacy'
+    cursor.execute(f'ALTER TABLE {_q(table)} RENAME TO {_q(legacy)}')
+    partition_by = f' PARTITION BY RANGE ({_q(column)})' if column else ''
+    # Sin INCLUDING DEFAULTS: la secuencia de id pertenece a la tabla vieja
+    cursor.execute(f'CREATE TABLE {_q(table)} (LIKE {_q(legacy)} INCLUDING CONSTRAINTS){partition_by}')
+
+    if column:
+        cursor.execute(f'SELECT min({_q(column)}) FROM {_q(legacy)}')
+        oldest = cursor.fetchone()[0]
+        month = month_start(oldest) if oldest else month_start()
+        last = add_months(month_start(), months_ahead)
+        while month <= last:
+            low, high = _bounds(month)
+            cursor.execute(f'CREATE TABLE {_q(partition_name(table, month))} PARTITION OF {_q(table)} '
+                           f'FOR VALUES FROM ({low}) TO ({high})')
+            month = add_months(month, 1)
+        cursor.execute(f'CREATE TABLE {_q(table + "_default")} PARTITION OF {_q(table)} DEFAULT')
+
+    cursor.execute(f'INSERT INTO {_q(table)} SELECT * FROM {_q(legacy)}')
+    # Sin CASCADE: si otra tabla referencia a ésta, mejor fallar que perder la FK
+    cursor.execute(f'DROP TABLE {_q(legacy)}')
+
+    sequence = f'{table}_id_seq'
+    cursor.execute(f'CREATE SEQUENCE {_q(sequence)} OWNED BY {_q(table)}.id')
+    cursor.execute(f"SELECT setval(%s, COALESCE((SELECT max(id) FROM {_q(table)}), 0) + 1, false)", [sequence])
+    cursor.execute(f"ALTER TABLE {_q(table)} ALTER COLUMN id SET DEFAULT nextval('{sequence}')")
+    pk_columns = f'id, {_q(column)}' if column else 'id'
+    cursor.execute(f'ALTER TABLE {_q(table)} ADD CONSTRAINT {_q(pk_name)} PRIMARY KEY ({pk_columns})')
+
+    for name, definition in indexes:
+        if name not in constraint_indexes:
+            cursor.execute(definition)
+    for name, kind, definition in constraints:
+        if kind == 'f':
+            cursor.execute(f'ALTER TABLE {_q(table)} ADD CONSTRAINT {_q(name)} {definition}')
+
+
+def partition_movement_tables(apps, schema_editor):
+    if not is_supported(schema_editor.connection):
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table, column, _ in MOVEMENT_TABLES:
+            if not is_partitioned(cursor, table):
+                _rebuild(cursor, table, column, getattr(settings, 'MOVEMENT_PARTITIONS_AHEAD', 3))
+
+
+def unpartition_movement_tables(apps, schema_editor):
+    if not is_supported(schema_editor.connection):
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table, _, _ in MOVEMENT_TABLES:
+            if is_partitioned(cursor, table):
+                _rebuild(cursor, table)
+
+
+# ==========================================
+# 3. PARTICIONES FUTURAS
+# ==========================================
+def create_partition(cursor, table, column, month):
+    """
+    Crea la partición de `month`. Si la DEFAULT ya recibió filas de ese mes
+    (mantenimiento atrasado) se mueven a la partición nueva antes de adjuntarla.
+    """
+    name = partition_name(table, month)
+    low, high = _bounds(month)
+    default = f'{table}_default'
+    in_range = f'{_q(column)} >= {low} AND {_q(column)} < {high}'
+    with transaction.atomic():
+        cursor.execute(f'SELECT EXISTS (SELECT 1 FROM {_q(default)} WHERE {in_range})')
+        if cursor.fetchone()[0]:
+            cursor.execute(f'CREATE TABLE {_q(name)} (LIKE {_q(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+            cursor.execute(f'INSERT INTO {_q(name)} SELECT * FROM {_q(default)} WHERE {in_range}')
+            cursor.execute(f'DELETE FROM {_q(default)} WHERE {in_range}')
+            cursor.execute(f'ALTER TABLE {_q(table)} ATTACH PARTITION {_q(name)} FOR VALUES FROM ({low}) TO ({high})')
+        else:
+            cursor.execute(f'CREATE TABLE {_q(name)} PARTITION OF {_q(table)} FOR VALUES FROM ({low}) TO ({high})')
+    return name
+
+
+# ==========================================
+# 4. ARCHIVO DE MESES CERRADOS
+# ==========================================
+def archive_partition(cursor, table, column, kind, month, directory):
+    """
+    CSV comprimido de la partición + totales por variación en línea; después
+    DETACH y DROP. El archivo se escribe antes de tocar la BD: si falla, no
+    se pierde nada.
+    """
+    from .models import ArchivedMovementTotal, CostConsumption, CostLayer, Dispatch, MovementArchive, StockArrival
+
+    name = partition_name(table, month)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{name}.csv.gz')
+    tmp = f'{path}.tmp'
+    with gzip.open(tmp, 'wt', newline='') as fh:
+        cursor.copy_expert(f'COPY (SELECT * FROM {_q(name)} ORDER BY id) TO STDOUT WITH (FORMAT csv, HEADER)', fh)
+    digest = hashlib.sha256()
+    with open(tmp, 'rb') as fh:
+        for block in iter(lambda: fh.read(1 << 20), b''):
+            digest.update(block)
+    os.replace(tmp, path)
+
+    model = Dispatch if kind == MovementArchive.Kind.DISPATCH else StockArrival
+    in_month = {f'{column}__gte': month, f'{column}__lt': add_months(month, 1)}
+    totals = (model.objects.filter(**in_month)
+              .order_by().values('variation').annotate(movements=Count('pk'), units=Sum('quantity')))
+    if model is StockArrival:
+        totals = totals.annotate(cost=Sum(F('quantity') * F('unit_cost')))
+        # Capas de estos ingresos: quedan (con su saldo) sin el enlace al ingreso
+        cost_rows = CostLayer.objects.filter(**{f'arrival__{k}': v for k, v in in_month.items()})
+        consumed = {}
+    else:
+        # Consumos de estos despachos: su costo queda en los totales del archivo
+        cost_rows = CostConsumption.objects.filter(**{f'dispatch__{k}': v for k, v in in_month.items()})
+        consumed = dict(cost_rows.order_by().values('dispatch__variation')
+                        .annotate(cost=Sum(F('quantity') * F('unit_cost')))
+                        .values_list('dispatch__variation', 'cost'))
+    rows = [
+        ArchivedMovementTotal(
+            variation_id=t['variation'], movement_count=t['movements'],
+            quantity=t['units'], total_cost=t.get('cost') or consumed.get(t['variation']) or 0,
+        )
+        for t in totals
+    ]
+
+    with transaction.atomic():
+        archive = MovementArchive.objects.create(
+            kind=kind, period=month.date(), file=path, sha256=digest.hexdigest(),
+            rows=sum(r.movement_count for r in rows), quantity=sum(r.quantity for r in rows),
+        )
+        for row in rows:
+            row.archive = archive
+        ArchivedMovementTotal.objects.bulk_create(rows)
+        # Sin FK en la BD: nada impediría dejar filas de costeo apuntando a movimientos borrados
+        if model is StockArrival:
+            cost_rows.update(arrival=None)
+        else:
+            cost_rows.delete()
+        cursor.execute(f'ALTER TABLE {_q(table)} DETACH PARTITION {_q(name)}')
+        cursor.execute(f'DROP TABLE {_q(name)}')
+    return archive
+
+
+def maintain(months_ahead=None, retain_months=None, directory=None, dry_run=False):
+    """
+    Crea las particiones faltantes hasta `months_ahead` meses adelante y
+    archiva las de meses anteriores a la retención. Devuelve las acciones
+    [(acción, tabla, mes)] (las planeadas, con dry_run).
+    """
+    if not is_supported():
+        raise RuntimeError("El particionado de movimientos requiere PostgreSQL.")
+    months_ahead = getattr(settings, 'MOVEMENT_PARTITIONS_AHEAD', 3) if months_ahead is None else months_ahead
+    retain_months = getattr(settings, 'MOVEMENT_RETAIN_MONTHS', 24) if retain_months is None else retain_months
+    directory = directory or settings.MOVEMENT_ARCHIVE_DIR
+
+    current = month_start()
+    horizon = add_months(current, -retain_months)
+    actions = []
+    with connection.cursor() as cursor:
+        for table, column, kind in MOVEMENT_TABLES:
+            if not is_partitioned(cursor, table):
+                raise RuntimeError(f"{table} no está particionada (¿migraciones pendientes?).")
+            existing = partitions(cursor, table)
+            for offset in range(months_ahead + 1):
+                month = add_months(current, offset)
+                if month not in existing:
+                    actions.append(('create', table, month))
+                    if not dry_run:
+                        create_partition(cursor, table, column, month)
+            # Nunca el mes en curso: la retención mínima es de un mes cerrado
+            for month in sorted(m for m in existing if m < horizon and m < current):
+                actions.append(('archive', table, month))
+                if not dry_run:
+                    archive_partition(cursor, table, column, kind, month, directory)
+    return actions
@@ -0,0 +1,221 @@
+# inventory_app/pricing.py
+
+"""
+Reprecio masivo del precio de referencia (Product.sale_price).
+
+  - select_products(): los productos a repreciar (categorías, proveedor).
+  - preview(): el antes / después calculado en SQL, sin escribir nada.
+  - apply(): en una transacción lee los cambios (filas bloqueadas), guarda
+    un PriceHistory por producto con bulk_create y aplica la regla con
+    UPDATE ... SET sale_price = <fórmula> por lotes de pk.
+
+Las reglas son expresiones SQL sobre las columnas del producto:
+porcentaje sobre el precio actual, monto fijo sobre el precio actual o
+margen sobre el costo. El resultado se redondea a PRICE_PLACES y nunca es
+negativo.
+
+Precio a una fecha (reportes y valorizaciones de movimientos pasados):
+el vigente en `at` es el new_price del último cambio hasta `at`; antes del
+primer cambio, el old_price de ese cambio; sin historial, el precio actual.
+Cada resolución es una búsqueda en pricehistory_product_date_idx.
+  - price_at(): expresión para anotar querysets (un despacho, su precio).
+  - prices_at(): miles de pares (producto, fecha) en una consulta por lote.
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.db import connection, models, transaction
+from django.db.models import (
+    Count, DecimalField, Exists, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value,
+)
+from django.db.models.functions import Coalesce, Greatest, Round
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from purchasing_app.models import PurchaseOrderItem
+
+from . import cache as catalog_cache
+from . import changes, scan
+from .models import PriceHistory, Product
+
+PRICE_PLACES = 2
+PREVIEW_ROWS = 200
+# Pares (producto, fecha) por consulta de prices_at (3 parámetros por par)
+LOOKUP_CHUNK = 5000
+PRICE_FIELD = DecimalField(max_digits=18, decimal_places=4)
+# Tope del valor de la regla: la parte entera que admite la columna del precio
+_sale_price = Product._meta.get_field('sale_price')
+VALUE_LIMIT = Decimal(10) ** (_sale_price.max_digits - _sale_price.decimal_places)
+
+
+class Rule(models.TextChoices):
+    PERCENT = 'PERCENT', _('Porcentaje sobre el precio')
+    ABSOLUTE = 'ABSOLUTE', _('Monto fijo sobre el precio')
+    MARKUP = 'MARKUP', _('Margen sobre el costo')
+
+
+class RepricingError(Exception):
+    """Regla o valor inválidos"""
+
+
+def parse_value(value):
+    try:
+        parsed = Decimal(str(value).strip().replace(',', '.'))
+    except (InvalidOperation, AttributeError):
+        raise RepricingError(f"Valor inválido: {value}")
+    # NaN / Infinity romperían la expresión SQL y un valor enorme desbordaría la columna
+    if not parsed.is_finite() or abs(parsed) >= VALUE_LIMIT:
+        raise RepricingError(f"Valor fuera de rango: {value}")
+    return parsed
+
+
+def describe(rule, value):
+    """Texto que queda en PriceHistory.rule"""
+    return f"{Rule(rule).label} {value:+}"[:100]
+
+
+# ==========================================
+# 1. SELECCIÓN Y FÓRMULA
+# ==========================================
+def select_products(categories=None, supplier=None, include_inactive=False):
+    """
+    Productos del reprecio. `supplier`: los que figuran en alguna orden de
+    compra del proveedor (Exists: un producto pedido muchas veces no se repite).
+    """
+    products = Product.objects.all() if include_inactive else Product.objects.filter(is_active=True)
+    if categories:
+        products = products.filter(category_id__in=categories)
+    if supplier:
+        products = products.filter(Exists(PurchaseOrderItem.objects.filter(
+            product=OuterRef('pk'), purchase_order__supplier_id=supplier)))
+    return products
+
+
+def price_expression(rule, value):
+    value = parse_value(value)
+    # El factor se calcula aquí: en SQLite 10 / 100 en SQL es división entera
+    factor = Value(1 + value / 100, output_field=PRICE_FIELD)
+    if rule == Rule.PERCENT:
+        raw = F('sale_price') * factor
+    elif rule == Rule.ABSOLUTE:
+        raw = F('sale_price') + Value(value, output_field=PRICE_FIELD)
+    elif rule == Rule.MARKUP:
+        raw = F('cost_price') * factor
+    else:
+        raise RepricingError(f"Regla desconocida: {rule}")
+    return Greatest(Round(ExpressionWrapper(raw, output_field=PRICE_FIELD), PRICE_PLACES),
+                    Value(Decimal('0'), output_field=PRICE_FIELD), output_field=PRICE_FIELD)
+
+
+def _changed(products, rule, value):
+    return (products.order_by().annotate(new_price=price_expression(rule, value))
+            .exclude(new_price=F('sale_price')))
+
+
+# ==========================================
+# 2. VISTA PREVIA
+# ==========================================
+def preview(products, rule, value, limit=PREVIEW_ROWS):
+    """{'count', 'old_total', 'new_total', 'rows'}: totales de todo el cambio y las primeras `limit` filas"""
+    changed = _changed(products, rule, value)
+    totals = changed.aggregate(count=Count('pk'), old_total=Sum('sale_price'), new_total=Sum('new_price'))
+    rows = list(changed.order_by('sku').values('pk', 'sku', 'name', 'cost_price', 'sale_price', 'new_price')[:limit])
+    for row in rows:
+        row['delta'] = row['new_price'] - row['sale_price']
+    return {**totals, 'rows': rows}
+
+
+# ==========================================
+# 3. APLICACIÓN
+# ==========================================
+def apply(products, rule, value, user=None, batch_size=2000):
+    """Aplica la regla; devuelve cuántos productos cambiaron"""
+    expression = price_expression(rule, value)
+    label = describe(rule, parse_value(value))
+    now = timezone.now()
+    with transaction.atomic():
+        rows = list(_changed(products, rule, value).select_for_update()
+                    .values_list('pk', 'sale_price', 'new_price'))
+        if not rows:
+            return 0
+        PriceHistory.objects.bulk_create([
+            PriceHistory(product_id=pk, old_price=old, new_price=new, effective_from=now, rule=label,
+                         changed_by=user)
+            for pk, old, new in rows
+        ], batch_size=batch_size)
+        pks = [row[0] for row in rows]
+        for start in range(0, len(pks), batch_size):
+            # Filas bloqueadas arriba: la fórmula da lo mismo que se guardó en el historial
+            Product.objects.filter(pk__in=pks[start:start + batch_size]).update(
+                sale_price=expression, updated_at=now)
+        # Sin señales (update): caché, tabla de escaneo (guarda precios) y sincronización delta
+        transaction.on_commit(lambda: catalog_cache.invalidate_products(pks))
+        transaction.on_commit(lambda: scan.invalidate_products(pks))
+        changes.record(changes.Entity.PRODUCT, pks)
+    return len(pks)
+
+
+# ==========================================
+# 4. PRECIO A UNA FECHA
+# ==========================================
+def price_at(product, at):
+    """
+    Expresión: precio de referencia de OuterRef(product) vigente en
+    OuterRef(at). P. ej. Dispatch: price_at('variation__product', 'dispatched_at').
+    """
+    history = PriceHistory.objects.filter(product=OuterRef(product))
+    return Coalesce(
+        Subquery(history.filter(effective_from__lte=OuterRef(at)).order_by('-effective_from').values('new_price')[:1]),
+        Subquery(history.filter(effective_from__gt=OuterRef(at)).order_by('effective_from').values('old_price')[:1]),
+        F(f'{product}__sale_price'),
+        output_field=PRICE_FIELD,
+    )
+
+
+# Dos subconsultas correlacionadas LIMIT 1 por fila: equivalente portable
+# (también SQLite) a un LATERAL JOIN, cada una una búsqueda en el índice
+PRICE_AT_SQL = """COALESCE(
+        (SELECT h.new_price FROM {history} h
+         WHERE h.product_id = {product}.id AND h.effective_from <= {moment}
+         ORDER BY h.effective_from DESC LIMIT 1),
+        (SELECT h.old_price FROM {history} h
+         WHERE h.product_id = {product}.id AND h.effective_from > {moment}
+         ORDER BY h.effective_from LIMIT 1),
+        {product}.sale_price)"""
+
+
+def price_at_sql(product, moment):
+    """Fragmento SQL crudo: precio del alias de producto `product` vigente en `moment` (columna o %s)"""
+    history = connection.ops.quote_name(PriceHistory._meta.db_table)
+    return PRICE_AT_SQL.format(history=history, product=product, moment=moment)
+
+
+LOOKUP_SQL = """
+    WITH pairs (n, product_id, moment) AS (VALUES {values})
+    SELECT pairs.n, {price}
+    FROM pairs INNER JOIN {product} p ON p.id = pairs.product_id
+"""
+
+
+def prices_at(pairs):
+    """
+    [(product_id, datetime), ...] -> [precio, ...] en el mismo orden
+    (None si el producto no existe). Una consulta cada LOOKUP_CHUNK pares.
+    """
+    pairs = list(pairs)
+    ops = connection.ops
+    # En PostgreSQL los parámetros de VALUES no traen tipo: la fecha se castea
+    row = '(%s, %s, CAST(%s AS timestamp with time zone))' if connection.vendor == 'postgresql' else '(%s, %s, %s)'
+    price_sql = price_at_sql('p', 'pairs.moment')
+    product_table = ops.quote_name(Product._meta.db_table)
+    prices = [None] * len(pairs)
+    with connection.cursor() as cursor:
+        for start in range(0, len(pairs), LOOKUP_CHUNK):
+            chunk = pairs[start:start + LOOKUP_CHUNK]
+            params = []
+            for n, (product_id, at) in enumerate(chunk, start):
+                params += [n, product_id, ops.adapt_datetimefield_value(at)]
+            cursor.execute(LOOKUP_SQL.format(values=', '.join([row] * len(chunk)), price=price_sql,
+                                             product=product_table), params)
+            for n, value in cursor.fetchall():
+                prices[n] = value if value is None or isinstance(value, Decimal) else Decimal(str(value))
+    return prices
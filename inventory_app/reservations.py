@@ -0,0 +1,214 @@
+# inventory_app/reservations.py
+
+"""
+Reservas de stock (StockReservation) y disponible para prometer.
+
+  - availability(): stock, reservado y disponible de muchas variaciones en
+    una consulta agrupada (ProductVariation.objects.with_available()).
+  - reserve(): aparta las unidades de un documento. Bloquea las variaciones
+    en orden de pk, así dos ventas concurrentes del último stock se
+    serializan y la segunda ve lo que apartó la primera.
+  - sync_document(): reserva mientras el documento está abierto y libera al
+    cerrarlo. Las señales de documentos e ítems no la llaman por cada guardado:
+    schedule_sync() la encola una vez por documento para el commit (un alta
+    de 500 ítems sincroniza una vez, no 500).
+  - sweep_expired(): borra en bloque las reservas vencidas (que ya no
+    cuentan desde que vencen).
+"""
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from billing_app.models import Invoice
+from delivery_app.models import DeliveryNote
+
+from .models import ProductVariation, StockReservation
+
+# Estados en que el documento aparta stock
+HOLDING = {
+    Invoice: {Invoice.InvoiceStatus.DRAFT},
+    DeliveryNote: {DeliveryNote.DeliveryStatus.PENDING, DeliveryNote.DeliveryStatus.PREPARING},
+}
+
+
+class ReservationError(Exception):
+    """No hay disponible suficiente; `shortages` = {variation_id: unidades que faltan}"""
+
+    def __init__(self, shortages):
+        self.shortages = shortages
+        super().__init__(f"Stock insuficiente para reservar {len(shortages)} variación(es).")
+
+
+def _document_filter(document):
+    field = 'invoice' if isinstance(document, Invoice) else 'delivery_note'
+    return {field: document}
+
+
+def is_holding(document):
+    return document.status in HOLDING[type(document)]
+
+
+def default_expiry():
+    return timezone.now() + timedelta(hours=getattr(settings, 'RESERVATION_HOLD_HOURS', 72))
+
+
+# ==========================================
+# 1. DISPONIBLE PARA PROMETER
+# ==========================================
+def availability(variation_ids, at=None):
+    """{variation_id: {'stock', 'reserved', 'available'}} en una consulta"""
+    return {
+        row['pk']: {'stock': row['stock'], 'reserved': row['reserved'], 'available': row['available']}
+        for row in ProductVariation.objects.filter(pk__in=variation_ids).order_by()
+        .with_available(at).values('pk', 'stock', 'reserved', 'available')
+    }
+
+
+# ==========================================
+# 2. RESERVA Y LIBERACIÓN
+# ==========================================
+def reserve(document, lines, expires_at=None, partial=False):
+    """
+    Reemplaza las reservas de `document` (Invoice o DeliveryNote) por `lines`
+    ({variation_id: unidades}). Si algo no alcanza, partial=False lanza
+    ReservationError sin tocar nada; partial=True aparta lo que haya.
+    Devuelve {variation_id: unidades que faltaron}.
+    """
+    lines = {pk: qty for pk, qty in lines.items() if qty > 0}
+    expires_at = expires_at or default_expiry()
+    with transaction.atomic():
+        # Las reservas de otros documentos se cuentan con las variaciones bloqueadas
+        list(ProductVariation.objects.select_for_update().filter(pk__in=lines).order_by('pk')
+             .values_list('pk', flat=True))
+        StockReservation.objects.filter(**_document_filter(document)).delete()
+        if not lines:
+            return {}
+
+        free = availability(lines)
+        rows, shortages = [], {}
+        for pk, wanted in lines.items():
+            held = min(wanted, max(free.get(pk, {}).get('available', 0), 0))
+            if held < wanted:
+                shortages[pk] = wanted - held
+            if held:
+                rows.append(StockReservation(variation_id=pk, quantity=held, expires_at=expires_at,
+                                             **_document_filter(document)))
+        if shortages and not partial:
+            raise ReservationError(shortages)
+        StockReservation.objects.bulk_create(rows)
+    return shortages
+
+
+def release(document):
+    """Libera las reservas de `document`; devuelve cuántas había"""
+    deleted, _ = StockReservation.objects.filter(**_document_filter(document)).delete()
+    return deleted
+
+
+def document_lines(document):
+    """
+    {variation_id: unidades} de los ítems del documento. Un ítem sin variación
+    se asigna a la única variación de su producto; si tiene varias, no se reserva.
+    """
+    items = list(document.items.values_list('variation_id', 'product_id', 'quantity'))
+    pending = {product_id for variation_id, product_id, _ in items if variation_id is None and product_id}
+    single = dict(
+        ProductVariation.objects.filter(product_id__in=pending).order_by().values('product_id')
+        .annotate(n=Count('pk'), first=Min('pk')).filter(n=1).values_list('product_id', 'first')
+    ) if pending else {}
+
+    lines = {}
+    for variation_id, product_id, quantity in items:
+        variation_id = variation_id or single.get(product_id)
+        if variation_id is not None:
+            # Las cantidades de los documentos admiten decimales; el stock es entero
+            lines[variation_id] = lines.get(variation_id, 0) + math.ceil(quantity)
+    return lines
+
+
+def sync_document(document):
+    """Reserva (lo disponible) si el documento está abierto; si no, libera. Devuelve los faltantes."""
+    # Sincronizado ahora (p. ej. desde el admin): el commit no lo repite
+    pending = _pending(transaction.get_connection())
+    if pending:
+        pending.discard((type(document), document.pk))
+    if not is_holding(document):
+        release(document)
+        return {}
+    if isinstance(document, DeliveryNote) and document.invoice_id:
+        # La nota de entrega toma el relevo de su factura: no se reserva dos veces
+        StockReservation.objects.filter(invoice_id=document.invoice_id).delete()
+    return reserve(document, document_lines(document), partial=True)
+
+
+def _pending(connection):
+    """
+    Documentos por sincronizar de la transacción en curso, o None si su cola ya
+    no está (se confirmó o se revirtió). El flush se reconoce por su lugar en la
+    cola de on_commit de la conexión: sin recorrerla ítem por ítem.
+    """
+    state = getattr(connection, '_reservation_sync', None)
+    if state is None:
+        return None
+    queue = connection.run_on_commit
+    if len(queue) <= state['index'] or queue[state['index']][1] is not state['flush']:
+        return None
+    return state['keys']
+
+
+def _sync_keys(keys):
+    by_model = {}
+    for model, pk in keys:
+        by_model.setdefault(model, []).append(pk)
+    for model, pks in by_model.items():
+        # Releídos: en un borrado en cascada el documento ya no existe
+        for document in model.objects.filter(pk__in=pks).order_by('pk'):
+            sync_document(document)
+
+
+def schedule_sync(model, pk):
+    """Encola la sincronización del documento para el commit; una sola vez por transacción"""
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        _sync_keys([(model, pk)])
+        return
+    keys = _pending(connection)
+    if keys is None:
+        keys = set()
+
+        def flush():
+            connection._reservation_sync = None
+            _sync_keys(sorted(keys, key=lambda key: (key[0]._meta.label, key[1])))
+        connection._reservation_sync = {'keys': keys, 'flush': flush, 'index': len(connection.run_on_commit)}
+        transaction.on_commit(flush)
+    keys.add((model, pk))
+
+
+def shortfall(document):
+    """{variation_id: unidades sin reservar} de un documento abierto"""
+    if not is_holding(document):
+        return {}
+    held = {}
+    for variation_id, quantity in StockReservation.objects.filter(**_document_filter(document)).values_list(
+            'variation_id', 'quantity'):
+        held[variation_id] = held.get(variation_id, 0) + quantity
+    return {pk: wanted - held.get(pk, 0) for pk, wanted in document_lines(document).items() if wanted > held.get(pk, 0)}
+
+
+# ==========================================
+# 3. VENCIMIENTOS
+# ==========================================
+def sweep_expired(batch_size=5000, at=None):
+    """Borra las reservas vencidas por lotes (transacciones cortas); devuelve cuántas"""
+    at = at or timezone.now()
+    total = 0
+    while True:
+        ids = list(StockReservation.objects.filter(expires_at__lte=at).order_by('expires_at')
+                   .values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return total
+        total += StockReservation.objects.filter(pk__in=ids).delete()[0]
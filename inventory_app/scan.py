@@ -0,0 +1,261 @@
+# inventory_app/scan.py
+
+"""
+Tabla de búsqueda en memoria para escaneos (código de barras / SKU / SKU variante).
+
+Un diccionario por proceso {código: respuesta} que se calienta con una sola
+consulta al arrancar el worker. Los escaneos se resuelven sin tocar la base
+de datos; si un código no está (p. ej. creado en otro worker) se consulta la
+BD como respaldo y se agrega a la tabla.
+
+Invalidación:
+  - Local: las señales del catálogo eliminan los códigos del producto afectado.
+  - Entre procesos: un contador 'scan' en la caché compartida. Cada worker lo
+    revisa como máximo cada SCAN_TABLE_RECHECK_SECONDS y, si cambió, descarta
+    su tabla y la recalienta en el siguiente escaneo.
+  - Ambas corren al confirmar la transacción (on_commit): antes, otro worker
+    podría recalentar con la versión nueva y los datos aún sin confirmar.
+  - Respaldo: pasados SCAN_TABLE_TTL_SECONDS desde el calentado la tabla se
+    descarta igual (cambios hechos fuera del ORM, un aviso perdido).
+Los cambios que sólo tocan stock no invalidan nada: la tabla no guarda stock.
+"""
+import logging
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Q
+
+from . import cache as catalog_cache
+from .models import Product, ProductVariation
+
+logger = logging.getLogger(__name__)
+
+SCOPE_SCAN = 'scan'
+
+
+def normalize(code):
+    return (code or '').strip().upper()
+
+
+def _variation_entry(v, product):
+    return {
+        'match': 'variation',
+        'id': v['id'],
+        'sku': v['sku_variant'],
+        'size': v['size'],
+        'color': v['color'],
+        'product_id': product['id'],
+        'product_sku': product['sku'],
+        'name': product['name'],
+        'price': float(product['sale_price']),
+        'cost': float(product['cost_price']),
+    }
+
+
+def _product_entry(product, variations):
+    return {
+        'match': 'product',
+        'product_id': product['id'],
+        'product_sku': product['sku'],
+        'barcode': product['barcode'],
+        'name': product['name'],
+        'price': float(product['sale_price']),
+        'cost': float(product['cost_price']),
+        'variations': [
+            {'id': v['id'], 'sku': v['sku_variant'], 'size': v['size'], 'color': v['color']}
+            for v in variations
+        ],
+    }
+
+
+def _build(product_filter=None):
+    """Construye {código: entrada} y {producto: [códigos]} con dos consultas"""
+    products = Product.objects.filter(is_active=True)
+    if product_filter is not None:
+        products = products.filter(product_filter)
+    products = {
+        p['id']: p for p in products.values('id', 'sku', 'barcode', 'name', 'sale_price', 'cost_price')
+    }
+    variations = {}
+    for v in (ProductVariation.objects.filter(product_id__in=list(products))
+              .order_by('pk').values('id', 'product_id', 'sku_variant', 'size', 'color')):
+        variations.setdefault(v['product_id'], []).append(v)
+
+    codes, by_product = {}, {}
+    for pk, product in products.items():
+        product_codes = by_product.setdefault(pk, [])
+        own = variations.get(pk, [])
+        entry = _product_entry(product, own)
+        for code in (product['sku'], product['barcode']):
+            if code:
+                codes[normalize(code)] = entry
+                product_codes.append(normalize(code))
+        for v in own:
+            codes[normalize(v['sku_variant'])] = _variation_entry(v, product)
+            product_codes.append(normalize(v['sku_variant']))
+    return codes, by_product
+
+
+class ScanTable:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._codes = {}
+        self._by_product = {}
+        self._warm = False
+        self._version = None
+        self._checked_at = 0.0
+        self._warmed_at = 0.0
+        self.stats = {'hits': 0, 'db_fallbacks': 0, 'not_found': 0, 'warmups': 0}
+
+    # --- Ciclo de vida ---
+    def warm(self):
+        version = catalog_cache.get_version(SCOPE_SCAN)
+        codes, by_product = _build()
+        with self._lock:
+            self._codes, self._by_product = codes, by_product
+            self._warm = True
+            self._version = version
+            self._checked_at = self._warmed_at = time.monotonic()
+            self.stats['warmups'] += 1
+        return len(codes)
+
+    def clear(self):
+        with self._lock:
+            self._codes, self._by_product = {}, {}
+            self._warm = False
+
+    def _recheck_due(self):
+        interval = getattr(settings, 'SCAN_TABLE_RECHECK_SECONDS', 2)
+        now = time.monotonic()
+        if now - self._checked_at < interval:
+            return False
+        self._checked_at = now
+        return True
+
+    def _expired(self):
+        ttl = getattr(settings, 'SCAN_TABLE_TTL_SECONDS', 300)
+        return self._warm and bool(ttl) and time.monotonic() - self._warmed_at >= ttl
+
+    def _check_version(self):
+        if self._expired() or (self._recheck_due() and catalog_cache.get_version(SCOPE_SCAN) != self._version):
+            self.clear()
+
+    # --- Lectura ---
+    def lookup(self, code):
+        code = normalize(code)
+        if not code:
+            return None
+        self._check_version()
+        if not self._warm:
+            self.warm()
+
+        entry = self._codes.get(code)
+        if entry is not None:
+            self.stats['hits'] += 1
+            return entry
+
+        # Respaldo en BD (código creado en otro worker antes de propagar la versión)
+        self.stats['db_fallbacks'] += 1
+        product_id = (
+            ProductVariation.objects.filter(sku_variant__iexact=code, product__is_active=True)
+            .values_list('product_id', flat=True).first()
+            or Product.objects.filter(Q(sku__iexact=code) | Q(barcode__iexact=code), is_active=True)
+            .values_list('pk', flat=True).first()
+        )
+        if product_id is None:
+            self.stats['not_found'] += 1
+            return None
+        codes, by_product = _build(Q(pk=product_id))
+        with self._lock:
+            self._codes.update(codes)
+            self._by_product.update(by_product)
+        return codes.get(code)
+
+    async def alookup(self, code):
+        """
+        Versión async: el acierto en la tabla no espera nada; la revisión de
+        versión usa la caché async y el respaldo usa el ORM async. Sólo el
+        recalentado completo (raro) corre en un hilo.
+        """
+        code = normalize(code)
+        if not code:
+            return None
+        if self._expired():
+            self.clear()
+        elif self._recheck_due():
+            (version,) = await catalog_cache.aget_versions((SCOPE_SCAN, None))
+            if version != self._version:
+                self.clear()
+        if not self._warm:
+            await sync_to_async(self.warm)()
+
+        entry = self._codes.get(code)
+        if entry is not None:
+            self.stats['hits'] += 1
+            return entry
+
+        self.stats['db_fallbacks'] += 1
+        product_id = await (
+            ProductVariation.objects.filter(sku_variant__iexact=code, product__is_active=True)
+            .values_list('product_id', flat=True).afirst()
+        )
+        if product_id is None:
+            product_id = await (
+                Product.objects.filter(Q(sku__iexact=code) | Q(barcode__iexact=code), is_active=True)
+                .values_list('pk', flat=True).afirst()
+            )
+        if product_id is None:
+            self.stats['not_found'] += 1
+            return None
+        codes, by_product = await sync_to_async(_build)(Q(pk=product_id))
+        with self._lock:
+            self._codes.update(codes)
+            self._by_product.update(by_product)
+        return codes.get(code)
+
+    # --- Invalidación ---
+    def invalidate_products(self, product_ids):
+        """Elimina los códigos locales y avisa a los demás workers"""
+        with self._lock:
+            for pk in product_ids:
+                for code in self._by_product.pop(pk, ()):
+                    self._codes.pop(code, None)
+        new_version = catalog_cache.bump(SCOPE_SCAN)
+        # Si nadie más cambió la versión entretanto, este proceso ya está al día
+        # y no necesita recalentar por su propio aviso.
+        with self._lock:
+            if self._version is not None and new_version == self._version + 1:
+                self._version = new_version
+
+    def __len__(self):
+        return len(self._codes)
+
+
+table = ScanTable()
+
+
+def lookup(code):
+    return table.lookup(code)
+
+
+async def alookup(code):
+    return await table.alookup(code)
+
+
+def invalidate_products(product_ids):
+    table.invalidate_products(product_ids)
+
+
+def warm_on_startup():
+    """Llamado desde core.wsgi / core.asgi al cargar el worker"""
+    if not getattr(settings, 'SCAN_TABLE_WARM_ON_STARTUP', True):
+        return
+    try:
+        count = table.warm()
+        logger.info("Tabla de escaneo precargada con %s códigos", count)
+    except DatabaseError as exc:
+        # Sin BD al arrancar (migraciones pendientes, etc.): se calentará en el primer escaneo
+        logger.warning("No se pudo precargar la tabla de escaneo: %s", exc)
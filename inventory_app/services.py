@@ -0,0 +1,197 @@
+# inventory_app/services.py
+
+"""
+Contabilización masiva de movimientos (despachos y reposiciones).
+
+`post_movements` aplica cientos de líneas con un número fijo de consultas:
+  1. Bloquea y lee todas las variaciones involucradas (SELECT ... FOR UPDATE).
+  2. Valida cada línea contra un stock "en curso" calculado en memoria.
+  3. Inserta los movimientos con bulk_create (no pasa por Model.save()).
+  4. Ajusta el stock con un único UPDATE ... CASE.
+  5. Abre / consume las capas de costo (costing.py) y guarda el nuevo costo
+     promedio de los productos cuyo valor cambió.
+
+Como bulk_create/update no disparan señales, aquí mismo invalidamos la caché
+y la tabla de escaneo, registramos los cambios para la sincronización delta
+y publicamos los eventos del Dashboard en vivo.
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Case, When, Value, F, Q
+
+from . import cache as catalog_cache
+from . import changes
+from . import costing
+from . import live
+from . import metrics
+from .models import ProductVariation, Dispatch, StockArrival
+
+DISPATCH = 'dispatch'
+ARRIVAL = 'arrival'
+# Variaciones por UPDATE ... CASE de stock: un conteo grande ajusta miles de una vez
+UPDATE_CHUNK = 500
+
+
+class MovementError(Exception):
+    """Lote rechazado completo (modo todo-o-nada). Lleva los resultados por línea."""
+
+    def __init__(self, message, results):
+        super().__init__(message)
+        self.results = results
+
+
+def _line_error(index, message):
+    return {'line': index, 'status': 'error', 'error': message}
+
+
+def _quantity(value):
+    """Entero positivo o None: 2.7 no se trunca a 2, la línea se rechaza (como en counting)"""
+    try:
+        quantity = Decimal(str(value).strip())
+    except InvalidOperation:
+        return None
+    if not quantity.is_finite() or quantity != quantity.to_integral_value() or quantity <= 0:
+        return None
+    return int(quantity)
+
+
+def _resolve_variations(lines):
+    """Una sola consulta (con bloqueo de filas) para ids y SKUs de variante"""
+    ids, skus = set(), set()
+    for line in lines:
+        if line.get('variation') not in (None, ''):
+            try:
+                ids.add(int(line['variation']))
+            except (TypeError, ValueError):
+                pass
+        elif line.get('sku'):
+            skus.add(str(line['sku']).strip().upper())
+
+    if not ids and not skus:
+        return {}, {}
+
+    variations = list(
+        ProductVariation.objects.select_for_update(of=('self',))
+        .select_related('product')
+        .filter(Q(pk__in=ids) | Q(sku_variant__in=skus))
+        .order_by('pk')  # Orden estable de bloqueo: evita interbloqueos
+    )
+    return {v.pk: v for v in variations}, {v.sku_variant: v for v in variations}
+
+
+def post_movements(lines, user=None, destination='', supplier='General', partial=True):
+    """
+    Contabiliza una lista de líneas:
+        {'type': 'dispatch'|'arrival', 'variation': id | 'sku': sku_variant,
+         'qty': n, 'cost': x, 'destination': str, 'supplier': str}
+
+    Con partial=True las líneas inválidas se informan y se omiten; con
+    partial=False cualquier error revierte el lote (MovementError).
+    Devuelve una lista de resultados, uno por línea y en el mismo orden.
+    """
+    with transaction.atomic():
+        by_id, by_sku = _resolve_variations(lines)
+        running_stock = {pk: v.stock for pk, v in by_id.items()}
+
+        results = []
+        dispatches, arrivals = [], []
+        pending = []  # (índice de resultado, objeto) para asignar ids tras el insert
+
+        for index, line in enumerate(lines):
+            kind = line.get('type')
+            if kind not in (DISPATCH, ARRIVAL):
+                results.append(_line_error(index, "Tipo inválido (use 'dispatch' o 'arrival')."))
+                continue
+
+            if line.get('variation') not in (None, ''):
+                try:
+                    variation = by_id.get(int(line['variation']))
+                except (TypeError, ValueError):
+                    variation = None
+            else:
+                variation = by_sku.get(str(line.get('sku', '')).strip().upper())
+            if variation is None:
+                results.append(_line_error(index, "Variación no encontrada."))
+                continue
+
+            quantity = _quantity(line.get('qty'))
+            if quantity is None:
+                results.append(_line_error(index, "Cantidad inválida."))
+                continue
+
+            if kind == DISPATCH:
+                if running_stock[variation.pk] < quantity:
+                    results.append(_line_error(index, f"Stock insuficiente para {variation.product.name}"))
+                    continue
+                running_stock[variation.pk] -= quantity
+                obj = Dispatch(
+                    variation=variation,
+                    quantity=quantity,
+                    destination=line.get('destination') or destination,
+                    user=user,
+                )
+                dispatches.append(obj)
+            else:
+                try:
+                    cost = Decimal(str(line['cost'])) if line.get('cost') not in (None, '') else variation.product.cost_price
+                except InvalidOperation:
+                    results.append(_line_error(index, "Costo inválido."))
+                    continue
+                running_stock[variation.pk] += quantity
+                obj = StockArrival(
+                    variation=variation,
+                    quantity=quantity,
+                    unit_cost=cost,
+                    supplier=line.get('supplier') or supplier,
+                    user=user,
+                )
+                arrivals.append(obj)
+
+            results.append({
+                'line': index, 'status': 'ok', 'type': kind,
+                'variation': variation.pk, 'stock': running_stock[variation.pk],
+            })
+            pending.append((len(results) - 1, obj))
+
+        if not partial and any(r['status'] == 'error' for r in results):
+            raise MovementError("El lote contiene líneas inválidas.", results)
+
+        if dispatches:
+            Dispatch.objects.bulk_create(dispatches)
+        if arrivals:
+            StockArrival.objects.bulk_create(arrivals)
+
+        deltas = {pk: running_stock[pk] - v.stock for pk, v in by_id.items() if running_stock[pk] != v.stock}
+        changed = sorted(deltas)
+        for start in range(0, len(changed), UPDATE_CHUNK):
+            chunk = changed[start:start + UPDATE_CHUNK]
+            ProductVariation.objects.filter(pk__in=chunk).update(
+                stock=F('stock') + Case(*[When(pk=pk, then=Value(deltas[pk])) for pk in chunk], default=Value(0))
+            )
+
+        # Capas de costo: los ingresos primero para que un despacho del mismo lote pueda consumirlos
+        costing.receive(arrivals)
+        costing.consume(dispatches)
+        products = {m.variation.product_id: m.variation.product for m in dispatches + arrivals}
+        new_costs = {}
+        if products:
+            new_costs = {
+                pk: cost for pk, cost in costing.average_costs(list(products)).items() if cost != products[pk].cost_price
+            }
+        if new_costs:
+            # Invalida también catálogo, escaneo (el costo es parte de su respuesta) y sincronización
+            costing.store_costs(new_costs)
+
+        for result_index, obj in pending:
+            results[result_index]['id'] = obj.pk
+
+        touched_products = {v.product_id for pk, v in by_id.items() if pk in deltas} - set(new_costs)
+        if touched_products:
+            # Sin cambio de costo sólo cambian existencias: los fragmentos de catálogo siguen valiendo
+            transaction.on_commit(lambda: catalog_cache.invalidate_products(touched_products, stock_only=True))
+        changes.record(changes.Entity.STOCK, sorted(deltas))
+        live.publish_movements(dispatches, arrivals, deltas)
+        metrics.count_movements(dispatches, arrivals)
+
+    return results
@@ -0,0 +1,111 @@
+# inventory_app/signals.py
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from billing_app.models import Invoice, InvoiceItem
+from delivery_app.models import DeliveryNote, DeliveryNoteItem
+
+from . import cache as catalog_cache
+from . import changes
+from . import live
+from . import metrics
+from . import reservations
+from . import scan
+from .models import Category, Product, ProductVariation, Dispatch, StockArrival
+
+
+# ==========================================
+# INVALIDACIÓN DE LA CACHÉ DEL CATÁLOGO
+# ==========================================
+# Las versiones (caché y tabla de escaneo) se incrementan al confirmar: si
+# subieran antes, otra petición podría guardar un fragmento o recalentar su
+# tabla con la versión nueva y los datos viejos.
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_category_cache(sender, instance, **kwargs):
+    transaction.on_commit(catalog_cache.invalidate_categories)
+
+
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_product_cache(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: catalog_cache.invalidate_product(pk))
+    transaction.on_commit(lambda: scan.invalidate_products([pk]))
+
+
+@receiver([post_save, post_delete], sender=ProductVariation)
+def invalidate_variation_cache(sender, instance, update_fields=None, **kwargs):
+    # Cambios de stock incluidos: el detalle y el buscador muestran existencias
+    product_id = instance.product_id
+    stock_only = update_fields is not None and set(update_fields) == {'stock'}
+    transaction.on_commit(lambda: catalog_cache.invalidate_product(product_id, stock_only=stock_only))
+    # La tabla de escaneo no guarda stock: sólo se invalida si cambió el catálogo
+    if not stock_only:
+        transaction.on_commit(lambda: scan.invalidate_products([product_id]))
+
+
+# ==========================================
+# BITÁCORA PARA SINCRONIZACIÓN DELTA
+# ==========================================
+@receiver(post_save, sender=Product)
+def record_product_change(sender, instance, **kwargs):
+    changes.record(changes.Entity.PRODUCT, [instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def record_product_delete(sender, instance, **kwargs):
+    changes.record(changes.Entity.PRODUCT, [instance.pk], changes.Operation.DELETE)
+
+
+@receiver(post_save, sender=ProductVariation)
+def record_variation_change(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) == {'stock'}:
+        changes.record(changes.Entity.STOCK, [instance.pk])
+    else:
+        changes.record(changes.Entity.VARIATION, [instance.pk])
+
+
+@receiver(post_delete, sender=ProductVariation)
+def record_variation_delete(sender, instance, **kwargs):
+    changes.record(changes.Entity.VARIATION, [instance.pk], changes.Operation.DELETE)
+
+
+# ==========================================
+# DASHBOARD EN VIVO Y MÉTRICAS
+# ==========================================
+# Movimientos guardados uno a uno (admin, otros módulos). La ruta masiva
+# (services.post_movements) usa bulk_create y publica por su cuenta.
+@receiver(post_save, sender=Dispatch)
+def publish_dispatch(sender, instance, created, **kwargs):
+    if created:
+        live.publish_movements(dispatches=[instance], stock_deltas={instance.variation_id: -instance.quantity})
+        metrics.count_movements(dispatches=[instance])
+
+
+@receiver(post_save, sender=StockArrival)
+def publish_arrival(sender, instance, created, **kwargs):
+    if created:
+        live.publish_movements(arrivals=[instance], stock_deltas={instance.variation_id: instance.quantity})
+        metrics.count_movements(arrivals=[instance])
+
+
+# ==========================================
+# RESERVAS DE STOCK DE LOS DOCUMENTOS
+# ==========================================
+# Al confirmar, una vez por documento aunque se guarden cientos de ítems
+# (reservations.schedule_sync). Quien necesite los faltantes dentro de la
+# transacción (el admin) llama a reservations.sync_document directamente.
+@receiver(post_save, sender=Invoice)
+@receiver(post_save, sender=DeliveryNote)
+def sync_document_reservations(sender, instance, **kwargs):
+    reservations.schedule_sync(sender, instance.pk)
+
+
+@receiver([post_save, post_delete], sender=InvoiceItem)
+@receiver([post_save, post_delete], sender=DeliveryNoteItem)
+def sync_item_reservations(sender, instance, **kwargs):
+    if sender is InvoiceItem:
+        reservations.schedule_sync(Invoice, instance.invoice_id)
+    else:
+        reservations.schedule_sync(DeliveryNote, instance.delivery_note_id)
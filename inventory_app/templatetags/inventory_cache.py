@@ -0,0 +1,29 @@
+# inventory_app/templatetags/inventory_cache.py
+
+"""
+Claves para {% cache %} a partir de los contadores de versión del catálogo.
+
+    {% load cache inventory_cache %}
+    {% fragment_version 'stock' 'products' as ver %}
+    {% cache 3600 inventory_table ver query order %} ... {% endcache %}
+
+Cada movimiento de stock o edición del catálogo sube un contador (al
+confirmar la transacción), la clave cambia y el fragmento viejo deja de
+leerse: nunca se sirve una tabla desactualizada.
+"""
+from django import template
+
+from .. import cache as catalog_cache
+
+register = template.Library()
+
+FRAGMENT_SCOPES = {catalog_cache.SCOPE_STOCK, catalog_cache.SCOPE_PRODUCTS, catalog_cache.SCOPE_CATEGORY}
+
+
+@register.simple_tag
+def fragment_version(*scopes, product=None):
+    """Versión compuesta de los ámbitos indicados (y de un producto, si se pasa)"""
+    unknown = set(scopes) - FRAGMENT_SCOPES
+    if unknown:
+        raise template.TemplateSyntaxError(f"fragment_version: ámbito desconocido {sorted(unknown)}")
+    return catalog_cache.fragment_version(*scopes, product=product)
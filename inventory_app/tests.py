@@ -1,3 +1,857 @@
-from django.test import TestCase
+# inventory_app/tests.py
 
-# Create your tests here.
+"""
+Presupuesto de consultas por vista.
+
+Cada vista se mide en frío (cachés, fragmentos y tabla de escaneo vacíos)
+sobre un set de datos sintético chico (~10 filas por tabla) y de nuevo tras
+crecerlo a ~1.000 filas. Se exige:
+  - un máximo de consultas por vista (el presupuesto), y
+  - que el conteo no crezca con los datos (sin N+1).
+Si falla, el mensaje lista el SQL ejecutado para ubicar la consulta culpable.
+
+Al final, tests de comportamiento de los módulos de dominio (precios, ...).
+
+QueryBudgetTestCase la reutilizan los tests.py de las demás apps (admin y API).
+"""
+import json
+import time
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import cache as catalog_cache
+from billing_app.models import Invoice, InvoiceItem
+from core import db_router
+from core import metrics as core_metrics
+
+from . import costing, counting, live, pricing, reservations, scan, services, variants
+from .models import (
+    Category, CostConsumption, CostLayer, CountLine, CountSession, Dispatch, PriceHistory, Product, ProductVariation, StockArrival,
+)
+from .urls import urlpatterns as inventory_urlpatterns
+
+# Filas por tabla del set chico y del crecido
+SMALL_ROWS = 10
+LARGE_ROWS = 1000
+# Presupuesto por defecto de un changelist del admin (sesión, usuario, conteos,
+# página de resultados, filtros)
+ADMIN_CHANGELIST_BUDGET = 8
+# Cachés por proceso: las de archivo (por defecto) sobrevivirían a la BD de
+# prueba y servirían datos de otra corrida con las mismas versiones
+TEST_CACHES = {
+    alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'test-{alias}'}
+    for alias in settings.CACHES
+}
+
+
+def grow_dataset(prefix, rows):
+    """Carga `rows` filas por tabla con generate_synthetic_data (fecha fija: reproducible)"""
+    call_command(
+        'generate_synthetic_data',
+        prefix=prefix, seed=7, end_date='2025-06-30', years=1,
+        categories=max(rows // 100, 2), products=rows, variations=3,
+        warehouses=2, users=2, clients=rows, suppliers=max(rows // 10, 2),
+        invoices=rows, purchase_orders=rows, delivery_notes=rows, movements=rows,
+        stdout=StringIO(),
+    )
+
+
+# ==========================================
+# BASE COMÚN
+# ==========================================
+@override_settings(CACHES=TEST_CACHES, SCAN_TABLE_WARM_ON_STARTUP=False)
+class QueryBudgetTestCase(TestCase):
+    """
+    Las subclases describen sus casos como {nombre: (presupuesto, petición)}
+    donde petición es un callable que recibe el Client y devuelve la respuesta
+    (armado con get_case / post_case, que además verifican el código HTTP).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.load_dataset('QBS', SMALL_ROWS)
+        cls.superuser = get_user_model().objects.create_superuser('qb-admin', 'qb@example.com', 'x')
+
+    @classmethod
+    def load_dataset(cls, prefix, rows):
+        """Punto de extensión: las subclases agregan lo que sus vistas necesiten"""
+        grow_dataset(prefix, rows)
+
+    def setUp(self):
+        self.client.force_login(self.superuser)
+
+    def get_case(self, url, status=200, **extra):
+        def request(client):
+            response = client.get(url, **extra)
+            self.assertEqual(response.status_code, status, f"GET {url}")
+            return response
+        return request
+
+    def post_case(self, url, data, status=302, **extra):
+        # Un formulario rechazado vuelve a renderizarse con 200: no mediría la ruta de escritura
+        def request(client):
+            response = client.post(url, data, **extra)
+            self.assertEqual(response.status_code, status, f"POST {url}: {response.content[:300]!r}")
+            return response
+        return request
+
+    def reset_caches(self):
+        # Incluye los fragmentos de plantilla: medimos el render completo
+        for cache in caches.all():
+            cache.clear()
+        catalog_cache.clear_local()
+        scan.table.clear()
+
+    def count_queries(self, request):
+        """Ejecuta la petición en frío; devuelve (respuesta, consultas capturadas)"""
+        # Una pasada previa calienta lo ajeno a la app (ContentTypes, plantillas)
+        request(self.client)
+        self.reset_caches()
+        with CaptureQueriesContext(connection) as ctx:
+            response = request(self.client)
+        return response, ctx.captured_queries
+
+    def format_queries(self, queries):
+        return '\n'.join(f"{i}. {q['sql']}" for i, q in enumerate(queries, 1))
+
+    def measure_cases(self, cases):
+        """{nombre: (presupuesto, petición)} -> {nombre: nº de consultas}; verifica el presupuesto"""
+        counts = {}
+        for name, (budget, request) in cases.items():
+            with self.subTest(name):
+                _, queries = self.count_queries(request)
+                counts[name] = len(queries)
+                self.assertLessEqual(
+                    len(queries), budget,
+                    f"{name}: {len(queries)} consultas, presupuesto {budget}.\n{self.format_queries(queries)}",
+                )
+        return counts
+
+    def assert_query_budgets(self, cases, prefix):
+        """Mide con el set chico, crece a LARGE_ROWS y exige el mismo conteo"""
+        small = self.measure_cases(cases)
+        self.load_dataset(prefix, LARGE_ROWS)
+        for name, (_, request) in cases.items():
+            if name not in small:
+                # Ya falló con el set chico
+                continue
+            with self.subTest(name):
+                _, queries = self.count_queries(request)
+                self.assertLessEqual(
+                    len(queries), small[name],
+                    f"{name}: {small[name]} consultas con {SMALL_ROWS} filas y {len(queries)} con "
+                    f"{LARGE_ROWS} (N+1).\n{self.format_queries(queries)}",
+                )
+
+    def admin_changelist_cases(self, app_label, budgets=None):
+        """Un caso por cada ModelAdmin registrado de la app (no se escapa ninguno nuevo)"""
+        budgets = budgets or {}
+        cases = {}
+        for model in admin.site._registry:
+            if model._meta.app_label != app_label:
+                continue
+            name = model._meta.model_name
+            url = reverse(f'admin:{app_label}_{name}_changelist')
+            cases[f'admin:{name}'] = (budgets.get(name, ADMIN_CHANGELIST_BUDGET), self.get_case(url))
+        self.assertTrue(cases, f"{app_label} no tiene modelos en el admin")
+        return cases
+
+    def assert_covers(self, expected, cases):
+        missing = sorted(set(expected) - set(cases))
+        self.assertFalse(missing, f"Vistas sin presupuesto de consultas: {missing}")
+
+
+# ==========================================
+# VISTAS DE INVENTARIO
+# ==========================================
+class InventoryQueryBudgetTests(QueryBudgetTestCase):
+
+    def inventory_cases(self):
+        product = Product.objects.order_by('pk').first()
+        variations = list(ProductVariation.objects.filter(stock__gte=10).order_by('pk')[:3])
+        sku = variations[0].sku_variant
+        ajax = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'}
+        lines = {
+            'items_data': '[' + ','.join(f'{{"id": {v.pk}, "qty": 1, "cost": "5.00"}}' for v in variations) + ']',
+        }
+
+        reprice = {'rule': 'PERCENT', 'value': '1', 'category': product.category_id}
+
+        def get(name, *args, query='', status=200, **extra):
+            return self.get_case(reverse(name, args=args) + query, status, **extra)
+
+        def post(name, data, *args):
+            return self.post_case(reverse(name, args=args), data)
+
+        return {
+            # +2: con pocos movimientos en el mes, recent() repite sobre todo el historial
+            'inventory_dashboard': (11, get('inventory_dashboard')),
+            'dashboard_stream': (3, get('dashboard_stream', status=503)),
+            'inventory_list': (4, get('inventory_list')),
+            'inventory_list:ajax': (4, get('inventory_list', query='?o=-stock', **ajax)),
+            'product_detail': (5, get('product_detail', product.pk)),
+            'create_product': (4, get('create_product')),
+            'create_dispatch': (4, get('create_dispatch')),
+            # Capas de costo: lectura con bloqueo, UPDATE de capas, INSERT de consumos,
+            # costo promedio y, si cambió, su UPDATE; INSERT en la bitácora de cambios
+            'create_dispatch:post': (14, post('create_dispatch', {**lines, 'destination': 'Planta'})),
+            'create_stock_arrival': (3, get('create_stock_arrival')),
+            # Capas de costo: INSERT de capas (o lectura y UPDATE si es promedio), costo promedio y su UPDATE
+            'create_stock_arrival:post': (12, post('create_stock_arrival', {**lines, 'supplier': 'General'})),
+            'product_search_ajax': (3, get('product_search_ajax', query='?q=a')),
+            'scan_lookup': (5, get('scan_lookup', sku)),
+            'scan_lookup:stock': (6, get('scan_lookup', sku, query='?stock=1')),
+            'product_search_ajax_async': (3, get('product_search_ajax_async', query='?q=a')),
+            'scan_lookup_async': (5, get('scan_lookup_async', sku)),
+            'update_product_price': (3, get('update_product_price', product.pk, status=302)),
+            # save() escribe precio e historial en una transacción (SAVEPOINT, UPDATE, INSERT, RELEASE)
+            'update_product_price:post': (7, post('update_product_price', {'new_price': '12.50'}, product.pk)),
+            'bulk_reprice': (4, get('bulk_reprice')),
+            'bulk_reprice:preview': (
+                6, self.post_case(reverse('bulk_reprice'), {**reprice, 'action': 'preview'}, status=200),
+            ),
+            # Lectura con bloqueo, INSERT del historial, UPDATE con la fórmula (un lote)
+            # e INSERT en la bitácora de cambios
+            'bulk_reprice:apply': (8, post('bulk_reprice', {**reprice, 'action': 'apply'})),
+            'inventory_reports': (6, get('inventory_reports', query='?interval=custom&start=2024-01-01&end=2025-06-30')),
+            'inventory_reports:arrivals': (
+                6, get('inventory_reports', query='?type=arrivals&interval=custom&start=2024-01-01&end=2025-06-30'),
+            ),
+            'catalog_cache_stats': (3, get('catalog_cache_stats')),
+        }
+
+    def test_inventory_views(self):
+        cases = self.inventory_cases()
+        self.assert_covers([p.name for p in inventory_urlpatterns], {name.split(':')[0] for name in cases})
+        self.assert_query_budgets(cases, 'QBL')
+
+    def test_admin_changelists(self):
+        self.assert_query_budgets(self.admin_changelist_cases('inventory_app'), 'QBL')
+
+
+# ==========================================
+# CACHÉ DEL CATÁLOGO
+# ==========================================
+@override_settings(CACHES=TEST_CACHES)
+class CatalogCacheTests(TestCase):
+
+    def test_versions_must_be_shared_between_workers(self):
+        with override_settings(WEB_CONCURRENCY=1):
+            catalog_cache.check_shared_versions()
+        with override_settings(WEB_CONCURRENCY=4), self.assertRaises(ImproperlyConfigured):
+            catalog_cache.check_shared_versions()
+        shared = {**TEST_CACHES, 'catalog': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                                             'LOCATION': '/tmp/sig-test-catalog'}}
+        with override_settings(WEB_CONCURRENCY=4, CACHES=shared):
+            catalog_cache.check_shared_versions()
+
+
+# ==========================================
+# TABLA DE ESCANEO
+# ==========================================
+@override_settings(CACHES=TEST_CACHES, SCAN_TABLE_RECHECK_SECONDS=0)
+class ScanTableTests(TestCase):
+
+    def setUp(self):
+        self.addCleanup(scan.table.clear)
+        self.product = Product.objects.create(sku='SC-1', name='Perno', sale_price=Decimal('10'))
+
+    def test_invalidation_waits_for_commit(self):
+        version = catalog_cache.get_version(scan.SCOPE_SCAN)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.product.sale_price = Decimal('11')
+            self.product.save()
+            # Dentro de la transacción otro worker seguiría viendo la versión anterior
+            self.assertEqual(catalog_cache.get_version(scan.SCOPE_SCAN), version)
+        self.assertTrue(callbacks)
+        self.assertGreater(catalog_cache.get_version(scan.SCOPE_SCAN), version)
+        self.assertEqual(scan.lookup('sc-1')['price'], 11.0)
+
+    def test_ttl_discards_table_without_notice(self):
+        self.assertEqual(scan.lookup('SC-1')['price'], 10.0)
+        # Cambio fuera del ORM: no hay señal ni aviso de versión
+        Product.objects.filter(pk=self.product.pk).update(sale_price=Decimal('15'))
+        self.assertEqual(scan.lookup('SC-1')['price'], 10.0)
+        with override_settings(SCAN_TABLE_TTL_SECONDS=60), \
+                mock.patch.object(scan.time, 'monotonic', return_value=scan.time.monotonic() + 61):
+            self.assertEqual(scan.lookup('SC-1')['price'], 15.0)
+
+
+# ==========================================
+# PRECIOS: HISTORIAL Y PRECIO A UNA FECHA
+# ==========================================
+def moment(year, month, day=1):
+    return datetime(year, month, day, tzinfo=dt_timezone.utc)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class PriceHistoryTests(TestCase):
+
+    def test_save_records_opening_price_and_changes(self):
+        product = Product(sku='PH-1', name='Perno', sale_price=Decimal('10'))
+        product.save()
+        opening = PriceHistory.objects.get(product=product)
+        self.assertEqual((opening.old_price, opening.new_price, opening.rule), (Decimal('10'), Decimal('10'), "Precio inicial"))
+
+        # Sin cambio de precio no hay fila nueva; tampoco si sale_price no se guarda
+        product.name = 'Perno M10'
+        product.save()
+        product.sale_price = Decimal('99')
+        product.save(update_fields=['name'])
+        self.assertEqual(PriceHistory.objects.filter(product=product).count(), 1)
+
+        product = Product.objects.get(pk=product.pk)
+        product.sale_price = Decimal('12.50')
+        product.save(price_rule="Ajuste manual")
+        change = PriceHistory.objects.filter(product=product).exclude(pk=opening.pk).get()
+        self.assertEqual((change.old_price, change.new_price, change.rule),
+                         (Decimal('10'), Decimal('12.50'), "Ajuste manual"))
+
+    def test_prices_at_across_chunks(self):
+        history, flat, gone = Product.objects.bulk_create([
+            Product(sku='PA-1', name='Con historial', sale_price=Decimal('30')),
+            Product(sku='PA-2', name='Sin historial', sale_price=Decimal('7')),
+            Product(sku='PA-3', name='Borrado', sale_price=Decimal('1')),
+        ])
+        PriceHistory.objects.bulk_create([
+            PriceHistory(product=history, old_price=10, new_price=20, effective_from=moment(2024, 1)),
+            PriceHistory(product=history, old_price=20, new_price=30, effective_from=moment(2024, 6)),
+        ])
+        gone_pk = gone.pk
+        gone.delete()
+        expected = [
+            ((history.pk, moment(2023, 6)), Decimal('10')),    # antes del primer cambio: su old_price
+            ((history.pk, moment(2024, 1)), Decimal('20')),
+            ((history.pk, moment(2024, 3)), Decimal('20')),
+            ((history.pk, moment(2025, 1)), Decimal('30')),
+            ((flat.pk, moment(2024, 3)), Decimal('7')),       # sin historial: el precio actual
+            ((gone_pk, moment(2024, 3)), None),
+            ((history.pk, moment(2023, 1)), Decimal('10')),
+        ]
+        pairs = [pair for pair, _ in expected]
+        # Lotes de 3: el fragmento SQL del precio se reutiliza en cada consulta
+        with mock.patch.object(pricing, 'LOOKUP_CHUNK', 3), CaptureQueriesContext(connection) as ctx:
+            prices = pricing.prices_at(pairs)
+        self.assertEqual(len(ctx.captured_queries), 3)
+        self.assertEqual(prices, [price for _, price in expected])
+        self.assertEqual(pricing.prices_at(pairs), prices)
+
+
+# ==========================================
+# REPRECIO MASIVO
+# ==========================================
+@override_settings(CACHES=TEST_CACHES)
+class RepricingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('precios')
+        cls.tools, cls.other = Category.objects.bulk_create([Category(name='Herramientas'), Category(name='Otros')])
+        cls.hammer, cls.drill, cls.free, cls.rope = Product.objects.bulk_create([
+            Product(sku='RP-1', name='Martillo', category=cls.tools, cost_price=Decimal('8'), sale_price=Decimal('10')),
+            Product(sku='RP-2', name='Taladro', category=cls.tools, cost_price=Decimal('50'), sale_price=Decimal('80.99')),
+            Product(sku='RP-3', name='Muestra', category=cls.tools, cost_price=Decimal('0'), sale_price=Decimal('0')),
+            Product(sku='RP-4', name='Cuerda', category=cls.other, cost_price=Decimal('2'), sale_price=Decimal('5')),
+        ])
+
+    def test_preview_totals_only_changed_products_without_writing(self):
+        products = pricing.select_products(categories=[self.tools.pk])
+        result = pricing.preview(products, pricing.Rule.PERCENT, '10')
+        # 0 * 1,10 = 0: la muestra gratuita no cambia y no cuenta
+        self.assertEqual((result['count'], result['old_total'], result['new_total']),
+                         (2, Decimal('90.99'), Decimal('100.09')))
+        self.assertEqual([(row['sku'], row['new_price'], row['delta']) for row in result['rows']],
+                         [('RP-1', Decimal('11'), Decimal('1')), ('RP-2', Decimal('89.09'), Decimal('8.10'))])
+        self.assertEqual(Product.objects.get(pk=self.hammer.pk).sale_price, Decimal('10'))
+        self.assertFalse(PriceHistory.objects.exists())
+
+    def test_apply_updates_prices_and_writes_history(self):
+        products = pricing.select_products(categories=[self.tools.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            changed = pricing.apply(products, pricing.Rule.MARKUP, '25', user=self.user)
+        self.assertEqual(changed, 1)
+
+        prices = dict(Product.objects.values_list('sku', 'sale_price'))
+        self.assertEqual(prices, {'RP-1': Decimal('10'), 'RP-2': Decimal('62.50'),
+                                  'RP-3': Decimal('0'), 'RP-4': Decimal('5')})
+        # El martillo ya valía costo + 25 % y la muestra, 0: sólo el taladro cambia y deja historial
+        history = PriceHistory.objects.get()
+        self.assertEqual((history.product_id, history.old_price, history.new_price, history.rule, history.changed_by),
+                         (self.drill.pk, Decimal('80.99'), Decimal('62.50'),
+                          pricing.describe(pricing.Rule.MARKUP, Decimal('25')), self.user))
+
+        # Aplicar de nuevo la misma regla no cambia nada
+        self.assertEqual(pricing.apply(products, pricing.Rule.MARKUP, '25', user=self.user), 0)
+        self.assertEqual(PriceHistory.objects.count(), 1)
+
+    def test_invalid_rule_or_value(self):
+        products = Product.objects.all()
+        for value in ('diez', 'NaN', '-Infinity', '1e999', pricing.VALUE_LIMIT):
+            with self.assertRaises(pricing.RepricingError):
+                pricing.preview(products, pricing.Rule.PERCENT, value)
+        with self.assertRaises(pricing.RepricingError):
+            pricing.apply(products, 'DOUBLE', '2')
+        # En la vista: mensaje de error, no un 500
+        self.client.force_login(get_user_model().objects.create_user('jefe', is_staff=True))
+        for action in ('preview', 'apply'):
+            response = self.client.post(reverse('bulk_reprice'), {'rule': pricing.Rule.PERCENT, 'value': 'NaN',
+                                                                  'action': action})
+            self.assertContains(response, "Valor fuera de rango")
+        # Nunca negativo
+        pricing.apply(products, pricing.Rule.ABSOLUTE, '-6')
+        self.assertEqual(Product.objects.get(pk=self.hammer.pk).sale_price, Decimal('4'))
+        self.assertEqual(Product.objects.get(pk=self.rope.pk).sale_price, Decimal('0'))
+
+
+# ==========================================
+# CAPAS DE COSTO (PEPS / PROMEDIO)
+# ==========================================
+@override_settings(CACHES=TEST_CACHES)
+class CostingTests(TestCase):
+
+    def variation(self, method, stock=0, cost='0'):
+        product = Product.objects.create(sku=f'CO-{method}-{stock}', name='Barra', costing_method=method,
+                                         cost_price=Decimal(cost))
+        return ProductVariation.objects.create(product=product, size='STD', color='Gen',
+                                               sku_variant=f'CO-{method}-{stock}-STD', stock=stock)
+
+    def post(self, variation, *movements):
+        services.post_movements([
+            {'type': kind, 'variation': variation.pk, 'qty': qty, 'cost': cost} for kind, qty, cost in movements
+        ], partial=False)
+
+    def open_layers(self, variation):
+        return list(CostLayer.objects.filter(variation=variation, remaining__gt=0)
+                    .order_by('received_at', 'pk').values_list('remaining', 'unit_cost'))
+
+    def consumed(self, variation):
+        return list(CostConsumption.objects.filter(dispatch__variation=variation)
+                    .order_by('pk').values_list('quantity', 'unit_cost'))
+
+    def test_fifo_consumes_oldest_layers_first(self):
+        variation = self.variation(Product.CostingMethod.FIFO)
+        self.post(variation, (services.ARRIVAL, 10, '5'), (services.ARRIVAL, 10, '8'))
+        self.post(variation, (services.DISPATCH, 15, None))
+
+        self.assertEqual(self.consumed(variation), [(10, Decimal('5')), (5, Decimal('8'))])
+        self.assertEqual(self.open_layers(variation), [(5, Decimal('8'))])
+        variation.product.refresh_from_db()
+        self.assertEqual(variation.product.cost_price, Decimal('8'))
+
+    def test_average_reweights_a_single_layer(self):
+        variation = self.variation(Product.CostingMethod.AVG)
+        self.post(variation, (services.ARRIVAL, 10, '5'), (services.ARRIVAL, 10, '8'))
+        self.assertEqual(self.open_layers(variation), [(20, Decimal('6.5'))])
+
+        self.post(variation, (services.DISPATCH, 5, None))
+        self.assertEqual(self.consumed(variation), [(5, Decimal('6.5'))])
+        self.assertEqual(self.open_layers(variation), [(15, Decimal('6.5'))])
+        variation.product.refresh_from_db()
+        self.assertEqual(variation.product.cost_price, Decimal('6.5'))
+
+    def test_rebuild_opens_layer_for_unexplained_stock(self):
+        # Stock inicial sin movimientos que lo expliquen + historial cargado sin capas (bulk_create)
+        variation = self.variation(Product.CostingMethod.FIFO, stock=35, cost='4')
+        StockArrival.objects.bulk_create([StockArrival(variation=variation, quantity=10, unit_cost=Decimal('6'))])
+        Dispatch.objects.bulk_create([Dispatch(variation=variation, quantity=5, destination='Planta')])
+
+        totals = costing.rebuild(variations=ProductVariation.objects.filter(pk=variation.pk))
+
+        self.assertEqual((totals['opening'], totals['layers'], totals['consumptions']), (1, 2, 1))
+        # Apertura: 35 - (10 - 5) = 30 al costo vigente, consumida primero por ser la más antigua
+        self.assertEqual(self.consumed(variation), [(5, Decimal('4'))])
+        self.assertEqual(self.open_layers(variation), [(25, Decimal('4')), (10, Decimal('6'))])
+        variation.product.refresh_from_db()
+        self.assertEqual(variation.product.cost_price, Decimal('4.5714'))
+
+# ==========================================
+# RESERVAS Y DISPONIBLE PARA PROMETER
+# ==========================================
+@override_settings(CACHES=TEST_CACHES)
+class ReservationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        product = Product.objects.create(sku='RS-1', name='Casco', sale_price=Decimal('10'))
+        cls.variation = ProductVariation.objects.create(product=product, size='U', color='Blanco',
+                                                        sku_variant='RS-1-U', stock=10)
+
+    def invoice(self, number, qty):
+        with self.captureOnCommitCallbacks(execute=True):
+            invoice = Invoice.objects.create(invoice_number=number, invoice_date=timezone.localdate())
+            InvoiceItem.objects.create(invoice=invoice, product=self.variation.product, variation=self.variation,
+                                       quantity=qty, unit_price=Decimal('10'))
+        return invoice
+
+    def available(self):
+        return reservations.availability([self.variation.pk])[self.variation.pk]
+
+    def test_competing_documents_share_available_to_promise(self):
+        first = self.invoice('RS-A', 6)
+        self.assertEqual(self.available(), {'stock': 10, 'reserved': 6, 'available': 4})
+
+        # La segunda factura sólo aparta lo que queda
+        second = self.invoice('RS-B', 7)
+        self.assertEqual(self.available(), {'stock': 10, 'reserved': 10, 'available': 0})
+        self.assertEqual(reservations.shortfall(second), {self.variation.pk: 3})
+
+        # Emitida, la primera deja de apartar; la segunda completa al volver a sincronizar
+        first.status = Invoice.InvoiceStatus.ISSUED
+        with self.captureOnCommitCallbacks(execute=True):
+            first.save()
+        self.assertEqual(self.available(), {'stock': 10, 'reserved': 4, 'available': 6})
+        self.assertEqual(reservations.sync_document(second), {})
+        self.assertEqual(self.available(), {'stock': 10, 'reserved': 7, 'available': 3})
+
+    def test_items_sync_document_once_at_commit(self):
+        with mock.patch.object(reservations, 'sync_document', wraps=reservations.sync_document) as sync, \
+                self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                invoice = Invoice.objects.create(invoice_number='RS-C', invoice_date=timezone.localdate())
+                for _ in range(5):
+                    InvoiceItem.objects.create(invoice=invoice, product=self.variation.product,
+                                               variation=self.variation, quantity=1, unit_price=Decimal('10'))
+                self.assertFalse(sync.called)
+        sync.assert_called_once()
+        self.assertEqual(self.available()['reserved'], 5)
+
+
+# ==========================================
+# CONTEOS FÍSICOS: APROBACIÓN
+# ==========================================
+@override_settings(CACHES=TEST_CACHES)
+class CountApprovalTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('contador')
+        product = Product.objects.create(sku='CT-1', name='Cable', sale_price=Decimal('3'))
+        cls.variations = ProductVariation.objects.bulk_create([
+            ProductVariation(product=product, size=f'{n}M', color='Negro', sku_variant=f'CT-1-{n}M', stock=10)
+            for n in range(1, 6)
+        ])
+
+    def test_approve_posts_adjustments_in_chunks(self):
+        session = CountSession.objects.create(name='Cíclico', created_by=self.user)
+        counted = [14, 7, 10, 12, 0]
+        CountLine.objects.bulk_create(CountLine(session=session, variation=v, counted_qty=qty)
+                                      for v, qty in zip(self.variations, counted))
+
+        # Lotes de 2: dos UPDATE de stock para las cuatro variaciones con diferencia
+        with mock.patch.object(services, 'UPDATE_CHUNK', 2), CaptureQueriesContext(connection) as ctx:
+            session = counting.approve(session, self.user)
+        stock_updates = [q for q in ctx.captured_queries
+                         if q['sql'].startswith('UPDATE "inventory_app_productvariation" SET "stock"')]
+        self.assertEqual(len(stock_updates), 2)
+
+        stock = dict(ProductVariation.objects.filter(pk__in=[v.pk for v in self.variations]).values_list('pk', 'stock'))
+        self.assertEqual([stock[v.pk] for v in self.variations], counted)
+        self.assertEqual((session.status, session.adjusted_lines, session.units_added, session.units_removed),
+                         (CountSession.Status.APPROVED, 4, 6, 13))
+        label = f"Ajuste por conteo #{session.pk}"
+        self.assertEqual(sorted(StockArrival.objects.filter(supplier=label).values_list('quantity', flat=True)), [2, 4])
+        self.assertEqual(sorted(Dispatch.objects.filter(destination=label).values_list('quantity', flat=True)), [3, 10])
+
+        with self.assertRaises(counting.CountError):
+            counting.approve(session, self.user)
+
+
+# ==========================================
+# RÉPLICA DE LECTURA: RUTEO Y PRIMARIO TRAS ESCRIBIR
+# ==========================================
+class ReplicaRouterTests(TestCase):
+
+    def setUp(self):
+        self.router = db_router.ReplicaRouter()
+        for patcher in (mock.patch.object(db_router, 'replica_configured', return_value=True),
+                        # TestCase corre cada test en una transacción; aquí se simula una petición sin ella
+                        mock.patch.object(connection, 'in_atomic_block', False)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def read_alias(self):
+        return self.router.db_for_read(Product)
+
+    def test_reads_go_to_replica_only_inside_use_replica(self):
+        self.assertEqual(self.read_alias(), 'default')
+        with db_router.use_replica():
+            self.assertEqual(self.read_alias(), 'replica')
+            with db_router.use_primary():
+                self.assertEqual(self.read_alias(), 'default')
+        self.assertEqual(self.router.db_for_write(Product), 'default')
+        with db_router.use_replica(), mock.patch.object(db_router, 'replica_configured', return_value=False):
+            self.assertEqual(self.read_alias(), 'default')
+
+    def test_primary_transaction_and_pinned_request_read_primary(self):
+        with db_router.use_replica():
+            with mock.patch.object(connection, 'in_atomic_block', True):
+                self.assertEqual(self.read_alias(), 'default')
+            token = db_router._pinned.set(True)
+            try:
+                self.assertEqual(self.read_alias(), 'default')
+            finally:
+                db_router._pinned.reset(token)
+
+    def test_write_sticks_browser_to_primary(self):
+        seen = []
+
+        def view(request):
+            with db_router.use_replica():
+                seen.append(self.read_alias())
+            return HttpResponse(status=400 if request.path == '/invalido/' else 200)
+
+        middleware = db_router.ReplicaStickinessMiddleware(view)
+        factory = RequestFactory()
+
+        response = middleware(factory.post('/invalido/'))
+        self.assertNotIn(db_router.STICKY_COOKIE, response.cookies)
+
+        response = middleware(factory.post('/'))
+        cookie = response.cookies[db_router.STICKY_COOKIE].value
+        self.assertGreater(float(cookie), time.time())
+
+        pinned = factory.get('/')
+        pinned.COOKIES[db_router.STICKY_COOKIE] = cookie
+        middleware(pinned)
+        expired = factory.get('/')
+        expired.COOKIES[db_router.STICKY_COOKIE] = f'{time.time() - 1:.3f}'
+        middleware(expired)
+        middleware(factory.get('/'))
+        self.assertEqual(seen, ['default', 'default', 'default', 'replica', 'replica'])
+
+
+# ==========================================
+# DASHBOARD EN VIVO: PRODUCTOR DE EVENTOS
+# ==========================================
+@override_settings(CACHES=TEST_CACHES)
+class LiveUpdatesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        product = Product.objects.create(sku='LV-1', name='Guantes', cost_price=Decimal('2'), sale_price=Decimal('5'),
+                                         is_critical=True, min_stock_level=5)
+        cls.variation = ProductVariation.objects.create(product=product, size='M', color='Nitrilo',
+                                                        sku_variant='LV-1-M', stock=20)
+
+    def setUp(self):
+        for patcher in (mock.patch.object(live.broadcaster, 'publish'), mock.patch.object(live.totals, 'request')):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def dispatch(self, qty):
+        with self.captureOnCommitCallbacks(execute=True):
+            services.post_movements([{'type': 'dispatch', 'variation': self.variation.pk, 'qty': qty}], destination='Planta')
+
+    def published(self):
+        return [call.args[0] for call in live.broadcaster.publish.call_args_list]
+
+    def test_no_subscribers_no_work(self):
+        with mock.patch.object(ProductVariation.objects, 'valuation', side_effect=AssertionError):
+            self.dispatch(3)
+        self.assertEqual(self.published(), [])
+        live.totals.request.assert_not_called()
+
+    def test_movement_sends_deltas_and_defers_totals(self):
+        with mock.patch.object(live.broadcaster, 'has_subscribers', return_value=True), \
+                mock.patch.object(ProductVariation.objects, 'valuation',
+                                  side_effect=AssertionError("valorización dentro de la transacción")):
+            self.dispatch(16)
+        events = {event['type']: event['data'] for event in self.published()}
+        self.assertEqual(list(events), ['movements', 'kpi', 'critical'])
+        self.assertEqual(events['kpi'], {'delta': {'total_cost': Decimal('-32'), 'total_sales': Decimal('-80'),
+                                                   'projected_profit': Decimal('-48')}})
+        self.assertEqual(events['critical']['products'][0]['status'], 'CRITICAL')
+        live.totals.request.assert_called_once()
+
+        live.broadcaster.publish.reset_mock()
+        live.publish_totals()
+        self.assertEqual(self.published(), [{'type': 'kpi_totals', 'data': {
+            'total_cost': Decimal('8'), 'total_sales': Decimal('20'), 'projected_profit': Decimal('12')}}])
+
+    def test_large_batches_are_capped(self):
+        product = Product.objects.create(sku='LV-2', name='Casco ' * 30, is_critical=True, min_stock_level=5)
+        variations = ProductVariation.objects.bulk_create([
+            ProductVariation(product=product, size=str(n), color='Blanco', sku_variant=f'LV-2-{n}', stock=10)
+            for n in range(live.MAX_MOVEMENT_LINES + 5)
+        ] + [
+            ProductVariation(product=Product.objects.create(sku=f'LV-C{n}', name='Filtro', is_critical=True),
+                             size='U', color='U', sku_variant=f'LV-C{n}', stock=10)
+            for n in range(live.MAX_CRITICAL_PRODUCTS + 5)
+        ])
+        with mock.patch.object(live.broadcaster, 'has_subscribers', return_value=True), \
+                self.captureOnCommitCallbacks(execute=True):
+            services.post_movements([{'type': 'dispatch', 'variation': v.pk, 'qty': 1} for v in variations],
+                                    destination='Planta ' * 50)
+        events = {event['type']: event for event in self.published()}
+        movements, critical = events['movements']['data'], events['critical']['data']
+        self.assertEqual((len(movements['lines']), movements['total']), (live.MAX_MOVEMENT_LINES, len(variations)))
+        self.assertEqual((len(critical['products']), critical['total']),
+                         (live.MAX_CRITICAL_PRODUCTS, live.MAX_CRITICAL_PRODUCTS + 6))
+        for event in events.values():
+            self.assertLess(len(json.dumps(event, default=str).encode()), live.NOTIFY_MAX_BYTES)
+
+
+# ==========================================
+# MÉTRICAS (/metrics)
+# ==========================================
+@override_settings(CACHES=TEST_CACHES, METRICS_TOKEN='secreto', METRICS_PUBLIC=False)
+class MetricsEndpointTests(TestCase):
+
+    def test_requires_token_or_staff_session(self):
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer otro').status_code, 401)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer secreto').status_code, 200)
+
+        user = get_user_model().objects.create_user('operador')
+        self.client.force_login(user)
+        self.assertEqual(self.client.get(url).status_code, 401)
+        user.is_staff = True
+        user.save()
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        self.client.logout()
+        with override_settings(METRICS_TOKEN=''):
+            self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer ').status_code, 401)
+            with override_settings(METRICS_PUBLIC=True):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_several_workers_need_multiprocess_dir(self):
+        with override_settings(WEB_CONCURRENCY=4, METRICS_MULTIPROC_DIR=''):
+            with self.assertRaises(ImproperlyConfigured):
+                core_metrics.check_multiprocess()
+            with override_settings(METRICS_ENABLED=False):
+                core_metrics.check_multiprocess()
+        with override_settings(WEB_CONCURRENCY=4, METRICS_MULTIPROC_DIR='/tmp/sig-test-metrics'):
+            core_metrics.check_multiprocess()
+        with override_settings(WEB_CONCURRENCY=1, METRICS_MULTIPROC_DIR=''):
+            core_metrics.check_multiprocess()
+
+
+# ==========================================
+# VARIACIONES: MATRIZ Y ALTA MASIVA
+# ==========================================
+@override_settings(CACHES=TEST_CACHES)
+class VariantMatrixTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = Product.objects.create(sku='MAT-001', name='Perno')
+
+    def test_matrix_and_pattern(self):
+        rows = variants.matrix('mat 001', ['10mm', '12 mm'], ['acero inox'], pattern='{sku}-{size}-{color}-{n}')
+        self.assertEqual([(row['size'], row['color'], row['sku_variant']) for row in rows], [
+            ('10MM', 'Acero inox', 'MAT001-10MM-ACEROINOX-01'),
+            ('12 MM', 'Acero inox', 'MAT001-12MM-ACEROINOX-02'),
+        ])
+        self.assertEqual(variants.matrix('X', [], [])[0]['sku_variant'], 'X-STD-GEN')
+        for pattern in ('{sku}-{peso}', '{sku', 'FIJO'):
+            with self.assertRaises(variants.VariantError):
+                variants.sku_pattern(pattern)
+
+    def test_repeated_skus_reject_the_whole_matrix(self):
+        rows = variants.matrix('MAT-001', ['10mm', '10 mm', '12mm'], ['Acero'], pattern='{sku}-{size}')
+        with self.assertRaises(variants.VariantError) as ctx:
+            variants.create_variations(self.product, rows)
+        self.assertEqual(ctx.exception.skus, ['MAT-001-10MM'])
+        self.assertFalse(ProductVariation.objects.exists())
+
+    def test_existing_skus_reject_the_whole_matrix(self):
+        ProductVariation.objects.create(product=self.product, size='12MM', color='Acero', sku_variant='MAT-001-12MM-ACERO')
+        rows = variants.matrix('MAT-001', ['10mm', '12mm'], ['Acero'])
+        with self.assertRaises(variants.VariantError) as ctx:
+            variants.create_variations(self.product, rows)
+        self.assertEqual(ctx.exception.skus, ['MAT-001-12MM-ACERO'])
+        self.assertEqual(ProductVariation.objects.count(), 1)
+
+        # Alta simultánea: el SKU se confirma entre la validación y el insert
+        with mock.patch.object(variants, '_check'), self.assertRaises(variants.VariantError) as ctx:
+            variants.create_variations(self.product, rows)
+        self.assertEqual(ctx.exception.skus, ['MAT-001-12MM-ACERO'])
+        self.assertEqual(ProductVariation.objects.count(), 1)
+
+    def test_large_matrix_is_one_insert(self):
+        rows = variants.matrix('MAT-001', [f'{n}mm' for n in range(1, 9)], [f'Tipo {n}' for n in range(1, 13)])
+        with CaptureQueriesContext(connection) as ctx:
+            variations = variants.create_variations(self.product, rows)
+        self.assertEqual(len(variations), 96)
+        inserts = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('INSERT')]
+        # Las variaciones y sus filas del registro de cambios, un INSERT cada una
+        self.assertEqual(len(inserts), 2)
+        # + validación de SKU existentes y el savepoint (crear / liberar)
+        self.assertEqual(len(ctx.captured_queries), 5)
+        self.assertEqual(ProductVariation.objects.filter(product=self.product).count(), 96)
+
+
+# ==========================================
+# GET CONDICIONAL (ETag / Last-Modified)
+# ==========================================
+@override_settings(CACHES=TEST_CACHES)
+class ConditionalGetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('bodega')
+        cls.product = Product.objects.create(sku='CG-1', name='Casco', sale_price=Decimal('9'))
+        cls.variation = ProductVariation.objects.create(product=cls.product, size='U', color='Blanco',
+                                                        sku_variant='CG-1-U', stock=10)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.urls = [reverse('inventory_list'), reverse('product_detail', args=[self.product.pk])]
+        # El ETag incluye la cookie CSRF: la primera visita la fija, como en el navegador
+        self.client.get(self.urls[0])
+
+    def assertNotModified(self, url, **headers):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, **headers)
+        self.assertEqual(response.status_code, 304)
+        # Sesión, usuario y la consulta del validador: la página no se arma
+        queries = [q['sql'] for q in ctx.captured_queries]
+        self.assertEqual(len(queries), 3, "\n".join(queries))
+        self.assertIn('"dispatched_at"', queries[-1])
+
+    def validators(self):
+        responses = [self.client.get(url) for url in self.urls]
+        for response in responses:
+            self.assertEqual(response.status_code, 200)
+        return [(response['ETag'], response['Last-Modified']) for response in responses]
+
+    def test_matching_validators_return_not_modified(self):
+        for url, (etag, last_modified) in zip(self.urls, self.validators()):
+            self.assertNotModified(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertNotModified(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+
+    def test_movements_and_edits_change_the_validators(self):
+        before = self.validators()
+        with self.captureOnCommitCallbacks(execute=True):
+            services.post_movements([{'type': 'dispatch', 'variation': self.variation.pk, 'qty': 1}], destination='Planta')
+        after_movement = self.validators()
+
+        product = Product.objects.get(pk=self.product.pk)
+        product.name = 'Casco de seguridad'
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        after_edit = self.validators()
+
+        for url, old, new in zip(self.urls, before, after_movement):
+            self.assertNotEqual(old[0], new[0])
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=old[0]).status_code, 200)
+        for url, old, new in zip(self.urls, after_movement, after_edit):
+            self.assertNotEqual(old[0], new[0])
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=old[0]).status_code, 200)
@@ -6,6 +6,7 @@ from . import views
 urlpatterns = [
     # Dashboard Principal
     path('dashboard/', views.inventory_dashboard, name='inventory_dashboard'),
+    path('dashboard/stream/', views.dashboard_stream, name='dashboard_stream'),
     
     # Listado y Detalle de Productos
     path('inventario/', views.inventory_list, name='inventory_list'),
@@ -18,8 +19,16 @@ urlpatterns = [
     
     # Endpoints de Búsqueda (AJAX)
     path('product-search-ajax/', views.product_search_ajax, name='product_search_ajax'),
+    path('scan/<str:code>/', views.scan_lookup, name='scan_lookup'),
+    # Versiones async (servidas por core.asgi)
+    path('async/product-search-ajax/', views.product_search_ajax_async, name='product_search_ajax_async'),
+    path('async/scan/<str:code>/', views.scan_lookup_async, name='scan_lookup_async'),
     # Actulizacion de Precio
     path('producto/<int:pk>/cambiar-precio/', views.update_product_price, name='update_product_price'),
+    # Reprecio masivo con vista previa (solo staff)
+    path('catalogo/reprecio/', views.bulk_reprice, name='bulk_reprice'),
     # Reportes de Inventario
     path('reportes/', views.inventory_reports, name='inventory_reports'),
-]
\ No newline at end of file
+    # Diagnóstico de la caché del catálogo (solo staff)
+    path('cache/estadisticas/', views.catalog_cache_stats, name='catalog_cache_stats'),
+]
\ No newline at end of file
@@ -0,0 +1,60 @@
+# inventory_app/usage.py
+
+"""
+Tasa de consumo diario (Product.daily_usage_rate) calculada desde los
+despachos: unidades despachadas en los últimos `days` días / `days`.
+Alimenta los días restantes de los insumos críticos (Dashboard).
+
+Una consulta agrupada lee los despachos del rango (en PostgreSQL sólo
+toca las particiones de esos meses) y sólo se escriben los productos cuya
+tasa cambió, con UPDATE ... CASE por lotes.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, F, Sum, Value, When
+from django.utils import timezone
+
+from . import cache as catalog_cache
+from . import changes
+from .models import Dispatch, Product
+
+RATE_PLACES = Decimal('0.01')
+
+
+def usage_rates(days):
+    """{product_id: unidades por día} de los productos con despachos en los últimos `days` días"""
+    since = timezone.now() - timedelta(days=days)
+    rows = (Dispatch.objects.filter(dispatched_at__gte=since).order_by()
+            .values('variation__product_id').annotate(units=Sum('quantity'))
+            .values_list('variation__product_id', 'units'))
+    return {pk: (Decimal(units) / days).quantize(RATE_PLACES) for pk, units in rows}
+
+
+def recompute_usage_rates(days=90, batch_size=1000, progress=None):
+    """
+    Guarda la tasa de todos los productos activos (0 sin despachos en el
+    rango). Devuelve cuántos cambiaron. `progress(hechos, total)` tras cada lote.
+    """
+    rates = usage_rates(days)
+    changed = {
+        pk: rates.get(pk, Decimal('0.00'))
+        for pk, current in Product.objects.filter(is_active=True).values_list('pk', 'daily_usage_rate')
+        if rates.get(pk, Decimal('0.00')) != current
+    }
+    pks = sorted(changed)
+    for start in range(0, len(pks), batch_size):
+        batch = pks[start:start + batch_size]
+        with transaction.atomic():
+            Product.objects.filter(pk__in=batch).update(
+                daily_usage_rate=Case(*[When(pk=pk, then=Value(changed[pk])) for pk in batch],
+                                      default=F('daily_usage_rate')),
+                updated_at=timezone.now(),
+            )
+            # Sin señales (update): la caché del catálogo y la sincronización delta se avisan aquí
+            transaction.on_commit(lambda batch=batch: catalog_cache.invalidate_products(batch))
+            changes.record(changes.Entity.PRODUCT, batch)
+        if progress is not None:
+            progress(start + len(batch), len(pks))
+    return len(pks)
@@ -0,0 +1,127 @@
+# inventory_app/valuation.py
+
+"""
+Valorización diaria del inventario (ValuationSnapshot).
+
+take_snapshot() escribe la foto de un día con dos INSERT ... SELECT
+agrupados (por categoría y por almacén): la BD calcula y guarda sin que
+las filas pasen por Python. Repetirla el mismo día la reemplaza. El valor
+de venta usa el precio vigente ese día (historial de precios, pricing.py).
+
+Las tendencias leen un rango de fechas de una sola agrupación, cubierto
+por el índice valuation_scope_date_idx.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import Category, Product, ProductLot, ProductVariation, ValuationSnapshot, Warehouse
+from .pricing import price_at_sql
+
+UNCATEGORIZED = "Sin categoría"
+
+
+# ==========================================
+# 1. FOTO DIARIA
+# ==========================================
+def _tables():
+    return {
+        'snapshot': ValuationSnapshot._meta.db_table,
+        'variation': ProductVariation._meta.db_table,
+        'product': Product._meta.db_table,
+        'category': Category._meta.db_table,
+        'lot': ProductLot._meta.db_table,
+        'warehouse': Warehouse._meta.db_table,
+    }
+
+
+BY_CATEGORY = """
+    INSERT INTO {snapshot} (date, scope, category_id, warehouse_id, name, units, cost_value, sale_value, created_at)
+    SELECT %s, %s, p.category_id, NULL, COALESCE(MAX(c.name), %s),
+           COALESCE(SUM(v.stock), 0),
+           COALESCE(SUM(v.stock * p.cost_price), 0),
+           COALESCE(SUM(v.stock * {price}), 0),
+           %s
+    FROM {variation} v
+    INNER JOIN {product} p ON p.id = v.product_id
+    LEFT OUTER JOIN {category} c ON c.id = p.category_id
+    GROUP BY p.category_id
+"""
+
+BY_WAREHOUSE = """
+    INSERT INTO {snapshot} (date, scope, category_id, warehouse_id, name, units, cost_value, sale_value, created_at)
+    SELECT %s, %s, NULL, l.warehouse_id, MAX(w.name),
+           COALESCE(SUM(l.quantity), 0),
+           COALESCE(SUM(l.quantity * p.cost_price), 0),
+           COALESCE(SUM(l.quantity * {price}), 0),
+           %s
+    FROM {lot} l
+    INNER JOIN {product} p ON p.id = l.product_id
+    INNER JOIN {warehouse} w ON w.id = l.warehouse_id
+    GROUP BY l.warehouse_id
+"""
+
+
+def take_snapshot(day=None):
+    """Foto del inventario actual con fecha `day` (hoy por defecto); devuelve las filas escritas"""
+    day = day or timezone.localdate()
+    ops = connection.ops
+    date = ops.adapt_datefield_value(day)
+    now = timezone.now()
+    # Precio vigente al cierre del día (o ahora, si es hoy)
+    closing = min(now, timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min)))
+    closing = ops.adapt_datetimefield_value(closing)
+    now = ops.adapt_datetimefield_value(now)
+    tables = {key: ops.quote_name(name) for key, name in _tables().items()}
+    price = price_at_sql('p', '%s')
+    with transaction.atomic(), connection.cursor() as cursor:
+        ValuationSnapshot.objects.filter(date=day).delete()
+        cursor.execute(BY_CATEGORY.format(price=price, **tables),
+                       [date, ValuationSnapshot.Scope.CATEGORY, UNCATEGORIZED, closing, closing, now])
+        cursor.execute(BY_WAREHOUSE.format(price=price, **tables),
+                       [date, ValuationSnapshot.Scope.WAREHOUSE, closing, closing, now])
+    return ValuationSnapshot.objects.filter(date=day).order_by('scope', 'name')
+
+
+# ==========================================
+# 2. TENDENCIAS
+# ==========================================
+def _series_value(value):
+    return float(value or 0)
+
+
+def total_trend(days):
+    """Valor total (costo y venta) por día de los últimos `days` días: {'labels', 'cost', 'sale'}"""
+    end = timezone.localdate()
+    rows = (ValuationSnapshot.objects
+            .filter(scope=ValuationSnapshot.Scope.CATEGORY, date__range=[end - timedelta(days=days), end])
+            .values('date').annotate(cost=Sum('cost_value'), sale=Sum('sale_value')).order_by('date'))
+    trend = {'labels': [], 'cost': [], 'sale': []}
+    for row in rows:
+        trend['labels'].append(row['date'].isoformat())
+        trend['cost'].append(_series_value(row['cost']))
+        trend['sale'].append(_series_value(row['sale']))
+    return trend
+
+
+def scope_trend(scope, start, end):
+    """
+    Valor al costo por día y por categoría o almacén entre `start` y `end`:
+    {'labels': [fechas], 'series': [{'name', 'data'}]}, con 0 en los días sin fila.
+    """
+    rows = (ValuationSnapshot.objects.filter(scope=scope, date__range=[start, end])
+            .values_list('date', 'name', 'cost_value').order_by('date', 'name'))
+    labels = []
+    values = {}
+    for date, name, cost in rows:
+        label = date.isoformat()
+        if not labels or labels[-1] != label:
+            labels.append(label)
+        values.setdefault(name, {})[label] = _series_value(cost)
+    return {
+        'labels': labels,
+        'series': [{'name': name, 'data': [by_day.get(label, 0) for label in labels]}
+                   for name, by_day in sorted(values.items())],
+    }
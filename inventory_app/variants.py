@@ -0,0 +1,132 @@
+# inventory_app/variants.py
+
+"""
+Variaciones de un producto nuevo (create_product).
+
+  - matrix(): genera en el servidor la matriz medida × tipo con el SKU de
+    cada celda según un patrón (VARIANT_SKU_PATTERN), p. ej.
+    '{sku}-{size}-{color}' -> 'MAT-001-10MM-ACERO'.
+  - create_variations(): valida todo antes de escribir (SKU repetidos en
+    la matriz y ya existentes en el sistema, con una sola consulta) e
+    inserta todas las variaciones con un único bulk_create. Un alta
+    simultánea del mismo SKU entre la validación y el insert también
+    termina en VariantError (el índice único, no un error genérico).
+"""
+import re
+from string import Formatter
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from . import cache as catalog_cache
+from . import changes, scan
+from .models import ProductVariation
+
+DEFAULT_SKU_PATTERN = '{sku}-{size}-{color}'
+PLACEHOLDERS = {'sku', 'size', 'color', 'n'}
+# Largo máximo de cada parte del SKU (la medida / tipo completos quedan en sus campos)
+PART_LENGTH = 10
+SKU_LENGTH = ProductVariation._meta.get_field('sku_variant').max_length
+
+
+class VariantError(Exception):
+    """Matriz rechazada completa; `skus` = los SKU en conflicto (repetidos o ya existentes)"""
+
+    def __init__(self, message, skus=()):
+        super().__init__(message)
+        self.skus = list(skus)
+
+
+def split_values(text):
+    """'10mm, 12mm\\n14mm' -> ['10mm', '12mm', '14mm'] (sin vacíos ni repetidos)"""
+    return list(dict.fromkeys(part.strip() for part in re.split(r'[,;\n]', text or '') if part.strip()))
+
+
+def _code(value):
+    """Parte de SKU: mayúsculas, sin espacios ni símbolos"""
+    return re.sub(r'[^A-Z0-9.]', '', value.upper())[:PART_LENGTH]
+
+
+def sku_pattern(pattern=None):
+    pattern = (pattern or getattr(settings, 'VARIANT_SKU_PATTERN', DEFAULT_SKU_PATTERN)).strip()
+    try:
+        fields = {name for _, name, _, _ in Formatter().parse(pattern) if name is not None}
+    except ValueError:
+        raise VariantError(f"Patrón de SKU inválido: {pattern}")
+    if not fields or fields - PLACEHOLDERS:
+        raise VariantError(f"Patrón de SKU inválido: {pattern}. Use {{sku}}, {{size}}, {{color}} y {{n}}.")
+    return pattern
+
+
+# ==========================================
+# 1. MATRIZ MEDIDA × TIPO
+# ==========================================
+def matrix(sku, sizes, colors, pattern=None, stock=0):
+    """Filas {'size', 'color', 'sku_variant', 'stock'} de todas las combinaciones, en orden"""
+    pattern = sku_pattern(pattern)
+    sizes, colors = sizes or ['STD'], colors or ['GEN']
+    # El SKU maestro va completo (como en el alta manual); medida y tipo, abreviados
+    master = re.sub(r'\s+', '', sku.upper())
+    rows = []
+    for size in sizes:
+        for color in colors:
+            rows.append({
+                'size': size.upper(),
+                'color': color.capitalize(),
+                'sku_variant': pattern.format(sku=master, size=_code(size), color=_code(color),
+                                              n=f'{len(rows) + 1:02d}').upper(),
+                'stock': stock,
+            })
+    return rows
+
+
+# ==========================================
+# 2. ALTA MASIVA
+# ==========================================
+def _check(rows):
+    skus = [row['sku_variant'] for row in rows]
+    too_long = [sku for sku in skus if len(sku) > SKU_LENGTH]
+    if too_long:
+        raise VariantError(f"SKU de más de {SKU_LENGTH} caracteres: {', '.join(too_long[:5])}", too_long)
+    seen, repeated = set(), {}
+    for sku in skus:
+        if sku in seen:
+            repeated[sku] = None
+        seen.add(sku)
+    if repeated:
+        raise VariantError(f"El patrón genera SKU repetidos: {', '.join(list(repeated)[:5])}", repeated)
+    _check_taken(skus)
+
+
+def _check_taken(skus):
+    taken = sorted(ProductVariation.objects.filter(sku_variant__in=skus).values_list('sku_variant', flat=True))
+    if taken:
+        raise VariantError(f"SKU ya registrados en el sistema: {', '.join(taken[:5])}", taken)
+
+
+def create_variations(product, rows):
+    """
+    Inserta las variaciones (filas de matrix() o de la lista manual) de
+    `product`. Todo o nada: cualquier conflicto lanza VariantError sin escribir.
+    """
+    rows = [{**row, 'sku_variant': row['sku_variant'].strip().upper()} for row in rows]
+    if not rows:
+        return []
+    try:
+        with transaction.atomic():
+            _check(rows)
+            variations = ProductVariation.objects.bulk_create([
+                ProductVariation(product=product, size=row['size'], color=row['color'],
+                                 sku_variant=row['sku_variant'], stock=row['stock'])
+                for row in rows
+            ])
+            # Sin señales (bulk_create): caché, tabla de escaneo y sincronización delta se avisan aquí
+            product_id = product.pk
+            transaction.on_commit(lambda: catalog_cache.invalidate_product(product_id))
+            transaction.on_commit(lambda: scan.invalidate_products([product_id]))
+            changes.record(changes.Entity.VARIATION, [variation.pk for variation in variations])
+    except IntegrityError:
+        # Otra alta confirmó alguno de los SKU después de _check(): el savepoint ya se revirtió
+        _check_taken([row['sku_variant'] for row in rows])
+        raise
+    return variations
@@ -1,60 +1,74 @@
+import asyncio
+import hashlib
 import json
 from datetime import datetime, timedelta
+from functools import wraps
 
 from django.shortcuts import render, get_object_or_404, redirect
-from django.contrib.auth.decorators import login_required
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.contrib.auth.views import redirect_to_login
 from django.contrib import messages
-from django.db import transaction
-from django.db.models import Sum, F, Q, DecimalField
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Sum, Q
 from django.db.models.functions import Coalesce
-from django.http import JsonResponse
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, Http404, HttpResponse, StreamingHttpResponse
 from django.urls import reverse
 from django.utils import timezone
-
-from .models import Product, Category, ProductVariation, Dispatch, StockArrival
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_headers
+
+from core.db_router import use_replica
+from purchasing_app.models import Supplier
+
+from . import cache as catalog_cache
+from . import live
+from . import pricing
+from . import scan
+from . import valuation
+from . import variants
+from .models import (
+    Product, Category, ProductVariation, Dispatch, StockArrival, MovementArchive, ValuationSnapshot,
+)
+from .partitioning import month_start
+from .services import post_movements, MovementError, DISPATCH, ARRIVAL
 
 
 @login_required
+@use_replica()
 def inventory_dashboard(request):
     """
     Dashboard Operativo: 
     Muestra KPIs financieros y, lo más importante, 
     la Tabla de Alertas de Insumos Críticos (Lixiviación).
     """
-    # 1. KPIs Financieros Globales
-    metrics = ProductVariation.objects.aggregate(
-        total_cost=Sum(F('stock') * F('product__cost_price'), output_field=DecimalField()),
-        total_sales=Sum(F('stock') * F('product__sale_price'), output_field=DecimalField())
-    )
+    # 1. KPIs Financieros Globales (costo desde las capas PEPS / promedio)
+    metrics = ProductVariation.objects.valuation()
     
-    total_cost = metrics['total_cost'] or 0
-    total_sales_value = metrics['total_sales'] or 0
+    total_cost = metrics['total_cost']
+    total_sales_value = metrics['total_sales']
     projected_profit = total_sales_value - total_cost
 
     # 2. Datos para Gráficos (Stock por Categoría)
-    categories = Category.objects.all()
+    # Una sola consulta agrupada (antes: un SUM por categoría)
     cat_labels = []
     cat_stocks = []
-    for cat in categories:
-        stock = ProductVariation.objects.filter(product__category=cat).aggregate(total=Sum('stock'))['total'] or 0
-        if stock > 0:
-            cat_labels.append(cat.name)
-            cat_stocks.append(stock)
+    for row in (Category.objects.annotate(total=Coalesce(Sum('product__variations__stock'), 0))
+                .filter(total__gt=0).order_by('pk').values('name', 'total')):
+        cat_labels.append(row['name'])
+        cat_stocks.append(row['total'])
 
     # 3. LÓGICA DE ALERTAS E INSUMOS CRÍTICOS
-    # Filtramos solo los productos marcados como críticos y activos
-    all_critical_products = Product.objects.filter(is_active=True, is_critical=True)
-    
-    # Procesamos en Python porque 'stock_status' es una @property del modelo
-    critical_list = []
-    for p in all_critical_products:
-        # Añadimos a la lista para mostrar en el dashboard
-        critical_list.append(p)
-
-    # Ordenamos por prioridad de riesgo: 
+    # Filtramos solo los productos marcados como críticos y activos; el stock,
+    # el semáforo y el orden por prioridad de riesgo van en SQL:
     # OUT_OF_STOCK (0) -> CRITICAL (1) -> LOW (2) -> OK (3)
-    status_priority = {'OUT_OF_STOCK': 0, 'CRITICAL': 1, 'LOW': 2, 'OK': 3}
-    critical_list.sort(key=lambda x: status_priority.get(x.stock_status, 3))
+    # El queryset queda perezoso: si la tabla sale del fragmento en caché no se ejecuta
+    critical = Product.objects.filter(is_active=True, is_critical=True)
+    # Del primario: la tabla se guarda en caché con la versión actual del
+    # catálogo y una réplica atrasada dejaría ahí datos viejos por una hora
+    critical_list = critical.by_stock_priority().using(DEFAULT_DB_ALIAS)
 
     context = {
         'total_cost': total_cost,
@@ -63,13 +77,99 @@ def inventory_dashboard(request):
         'cat_labels': cat_labels,
         'cat_stocks': cat_stocks,
         'critical_products': critical_list, # <--- Nueva variable para el template
-        'recent_arrivals': StockArrival.objects.all().select_related('variation__product', 'user').order_by('-arrival_date')[:5],
-        'recent_dispatches': Dispatch.objects.all().select_related('variation__product', 'user').order_by('-dispatched_at')[:5],
+        'critical_count': critical.count(),
+        # Mes en curso primero: en PostgreSQL sólo lee la partición actual
+        'recent_arrivals': StockArrival.objects.select_related('variation__product', 'user').recent(5),
+        'recent_dispatches': Dispatch.objects.select_related('variation__product', 'user').recent(5),
+        # Evolución del valor: fotos diarias (snapshot_valuation), no recálculo del historial
+        'valuation_trend': valuation.total_trend(getattr(settings, 'VALUATION_TREND_DAYS', 90)),
     }
     return render(request, 'inventory/dashboard.html', context)
 
 
+async def dashboard_stream(request):
+    """
+    Server-Sent Events del Dashboard: KPIs, movimientos nuevos y cambios de
+    semáforo. Cada conexión sólo espera en su cola; no consulta la BD.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponse(status=401)
+    if not isinstance(request, ASGIRequest):
+        # Bajo WSGI el flujo infinito ocuparía un worker para siempre
+        return HttpResponse("El Dashboard en vivo requiere un servidor ASGI.", status=503)
+
+    ping = getattr(settings, 'LIVE_PING_SECONDS', 15)
+
+    async def events():
+        async with live.broadcaster.subscribe() as queue:
+            # El navegador reconecta solo; al reconectar recarga el Dashboard
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=ping)
+                except asyncio.TimeoutError:
+                    # Mantiene viva la conexión a través de proxies
+                    yield ": ping\n\n"
+                    continue
+                yield live.format_sse(event)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# ==========================================
+# GET CONDICIONAL (ETag / Last-Modified)
+# ==========================================
+def _last_change(product_id=None):
+    """Último cambio visible del catálogo (o de un producto); None si no hay productos"""
+    row = Product.objects.last_change(product_id).first()
+    if row is None:
+        return None
+    return max(ts for ts in row if ts is not None)
+
+
+def _validators(request, pk=None):
+    """
+    (etag, last_modified) de la petición, calculados una vez (condition()
+    pide ambos). Las fechas no ven bajas ni ediciones de variaciones o
+    categorías: el ETag suma los contadores de versión del catálogo.
+    Sin validadores si hay mensajes pendientes: un 304 los perdería.
+    """
+    if not hasattr(request, '_inventory_validators'):
+        validators = (None, None)
+        if not len(messages.get_messages(request)):
+            last_modified = _last_change(pk)
+            if last_modified is not None:
+                if pk is None:
+                    version = catalog_cache.fragment_version(catalog_cache.SCOPE_STOCK, catalog_cache.SCOPE_PRODUCTS)
+                else:
+                    version = catalog_cache.fragment_version(catalog_cache.SCOPE_CATEGORY, product=pk)
+                # La página lleva el usuario y el token CSRF de la sesión
+                digest = hashlib.md5(repr((
+                    version, last_modified.timestamp(), request.user.pk,
+                    request.COOKIES.get(settings.CSRF_COOKIE_NAME),
+                    request.headers.get('x-requested-with') == 'XMLHttpRequest',
+                )).encode())
+                validators = (digest.hexdigest(), last_modified)
+        request._inventory_validators = validators
+    return request._inventory_validators
+
+
+def _etag(request, pk=None):
+    return _validators(request, pk)[0]
+
+
+def _last_modified(request, pk=None):
+    return _validators(request, pk)[1]
+
+
 @login_required
+@cache_control(private=True, no_cache=True)
+@vary_on_headers('X-Requested-With')
+@condition(etag_func=_etag, last_modified_func=_last_modified)
 def inventory_list(request):
     """Lista Maestra con Búsqueda y Ordenamiento"""
     query = request.GET.get('q', '')
@@ -94,18 +194,24 @@ def inventory_list(request):
 
     products = products.order_by(sort_mapping.get(order, 'name'))
 
+    # El orden normalizado forma parte de la clave del fragmento en caché
+    context = {'products': products, 'query': query, 'order': order if order in sort_mapping else 'name'}
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
-        return render(request, 'inventory/inventory_table_partial.html', {'products': products})
+        return render(request, 'inventory/inventory_table_partial.html', context)
 
-    return render(request, 'inventory/inventory_list.html', {'products': products, 'query': query})
+    return render(request, 'inventory/inventory_list.html', context)
 
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_etag, last_modified_func=_last_modified)
 def product_detail(request, pk):
-    product = get_object_or_404(Product, pk=pk)
+    product = catalog_cache.get_product(pk)
+    if product is None:
+        raise Http404("Producto no encontrado")
     return render(request, 'inventory/product_detail.html', {
         'product': product,
-        'variations': product.variations.all(),
+        'variations': catalog_cache.get_product_variations(pk),
     })
 
 
@@ -132,7 +238,7 @@ def create_product(request):
                 daily_usage = request.POST.get('daily_usage_rate', 0)
 
                 # 3. Crear Producto
-                product = Product.objects.create(
+                product = Product(
                     name=request.POST.get('name'),
                     sku=request.POST.get('sku').upper(),
                     category=category,
@@ -144,22 +250,29 @@ def create_product(request):
                     is_critical=is_critical,
                     daily_usage_rate=daily_usage
                 )
+                # El precio inicial queda en el historial de precios
+                product.save(changed_by=request.user)
+
+                # 4. Crear Variaciones: líneas manuales + matriz Medida × Tipo generada
+                # en el servidor; un solo chequeo de SKU y un solo INSERT
+                rows = [
+                    {'size': item['size'].upper(), 'color': item['color'].capitalize(),
+                     'sku_variant': item['sku_variant'], 'stock': item['stock']}
+                    for item in json.loads(variations_data or '[]')
+                ]
+                sizes = variants.split_values(request.POST.get('matrix_sizes'))
+                colors = variants.split_values(request.POST.get('matrix_colors'))
+                if sizes or colors:
+                    rows += variants.matrix(product.sku, sizes, colors,
+                                            pattern=request.POST.get('sku_pattern'),
+                                            stock=int(request.POST.get('matrix_stock') or 0))
+                variants.create_variations(product, rows)
 
-                # 4. Crear Variaciones
-                if variations_data:
-                    vars_list = json.loads(variations_data)
-                    for item in vars_list:
-                        ProductVariation.objects.create(
-                            product=product,
-                            size=item['size'].upper(),
-                            color=item['color'].capitalize(),
-                            sku_variant=item['sku_variant'].upper(),
-                            stock=item['stock']
-                        )
-                
                 messages.success(request, f"Material '{product.name}' registrado exitosamente.")
                 return redirect('inventory_list')
-        
+
+        except variants.VariantError as e:
+            messages.error(request, f"Error: {e}")
         except Exception as e:
             if "duplicate key" in str(e):
                 messages.error(request, "Error: El SKU ya existe en el sistema.")
@@ -167,7 +280,8 @@ def create_product(request):
                 messages.error(request, f"Error al crear: {str(e)}")
     
     return render(request, 'inventory/product_form.html', {
-        'categories': Category.objects.all()
+        'categories': catalog_cache.get_categories(),
+        'sku_pattern': variants.sku_pattern(),
     })
 
 
@@ -178,43 +292,156 @@ def update_product_price(request, pk):
         nuevo_precio = request.POST.get('new_price')
         if nuevo_precio:
             product.sale_price = nuevo_precio
-            product.save()
+            # save() deja el cambio en el historial de precios
+            product.save(changed_by=request.user)
             messages.success(request, "Precio de referencia actualizado.")
     return redirect('product_detail', pk=pk)
 
 
+@user_passes_test(lambda u: u.is_staff)
+def bulk_reprice(request):
+    """
+    Reprecio masivo por categoría / proveedor. 'Vista previa' muestra el
+    antes y después sin escribir; 'Aplicar' actualiza en bloque y deja el
+    historial de precios.
+    """
+    data = request.POST if request.method == 'POST' else {}
+    form = {
+        'categories': [int(pk) for pk in request.POST.getlist('category') if pk.isdigit()],
+        'supplier': int(data['supplier']) if data.get('supplier', '').isdigit() else None,
+        'rule': data.get('rule', pricing.Rule.PERCENT),
+        'value': data.get('value', ''),
+        'include_inactive': data.get('include_inactive') == 'on',
+    }
+    result = None
+    if request.method == 'POST':
+        products = pricing.select_products(form['categories'], form['supplier'], form['include_inactive'])
+        try:
+            if request.POST.get('action') == 'apply':
+                changed = pricing.apply(products, form['rule'], form['value'], user=request.user)
+                messages.success(request, f"Precio de referencia actualizado en {changed} productos.")
+                return redirect('bulk_reprice')
+            result = pricing.preview(products, form['rule'], form['value'])
+        except pricing.RepricingError as e:
+            messages.error(request, f"Error: {e}")
+
+    return render(request, 'inventory/bulk_reprice.html', {
+        'form': form,
+        'result': result,
+        'rules': pricing.Rule.choices,
+        'categories': catalog_cache.get_categories(),
+        'suppliers': Supplier.objects.order_by('name').values('pk', 'name'),
+        'preview_rows': pricing.PREVIEW_ROWS,
+    })
+
+
+def _search_queryset(query):
+    # Buscamos variaciones que coincidan
+    return ProductVariation.objects.filter(
+        Q(product__name__icontains=query) | 
+        Q(product__sku__icontains=query) |
+        Q(sku_variant__icontains=query)
+    ).select_related('product')[:15]
+
+
+def _search_result(v):
+    spec = v.size if v.size else "Std"
+    type_ = v.color if v.color else "Gen"
+
+    return {
+        'id': str(v.id),
+        'name': f"{v.product.name} ({spec} - {type_})",
+        'sku': v.sku_variant, # Usamos el SKU específico de la variante
+        'price': float(v.product.sale_price),
+        'cost': float(v.product.cost_price),
+        'stock': int(v.stock),
+    }
+
+
+def _search_variations(query):
+    """Consulta real del buscador (se cachea por versión del catálogo)"""
+    return [_search_result(v) for v in _search_queryset(query)]
+
+
+async def _asearch_variations(query):
+    return [_search_result(v) async for v in _search_queryset(query)]
+
+
+def alogin_required(view):
+    """login_required para vistas async (usa request.auser(), sin hilos)"""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
 @login_required
 def product_search_ajax(request):
     """Buscador para formularios de Entrada/Salida"""
     query = request.GET.get('q', '').strip()
     results = []
-    
+
     try:
         if len(query) > 1:
-            # Buscamos variaciones que coincidan
-            variations = ProductVariation.objects.filter(
-                Q(product__name__icontains=query) | 
-                Q(product__sku__icontains=query) |
-                Q(sku_variant__icontains=query)
-            ).select_related('product')[:15]
-            
-            for v in variations:
-                spec = v.size if v.size else "Std"
-                type_ = v.color if v.color else "Gen"
-                
-                results.append({
-                    'id': str(v.id),
-                    'name': f"{v.product.name} ({spec} - {type_})",
-                    'sku': v.sku_variant, # Usamos el SKU específico de la variante
-                    'price': float(v.product.sale_price),
-                    'cost': float(v.product.cost_price),
-                    'stock': int(v.stock),
-                })
+            results = catalog_cache.get_search_results(query, lambda: _search_variations(query))
+        return JsonResponse({'results': results})
+    except Exception as e:
+        return JsonResponse({'error': str(e), 'results': []}, status=500)
+
+
+@alogin_required
+async def product_search_ajax_async(request):
+    """
+    Igual que product_search_ajax, con ORM y caché async. Servida por
+    core.asgi, un worker atiende muchas búsquedas mientras espera a la BD.
+    """
+    query = request.GET.get('q', '').strip()
+    results = []
+
+    try:
+        if len(query) > 1:
+            results = await catalog_cache.aget_search_results(query, lambda: _asearch_variations(query))
         return JsonResponse({'results': results})
     except Exception as e:
         return JsonResponse({'error': str(e), 'results': []}, status=500)
 
 
+@login_required
+def scan_lookup(request, code):
+    """
+    Escaneo exacto por código de barras, SKU o SKU de variante.
+    Se resuelve desde la tabla en memoria; ?stock=1 agrega el stock actual
+    de la variación (una consulta por clave primaria).
+    """
+    entry = scan.lookup(code)
+    if entry is None:
+        return JsonResponse({'error': 'Código no encontrado', 'code': code}, status=404)
+
+    if request.GET.get('stock') and entry['match'] == 'variation':
+        entry = dict(entry, stock=ProductVariation.objects.filter(pk=entry['id']).values_list('stock', flat=True).first())
+    return JsonResponse(entry)
+
+
+@alogin_required
+async def scan_lookup_async(request, code):
+    """Versión async de scan_lookup (mismo contrato de respuesta)"""
+    entry = await scan.alookup(code)
+    if entry is None:
+        return JsonResponse({'error': 'Código no encontrado', 'code': code}, status=404)
+
+    if request.GET.get('stock') and entry['match'] == 'variation':
+        stock = await ProductVariation.objects.filter(pk=entry['id']).values_list('stock', flat=True).afirst()
+        entry = dict(entry, stock=stock)
+    return JsonResponse(entry)
+
+
+def _first_error(exc):
+    return next(r['error'] for r in exc.results if r['status'] == 'error')
+
+
 @login_required
 def create_dispatch(request):
     """Registro de Salidas (Consumo)"""
@@ -229,25 +456,18 @@ def create_dispatch(request):
             return redirect('create_dispatch')
 
         try:
-            with transaction.atomic():
-                items = json.loads(items_data)
-                for item in items:
-                    variation = get_object_or_404(ProductVariation, id=item['id'])
-                    quantity = int(item['qty'])
-                    
-                    if variation.stock < quantity:
-                        raise ValueError(f"Stock insuficiente para {variation.product.name}")
-
-                    Dispatch.objects.create(
-                        variation=variation,
-                        quantity=quantity,
-                        destination=destination,
-                        user=request.user
-                    )
-                    # El modelo Dispatch descuenta stock en save()
-
-                messages.success(request, f"Salida hacia '{destination}' registrada.")
-                return redirect('inventory_list')
+            items = json.loads(items_data)
+            # Ruta masiva: un solo INSERT y un solo UPDATE de stock para todo el formulario
+            post_movements(
+                [{'type': DISPATCH, 'variation': item['id'], 'qty': item['qty']} for item in items],
+                user=request.user,
+                destination=destination,
+                partial=False,
+            )
+            messages.success(request, f"Salida hacia '{destination}' registrada.")
+            return redirect('inventory_list')
+        except MovementError as e:
+            messages.error(request, f"Error: {_first_error(e)}")
         except Exception as e:
             messages.error(request, f"Error: {str(e)}")
             
@@ -269,24 +489,17 @@ def create_stock_arrival(request):
             return redirect('create_stock_arrival')
 
         try:
-            with transaction.atomic():
-                items = json.loads(items_data)
-                for item in items:
-                    variation = get_object_or_404(ProductVariation, id=item['id'])
-                    quantity = int(item['qty'])
-                    cost = float(item['cost'])
-                    
-                    StockArrival.objects.create(
-                        variation=variation,
-                        quantity=quantity,
-                        unit_cost=cost,
-                        supplier=supplier,
-                        user=request.user
-                    )
-                    # El modelo StockArrival aumenta stock y actualiza costo promedio en save()
-
-                messages.success(request, f"Entrada de '{supplier}' registrada.")
-                return redirect('inventory_list')
+            items = json.loads(items_data)
+            post_movements(
+                [{'type': ARRIVAL, 'variation': item['id'], 'qty': item['qty'], 'cost': item['cost']} for item in items],
+                user=request.user,
+                supplier=supplier,
+                partial=False,
+            )
+            messages.success(request, f"Entrada de '{supplier}' registrada.")
+            return redirect('inventory_list')
+        except MovementError as e:
+            messages.error(request, f"Error: {_first_error(e)}")
         except Exception as e:
             messages.error(request, f"Error: {str(e)}")
 
@@ -294,6 +507,7 @@ def create_stock_arrival(request):
 
 
 @login_required
+@use_replica()
 def inventory_reports(request):
     """Reportes de Auditoría"""
     interval = request.GET.get('interval', 'daily')
@@ -317,12 +531,28 @@ def inventory_reports(request):
 
     # Consultas
     if report_type == 'dispatches':
-        records = Dispatch.objects.filter(dispatched_at__range=[start_date, now]).select_related('variation__product', 'user').order_by('-dispatched_at')
+        # Valorizados al precio vigente en cada despacho, en la misma consulta
+        records = (Dispatch.objects.filter(dispatched_at__range=[start_date, now]).select_related('variation__product', 'user')
+                   .with_unit_price().order_by('-dispatched_at'))
         kpi_color = "zinc"
     else:
         records = StockArrival.objects.filter(arrival_date__range=[start_date, now]).select_related('variation__product', 'user').order_by('-arrival_date')
         kpi_color = "gold"
 
+    # Meses del rango ya archivados (manage_movement_partitions): su detalle no está en línea
+    archived = MovementArchive.objects.filter(
+        kind=MovementArchive.Kind.DISPATCH if report_type == 'dispatches' else MovementArchive.Kind.ARRIVAL,
+        period__gte=month_start(start_date).date(), period__lte=now.date(),
+    )
+
+    # Tendencia de valorización del rango (al menos VALUATION_TREND_MIN_DAYS para que sea legible)
+    valuation_scope = request.GET.get('valuation')
+    if valuation_scope not in ValuationSnapshot.Scope.values:
+        valuation_scope = ValuationSnapshot.Scope.CATEGORY
+    trend_days = getattr(settings, 'VALUATION_TREND_MIN_DAYS', 30)
+    trend_end = timezone.localdate(now)
+    trend_start = min(timezone.localdate(start_date), trend_end - timedelta(days=trend_days))
+
     # Cálculos
     total_qty = records.aggregate(Sum('quantity'))['quantity__sum'] or 0
     # Calculamos valor en python ya que es una propiedad del modelo
@@ -338,4 +568,13 @@ def inventory_reports(request):
         'kpi_color': kpi_color,
         'start_val': request.GET.get('start', ''),
         'end_val': request.GET.get('end', ''),
-    })
\ No newline at end of file
+        'archived_periods': archived,
+        'valuation_scope': valuation_scope,
+        'valuation_trend': valuation.scope_trend(valuation_scope, trend_start, trend_end),
+    })
+
+
+@user_passes_test(lambda u: u.is_staff)
+def catalog_cache_stats(request):
+    """Contadores de la caché del catálogo (por proceso) para ajustar tamaños"""
+    return JsonResponse(catalog_cache.stats())
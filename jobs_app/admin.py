@@ -0,0 +1,74 @@
+# jobs_app/admin.py
+
+from django.contrib import admin, messages
+from django.utils.html import format_html
+
+from . import queue
+from .models import Job, PeriodicJob
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """Los trabajos se encolan desde el código, api/trabajos/ o las programaciones"""
+    list_display = ('pk', 'task', 'status', 'priority', 'progress_bar', 'attempts', 'run_at', 'started_at',
+                    'finished_at', 'worker')
+    list_filter = ('status', 'task')
+    search_fields = ('task',)
+    list_select_related = ('created_by',)
+    readonly_fields = ('task', 'args', 'status', 'attempts', 'progress_done', 'progress_total', 'progress_message',
+                       'result', 'error', 'worker', 'created_by', 'periodic', 'created_at', 'started_at',
+                       'heartbeat_at', 'finished_at')
+    fields = ('priority', 'run_at', 'max_attempts') + readonly_fields
+    actions = ['cancel_jobs', 'retry_jobs']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.display(description="Avance")
+    def progress_bar(self, obj):
+        percent = obj.percent
+        if percent is None:
+            return obj.progress_message or "—"
+        return format_html(
+            '<div title="{}" style="width:120px;background:#e4e4e7;border-radius:4px;">'
+            '<div style="width:{}%;background:#10b981;color:#fff;font-size:11px;text-align:center;'
+            'border-radius:4px;">{}%</div></div>',
+            obj.progress_message, percent, percent,
+        )
+
+    def _each(self, request, queryset, operation, done):
+        for job in queryset:
+            try:
+                operation(job)
+            except queue.JobError as e:
+                self.message_user(request, f"#{job.pk}: {e}", messages.ERROR)
+            else:
+                self.message_user(request, f"#{job.pk}: {done}", messages.SUCCESS)
+
+    @admin.action(description="Cancelar (en cola)")
+    def cancel_jobs(self, request, queryset):
+        self._each(request, queryset, queue.cancel, "cancelado.")
+
+    @admin.action(description="Reintentar (fallidos o cancelados)")
+    def retry_jobs(self, request, queryset):
+        self._each(request, queryset, queue.retry, "en cola.")
+
+
+@admin.register(PeriodicJob)
+class PeriodicJobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'task', 'interval_seconds', 'next_run_at', 'last_enqueued_at', 'enabled')
+    list_filter = ('enabled',)
+    list_editable = ('enabled',)
+    readonly_fields = ('last_enqueued_at',)
+    actions = ['run_now']
+
+    @admin.action(description="Encolar ahora")
+    def run_now(self, request, queryset):
+        for periodic in queryset:
+            try:
+                job = queue.enqueue(periodic.task, periodic.args, periodic.priority, user=request.user,
+                                    periodic=periodic)
+            except queue.JobError as e:
+                self.message_user(request, f"{periodic.name}: {e}", messages.ERROR)
+            else:
+                self.message_user(request, f"{periodic.name}: trabajo #{job.pk} en cola.", messages.SUCCESS)
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class JobsAppConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'jobs_app'
+
+    def ready(self):
+        # Registra las tareas incorporadas (queue.TASKS)
+        from . import tasks  # noqa: F401
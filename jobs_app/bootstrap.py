@@ -0,0 +1,17 @@
+# jobs_app/bootstrap.py
+
+"""
+Puntos de entrada de los procesos del pool ('spawn'). El proceso hijo
+importa este módulo antes de que Django esté configurado, así que aquí no
+se importan modelos a nivel de módulo.
+"""
+import django
+
+
+def init_process():
+    django.setup()
+
+
+def execute(pk):
+    from .queue import execute as run_job
+    run_job(pk)
@@ -0,0 +1,38 @@
+# jobs_app/management/commands/run_jobs.py
+
+import logging
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from jobs_app.worker import PROCESS, THREAD, Worker
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker de la cola de trabajos (jobs_app): ejecuta los trabajos en cola y las programaciones "
+        "periódicas. Se pueden correr varios a la vez (SKIP LOCKED). SIGTERM / Ctrl+C terminan lo que "
+        "está en curso y salen."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=None,
+                            help="Trabajos simultáneos (por defecto JOBS_CONCURRENCY).")
+        parser.add_argument('--pool', choices=[THREAD, PROCESS], default=THREAD,
+                            help="Hilos (E/S, BD) o procesos (CPU).")
+        parser.add_argument('--poll', type=float, default=None,
+                            help="Segundos entre consultas a la cola (por defecto JOBS_POLL_SECONDS).")
+        parser.add_argument('--once', action='store_true', help="Salir cuando no queden trabajos vencidos.")
+
+    def handle(self, *args, **options):
+        if options['concurrency'] is not None and options['concurrency'] < 1:
+            raise CommandError("--concurrency debe ser positivo.")
+        if options['verbosity'] > 1:
+            logging.getLogger('jobs_app').setLevel(logging.INFO)
+
+        worker = Worker(options['concurrency'], options['pool'], options['poll'])
+        signal.signal(signal.SIGTERM, worker.stop)
+        signal.signal(signal.SIGINT, worker.stop)
+        self.stdout.write(f"Worker {worker.name}: {worker.concurrency} trabajos simultáneos ({options['pool']})")
+        executed = worker.run(once=options['once'])
+        self.stdout.write(self.style.SUCCESS(f"Trabajos ejecutados: {executed}"))
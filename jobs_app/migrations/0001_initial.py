@@ -0,0 +1,68 @@
+# Generated by Django 5.0.6 on 2026-10-19 00:52
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PeriodicJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Nombre')),
+                ('task', models.CharField(max_length=100, verbose_name='Tarea')),
+                ('args', models.JSONField(blank=True, default=dict, verbose_name='Parámetros')),
+                ('priority', models.SmallIntegerField(default=0, verbose_name='Prioridad')),
+                ('interval_seconds', models.PositiveIntegerField(verbose_name='Cada (segundos)')),
+                ('next_run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Próxima Ejecución')),
+                ('enabled', models.BooleanField(default=True, verbose_name='Activa')),
+                ('last_enqueued_at', models.DateTimeField(blank=True, null=True, verbose_name='Último Encolado')),
+            ],
+            options={
+                'verbose_name': 'Trabajo Programado',
+                'verbose_name_plural': 'Trabajos Programados',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task', models.CharField(max_length=100, verbose_name='Tarea')),
+                ('args', models.JSONField(blank=True, default=dict, verbose_name='Parámetros')),
+                ('status', models.CharField(choices=[('QUEUED', 'En cola'), ('RUNNING', 'En ejecución'), ('DONE', 'Terminado'), ('FAILED', 'Fallido'), ('CANCELLED', 'Cancelado')], default='QUEUED', max_length=10, verbose_name='Estado')),
+                ('priority', models.SmallIntegerField(default=0, verbose_name='Prioridad')),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Ejecutar desde')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Intentos')),
+                ('max_attempts', models.PositiveSmallIntegerField(default=3, verbose_name='Máx. Intentos')),
+                ('progress_done', models.PositiveIntegerField(default=0, verbose_name='Avance')),
+                ('progress_total', models.PositiveIntegerField(blank=True, null=True, verbose_name='Total')),
+                ('progress_message', models.CharField(blank=True, max_length=255, verbose_name='Mensaje')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='Resultado')),
+                ('error', models.TextField(blank=True, verbose_name='Último Error')),
+                ('worker', models.CharField(blank=True, max_length=100, verbose_name='Worker')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Creado el')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Iniciado el')),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True, verbose_name='Último Latido')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Terminado el')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Creado por')),
+                ('periodic', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to='jobs_app.periodicjob', verbose_name='Programación')),
+            ],
+            options={
+                'verbose_name': 'Trabajo',
+                'verbose_name_plural': 'Trabajos',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(condition=models.Q(('status', 'QUEUED')), fields=['-priority', 'run_at', 'id'], name='job_queue_idx'), models.Index(condition=models.Q(('status', 'RUNNING')), fields=['heartbeat_at'], name='job_running_idx')],
+            },
+        ),
+    ]
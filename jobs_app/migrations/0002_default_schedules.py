@@ -0,0 +1,43 @@
+# Programaciones iniciales de las tareas de mantenimiento (editables en el admin)
+
+from django.db import migrations
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+SCHEDULES = [
+    # (nombre, tarea, cada, prioridad)
+    ("Resúmenes de stock (/metrics)", 'inventory.refresh_stock_rollups', 60, 10),
+    ("Barrido de reservas vencidas", 'inventory.sweep_reservations', HOUR, 5),
+    ("Valorización diaria", 'inventory.snapshot_valuation', DAY, 0),
+    ("Tasas de consumo diario", 'inventory.recompute_usage_rates', DAY, 0),
+    ("Compactar bitácora de sincronización", 'inventory.compact_catalog_changes', DAY, -5),
+    ("Particiones de movimientos", 'inventory.maintain_partitions', DAY, -5),
+]
+
+
+def create_schedules(apps, schema_editor):
+    PeriodicJob = apps.get_model('jobs_app', 'PeriodicJob')
+    postgres = schema_editor.connection.vendor == 'postgresql'
+    PeriodicJob.objects.bulk_create([
+        # Las particiones sólo existen en PostgreSQL
+        PeriodicJob(name=name, task=task, interval_seconds=interval, priority=priority,
+                    enabled=postgres or task != 'inventory.maintain_partitions')
+        for name, task, interval, priority in SCHEDULES
+    ])
+
+
+def delete_schedules(apps, schema_editor):
+    PeriodicJob = apps.get_model('jobs_app', 'PeriodicJob')
+    PeriodicJob.objects.filter(name__in=[name for name, *_ in SCHEDULES]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_schedules, delete_schedules),
+    ]
@@ -0,0 +1,90 @@
+# jobs_app/models.py
+
+from django.conf import settings
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+
+class Job(models.Model):
+    """
+    Trabajo en segundo plano. El worker (run_jobs) toma los QUEUED vencidos
+    con SELECT ... FOR UPDATE SKIP LOCKED: varios workers no se pisan y
+    ninguno espera el bloqueo de otro.
+    """
+    class Status(models.TextChoices):
+        QUEUED = 'QUEUED', _('En cola')
+        RUNNING = 'RUNNING', _('En ejecución')
+        DONE = 'DONE', _('Terminado')
+        FAILED = 'FAILED', _('Fallido')
+        CANCELLED = 'CANCELLED', _('Cancelado')
+
+    task = models.CharField(max_length=100, verbose_name=_("Tarea"))
+    args = models.JSONField(default=dict, blank=True, verbose_name=_("Parámetros"))
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.QUEUED, verbose_name=_("Estado"))
+    # Mayor número, antes se ejecuta
+    priority = models.SmallIntegerField(default=0, verbose_name=_("Prioridad"))
+    run_at = models.DateTimeField(default=timezone.now, verbose_name=_("Ejecutar desde"))
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name=_("Intentos"))
+    max_attempts = models.PositiveSmallIntegerField(default=3, verbose_name=_("Máx. Intentos"))
+
+    progress_done = models.PositiveIntegerField(default=0, verbose_name=_("Avance"))
+    progress_total = models.PositiveIntegerField(null=True, blank=True, verbose_name=_("Total"))
+    progress_message = models.CharField(max_length=255, blank=True, verbose_name=_("Mensaje"))
+    result = models.JSONField(null=True, blank=True, verbose_name=_("Resultado"))
+    error = models.TextField(blank=True, verbose_name=_("Último Error"))
+
+    worker = models.CharField(max_length=100, blank=True, verbose_name=_("Worker"))
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='+', verbose_name=_("Creado por"))
+    periodic = models.ForeignKey('PeriodicJob', on_delete=models.SET_NULL, null=True, blank=True,
+                                 related_name='jobs', verbose_name=_("Programación"))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Creado el"))
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name=_("Iniciado el"))
+    # Lo renueva el worker mientras lo ejecuta; sin latido el trabajo se da por abandonado
+    heartbeat_at = models.DateTimeField(null=True, blank=True, verbose_name=_("Último Latido"))
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name=_("Terminado el"))
+
+    class Meta:
+        verbose_name = _("Trabajo")
+        verbose_name_plural = _("Trabajos")
+        ordering = ['-created_at']
+        indexes = [
+            # Cola: sólo los pendientes, en el orden en que se toman
+            models.Index(fields=['-priority', 'run_at', 'id'], name='job_queue_idx',
+                         condition=Q(status='QUEUED')),
+            # Trabajos abandonados por un worker caído
+            models.Index(fields=['heartbeat_at'], name='job_running_idx', condition=Q(status='RUNNING')),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.task} ({self.get_status_display()})"
+
+    @property
+    def percent(self):
+        if self.status == self.Status.DONE:
+            return 100
+        if not self.progress_total:
+            return None
+        return min(round(100 * self.progress_done / self.progress_total), 100)
+
+
+class PeriodicJob(models.Model):
+    """Encola `task` cada `interval_seconds`; el worker las revisa en cada vuelta."""
+    name = models.CharField(max_length=100, unique=True, verbose_name=_("Nombre"))
+    task = models.CharField(max_length=100, verbose_name=_("Tarea"))
+    args = models.JSONField(default=dict, blank=True, verbose_name=_("Parámetros"))
+    priority = models.SmallIntegerField(default=0, verbose_name=_("Prioridad"))
+    interval_seconds = models.PositiveIntegerField(verbose_name=_("Cada (segundos)"))
+    next_run_at = models.DateTimeField(default=timezone.now, verbose_name=_("Próxima Ejecución"))
+    enabled = models.BooleanField(default=True, verbose_name=_("Activa"))
+    last_enqueued_at = models.DateTimeField(null=True, blank=True, verbose_name=_("Último Encolado"))
+
+    class Meta:
+        verbose_name = _("Trabajo Programado")
+        verbose_name_plural = _("Trabajos Programados")
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
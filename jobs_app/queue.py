@@ -0,0 +1,216 @@
+# jobs_app/queue.py
+
+"""
+Cola de trabajos en la base de datos (sin Redis ni Celery).
+
+  - @task('nombre') registra una función; enqueue('nombre', {...}) crea el Job.
+  - claim(): el worker toma los trabajos vencidos de mayor prioridad con
+    SELECT ... FOR UPDATE SKIP LOCKED y los marca RUNNING en la misma
+    transacción. Dos workers nunca toman el mismo trabajo.
+  - run(): ejecuta la tarea; si falla se reintenta con espera exponencial
+    hasta max_attempts y luego queda FAILED con el traceback.
+  - report_progress(): la tarea informa su avance (lo muestran el admin y
+    api/trabajos/<id>/).
+  - schedule_periodic() / requeue_stale(): programaciones vencidas y
+    trabajos de workers caídos. Los llama el worker en cada vuelta.
+"""
+import contextvars
+import json
+import logging
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job, PeriodicJob
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+# Trabajo en curso del hilo / proceso (report_progress lo lee)
+_current = contextvars.ContextVar('jobs_app_current', default=None)
+
+
+class JobError(Exception):
+    """Tarea desconocida o trabajo en un estado que no admite la operación"""
+
+
+def task(name):
+    """Registra la función como tarea `name`; recibe los parámetros del Job como kwargs"""
+    def register(func):
+        TASKS[name] = func
+        return func
+    return register
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# ==========================================
+# 1. ENCOLAR
+# ==========================================
+def enqueue(name, args=None, priority=0, run_at=None, max_attempts=None, user=None, periodic=None):
+    if name not in TASKS:
+        raise JobError(f"Tarea desconocida: {name}")
+    return Job.objects.create(
+        task=name, args=args or {}, priority=priority, run_at=run_at or timezone.now(),
+        max_attempts=max_attempts or _setting('JOBS_MAX_ATTEMPTS', 3), created_by=user, periodic=periodic,
+    )
+
+
+def cancel(job):
+    """Cancela un trabajo en cola (uno en ejecución termina su vuelta)"""
+    if not Job.objects.filter(pk=job.pk, status=Job.Status.QUEUED).update(
+            status=Job.Status.CANCELLED, finished_at=timezone.now()):
+        raise JobError("Sólo se cancelan trabajos en cola.")
+
+
+def retry(job):
+    """Vuelve a encolar un trabajo fallido o cancelado, con los intentos en cero"""
+    if not Job.objects.filter(pk=job.pk, status__in=[Job.Status.FAILED, Job.Status.CANCELLED]).update(
+            status=Job.Status.QUEUED, attempts=0, run_at=timezone.now(), finished_at=None):
+        raise JobError("Sólo se reintentan trabajos fallidos o cancelados.")
+
+
+# ==========================================
+# 2. TOMA Y EJECUCIÓN
+# ==========================================
+def claim(worker, limit):
+    """Hasta `limit` trabajos vencidos, ya marcados RUNNING para `worker`"""
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(Job.objects.select_for_update(skip_locked=True)
+                    .filter(status=Job.Status.QUEUED, run_at__lte=now)
+                    .order_by('-priority', 'run_at', 'pk')[:limit])
+        if jobs:
+            Job.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                status=Job.Status.RUNNING, worker=worker[:100], started_at=now, heartbeat_at=now,
+                attempts=F('attempts') + 1, error='',
+            )
+    for job in jobs:
+        job.status, job.worker, job.started_at, job.heartbeat_at = Job.Status.RUNNING, worker, now, now
+        job.attempts += 1
+    return jobs
+
+
+class _Progress:
+    def __init__(self, job):
+        self.job = job
+        self.written_at = 0.0
+
+
+def report_progress(done, total=None, message=''):
+    """Avance de la tarea en curso; fuera de un trabajo no hace nada. Escribe a lo sumo cada JOBS_PROGRESS_SECONDS."""
+    state = _current.get()
+    if state is None:
+        return
+    now = time.monotonic()
+    finished = total is not None and done >= total
+    if not finished and now - state.written_at < _setting('JOBS_PROGRESS_SECONDS', 1):
+        return
+    state.written_at = now
+    Job.objects.filter(pk=state.job.pk).update(
+        progress_done=done, progress_total=total, progress_message=message[:255], heartbeat_at=timezone.now(),
+    )
+
+
+def _jsonable(value):
+    # Decimal, fechas: lo que la tarea devuelva tiene que caber en el JSONField
+    return json.loads(json.dumps(value, cls=DjangoJSONEncoder))
+
+
+def run(job):
+    """Ejecuta `job` (ya tomado con claim) y guarda el resultado o el error"""
+    token = _current.set(_Progress(job))
+    started = time.monotonic()
+    try:
+        func = TASKS.get(job.task)
+        if func is None:
+            raise JobError(f"Tarea desconocida: {job.task}")
+        result = _jsonable(func(**job.args))
+    except Exception:
+        _failed(job, traceback.format_exc())
+    else:
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.Status.DONE, result=result, finished_at=timezone.now(), heartbeat_at=timezone.now(),
+        )
+        logger.info("Trabajo #%s %s terminado en %.1fs", job.pk, job.task, time.monotonic() - started)
+    finally:
+        _current.reset(token)
+
+
+def _failed(job, error):
+    now = timezone.now()
+    if job.attempts < job.max_attempts:
+        # Espera exponencial: base, 2×base, 4×base...
+        delay = _setting('JOBS_RETRY_BASE_SECONDS', 30) * 2 ** (job.attempts - 1)
+        Job.objects.filter(pk=job.pk).update(status=Job.Status.QUEUED, run_at=now + timedelta(seconds=delay),
+                                             error=error, heartbeat_at=now)
+        logger.warning("Trabajo #%s %s falló (intento %s); reintento en %ss", job.pk, job.task, job.attempts, delay)
+    else:
+        Job.objects.filter(pk=job.pk).update(status=Job.Status.FAILED, error=error, finished_at=now, heartbeat_at=now)
+        logger.error("Trabajo #%s %s falló definitivamente:\n%s", job.pk, job.task, error)
+
+
+def execute(pk):
+    """Punto de entrada del pool (hilo o proceso): recibe sólo el id"""
+    try:
+        job = Job.objects.get(pk=pk)
+        run(job)
+    finally:
+        # Conexiones por hilo: sin esto cada hilo del pool deja una abierta
+        connection.close()
+
+
+# ==========================================
+# 3. MANTENIMIENTO (CADA VUELTA DEL WORKER)
+# ==========================================
+def schedule_periodic():
+    """Encola las programaciones vencidas (si la anterior ya terminó); devuelve cuántas"""
+    now = timezone.now()
+    with transaction.atomic():
+        due = list(PeriodicJob.objects.select_for_update(skip_locked=True)
+                   .filter(enabled=True, next_run_at__lte=now))
+        if not due:
+            return 0
+        busy = set(Job.objects.filter(periodic__in=due, status__in=[Job.Status.QUEUED, Job.Status.RUNNING])
+                   .values_list('periodic_id', flat=True))
+        jobs = []
+        for periodic in due:
+            # Las vueltas perdidas (worker detenido) no se acumulan
+            interval = timedelta(seconds=max(periodic.interval_seconds, 1))
+            missed = (now - periodic.next_run_at) // interval + 1
+            periodic.next_run_at += missed * interval
+            if periodic.pk in busy or periodic.task not in TASKS:
+                continue
+            periodic.last_enqueued_at = now
+            jobs.append(Job(task=periodic.task, args=periodic.args, priority=periodic.priority, run_at=now,
+                            max_attempts=_setting('JOBS_MAX_ATTEMPTS', 3), periodic=periodic))
+        Job.objects.bulk_create(jobs)
+        PeriodicJob.objects.bulk_update(due, ['next_run_at', 'last_enqueued_at'])
+    return len(jobs)
+
+
+def heartbeat(pks):
+    """El worker sigue vivo: renueva el latido de los trabajos que está ejecutando"""
+    if pks:
+        Job.objects.filter(pk__in=pks, status=Job.Status.RUNNING).update(heartbeat_at=timezone.now())
+
+
+def requeue_stale():
+    """Trabajos RUNNING sin latido en JOBS_STALE_SECONDS (worker caído): se reintentan o fallan"""
+    now = timezone.now()
+    stale = Job.objects.filter(status=Job.Status.RUNNING,
+                               heartbeat_at__lt=now - timedelta(seconds=_setting('JOBS_STALE_SECONDS', 3600)))
+    error = "El worker dejó de reportar (caído o reiniciado)."
+    requeued = stale.filter(attempts__lt=F('max_attempts')).update(
+        status=Job.Status.QUEUED, run_at=now, error=error, heartbeat_at=now)
+    failed = stale.update(status=Job.Status.FAILED, error=error, finished_at=now, heartbeat_at=now)
+    return requeued + failed
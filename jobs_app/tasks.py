@@ -0,0 +1,59 @@
+# jobs_app/tasks.py
+
+"""
+Tareas incorporadas. Son envoltorios finos sobre los módulos que ya hacen
+el trabajo (los mismos que usan los comandos de gestión); otras apps
+registran las suyas con @task en su propio módulo.
+"""
+from datetime import date, timedelta
+
+from django.utils import timezone
+
+from inventory_app import changes, costing, metrics, partitioning, reservations, usage, valuation
+from inventory_app.models import ProductVariation
+
+from .queue import report_progress, task
+
+
+@task('inventory.refresh_stock_rollups')
+def refresh_stock_rollups():
+    return {'rows': len(metrics.refresh_stock_rollups())}
+
+
+@task('inventory.snapshot_valuation')
+def snapshot_valuation(day=None):
+    rows = valuation.take_snapshot(date.fromisoformat(day) if day else None)
+    return {'rows': len(rows)}
+
+
+@task('inventory.recompute_usage_rates')
+def recompute_usage_rates(days=90):
+    def progress(done, total):
+        report_progress(done, total, f"{done} de {total} productos")
+    return {'changed': usage.recompute_usage_rates(days, progress=progress)}
+
+
+@task('inventory.rebuild_cost_layers')
+def rebuild_cost_layers(batch_size=200, chunk_size=2000):
+    total = ProductVariation.objects.count()
+    report_progress(0, total, "Reconstruyendo capas de costo")
+
+    def progress(done, totals):
+        report_progress(done, total, f"{done} de {total} variaciones, {totals['layers']} capas")
+    return costing.rebuild(batch_size, chunk_size, progress)
+
+
+@task('inventory.sweep_reservations')
+def sweep_reservations():
+    return {'deleted': reservations.sweep_expired()}
+
+
+@task('inventory.compact_catalog_changes')
+def compact_catalog_changes(keep_days=30):
+    return {'deleted': changes.compact(timezone.now() - timedelta(days=keep_days))}
+
+
+@task('inventory.maintain_partitions')
+def maintain_partitions():
+    actions = partitioning.maintain()
+    return {'actions': [f"{action} {partitioning.partition_name(table, month)}" for action, table, month in actions]}
@@ -0,0 +1,90 @@
+# jobs_app/tests.py
+
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from inventory_app.tests import QueryBudgetTestCase
+
+from . import queue
+from .models import Job
+
+
+class AdminQueryBudgetTests(QueryBudgetTestCase):
+
+    @classmethod
+    def load_dataset(cls, prefix, rows):
+        super().load_dataset(prefix, rows)
+        # El listado de trabajos necesita filas (creador, programación)
+        Job.objects.bulk_create(Job(task='inventory.refresh_stock_rollups') for _ in range(rows))
+
+    def test_admin_changelists(self):
+        self.assert_query_budgets(self.admin_changelist_cases('jobs_app'), 'QBL')
+
+
+# ==========================================
+# COLA: TOMA, REINTENTOS Y TRABAJOS ABANDONADOS
+# ==========================================
+def flaky():
+    raise RuntimeError("sin conexión al ERP")
+
+
+@override_settings(JOBS_RETRY_BASE_SECONDS=10, JOBS_STALE_SECONDS=60)
+class JobQueueTests(TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.dict(queue.TASKS, {'test.ok': lambda n=0: {'n': n}, 'test.flaky': flaky})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_claim_takes_due_jobs_by_priority_once(self):
+        low = queue.enqueue('test.ok')
+        high = queue.enqueue('test.ok', priority=5)
+        queue.enqueue('test.ok', priority=9, run_at=timezone.now() + timedelta(hours=1))
+
+        claimed = queue.claim('worker-1', limit=10)
+        self.assertEqual([job.pk for job in claimed], [high.pk, low.pk])
+        self.assertEqual(set(Job.objects.filter(pk__in=[low.pk, high.pk]).values_list('status', 'attempts', 'worker')),
+                         {(Job.Status.RUNNING, 1, 'worker-1')})
+        # Ya tomados: otro worker sólo encontraría el programado a futuro, aún no vencido
+        self.assertEqual(queue.claim('worker-2', limit=10), [])
+
+        queue.run(claimed[0])
+        job = Job.objects.get(pk=high.pk)
+        self.assertEqual((job.status, job.result), (Job.Status.DONE, {'n': 0}))
+
+    def test_failures_back_off_exponentially_then_fail(self):
+        job = queue.enqueue('test.flaky', max_attempts=3)
+        for attempt, delay in ((1, 10), (2, 20)):
+            before = timezone.now()
+            (claimed,) = queue.claim('worker-1', limit=1)
+            queue.run(claimed)
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), (Job.Status.QUEUED, attempt))
+            self.assertGreaterEqual(job.run_at, before + timedelta(seconds=delay))
+            self.assertLess(job.run_at, before + timedelta(seconds=delay + 5))
+            self.assertIn("sin conexión al ERP", job.error)
+            # Sin esperar el reintento: se adelanta para la siguiente vuelta
+            Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+
+        (claimed,) = queue.claim('worker-1', limit=1)
+        queue.run(claimed)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.Status.FAILED, 3))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_requeue_stale_retries_or_fails_abandoned_jobs(self):
+        long_ago = timezone.now() - timedelta(minutes=5)
+        retried, exhausted, alive = Job.objects.bulk_create([
+            Job(task='test.ok', status=Job.Status.RUNNING, attempts=1, max_attempts=3, heartbeat_at=long_ago),
+            Job(task='test.ok', status=Job.Status.RUNNING, attempts=3, max_attempts=3, heartbeat_at=long_ago),
+            Job(task='test.ok', status=Job.Status.RUNNING, attempts=1, max_attempts=3, heartbeat_at=timezone.now()),
+        ])
+
+        self.assertEqual(queue.requeue_stale(), 2)
+        status = dict(Job.objects.values_list('pk', 'status'))
+        self.assertEqual((status[retried.pk], status[exhausted.pk], status[alive.pk]),
+                         (Job.Status.QUEUED, Job.Status.FAILED, Job.Status.RUNNING))
+        self.assertEqual([job.pk for job in queue.claim('worker-2', limit=10)], [retried.pk])
@@ -0,0 +1,103 @@
+# jobs_app/worker.py
+
+"""
+Bucle del worker (comando run_jobs): toma trabajos con queue.claim() y los
+ejecuta en un pool de hilos o de procesos.
+
+Con hilos cada trabajo usa su propia conexión (se cierra al terminar). Los
+procesos se crean con 'spawn' e inicializan Django desde cero: no heredan
+las conexiones abiertas del padre.
+"""
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections
+
+from . import bootstrap, queue
+
+logger = logging.getLogger(__name__)
+
+THREAD = 'thread'
+PROCESS = 'process'
+
+
+class Worker:
+    def __init__(self, concurrency=None, pool=THREAD, poll_seconds=None, name=None):
+        self.concurrency = concurrency or getattr(settings, 'JOBS_CONCURRENCY', 4)
+        self.pool = pool
+        self.poll_seconds = poll_seconds or getattr(settings, 'JOBS_POLL_SECONDS', 2)
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.stopping = threading.Event()
+        # Los procesos hijos no pueden importar queue antes de django.setup()
+        self._target = bootstrap.execute if pool == PROCESS else queue.execute
+
+    def stop(self, *args):
+        """Deja de tomar trabajos; los que están corriendo terminan"""
+        self.stopping.set()
+
+    def _executor(self):
+        if self.pool == PROCESS:
+            return ProcessPoolExecutor(self.concurrency, mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=bootstrap.init_process)
+        return ThreadPoolExecutor(self.concurrency, thread_name_prefix='job')
+
+    def _housekeeping(self, running):
+        queue.heartbeat(list(running.values()))
+        stale = queue.requeue_stale()
+        if stale:
+            logger.warning("%s trabajos abandonados vueltos a la cola", stale)
+        queue.schedule_periodic()
+
+    def run(self, once=False):
+        """
+        Procesa la cola hasta stop(). Con once=True termina cuando no quedan
+        trabajos vencidos (útil en cron o en pruebas). Devuelve cuántos ejecutó.
+        """
+        running = {}
+        executed = 0
+        housekeeping_at = 0.0
+        with self._executor() as executor:
+            while not self.stopping.is_set():
+                # Conexión del bucle principal: se descarta si quedó rota o vieja
+                close_old_connections()
+                free = self.concurrency - len(running)
+                try:
+                    if time.monotonic() - housekeeping_at >= self.poll_seconds:
+                        self._housekeeping(running)
+                        housekeeping_at = time.monotonic()
+                    jobs = queue.claim(self.name, free) if free else []
+                except DatabaseError:
+                    # BD caída o reiniciándose: el worker espera y reintenta, no muere
+                    logger.exception("Error de base de datos en el bucle del worker")
+                    jobs = []
+                    if not running:
+                        self.stopping.wait(self.poll_seconds)
+                        continue
+                for job in jobs:
+                    logger.info("Trabajo #%s %s (intento %s)", job.pk, job.task, job.attempts)
+                    running[executor.submit(self._target, job.pk)] = job.pk
+
+                if once and not running and not jobs:
+                    break
+                if running:
+                    done, _ = wait(running, timeout=self.poll_seconds, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        pk = running.pop(future)
+                        executed += 1
+                        if future.exception() is not None:
+                            # Error fuera de la tarea (p. ej. un proceso del pool murió)
+                            logger.error("Trabajo #%s: %r", pk, future.exception())
+                elif not jobs:
+                    self.stopping.wait(self.poll_seconds)
+
+            if running:
+                logger.info("Esperando %s trabajos en curso...", len(running))
+                wait(running)
+                executed += len(running)
+        return executed
@@ -0,0 +1,27 @@
+# Generated by Django 5.0.6 on 2026-10-19 00:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+from core.migration_operations import AddIndexConcurrentlyIfSupported
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY (PostgreSQL) no puede ir dentro de una transacción
+    atomic = False
+
+    dependencies = [
+        ('purchasing_app', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyIfSupported(
+            model_name='purchaseorder',
+            index=models.Index(fields=['status', '-order_date'], name='po_status_date_idx'),
+        ),
+        AddIndexConcurrentlyIfSupported(
+            model_name='purchaseorder',
+            index=models.Index(condition=models.Q(('status__in', ['SENT', 'PARTIALLY_RECEIVED'])), fields=['expected_delivery_date'], name='po_open_expected_idx'),
+        ),
+    ]
@@ -1,6 +1,7 @@
 # purchasing_app/models.py
 
 from django.db import models
+from django.db.models import Q
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
 
@@ -73,6 +74,15 @@ class PurchaseOrder(models.Model):
     class Meta:
         verbose_name = _("Orden de Compra")
         verbose_name_plural = _("Órdenes de Compra")
+        indexes = [
+            models.Index(fields=['status', '-order_date'], name='po_status_date_idx'),
+            # Parcial: sólo las órdenes abiertas, por fecha de entrega esperada
+            models.Index(
+                fields=['expected_delivery_date'],
+                condition=Q(status__in=['SENT', 'PARTIALLY_RECEIVED']),
+                name='po_open_expected_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"Orden #{self.po_number} a {self.supplier.name}"
@@ -1,3 +1,9 @@
-from django.test import TestCase
+# purchasing_app/tests.py
 
-# Create your tests here.
+from inventory_app.tests import QueryBudgetTestCase
+
+
+class AdminQueryBudgetTests(QueryBudgetTestCase):
+
+    def test_admin_changelists(self):
+        self.assert_query_budgets(self.admin_changelist_cases('purchasing_app'), 'QBL')